@@ -1,7 +1,20 @@
 """
 Admin configuration for Analytics app
-Placeholder - to be implemented
 """
 from django.contrib import admin
 
-# Register your models here
+from .models import DamageRollup, MetricRollupRun
+
+
+@admin.register(DamageRollup)
+class DamageRollupAdmin(admin.ModelAdmin):
+    list_display = ['source', 'period', 'bucket_start', 'company', 'structure', 'damage_type', 'damage_label', 'count']
+    list_filter = ['source', 'period', 'company']
+    date_hierarchy = 'bucket_start'
+    readonly_fields = ['bucket_key', 'updated_at']
+
+
+@admin.register(MetricRollupRun)
+class MetricRollupRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'full', 'cells']
+    list_filter = ['full']
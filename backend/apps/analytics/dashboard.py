@@ -0,0 +1,125 @@
+"""
+Dashboard statistics for Analytics app
+One conditional aggregate per model (Inspection, Issue, Report) cached per
+company. Every company has a version number in the cache that is bumped after
+writes to those models commit (signals.py); the cached stats live under a key
+that includes the version, so invalidation never has to find and delete
+entries. Shared by the API dashboard and the HTML dashboard page.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+ALL_COMPANIES = 'all'
+RECENT_LIMIT = 10
+METRIC_KEYS = {True: 'dashboard:metrics:hits', False: 'dashboard:metrics:misses'}
+
+
+def _version_key(scope):
+    return f'dashboard:version:{scope}'
+
+
+def _incr(key):
+    """Incrementa um contador no cache (criando-o se não existir)"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def dashboard_version(scope):
+    """Versão atual das estatísticas da empresa (ou ALL_COMPANIES)"""
+    version = cache.get(_version_key(scope))
+    if version is None:
+        # Valor novo a cada (re)criação: nunca reaproveita entradas antigas
+        cache.add(_version_key(scope), time.time_ns(), None)
+        version = cache.get(_version_key(scope))
+    return version
+
+
+def bump_dashboard_version(company_id):
+    """Invalida as estatísticas da empresa e as globais (superusuários)"""
+    for scope in (company_id, ALL_COMPANIES):
+        if scope is None:
+            continue
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), time.time_ns(), None)
+
+
+def invalidate_dashboard(company_id):
+    """Agenda a invalidação para depois do commit da transação atual"""
+    transaction.on_commit(lambda: bump_dashboard_version(company_id))
+
+
+def compute_dashboard_stats(company=None, all_companies=False):
+    """Estatísticas do dashboard: uma consulta por modelo mais as inspeções recentes"""
+    from apps.inspections.models import Inspection
+    from apps.issues.models import Issue
+    from apps.reports.models import Report
+
+    inspections = Inspection.objects.all()
+    issues = Issue.objects.all()
+    reports = Report.objects.all()
+    if not all_companies:
+        inspections = inspections.filter(company=company)
+        issues = issues.filter(company=company)
+        reports = reports.filter(inspection__company=company)
+
+    stats = inspections.aggregate(
+        total_inspections=Count('id'),
+        completed_inspections=Count('id', filter=Q(status='COMPLETED')),
+        in_progress_inspections=Count('id', filter=Q(status='IN_PROGRESS')),
+        draft_inspections=Count('id', filter=Q(status='DRAFT')),
+    )
+    stats['pending_inspections'] = stats['in_progress_inspections'] + stats['draft_inspections']
+    stats.update(issues.aggregate(
+        total_issues=Count('id'),
+        open_issues=Count('id', filter=Q(status='OPEN')),
+        resolved_issues=Count('id', filter=Q(status='RESOLVED')),
+    ))
+    stats['total_reports'] = reports.count()
+    stats['recent_inspections'] = list(
+        inspections.order_by('-created_at').values(
+            'id', 'reference_number', 'title', 'status', 'created_at'
+        )[:RECENT_LIMIT]
+    )
+    return stats
+
+
+def get_dashboard_stats(company=None, all_companies=False):
+    """
+    Estatísticas do dashboard a partir do cache
+
+    Returns:
+        Tupla (stats, True se veio do cache)
+    """
+    scope = ALL_COMPANIES if all_companies else (company.pk if company else None)
+    if scope is None:
+        return compute_dashboard_stats(company), False
+
+    key = f'dashboard:stats:{scope}:{dashboard_version(scope)}'
+    stats = cache.get(key)
+    hit = stats is not None
+    if not hit:
+        stats = compute_dashboard_stats(company, all_companies)
+        cache.set(key, stats, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    _incr(METRIC_KEYS[hit])
+    return stats, hit
+
+
+def cache_metrics():
+    """Acertos e falhas do cache do dashboard (somados entre processos quando o cache é compartilhado)"""
+    hits = cache.get(METRIC_KEYS[True], 0)
+    misses = cache.get(METRIC_KEYS[False], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,177 @@
+"""
+Damage heatmap for Analytics app
+Reads DamageRollup rows for a period range into a NumPy cube
+(bucket x structure x damage type) and derives the structure x damage matrix,
+the top-N cells and a least-squares trend per cell without touching the
+source tables.
+"""
+from datetime import date
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+from apps.inspections.structure_models import ContainerStructure, DamageType
+from .models import DamageRollup
+from .rollups import CARGOSNAP, STRUCTURE, UNKNOWN_DAMAGE, bucket_start
+
+MAX_BUCKETS = 400
+CARGOSNAP_ROW = 'CargoSnap'
+
+
+def bucket_range(date_from, date_to, period):
+    """
+    Lista contínua de buckets entre as datas (inclusive)
+
+    Raises:
+        ValueError: intervalo invertido ou com mais de MAX_BUCKETS buckets
+    """
+    if date_from > date_to:
+        raise ValueError('date_from deve ser anterior a date_to')
+    step = {'DAY': relativedelta(days=1), 'WEEK': relativedelta(weeks=1), 'MONTH': relativedelta(months=1)}[period]
+    buckets = []
+    current = bucket_start(date_from, period)
+    while current <= date_to:
+        buckets.append(current)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f'Intervalo maior que {MAX_BUCKETS} buckets')
+        current += step
+    return buckets
+
+
+def default_range(period, today=None):
+    """Últimos 30 dias, 12 semanas ou 12 meses"""
+    today = today or date.today()
+    if period == 'DAY':
+        return today - relativedelta(days=29), today
+    if period == 'WEEK':
+        return bucket_start(today, 'WEEK') - relativedelta(weeks=11), today
+    return bucket_start(today, 'MONTH') - relativedelta(months=11), today
+
+
+def trend_slopes(series):
+    """
+    Inclinação da reta de mínimos quadrados de cada coluna
+
+    Args:
+        series: Array (buckets x células)
+
+    Returns:
+        Array (células,) com a variação média por bucket
+    """
+    n = series.shape[0]
+    if n < 2:
+        return np.zeros(series.shape[1])
+    t = np.arange(n, dtype=float)
+    t -= t.mean()
+    return t @ (series - series.mean(axis=0)) / (t @ t)
+
+
+def damage_matrix(company, source=STRUCTURE, period='MONTH', date_from=None, date_to=None, top=10):
+    """
+    Matriz estrutura x tipo de avaria pronta para gráfico
+
+    Linhas e colunas vêm ordenadas pelo total (maior primeiro) e só incluem
+    estruturas/tipos com avarias no intervalo. Uploads CargoSnap não têm
+    estrutura: a matriz tem uma única linha e as colunas são as descrições
+    enviadas pelo CargoSnap.
+    """
+    if date_from is None or date_to is None:
+        default_from, default_to = default_range(period)
+        date_from = date_from or default_from
+        date_to = date_to or default_to
+    buckets = bucket_range(date_from, date_to, period)
+
+    rollups = DamageRollup.objects.filter(
+        source=source, period=period, bucket_start__gte=buckets[0], bucket_start__lte=date_to, count__gt=0
+    )
+    if source == CARGOSNAP:
+        rows = rollups.filter(company__isnull=True).values_list('bucket_start', 'damage_label', 'count')
+        rows = [(start, CARGOSNAP_ROW, label, count) for start, label, count in rows]
+    else:
+        rows = rollups.filter(company=company).values_list('bucket_start', 'structure_id', 'damage_type_id', 'count')
+
+    bucket_index = {start: i for i, start in enumerate(buckets)}
+    row_keys = sorted({row[1] for row in rows}, key=str)
+    col_keys = sorted({row[2] for row in rows}, key=str)
+    row_index = {key: i for i, key in enumerate(row_keys)}
+    col_index = {key: i for i, key in enumerate(col_keys)}
+
+    cube = np.zeros((len(buckets), len(row_keys), len(col_keys)), dtype=np.int64)
+    if rows:
+        np.add.at(
+            cube,
+            (
+                np.fromiter((bucket_index[row[0]] for row in rows), dtype=np.intp, count=len(rows)),
+                np.fromiter((row_index[row[1]] for row in rows), dtype=np.intp, count=len(rows)),
+                np.fromiter((col_index[row[2]] for row in rows), dtype=np.intp, count=len(rows)),
+            ),
+            np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows)),
+        )
+
+    # Ordena eixos pelo total
+    row_order = np.argsort(-cube.sum(axis=(0, 2)), kind='stable')
+    col_order = np.argsort(-cube.sum(axis=(0, 1)), kind='stable')
+    cube = cube[:, row_order][:, :, col_order]
+    row_keys = [row_keys[i] for i in row_order]
+    col_keys = [col_keys[i] for i in col_order]
+
+    matrix = cube.sum(axis=0)
+    total = int(matrix.sum())
+    row_labels, col_labels = _axis_labels(source, row_keys, col_keys)
+
+    # Top N células e tendência
+    flat = matrix.ravel()
+    n_top = min(max(top, 0), int(np.count_nonzero(flat)))
+    top_cells = []
+    if n_top:
+        candidates = np.argpartition(-flat, n_top - 1)[:n_top]
+        candidates = candidates[np.argsort(-flat[candidates], kind='stable')]
+        series = cube.reshape(len(buckets), -1)[:, candidates].astype(float)
+        slopes = trend_slopes(series)
+        for position, cell in enumerate(candidates):
+            i, j = divmod(int(cell), len(col_keys))
+            top_cells.append({
+                'structure': row_labels[i],
+                'damage_type': col_labels[j],
+                'count': int(flat[cell]),
+                'share': round(float(flat[cell]) / total, 4),
+                'trend': round(float(slopes[position]), 4),
+                'series': series[:, position].astype(int).tolist(),
+            })
+
+    return {
+        'source': source,
+        'period': period,
+        'date_from': buckets[0].isoformat(),
+        'date_to': date_to.isoformat(),
+        'buckets': [start.isoformat() for start in buckets],
+        'structures': row_labels,
+        'damage_types': col_labels,
+        'matrix': matrix.tolist(),
+        'totals_by_bucket': cube.sum(axis=(1, 2)).tolist(),
+        'total': total,
+        'top': top_cells,
+    }
+
+
+def _axis_labels(source, row_keys, col_keys):
+    if source == CARGOSNAP:
+        return (
+            [{'id': None, 'code': None, 'name': key} for key in row_keys],
+            [{'id': None, 'code': None, 'name': key} for key in col_keys],
+        )
+
+    structures = {
+        pk: (code, name) for pk, code, name in
+        ContainerStructure.objects.filter(pk__in=row_keys).values_list('id', 'code', 'name')
+    }
+    damage_types = {
+        pk: (code, name) for pk, code, name in
+        DamageType.objects.filter(pk__in=[key for key in col_keys if key]).values_list('id', 'code', 'name')
+    }
+
+    def label(pk, names):
+        code, name = names.get(pk, (None, UNKNOWN_DAMAGE))
+        return {'id': pk, 'code': code, 'name': name}
+
+    return [label(pk, structures) for pk in row_keys], [label(pk, damage_types) for pk in col_keys]
@@ -0,0 +1,24 @@
+"""
+Management command to rebuild the damage heatmap rollups from the source tables
+Usage: python manage.py rebuild_damage_rollups [--company slug]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.analytics.rollups import rebuild_rollups
+from apps.core.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os rollups de avarias (itens de inspeção e uploads CargoSnap)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='Slug da empresa (apenas itens de inspeção da empresa)')
+
+    def handle(self, *args, **options):
+        company = None
+        if options['company']:
+            company = Company.objects.filter(slug=options['company']).first()
+            if company is None:
+                raise CommandError(f"Empresa '{options['company']}' não encontrada")
+
+        written = rebuild_rollups(company=company, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'{written} linhas de rollup gravadas'))
@@ -0,0 +1,30 @@
+"""
+Management command to update the daily DashboardMetric rollups
+Usage: python manage.py rollup_dashboard_metrics [--full] [--loop --interval 300]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.analytics.metrics import run_rollup
+
+
+class Command(BaseCommand):
+    help = 'Atualiza as métricas diárias do dashboard (apenas dias alterados desde a última execução)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recalcula todos os dias')
+        parser.add_argument('--loop', action='store_true', help='Executa continuamente (worker)')
+        parser.add_argument('--interval', type=int, default=300, help='Segundos entre execuções com --loop')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            run = run_rollup(full=full, stdout=self.stdout)
+            kind = 'completo' if run.full else 'incremental'
+            self.stdout.write(self.style.SUCCESS(f'Rollup {kind}: {run.cells} células recalculadas'))
+            if not options['loop']:
+                break
+            full = False
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,227 @@
+"""
+DashboardMetric rollups for Analytics app
+Materializes daily metrics per company in DashboardMetric (one row per
+company x metric type x day, period_start == period_end):
+
+    inspections_by_status   value = inspeções criadas no dia, data = {status: n}
+    issues_by_priority      value = ocorrências criadas no dia, data = {priority: n}
+    cargosnap_snaps         value = uploads CargoSnap do dia, data = {'damaged': n}
+    report_generation_time  value = tempo médio (s), data = {'count', 'max_seconds'}
+
+Incremental runs only recompute the (company, day) cells whose source rows
+changed since the previous run (updated_at / last_synced_at watermark). The
+watermark is the previous run's start minus DASHBOARD_METRICS_OVERLAP
+seconds: updated_at is stamped before commit, so a row whose transaction
+commits after that run read the tables can carry an earlier updated_at.
+Deleted rows are not seen by the watermark: they are picked up by the next
+full run (`rollup_dashboard_metrics --full`).
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.inspections.models import Inspection
+from apps.issues.models import Issue
+from apps.reports.models import Report
+from .models import DashboardMetric, MetricRollupRun
+
+logger = logging.getLogger(__name__)
+
+INSPECTIONS_BY_STATUS = 'inspections_by_status'
+ISSUES_BY_PRIORITY = 'issues_by_priority'
+CARGOSNAP_SNAPS = 'cargosnap_snaps'
+REPORT_GENERATION_TIME = 'report_generation_time'
+METRIC_TYPES = [INSPECTIONS_BY_STATUS, ISSUES_BY_PRIORITY, CARGOSNAP_SNAPS, REPORT_GENERATION_TIME]
+
+DAY_CHUNK = 500  # Dias por consulta no modo incremental (limite de parâmetros do banco)
+
+
+def _sources():
+    """
+    Consultas de origem de cada métrica
+
+    Returns:
+        {metric_type: (queryset, campo da empresa, campo de data)}
+    """
+    uploads = CargoSnapUpload.objects.filter(file__inspections__isnull=False)
+    return {
+        INSPECTIONS_BY_STATUS: (Inspection.objects.all(), 'company_id', 'created_at'),
+        ISSUES_BY_PRIORITY: (Issue.objects.all(), 'company_id', 'created_at'),
+        CARGOSNAP_SNAPS: (uploads, 'file__inspections__company_id', 'scan_date_time'),
+        REPORT_GENERATION_TIME: (Report.objects.all(), 'inspection__company_id', 'generated_at'),
+    }
+
+
+def _changed(metric_type, queryset, since):
+    """Linhas alteradas desde o watermark"""
+    if metric_type == CARGOSNAP_SNAPS:
+        # Uploads são regravados na sincronização do arquivo; vincular o arquivo
+        # a uma inspeção muda a empresa a que os uploads são atribuídos
+        return queryset.filter(Q(file__last_synced_at__gte=since) | Q(file__inspections__updated_at__gte=since))
+    return queryset.filter(updated_at__gte=since)
+
+
+def touched_cells(metric_type, since):
+    """Pares (company_id, dia) com linhas alteradas desde `since`"""
+    queryset, company_field, date_field = _sources()[metric_type]
+    return set(
+        _changed(metric_type, queryset, since)
+        .annotate(day=TruncDate(date_field))
+        .order_by().values_list(company_field, 'day').distinct()
+    )
+
+
+def _aggregate(metric_type, queryset, company_field, date_field):
+    """Agrega por (empresa, dia) e retorna {(company_id, dia): (valor, dados)}"""
+    rows = queryset.annotate(metric_company=F(company_field), day=TruncDate(date_field)).order_by()
+    cells = {}
+
+    if metric_type in (INSPECTIONS_BY_STATUS, ISSUES_BY_PRIORITY):
+        key = 'status' if metric_type == INSPECTIONS_BY_STATUS else 'priority'
+        breakdown = defaultdict(Counter)
+        for row in rows.values('metric_company', 'day', key).annotate(n=Count('id')):
+            breakdown[(row['metric_company'], row['day'])][row[key]] += row['n']
+        for cell, counts in breakdown.items():
+            cells[cell] = (sum(counts.values()), dict(counts))
+
+    elif metric_type == CARGOSNAP_SNAPS:
+        for row in rows.values('metric_company', 'day').annotate(
+            n=Count('id', distinct=True),
+            damaged=Count('id', filter=Q(has_damage=True), distinct=True),
+        ):
+            cells[(row['metric_company'], row['day'])] = (row['n'], {'damaged': row['damaged']})
+
+    elif metric_type == REPORT_GENERATION_TIME:
+        for row in rows.filter(status='COMPLETED').values('metric_company', 'day').annotate(
+            n=Count('id'), avg=Avg('generation_time_seconds'), max_seconds=Max('generation_time_seconds'),
+        ):
+            cells[(row['metric_company'], row['day'])] = (
+                round(row['avg'], 2), {'count': row['n'], 'max_seconds': float(row['max_seconds'])}
+            )
+
+    return cells
+
+
+def compute_cells(metric_type, cells=None):
+    """
+    Valores das células da métrica (todas quando cells é None)
+
+    Células sem linhas de origem ficam fora do resultado (o valor é zero).
+    """
+    queryset, company_field, date_field = _sources()[metric_type]
+    if cells is None:
+        return _aggregate(metric_type, queryset, company_field, date_field)
+
+    companies = {company_id for company_id, _ in cells}
+    days = sorted({day for _, day in cells})
+    values = {}
+    for start in range(0, len(days), DAY_CHUNK):
+        chunk = queryset.filter(**{
+            f'{company_field}__in': companies,
+            f'{date_field}__date__in': days[start:start + DAY_CHUNK],
+        })
+        values.update(_aggregate(metric_type, chunk, company_field, date_field))
+    return {cell: value for cell, value in values.items() if cell in cells}
+
+
+def _write(metric_type, cells, values):
+    """Substitui as linhas das células informadas (todas quando cells é None)"""
+    existing = DashboardMetric.objects.filter(metric_type=metric_type)
+    if cells is not None:
+        days = sorted({day for _, day in cells})
+        stale = [
+            pk for start in range(0, len(days), DAY_CHUNK)
+            for pk, company_id, day in existing.filter(
+                company_id__in={company_id for company_id, _ in cells},
+                period_start__in=days[start:start + DAY_CHUNK],
+            ).values_list('id', 'company_id', 'period_start')
+            if (company_id, day) in cells
+        ]
+        existing = DashboardMetric.objects.filter(pk__in=stale)
+    existing.delete()
+
+    DashboardMetric.objects.bulk_create([
+        DashboardMetric(
+            company_id=company_id, metric_type=metric_type, metric_value=value, metric_data=data,
+            period_start=day, period_end=day,
+        )
+        for (company_id, day), (value, data) in values.items()
+        if company_id is not None and day is not None
+    ], batch_size=500)
+
+
+def run_rollup(full=False, stdout=None):
+    """
+    Atualiza os rollups do DashboardMetric
+
+    A primeira execução é sempre completa. As seguintes recalculam apenas as
+    células alteradas desde o início da última execução concluída (menos
+    DASHBOARD_METRICS_OVERLAP).
+
+    Returns:
+        MetricRollupRun da execução
+    """
+    last = MetricRollupRun.objects.filter(finished_at__isnull=False).first()
+    full = full or last is None
+    run = MetricRollupRun.objects.create(started_at=timezone.now(), full=full)
+    since = None if full else last.started_at - timedelta(seconds=getattr(settings, 'DASHBOARD_METRICS_OVERLAP', 300))
+
+    total = 0
+    with transaction.atomic():
+        for metric_type in METRIC_TYPES:
+            cells = None if full else touched_cells(metric_type, since)
+            if cells is not None and not cells:
+                continue
+            values = compute_cells(metric_type, cells)
+            _write(metric_type, cells, values)
+            count = len(values) if cells is None else len(cells)
+            total += count
+            if stdout:
+                stdout.write(f'{metric_type}: {count} células recalculadas')
+
+    run.finished_at = timezone.now()
+    run.cells = total
+    run.save(update_fields=['finished_at', 'cells'])
+    logger.info(f"Rollup de métricas ({'completo' if full else 'incremental'}): {total} células")
+    return run
+
+
+def rollups_fresh():
+    """
+    Os rollups podem responder às consultas?
+
+    Exige uma execução completa concluída e uma execução (qualquer) mais recente
+    que DASHBOARD_METRICS_MAX_AGE segundos.
+    """
+    last = MetricRollupRun.objects.filter(finished_at__isnull=False).first()
+    if last is None:
+        return False
+    max_age = timedelta(seconds=getattr(settings, 'DASHBOARD_METRICS_MAX_AGE', 3600))
+    if timezone.now() - last.finished_at > max_age:
+        return False
+    return last.full or MetricRollupRun.objects.filter(full=True, finished_at__isnull=False).exists()
+
+
+def metric_rows(company, metric_type, date_from=None, date_to=None):
+    """Linhas diárias da métrica no intervalo (datas inclusivas)"""
+    rows = DashboardMetric.objects.filter(company=company, metric_type=metric_type)
+    if date_from:
+        rows = rows.filter(period_start__gte=date_from)
+    if date_to:
+        rows = rows.filter(period_start__lte=date_to)
+    return rows.order_by('period_start')
+
+
+def metric_breakdown(company, metric_type, date_from=None, date_to=None):
+    """Soma dos metric_data ({chave: n}) no intervalo"""
+    totals = Counter()
+    for data in metric_rows(company, metric_type, date_from, date_to).values_list('metric_data', flat=True):
+        totals.update(data)
+    return totals
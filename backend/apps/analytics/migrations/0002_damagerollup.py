@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-19 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('core', '0002_reference_sequence'),
+        ('inspections', '0009_structure_item_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DamageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_key', models.CharField(max_length=300, unique=True)),
+                ('source', models.CharField(choices=[('STRUCTURE', 'Itens de Inspeção'), ('CARGOSNAP', 'Uploads CargoSnap')], max_length=20)),
+                ('period', models.CharField(choices=[('DAY', 'Diário'), ('WEEK', 'Semanal'), ('MONTH', 'Mensal')], max_length=10)),
+                ('bucket_start', models.DateField()),
+                ('damage_label', models.CharField(blank=True, max_length=200)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='damage_rollups', to='core.company')),
+                ('damage_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inspections.damagetype')),
+                ('structure', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inspections.containerstructure')),
+            ],
+            options={
+                'ordering': ['period', 'bucket_start'],
+                'indexes': [models.Index(fields=['company', 'source', 'period', 'bucket_start'], name='analytics_d_company_716cb2_idx')],
+            },
+        ),
+    ]
@@ -25,3 +25,71 @@ class DashboardMetric(BaseModel):
     
     def __str__(self):
         return f"{self.metric_type}: {self.metric_value}"
+
+
+class DamageRollup(models.Model):
+    """
+    Damage counts per structure x damage type x period bucket x company
+
+    Maintained incrementally by apps/analytics/rollups.py (item saves and
+    CargoSnap sync) and rebuilt by `rebuild_damage_rollups`. `bucket_key`
+    identifies the cell so that increments are a single upsert.
+    CargoSnap uploads have no company (company is NULL) and no structure;
+    their damage is identified by the description sent by CargoSnap.
+    """
+    SOURCE_CHOICES = [
+        ('STRUCTURE', 'Itens de Inspeção'),
+        ('CARGOSNAP', 'Uploads CargoSnap'),
+    ]
+    PERIOD_CHOICES = [
+        ('DAY', 'Diário'),
+        ('WEEK', 'Semanal'),
+        ('MONTH', 'Mensal'),
+    ]
+    
+    bucket_key = models.CharField(max_length=300, unique=True)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True, related_name='damage_rollups')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    bucket_start = models.DateField()
+    
+    structure = models.ForeignKey(
+        'inspections.ContainerStructure', on_delete=models.CASCADE, null=True, blank=True, related_name='+'
+    )
+    damage_type = models.ForeignKey(
+        'inspections.DamageType', on_delete=models.CASCADE, null=True, blank=True, related_name='+'
+    )
+    damage_label = models.CharField(max_length=200, blank=True)  # CargoSnap damage_type_desc
+    
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['period', 'bucket_start']
+        indexes = [
+            models.Index(fields=['company', 'source', 'period', 'bucket_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} {self.period} {self.bucket_start}: {self.count}"
+
+
+class MetricRollupRun(models.Model):
+    """
+    One execution of the DashboardMetric rollup job (apps/analytics/metrics.py)
+
+    The `started_at` of the last finished run is the watermark of the next
+    incremental run: only (company, day) cells with rows changed after it are
+    recomputed. A finished full run marks the rollups as covering all days.
+    """
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    cells = models.IntegerField(default=0)  # (company, day, metric) cells recomputed
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        kind = 'full' if self.full else 'incremental'
+        return f"{kind} rollup {self.started_at:%Y-%m-%d %H:%M}: {self.cells} cells"
@@ -0,0 +1,171 @@
+"""
+Damage rollups for Analytics app
+Keeps DamageRollup (structure x damage type x period bucket x company) up to
+date with deltas instead of re-running GROUP BYs over StructureInspectionItem
+and CargoSnapUpload. Every damaged row contributes one "cell"
+(company, source, day, structure, damage type, label); a change applies -1 to
+the old cell and +1 to the new one, in every period (day/week/month), as one
+INSERT ... ON CONFLICT DO UPDATE per row.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.inspections.models import Inspection
+from apps.inspections.structure_models import StructureInspectionItem
+from .dashboard import invalidate_dashboard
+from .models import DamageRollup
+
+STRUCTURE = 'STRUCTURE'
+CARGOSNAP = 'CARGOSNAP'
+PERIODS = ('DAY', 'WEEK', 'MONTH')
+UNKNOWN_DAMAGE = 'Não informado'
+
+ITEM_FIELDS = ['status', 'structure_id', 'damage_type_id', 'inspected_at', 'created_at']
+UPLOAD_FIELDS = ['has_damage', 'damage_type_desc', 'scan_date_time']
+
+
+def bucket_start(day, period):
+    """Primeiro dia do bucket (semana começa na segunda-feira)"""
+    if period == 'WEEK':
+        return day - timedelta(days=day.weekday())
+    if period == 'MONTH':
+        return day.replace(day=1)
+    return day
+
+
+def _local_date(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def item_cell(company_id, values):
+    """Célula de um item (dict com ITEM_FIELDS) ou None se não conta como avaria"""
+    if not values or values['status'] != 'DAMAGED' or company_id is None:
+        return None
+    moment = values['inspected_at'] or values['created_at']
+    if moment is None:
+        return None
+    return (company_id, STRUCTURE, _local_date(moment), values['structure_id'], values['damage_type_id'], '')
+
+
+def upload_cell(values):
+    """Célula de um upload CargoSnap (dict com UPLOAD_FIELDS)"""
+    if not values or not values['has_damage'] or values['scan_date_time'] is None:
+        return None
+    label = (values['damage_type_desc'] or UNKNOWN_DAMAGE)[:200]
+    return (None, CARGOSNAP, _local_date(values['scan_date_time']), None, None, label)
+
+
+def item_values(item):
+    return {field: getattr(item, field) for field in ITEM_FIELDS}
+
+
+def upload_values(upload):
+    return {field: getattr(upload, field) for field in UPLOAD_FIELDS}
+
+
+def inspection_companies(inspection_ids):
+    """{inspection_id: company_id} em uma consulta"""
+    return dict(Inspection.objects.filter(pk__in=set(inspection_ids)).values_list('id', 'company_id'))
+
+
+def change_deltas(old_cell, new_cell):
+    deltas = Counter()
+    if old_cell != new_cell:
+        if old_cell:
+            deltas[old_cell] -= 1
+        if new_cell:
+            deltas[new_cell] += 1
+    return deltas
+
+
+def bucket_key(company_id, source, period, start, structure_id, damage_type_id, label):
+    return f'{company_id or 0}:{source}:{period}:{start.isoformat()}:{structure_id or 0}:{damage_type_id or 0}:{label}'
+
+
+def apply_deltas(deltas):
+    """
+    Soma os deltas {célula: n} nas linhas de todos os períodos
+
+    Returns:
+        Número de linhas afetadas (inseridas ou atualizadas)
+    """
+    rows = Counter()
+    for (company_id, source, day, structure_id, damage_type_id, label), delta in deltas.items():
+        if not delta:
+            continue
+        for period in PERIODS:
+            start = bucket_start(day, period)
+            rows[(company_id, source, period, start, structure_id, damage_type_id, label)] += delta
+    rows = {key: delta for key, delta in rows.items() if delta}
+    if not rows:
+        return 0
+
+    table = DamageRollup._meta.db_table
+    ops = connection.ops
+    now = ops.adapt_datetimefield_value(timezone.now())
+    sql = (
+        f'INSERT INTO {table} (bucket_key, company_id, source, period, bucket_start, structure_id, '
+        f'damage_type_id, damage_label, count, updated_at) '
+        f'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) '
+        f'ON CONFLICT (bucket_key) DO UPDATE SET count = {table}.count + excluded.count, '
+        f'updated_at = excluded.updated_at'
+    )
+    params = [
+        (
+            bucket_key(company_id, source, period, start, structure_id, damage_type_id, label),
+            company_id, source, period, ops.adapt_datefield_value(start),
+            structure_id, damage_type_id, label, delta, now,
+        )
+        for (company_id, source, period, start, structure_id, damage_type_id, label), delta in rows.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    # Série 'damages' do timeseries
+    for company_id in {key[0] for key in rows if key[0] is not None}:
+        invalidate_dashboard(company_id)
+    return len(params)
+
+
+@transaction.atomic
+def rebuild_rollups(company=None, stdout=None):
+    """
+    Recalcula os rollups a partir das tabelas de origem
+
+    Um GROUP BY por dia para cada origem; semanas e meses são derivados dos
+    dias em memória. Com company, apenas os itens de inspeção da empresa são
+    recalculados (uploads CargoSnap não têm empresa).
+
+    Returns:
+        Número de linhas gravadas
+    """
+    rollups = DamageRollup.objects.all()
+    items = StructureInspectionItem.objects.filter(status='DAMAGED')
+    if company is not None:
+        rollups = rollups.filter(company=company, source=STRUCTURE)
+        items = items.filter(inspection__company=company)
+    rollups.delete()
+
+    deltas = Counter()
+    for row in items.annotate(
+        day=TruncDate(Coalesce('inspected_at', 'created_at'))
+    ).order_by().values('inspection__company_id', 'structure_id', 'damage_type_id', 'day').annotate(n=Count('id')):
+        cell = (row['inspection__company_id'], STRUCTURE, row['day'], row['structure_id'], row['damage_type_id'], '')
+        deltas[cell] += row['n']
+
+    if company is None:
+        for row in CargoSnapUpload.objects.filter(has_damage=True).annotate(
+            day=TruncDate('scan_date_time')
+        ).order_by().values('damage_type_desc', 'day').annotate(n=Count('id')):
+            label = (row['damage_type_desc'] or UNKNOWN_DAMAGE)[:200]
+            deltas[(None, CARGOSNAP, row['day'], None, None, label)] += row['n']
+
+    written = apply_deltas(deltas)
+    if stdout:
+        stdout.write(f'{len(deltas)} células diárias, {written} linhas de rollup')
+    return written
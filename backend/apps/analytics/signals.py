@@ -0,0 +1,97 @@
+"""
+Signals for Analytics app
+Apply damage rollup deltas when structure items or CargoSnap uploads change
+and invalidate the cached dashboard stats when inspections, issues or reports
+change. The previous rollup state is read in pre_save; bulk operations must
+call rollups.apply_deltas / dashboard.invalidate_dashboard explicitly (see
+inspections/checklists.py and cargosnap_integration/bulk_import.py).
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.inspections.models import Inspection
+from apps.inspections.structure_models import StructureInspectionItem
+from apps.issues.models import Issue
+from apps.reports.models import Report
+from .dashboard import invalidate_dashboard
+from .rollups import (
+    ITEM_FIELDS, UPLOAD_FIELDS, apply_deltas, change_deltas, inspection_companies,
+    item_cell, item_values, upload_cell, upload_values
+)
+
+
+def _item_company_id(item):
+    inspection = item._state.fields_cache.get('inspection')
+    if inspection is not None:
+        return inspection.company_id
+    return inspection_companies([item.inspection_id]).get(item.inspection_id)
+
+
+def _item_pre_save(sender, instance, raw=False, **kwargs):
+    instance._rollup_old_cell = None
+    if raw or instance._state.adding:
+        return
+    old = StructureInspectionItem.objects.filter(pk=instance.pk).values(
+        *ITEM_FIELDS, 'inspection__company_id'
+    ).first()
+    if old:
+        instance._rollup_old_cell = item_cell(old['inspection__company_id'], old)
+
+
+def _item_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    new_cell = None
+    if instance.status == 'DAMAGED':
+        new_cell = item_cell(_item_company_id(instance), item_values(instance))
+    apply_deltas(change_deltas(getattr(instance, '_rollup_old_cell', None), new_cell))
+
+
+def _item_post_delete(sender, instance, **kwargs):
+    if instance.status == 'DAMAGED':
+        apply_deltas(change_deltas(item_cell(_item_company_id(instance), item_values(instance)), None))
+
+
+def _upload_pre_save(sender, instance, raw=False, **kwargs):
+    instance._rollup_old_cell = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    instance._rollup_old_cell = upload_cell(
+        CargoSnapUpload.objects.filter(pk=instance.pk).values(*UPLOAD_FIELDS).first()
+    )
+
+
+def _upload_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        apply_deltas(change_deltas(
+            getattr(instance, '_rollup_old_cell', None), upload_cell(upload_values(instance))
+        ))
+
+
+def _upload_post_delete(sender, instance, **kwargs):
+    apply_deltas(change_deltas(upload_cell(upload_values(instance)), None))
+
+
+def _dashboard_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender is Report:
+        inspection = instance._state.fields_cache.get('inspection')
+        company_id = inspection.company_id if inspection is not None else (
+            inspection_companies([instance.inspection_id]).get(instance.inspection_id)
+        )
+    else:
+        company_id = instance.company_id
+    invalidate_dashboard(company_id)
+
+
+pre_save.connect(_item_pre_save, sender=StructureInspectionItem, dispatch_uid='damage_rollup_item_pre_save')
+post_save.connect(_item_post_save, sender=StructureInspectionItem, dispatch_uid='damage_rollup_item_post_save')
+post_delete.connect(_item_post_delete, sender=StructureInspectionItem, dispatch_uid='damage_rollup_item_delete')
+pre_save.connect(_upload_pre_save, sender=CargoSnapUpload, dispatch_uid='damage_rollup_upload_pre_save')
+post_save.connect(_upload_post_save, sender=CargoSnapUpload, dispatch_uid='damage_rollup_upload_post_save')
+post_delete.connect(_upload_post_delete, sender=CargoSnapUpload, dispatch_uid='damage_rollup_upload_delete')
+
+for _model in (Inspection, Issue, Report):
+    post_save.connect(_dashboard_changed, sender=_model, dispatch_uid=f'dashboard_{_model.__name__}_save')
+    post_delete.connect(_dashboard_changed, sender=_model, dispatch_uid=f'dashboard_{_model.__name__}_delete')
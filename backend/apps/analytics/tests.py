@@ -0,0 +1,326 @@
+"""
+Tests for Analytics app
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.analytics.heatmap import bucket_range, trend_slopes
+from apps.analytics.metrics import CARGOSNAP_SNAPS, run_rollup
+from apps.analytics.models import DamageRollup, DashboardMetric
+from apps.analytics.timeseries import rolling_mean
+from apps.analytics.rollups import rebuild_rollups
+from apps.cargosnap_integration.models import CargoSnapFile, CargoSnapUpload
+from apps.core.models import Company, User
+from apps.inspections.checklists import bulk_update_items
+from apps.inspections.models import Inspection, InspectionType
+from apps.inspections.structure_models import ContainerStructure, DamageType, StructureInspectionItem
+from apps.issues.models import Issue
+
+
+class DamageRollupTest(TestCase):
+    """Tests for incremental damage rollups and the damage_heatmap endpoint"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='inspector', password='testpass123', company=self.company, role='INSPECTOR'
+        )
+        self.inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        self.door = ContainerStructure.objects.create(company=self.company, code='1', name='PORTA')
+        self.roof = ContainerStructure.objects.create(company=self.company, code='2', name='TETO')
+        self.dent = DamageType.objects.create(company=self.company, code='1', name='AMASSADO')
+        self.hole = DamageType.objects.create(company=self.company, code='2', name='FURO')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _inspection(self):
+        return Inspection.objects.create(
+            company=self.company, inspection_type=self.inspection_type, title='Container ABCD1234567'
+        )
+
+    def _item(self, structure, damage_type, day):
+        # Um item por estrutura e inspeção
+        return StructureInspectionItem.objects.create(
+            inspection=self._inspection(), structure=structure, damage_type=damage_type, status='DAMAGED',
+            inspected_at=datetime(day.year, day.month, day.day, 15, tzinfo=dt_timezone.utc),
+        )
+
+    def _counts(self, period='MONTH'):
+        return {
+            (r.bucket_start, r.structure_id, r.damage_type_id, r.damage_label): r.count
+            for r in DamageRollup.objects.filter(period=period).exclude(count=0)
+        }
+
+    def test_item_changes_update_all_periods(self):
+        item = self._item(self.door, self.dent, date(2026, 3, 18))
+        self.assertEqual(self._counts('DAY'), {(date(2026, 3, 18), self.door.id, self.dent.id, ''): 1})
+        self.assertEqual(self._counts('WEEK'), {(date(2026, 3, 16), self.door.id, self.dent.id, ''): 1})
+        self.assertEqual(self._counts('MONTH'), {(date(2026, 3, 1), self.door.id, self.dent.id, ''): 1})
+
+        item.damage_type = self.hole
+        item.save()
+        self.assertEqual(self._counts(), {(date(2026, 3, 1), self.door.id, self.hole.id, ''): 1})
+
+        item.status = 'OK'
+        item.save()
+        self.assertEqual(self._counts(), {})
+
+        self._item(self.roof, self.dent, date(2026, 3, 2)).delete()
+        self.assertEqual(self._counts(), {})
+
+    def test_bulk_update_and_rebuild_match(self):
+        items = [self._item(self.door, self.dent, date(2026, 3, 2)) for _ in range(2)]
+        ok = StructureInspectionItem.objects.create(inspection=self._inspection(), structure=self.roof)
+
+        bulk_update_items(StructureInspectionItem.objects.all(), [
+            {'id': items[0].id, 'version': 1, 'status': 'OK'},
+            {'id': ok.id, 'version': 1, 'status': 'DAMAGED', 'damage_type': self.hole},
+        ], self.user)
+        self.assertEqual(sum(self._counts().values()), 2)
+
+        now = datetime.now(dt_timezone.utc)
+        cargosnap_file = CargoSnapFile.objects.create(cargosnap_id=1, scan_code='MSCU1', created_at=now, updated_at=now)
+        CargoSnapUpload.objects.create(
+            file=cargosnap_file, cargosnap_id=10, tenant_id=1, device_id=1, upload_type='image',
+            created_at=now, scan_date_time=now, has_damage=True, damage_type_desc='Amassado',
+            image_path='x', image_url='http://example.com/x.jpg', image_thumb='http://example.com/t.jpg',
+        )
+        self.assertEqual(DamageRollup.objects.filter(source='CARGOSNAP', period='DAY').get().count, 1)
+
+        incremental = {period: self._counts(period) for period in ('DAY', 'WEEK', 'MONTH')}
+        DamageRollup.objects.update(count=99)
+        rebuild_rollups()
+        self.assertEqual({period: self._counts(period) for period in ('DAY', 'WEEK', 'MONTH')}, incremental)
+
+    def test_heatmap_endpoint(self):
+        for _ in range(3):
+            self._item(self.door, self.dent, date(2026, 3, 10))
+        self._item(self.door, self.dent, date(2026, 1, 10))
+        self._item(self.roof, self.hole, date(2026, 2, 10))
+
+        response = self.client.get('/api/analytics/analytics/damage_heatmap/', {
+            'date_from': '2026-01-01', 'date_to': '2026-03-31', 'top': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['buckets'], ['2026-01-01', '2026-02-01', '2026-03-01'])
+        self.assertEqual([s['name'] for s in response.data['structures']], ['PORTA', 'TETO'])
+        self.assertEqual([d['name'] for d in response.data['damage_types']], ['AMASSADO', 'FURO'])
+        self.assertEqual(response.data['matrix'], [[4, 0], [0, 1]])
+        self.assertEqual(response.data['totals_by_bucket'], [1, 1, 3])
+        top = response.data['top'][0]
+        self.assertEqual((top['structure']['name'], top['damage_type']['name'], top['count']), ('PORTA', 'AMASSADO', 4))
+        self.assertEqual((top['series'], top['trend']), ([1, 0, 3], 1.0))
+
+        response = self.client.get('/api/analytics/analytics/damage_heatmap/', {'period': 'YEAR'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/analytics/analytics/damage_heatmap/', {
+            'period': 'DAY', 'date_from': '2020-01-01', 'date_to': '2026-01-01'
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_numeric_helpers(self):
+        self.assertEqual(
+            bucket_range(date(2026, 3, 4), date(2026, 3, 20), 'WEEK'),
+            [date(2026, 3, 2), date(2026, 3, 9), date(2026, 3, 16)]
+        )
+        series = np.array([[0, 5], [1, 5], [2, 5]], dtype=float)
+        np.testing.assert_allclose(trend_slopes(series), [1.0, 0.0])
+
+
+class DashboardCacheTest(TestCase):
+    """Tests for the cached, single-pass dashboard statistics"""
+
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.other = Company.objects.create(name='CLIA', slug='clia', company_type='CLIA')
+        self.user = User.objects.create_user(
+            username='admin', password='testpass123', company=self.company, role='ADMIN'
+        )
+        inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        for status_value in ('COMPLETED', 'DRAFT', 'IN_PROGRESS'):
+            Inspection.objects.create(
+                company=self.company, inspection_type=inspection_type, title='Container', status=status_value
+            )
+        self.inspection = Inspection.objects.filter(company=self.company).first()
+        other_type = InspectionType.objects.create(company=self.other, name='Container', code='C2')
+        self.other_inspection = Inspection.objects.create(company=self.other, inspection_type=other_type, title='Outra')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_dashboard_is_cached_until_a_write(self):
+        url = '/api/analytics/analytics/dashboard/'
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            (response.data['total_inspections'], response.data['completed_inspections'],
+             response.data['pending_inspections'], response.data['open_issues']),
+            (3, 1, 2, 0)
+        )
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        # Escrita em outra empresa não invalida
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(company=self.other, inspection=self.other_inspection, title='Outra')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(company=self.company, inspection=self.inspection, title='Lacre violado')
+        response = self.client.get(url)
+        self.assertEqual((response['X-Cache'], response.data['open_issues']), ('MISS', 1))
+
+        response = self.client.get('/api/analytics/analytics/dashboard_cache/')
+        self.assertEqual(response.data, {'hits': 2, 'misses': 2, 'hit_rate': 0.5})
+
+
+class MetricRollupTest(TestCase):
+    """Tests for the daily DashboardMetric rollups"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='inspector', password='testpass123', company=self.company, role='INSPECTOR'
+        )
+        self.inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        self.inspections = [
+            Inspection.objects.create(
+                company=self.company, inspection_type=self.inspection_type, title='Container', status=status_value
+            )
+            for status_value in ('DRAFT', 'DRAFT', 'COMPLETED')
+        ]
+        Issue.objects.create(company=self.company, inspection=self.inspections[0], title='Lacre', priority='HIGH')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(DASHBOARD_METRICS_OVERLAP=0)
+    def test_endpoints_read_rollups_after_run(self):
+        url = '/api/analytics/analytics/inspections_by_status/'
+        live = self.client.get(url)
+        self.assertEqual(live['X-Data-Source'], 'live')
+        self.assertEqual(live.data, [{'status': 'COMPLETED', 'count': 1}, {'status': 'DRAFT', 'count': 2}])
+
+        self.assertTrue(run_rollup().full)
+        response = self.client.get(url)
+        self.assertEqual((response['X-Data-Source'], response.data), ('rollup', live.data))
+        response = self.client.get('/api/analytics/analytics/issues_by_priority/')
+        self.assertEqual(response.data, [{'priority': 'HIGH', 'count': 1}])
+        response = self.client.get('/api/analytics/analytics/inspections_timeline/')
+        self.assertEqual([row['count'] for row in response.data], [3])
+
+        # Incremental: só o dia alterado é recalculado
+        self.inspections[0].status = 'COMPLETED'
+        self.inspections[0].save()
+        run = run_rollup()
+        self.assertEqual((run.full, run.cells), (False, 1))
+        response = self.client.get(url)
+        self.assertEqual(response.data, [{'status': 'COMPLETED', 'count': 2}, {'status': 'DRAFT', 'count': 1}])
+
+        response = self.client.get(url, {'date_from': 'ontem'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_incremental_run_sees_rows_committed_after_the_watermark(self):
+        run = run_rollup()
+        # Transação que gravou updated_at antes do início da execução, mas só fez commit depois
+        Inspection.objects.filter(pk=self.inspections[0].pk).update(
+            status='COMPLETED', updated_at=run.started_at - timedelta(seconds=60)
+        )
+        self.assertFalse(run_rollup().full)
+        response = self.client.get('/api/analytics/analytics/inspections_by_status/')
+        self.assertEqual(response.data, [{'status': 'COMPLETED', 'count': 2}, {'status': 'DRAFT', 'count': 1}])
+
+    def test_cargosnap_snaps_per_company(self):
+        now = datetime.now(dt_timezone.utc)
+        cargosnap_file = CargoSnapFile.objects.create(cargosnap_id=1, scan_code='MSCU1', created_at=now, updated_at=now)
+        for i, damaged in enumerate((True, False)):
+            CargoSnapUpload.objects.create(
+                file=cargosnap_file, cargosnap_id=10 + i, tenant_id=1, device_id=1, upload_type='image',
+                created_at=now, scan_date_time=now, has_damage=damaged,
+                image_path='x', image_url='http://example.com/x.jpg', image_thumb='http://example.com/t.jpg',
+            )
+        run_rollup()
+        self.assertFalse(DashboardMetric.objects.filter(metric_type=CARGOSNAP_SNAPS).exists())
+
+        self.inspections[2].cargosnap_file = cargosnap_file
+        self.inspections[2].save()
+        run_rollup()
+        metric = DashboardMetric.objects.get(metric_type=CARGOSNAP_SNAPS)
+        self.assertEqual((metric.company, int(metric.metric_value), metric.metric_data), (self.company, 2, {'damaged': 1}))
+
+
+class TimeSeriesTest(TestCase):
+    """Tests for the bucketed, cached timeseries endpoint"""
+
+    url = '/api/analytics/analytics/timeseries/'
+
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='inspector', password='testpass123', company=self.company, role='INSPECTOR'
+        )
+        self.inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        # Horários em UTC; America/Sao_Paulo = UTC-3
+        for created, completed in (
+            ('2026-03-02T12:00:00Z', '2026-03-04T12:00:00Z'),
+            ('2026-03-02T15:00:00Z', None),
+            ('2026-03-05T02:00:00Z', None),  # 23h do dia 4 no horário local
+        ):
+            inspection = Inspection.objects.create(
+                company=self.company, inspection_type=self.inspection_type, title='Container'
+            )
+            Inspection.objects.filter(pk=inspection.pk).update(created_at=created, completed_at=completed)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_daily_series_with_gaps_cumulative_and_rolling(self):
+        params = {
+            'date_from': '2026-03-01', 'date_to': '2026-03-05', 'series': 'created,completed',
+            'cumulative': 'true', 'rolling': 2,
+        }
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['buckets'][0], '2026-03-01T00:00:00')
+        created = response.data['series']['created']
+        self.assertEqual(created['counts'], [0, 2, 0, 1, 0])
+        self.assertEqual(created['cumulative'], [0, 2, 2, 3, 3])
+        self.assertEqual(created['rolling_average'], [0.0, 1.0, 1.0, 0.5, 0.5])
+        self.assertEqual(response.data['series']['completed']['counts'], [0, 0, 0, 1, 0])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, params).data, response.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inspection = Inspection.objects.create(
+                company=self.company, inspection_type=self.inspection_type, title='Container'
+            )
+        Inspection.objects.filter(pk=inspection.pk).update(created_at='2026-03-03T12:00:00Z')
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.data['series']['created']['counts'], [0, 2, 1, 1, 0])
+
+    def test_granularities_and_validation(self):
+        response = self.client.get(self.url, {
+            'date_from': '2026-03-02', 'date_to': '2026-03-02', 'granularity': 'hour'
+        })
+        counts = response.data['series']['created']['counts']
+        self.assertEqual((len(counts), counts[9], counts[12]), (24, 1, 1))
+
+        response = self.client.get(self.url, {
+            'date_from': '2026-03-01', 'date_to': '2026-03-31', 'granularity': 'week'
+        })
+        self.assertEqual(response.data['buckets'][:2], ['2026-02-23T00:00:00', '2026-03-02T00:00:00'])
+        self.assertEqual(response.data['series']['created']['counts'][:2], [0, 3])
+
+        self.assertEqual(self.client.get(self.url, {'series': 'created,foo'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'granularity': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {
+            'date_from': '2020-01-01', 'date_to': '2026-01-01', 'granularity': 'hour'
+        }).status_code, 400)
+        np.testing.assert_allclose(rolling_mean(np.array([3, 0, 3]), 3), [3.0, 1.5, 2.0])
@@ -0,0 +1,158 @@
+"""
+Time series for Analytics app
+Each series pulls a single timestamp column for the company and range and is
+bucketed with NumPy (searchsorted over the bucket edges + bincount), so gaps
+come back as zeros and hour/day/week/month share the same code path. Bucket
+edges are computed in local time and converted to UTC, which keeps DST days
+correct. Results are cached per company, range and options under the
+company's analytics version (apps/analytics/dashboard.py).
+"""
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .dashboard import dashboard_version
+
+GRANULARITIES = {
+    'hour': relativedelta(hours=1),
+    'day': relativedelta(days=1),
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+}
+SERIES = ['created', 'completed', 'damages', 'issues_opened', 'issues_resolved']
+MAX_BUCKETS = 2000
+
+
+def _series_queries(company):
+    """{nome: queryset com uma coluna de data/hora} de cada série"""
+    from apps.inspections.models import Inspection
+    from apps.inspections.structure_models import StructureInspectionItem
+    from apps.issues.models import Issue
+
+    inspections = Inspection.objects.filter(company=company)
+    issues = Issue.objects.filter(company=company)
+    return {
+        'created': (inspections, 'created_at'),
+        'completed': (inspections.filter(completed_at__isnull=False), 'completed_at'),
+        'damages': (
+            StructureInspectionItem.objects.filter(inspection__company=company, status='DAMAGED')
+            .annotate(moment=Coalesce('inspected_at', 'created_at')),
+            'moment',
+        ),
+        'issues_opened': (issues, 'detected_at'),
+        'issues_resolved': (issues.filter(resolved_at__isnull=False), 'resolved_at'),
+    }
+
+
+def floor_bucket(moment, granularity):
+    """Início do bucket (naive, horário local) que contém `moment`"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        return moment - timedelta(days=moment.weekday())
+    if granularity == 'month':
+        return moment.replace(day=1)
+    return moment
+
+
+def bucket_edges(date_from, date_to, granularity):
+    """
+    Inícios dos buckets entre as datas (inclusive) e o fim do último
+
+    Returns:
+        Tupla (inícios locais naive, bordas em UTC como datetime64[us] com len + 1)
+
+    Raises:
+        ValueError: intervalo invertido ou com mais de MAX_BUCKETS buckets
+    """
+    if date_from > date_to:
+        raise ValueError('date_from deve ser anterior a date_to')
+    step = GRANULARITIES[granularity]
+    end = datetime.combine(date_to + timedelta(days=1), time.min)
+    starts = []
+    current = floor_bucket(datetime.combine(date_from, time.min), granularity)
+    while current < end:
+        starts.append(current)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f'Intervalo maior que {MAX_BUCKETS} buckets')
+        current += step
+
+    tz = timezone.get_current_timezone()
+    edges = [
+        timezone.make_aware(moment, tz).astimezone(dt_timezone.utc).replace(tzinfo=None)
+        for moment in starts + [current]
+    ]
+    return starts, np.array(edges, dtype='datetime64[us]')
+
+
+def bucket_counts(moments, edges):
+    """Contagem por bucket de datas/horas UTC (naive ou aware)"""
+    if not moments:
+        return np.zeros(len(edges) - 1, dtype=np.int64)
+    values = np.array(
+        [moment.astimezone(dt_timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment for moment in moments],
+        dtype='datetime64[us]',
+    )
+    index = np.searchsorted(edges, values, side='right') - 1
+    index = index[(index >= 0) & (index < len(edges) - 1)]
+    return np.bincount(index, minlength=len(edges) - 1)
+
+
+def rolling_mean(counts, window):
+    """Média móvel dos últimos `window` buckets (janela menor no início da série)"""
+    cumulative = np.concatenate(([0], np.cumsum(counts, dtype=float)))
+    n = np.arange(1, len(counts) + 1)
+    lower = np.maximum(n - window, 0)
+    return (cumulative[n] - cumulative[lower]) / (n - lower)
+
+
+def compute_timeseries(company, date_from, date_to, granularity='day', series=None, cumulative=False, rolling=0):
+    """Séries por bucket, sem lacunas"""
+    series = series or ['created']
+    starts, edges = bucket_edges(date_from, date_to, granularity)
+    range_start = timezone.make_aware(starts[0])
+    range_end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+
+    queries = _series_queries(company)
+    result = {}
+    for name in series:
+        queryset, field = queries[name]
+        moments = list(
+            queryset.filter(**{f'{field}__gte': range_start, f'{field}__lt': range_end})
+            .order_by().values_list(field, flat=True)
+        )
+        counts = bucket_counts(moments, edges)
+        data = {'counts': counts.tolist(), 'total': int(counts.sum())}
+        if cumulative:
+            data['cumulative'] = np.cumsum(counts).tolist()
+        if rolling:
+            data['rolling_average'] = np.round(rolling_mean(counts, rolling), 2).tolist()
+        result[name] = data
+
+    return {
+        'granularity': granularity,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'buckets': [start.isoformat() for start in starts],
+        'series': result,
+    }
+
+
+def get_timeseries(company, date_from, date_to, granularity='day', series=None, cumulative=False, rolling=0):
+    """compute_timeseries com cache por empresa, intervalo e opções"""
+    series = series or ['created']
+    options = f'{date_from}:{date_to}:{granularity}:{",".join(series)}:{int(cumulative)}:{rolling}'
+    digest = hashlib.md5(options.encode()).hexdigest()
+    key = f'analytics:timeseries:{company.pk}:{dashboard_version(company.pk)}:{digest}'
+    data = cache.get(key)
+    if data is None:
+        data = compute_timeseries(company, date_from, date_to, granularity, series, cumulative, rolling)
+        cache.set(key, data, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return data
@@ -8,6 +8,8 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Count, Q
 from datetime import datetime, timedelta
+from apps.core.permissions import IsAdmin
+from .dashboard import cache_metrics, get_dashboard_stats
 from .models import DashboardMetric
 from .serializers import DashboardMetricSerializer, DashboardStatsSerializer
 
@@ -18,84 +20,92 @@ class AnalyticsViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
-        """Get dashboard statistics"""
-        from apps.inspections.models import Inspection
-        from apps.issues.models import Issue
-        from apps.reports.models import Report
+        """Get dashboard statistics (cached per company)"""
+        stats, hit = get_dashboard_stats(request.user.company)
+        data = dict(stats, recent_inspections=stats['recent_inspections'][:5])
+        
+        serializer = DashboardStatsSerializer(data)
+        response = Response(serializer.data)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdmin])
+    def dashboard_cache(self, request):
+        """Acertos e falhas do cache do dashboard"""
+        return Response(cache_metrics())
+    
+    def _grouped(self, request, metric_type, model, key):
+        """
+        Contagem por `key` (status, priority) no intervalo date_from/date_to
+        
+        Lê os rollups diários do DashboardMetric quando estão atualizados;
+        caso contrário agrega a tabela de origem.
+        """
+        from django.utils.dateparse import parse_date
+        from .metrics import metric_breakdown, rollups_fresh
         
         company = request.user.company
+        dates = []
+        for name in ('date_from', 'date_to'):
+            value = request.query_params.get(name)
+            try:
+                dates.append(parse_date(value) if value else None)
+            except ValueError:
+                dates.append(None)
+            if value and dates[-1] is None:
+                return Response({'error': 'Datas devem estar no formato AAAA-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        date_from, date_to = dates
         
-        # Date range (last 30 days)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        
-        # Inspections stats
-        inspections = Inspection.objects.filter(company=company)
-        total_inspections = inspections.count()
-        completed_inspections = inspections.filter(status='COMPLETED').count()
-        pending_inspections = inspections.filter(status__in=['DRAFT', 'IN_PROGRESS']).count()
-        
-        # Issues stats
-        issues = Issue.objects.filter(company=company)
-        total_issues = issues.count()
-        open_issues = issues.filter(status='OPEN').count()
-        resolved_issues = issues.filter(status='RESOLVED').count()
-        
-        # Reports stats
-        reports = Report.objects.filter(inspection__company=company)
-        total_reports = reports.count()
-        
-        # Recent inspections
-        recent = inspections.order_by('-created_at')[:5].values(
-            'id', 'reference_number', 'title', 'status', 'created_at'
-        )
-        
-        data = {
-            'total_inspections': total_inspections,
-            'completed_inspections': completed_inspections,
-            'pending_inspections': pending_inspections,
-            'total_issues': total_issues,
-            'open_issues': open_issues,
-            'resolved_issues': resolved_issues,
-            'total_reports': total_reports,
-            'recent_inspections': list(recent)
-        }
+        if rollups_fresh():
+            totals = metric_breakdown(company, metric_type, date_from, date_to)
+            source = 'rollup'
+        else:
+            rows = model.objects.filter(company=company)
+            if date_from:
+                rows = rows.filter(created_at__date__gte=date_from)
+            if date_to:
+                rows = rows.filter(created_at__date__lte=date_to)
+            totals = dict(rows.order_by().values_list(key).annotate(count=Count('id')))
+            source = 'live'
         
-        serializer = DashboardStatsSerializer(data)
-        return Response(serializer.data)
+        data = [{key: value, 'count': count} for value, count in sorted(totals.items()) if count]
+        return Response(data, headers={'X-Data-Source': source})
     
     @action(detail=False, methods=['get'])
     def inspections_by_status(self, request):
         """Get inspections grouped by status"""
         from apps.inspections.models import Inspection
+        from .metrics import INSPECTIONS_BY_STATUS
         
-        company = request.user.company
-        data = Inspection.objects.filter(company=company).values('status').annotate(
-            count=Count('id')
-        )
-        return Response(data)
+        return self._grouped(request, INSPECTIONS_BY_STATUS, Inspection, 'status')
     
     @action(detail=False, methods=['get'])
     def issues_by_priority(self, request):
         """Get issues grouped by priority"""
         from apps.issues.models import Issue
+        from .metrics import ISSUES_BY_PRIORITY
         
-        company = request.user.company
-        data = Issue.objects.filter(company=company).values('priority').annotate(
-            count=Count('id')
-        )
-        return Response(data)
+        return self._grouped(request, ISSUES_BY_PRIORITY, Issue, 'priority')
     
     @action(detail=False, methods=['get'])
     def inspections_timeline(self, request):
         """Get inspections over time"""
         from apps.inspections.models import Inspection
         from django.db.models.functions import TruncDate
+        from .metrics import INSPECTIONS_BY_STATUS, metric_rows, rollups_fresh
         
         company = request.user.company
         days = int(request.query_params.get('days', 30))
         start_date = datetime.now() - timedelta(days=days)
         
+        if rollups_fresh():
+            data = [
+                {'date': day, 'count': int(value)}
+                for day, value in metric_rows(company, INSPECTIONS_BY_STATUS, date_from=start_date.date())
+                .values_list('period_start', 'metric_value')
+            ]
+            return Response(data, headers={'X-Data-Source': 'rollup'})
+        
         data = Inspection.objects.filter(
             company=company,
             created_at__gte=start_date
@@ -105,6 +115,86 @@ class AnalyticsViewSet(viewsets.ViewSet):
             count=Count('id')
         ).order_by('date')
         
+        return Response(data, headers={'X-Data-Source': 'live'})
+    
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """
+        Séries temporais por bucket (sem lacunas)
+        
+        Query params: granularity (hour, day, week, month - padrão day),
+        date_from, date_to (AAAA-MM-DD, padrão últimos 30 dias),
+        series (lista separada por vírgula: created, completed, damages,
+        issues_opened, issues_resolved), cumulative (true/false),
+        rolling (janela da média móvel em buckets)
+        """
+        from django.utils.dateparse import parse_date
+        from .timeseries import GRANULARITIES, SERIES, get_timeseries
+        
+        params = request.query_params
+        granularity = params.get('granularity', 'day').lower()
+        if granularity not in GRANULARITIES:
+            return Response({'error': f'granularity deve ser um de {list(GRANULARITIES)}'}, status=status.HTTP_400_BAD_REQUEST)
+        series = [name.strip() for name in params.get('series', 'created').split(',') if name.strip()]
+        unknown = [name for name in series if name not in SERIES]
+        if unknown or not series:
+            return Response({'error': f'Séries inválidas: {unknown}. Disponíveis: {SERIES}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            date_to = parse_date(params['date_to']) if params.get('date_to') else datetime.now().date()
+            date_from = parse_date(params['date_from']) if params.get('date_from') else date_to - timedelta(days=29)
+            rolling = int(params.get('rolling', 0))
+        except ValueError:
+            date_from = date_to = None
+            rolling = 0
+        if date_from is None or date_to is None or not 0 <= rolling <= 365:
+            return Response({'error': 'Parâmetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            data = get_timeseries(
+                request.user.company, date_from, date_to, granularity=granularity, series=series,
+                cumulative=params.get('cumulative', '').lower() in ('1', 'true'), rolling=rolling,
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def damage_heatmap(self, request):
+        """
+        Matriz de avarias (estrutura x tipo de avaria) a partir dos rollups
+        
+        Query params: period (DAY, WEEK, MONTH - padrão MONTH),
+        source (STRUCTURE ou CARGOSNAP), date_from, date_to (AAAA-MM-DD), top
+        """
+        from django.utils.dateparse import parse_date
+        from .heatmap import damage_matrix
+        from .rollups import PERIODS, CARGOSNAP, STRUCTURE
+        
+        params = request.query_params
+        period = params.get('period', 'MONTH').upper()
+        source = params.get('source', STRUCTURE).upper()
+        if period not in PERIODS:
+            return Response({'error': f'period deve ser um de {list(PERIODS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        if source not in (STRUCTURE, CARGOSNAP):
+            return Response({'error': 'source deve ser STRUCTURE ou CARGOSNAP'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            date_from = parse_date(params['date_from']) if params.get('date_from') else None
+            date_to = parse_date(params['date_to']) if params.get('date_to') else None
+            top = int(params.get('top', 10))
+        except ValueError:
+            return Response({'error': 'Parâmetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if (params.get('date_from') and date_from is None) or (params.get('date_to') and date_to is None):
+            return Response({'error': 'Datas devem estar no formato AAAA-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            data = damage_matrix(
+                request.user.company, source=source, period=period,
+                date_from=date_from, date_to=date_to, top=min(max(top, 0), 100)
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(data)
 
 
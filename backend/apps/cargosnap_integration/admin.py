@@ -4,7 +4,7 @@ from .models import (
     CargoSnapFile, CargoSnapUpload, CargoSnapLocation,
     CargoSnapWorkflow, CargoSnapWorkflowStep, CargoSnapWorkflowRun,
     CargoSnapWorkflowRunStep, CargoSnapFormSubmit, CargoSnapField,
-    CargoSnapSyncLog
+    CargoSnapSyncLog, CargoSnapImportJob
 )
 
 
@@ -171,3 +171,13 @@ class CargoSnapSyncLogAdmin(admin.ModelAdmin):
             'fields': ('error_message', 'details')
         }),
     )
+
+
+@admin.register(CargoSnapImportJob)
+class CargoSnapImportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'company', 'status', 'total_files', 'processed_files',
+                    'created_count', 'failed_count', 'created_at', 'finished_at']
+    list_filter = ['status', 'company', 'created_at']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'processed_files',
+                       'created_count', 'skipped_count', 'failed_count', 'results', 'error_message']
+    ordering = ['-created_at']
@@ -0,0 +1,287 @@
+"""
+Bulk creation of inspections from CargoSnap files
+Inspections and photos are inserted with bulk_create (one round trip per
+chunk of files) and the image files are copied, or hard-linked, by a pool of
+I/O threads. Used by the bulk_create_inspections endpoint, by
+CargoSnapImportJob (background) and by the bulk_import_inspections command.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.analytics.dashboard import invalidate_dashboard
+from apps.core.models import User
+from apps.core.sequences import allocate_references
+from apps.inspections.duplicates import default_max_distance, update_upload_hash
+from apps.inspections.models import Inspection, InspectionPhoto
+from apps.inspections.photo_processing import schedule_photo_processing
+from apps.search.documents import build_document, upsert_documents
+from .integration_services import CargoSnapInspectionIntegrator, copy_cargosnap_image
+from .models import CargoSnapFile, CargoSnapImportJob, CargoSnapUpload
+
+logger = logging.getLogger(__name__)
+
+CREATED = 'created'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class BulkInspectionImporter:
+    """
+    Cria uma inspeção por CargoSnapFile, em lotes
+
+    Arquivos que já têm inspeção na empresa são ignorados (a importação pode
+    ser repetida). Cada lote de arquivos é gravado em uma transação: uma
+    falha no lote marca apenas os arquivos daquele lote como 'failed'.
+    """
+
+    def __init__(self, company, inspection_type, assigned_to=None, import_photos=True,
+                 skip_duplicates=False, max_distance=None):
+        self.company = company
+        self.inspection_type = inspection_type
+        self.assigned_to = assigned_to
+        self.import_photos = import_photos
+        self.skip_duplicates = skip_duplicates
+        self.max_distance = default_max_distance() if max_distance is None else max_distance
+        self.chunk_size = getattr(settings, 'CARGOSNAP_IMPORT_CHUNK_SIZE', 50)
+        self.io_workers = getattr(settings, 'CARGOSNAP_IMPORT_IO_WORKERS', 8)
+        self.link_images = getattr(settings, 'CARGOSNAP_IMPORT_LINK_IMAGES', False)
+        self.integrator = CargoSnapInspectionIntegrator()
+
+    def run(self, files, progress=None):
+        """
+        Importa os arquivos
+
+        Args:
+            files: CargoSnapFiles (lista ou queryset)
+            progress: Callback chamado com os resultados acumulados após cada lote
+
+        Returns:
+            Lista de resultados por arquivo, na ordem recebida
+        """
+        files = list(files)
+        existing = dict(
+            Inspection.objects.filter(company=self.company, cargosnap_file__in=files)
+            .values_list('cargosnap_file_id', 'reference_number')
+        )
+
+        results = {}
+        pending = []
+        for cargosnap_file in files:
+            if cargosnap_file.pk in existing:
+                results[cargosnap_file.pk] = self._result(
+                    cargosnap_file, SKIPPED, reference_number=existing[cargosnap_file.pk],
+                    error='Arquivo já possui inspeção'
+                )
+            else:
+                pending.append(cargosnap_file)
+
+        for start in range(0, len(pending), self.chunk_size):
+            chunk = pending[start:start + self.chunk_size]
+            try:
+                chunk_results = self._import_chunk(chunk)
+            except Exception as e:
+                logger.error(f"Erro ao importar lote de arquivos CargoSnap: {str(e)}")
+                chunk_results = [self._result(cargosnap_file, FAILED, error=str(e)) for cargosnap_file in chunk]
+            results.update((result['file_id'], result) for result in chunk_results)
+            if progress:
+                progress(list(results.values()))
+
+        return [results[cargosnap_file.pk] for cargosnap_file in files]
+
+    def _import_chunk(self, files):
+        uploads_by_file = self._uploads_by_file(files) if self.import_photos else {}
+        skipped_by_file = defaultdict(int)
+        if self.skip_duplicates:
+            uploads_by_file = self._drop_duplicates(files, uploads_by_file, skipped_by_file)
+
+        all_uploads = [upload for uploads in uploads_by_file.values() for upload in uploads]
+        copied = self._copy_images(all_uploads)
+        try:
+            with transaction.atomic():
+                return self._write_chunk(files, uploads_by_file, skipped_by_file, copied)
+        except Exception:
+            # Nada foi gravado: remove os arquivos já copiados
+            for path in copied.values():
+                if path:
+                    Path(settings.MEDIA_ROOT, path).unlink(missing_ok=True)
+            raise
+
+    def _write_chunk(self, files, uploads_by_file, skipped_by_file, copied):
+        references = allocate_references(self.company, self.company.company_type, len(files))
+
+        inspections = []
+        photos_by_file = {}
+        for cargosnap_file, reference in zip(files, references):
+            inspection = self.integrator.build_inspection(
+                cargosnap_file, self.company, self.inspection_type, self.assigned_to
+            )
+            inspection.reference_number = reference
+            uploads = [u for u in uploads_by_file.get(cargosnap_file.pk, []) if copied.get(u.pk)]
+            photos_by_file[cargosnap_file.pk] = [
+                self.integrator.build_photo(upload, inspection, copied[upload.pk], sequence)
+                for sequence, upload in enumerate(uploads, start=1)
+            ]
+            # bulk_create não dispara os sinais dos contadores
+            inspection.photo_count = len(photos_by_file[cargosnap_file.pk])
+            inspections.append(inspection)
+
+        Inspection.objects.bulk_create(inspections)
+        photos = []
+        for inspection, cargosnap_file in zip(inspections, files):
+            for photo in photos_by_file[cargosnap_file.pk]:
+                photo.inspection = inspection
+                photos.append(photo)
+        InspectionPhoto.objects.bulk_create(photos, batch_size=500)
+
+        upsert_documents([build_document('inspection', inspection) for inspection in inspections])
+        invalidate_dashboard(self.company.pk)
+        schedule_photo_processing([photo.pk for photo in photos])
+        self.integrator.schedule_damage_issues([cargosnap_file.pk for cargosnap_file in files])
+
+        results = []
+        for inspection, cargosnap_file in zip(inspections, files):
+            attempted = len(uploads_by_file.get(cargosnap_file.pk, []))
+            imported = len(photos_by_file[cargosnap_file.pk])
+            results.append(self._result(
+                cargosnap_file, CREATED,
+                inspection_id=inspection.pk,
+                reference_number=inspection.reference_number,
+                photos_imported=imported,
+                photos_skipped=skipped_by_file[cargosnap_file.pk],
+                photos_failed=attempted - imported,
+            ))
+        return results
+
+    def _uploads_by_file(self, files):
+        """Uploads com imagem local de todos os arquivos (uma consulta)"""
+        uploads_by_file = defaultdict(list)
+        for upload in CargoSnapUpload.objects.filter(
+            file__in=files, image_downloaded=True, local_image_path__isnull=False
+        ).order_by('file_id', 'scan_date_time'):
+            uploads_by_file[upload.file_id].append(upload)
+        return uploads_by_file
+
+    def _drop_duplicates(self, files, uploads_by_file, skipped_by_file):
+        """Remove uploads quase idênticos a fotos do mesmo container (ou a outro upload do arquivo)"""
+        container_photo_ids = defaultdict(set)
+        for container_number, photo_id in InspectionPhoto.objects.filter(
+            inspection__company=self.company,
+            inspection__container_number__in=[cargosnap_file.scan_code for cargosnap_file in files],
+        ).exclude(perceptual_hash='').values_list('inspection__container_number', 'id'):
+            container_photo_ids[container_number].add(photo_id)
+
+        kept = {}
+        for cargosnap_file in files:
+            imported_hashes = []
+            kept[cargosnap_file.pk] = []
+            for upload in uploads_by_file.get(cargosnap_file.pk, []):
+                hash_hex = upload.perceptual_hash or update_upload_hash(upload)
+                if hash_hex and self.integrator.is_duplicate(
+                    hash_hex, container_photo_ids[cargosnap_file.scan_code], imported_hashes, self.max_distance
+                ):
+                    skipped_by_file[cargosnap_file.pk] += 1
+                    continue
+                if hash_hex:
+                    imported_hashes.append(int(hash_hex, 16))
+                kept[cargosnap_file.pk].append(upload)
+        return kept
+
+    def _copy_images(self, uploads):
+        """
+        Copia as imagens em paralelo
+
+        Pool próprio (e não apps.core.tasks): o job de importação já roda
+        dentro do pool de background e não pode esperar por ele mesmo.
+
+        Returns:
+            Dict {upload.pk: caminho relativo ou None}
+        """
+        if not uploads:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='cargosnap-copy') as pool:
+            paths = pool.map(
+                lambda upload: copy_cargosnap_image(
+                    upload.local_image_path, upload.cargosnap_id, upload.scan_date_time, link=self.link_images
+                ),
+                uploads,
+            )
+            return {upload.pk: path for upload, path in zip(uploads, paths)}
+
+    @staticmethod
+    def _result(cargosnap_file, status, **extra):
+        result = {
+            'file_id': cargosnap_file.pk,
+            'scan_code': cargosnap_file.scan_code,
+            'status': status,
+            'inspection_id': None,
+            'reference_number': None,
+            'photos_imported': 0,
+            'photos_skipped': 0,
+            'photos_failed': 0,
+            'error': None,
+        }
+        result.update(extra)
+        return result
+
+
+def summarize(results):
+    """Totais de uma lista de resultados"""
+    return {
+        'total': len(results),
+        'created': sum(1 for result in results if result['status'] == CREATED),
+        'skipped': sum(1 for result in results if result['status'] == SKIPPED),
+        'failed': sum(1 for result in results if result['status'] == FAILED),
+        'photos_imported': sum(result['photos_imported'] for result in results),
+    }
+
+
+def run_import_job(job_id):
+    """Executa um CargoSnapImportJob (chamado no pool de background)"""
+    job = CargoSnapImportJob.objects.select_related('company', 'inspection_type').get(pk=job_id)
+    CargoSnapImportJob.objects.filter(pk=job_id).update(status='running', started_at=timezone.now())
+
+    options = job.options or {}
+    assigned_to_id = options.get('assigned_to_id')
+    importer = BulkInspectionImporter(
+        company=job.company,
+        inspection_type=job.inspection_type,
+        assigned_to=User.objects.filter(pk=assigned_to_id).first() if assigned_to_id else None,
+        import_photos=options.get('import_photos', True),
+        skip_duplicates=options.get('skip_duplicates', False),
+    )
+
+    def progress(results):
+        totals = summarize(results)
+        CargoSnapImportJob.objects.filter(pk=job_id).update(
+            processed_files=totals['total'], created_count=totals['created'],
+            skipped_count=totals['skipped'], failed_count=totals['failed'],
+        )
+
+    try:
+        files = CargoSnapFile.objects.filter(pk__in=job.file_ids).order_by('pk')
+        results = importer.run(files, progress=progress)
+    except Exception as e:
+        logger.error(f"Erro na importação em lote {job_id}: {str(e)}")
+        CargoSnapImportJob.objects.filter(pk=job_id).update(
+            status='error', error_message=str(e), finished_at=timezone.now()
+        )
+        return
+
+    totals = summarize(results)
+    if totals['failed'] and totals['failed'] == totals['total']:
+        final_status = 'error'
+    elif totals['failed']:
+        final_status = 'partial'
+    else:
+        final_status = 'completed'
+    CargoSnapImportJob.objects.filter(pk=job_id).update(
+        status=final_status, results=results, processed_files=totals['total'],
+        created_count=totals['created'], skipped_count=totals['skipped'],
+        failed_count=totals['failed'], finished_at=timezone.now(),
+    )
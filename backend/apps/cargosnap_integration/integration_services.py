@@ -1,22 +1,76 @@
 """
 Serviços de integração entre CargoSnap e sistema de Inspeções ICTSI
 """
+from django.conf import settings
 from django.db import transaction
 from django.core.files import File
 from django.utils import timezone
 from pathlib import Path
 import logging
+import os
 import shutil
+import uuid
 from PIL import Image
 from io import BytesIO
 
 from .models import CargoSnapFile, CargoSnapUpload
 from apps.inspections.models import Inspection, InspectionPhoto, InspectionType
+from apps.inspections.photo_processing import schedule_photo_processing
+from apps.inspections.duplicates import (
+    PHOTO, default_max_distance, hamming_distance, hash_index, update_upload_hash
+)
 from apps.core.models import Company
 
 logger = logging.getLogger(__name__)
 
 
+def copy_cargosnap_image(local_image_path, cargosnap_id, scan_date_time, link=False):
+    """
+    Copia imagem do CargoSnap para o diretório de fotos de inspeção
+    
+    Não acessa o banco (pode rodar em threads de I/O).
+    
+    Args:
+        local_image_path: Caminho da imagem baixada (relativo ao MEDIA_ROOT)
+        cargosnap_id: ID do upload no CargoSnap (usado no nome do arquivo)
+        scan_date_time: Data da captura (define o diretório de destino)
+        link: Cria hard link em vez de copiar (cópia se o link falhar)
+    
+    Returns:
+        Path relativo da imagem copiada ou None se falhar
+    """
+    try:
+        source_path = Path(settings.MEDIA_ROOT) / local_image_path
+        
+        if not source_path.exists():
+            logger.warning(f"Imagem CargoSnap não encontrada: {source_path}")
+            return None
+        
+        # Novo caminho para inspeção (único: a mesma imagem pode ir para várias inspeções)
+        timestamp = scan_date_time.strftime('%Y/%m/%d')
+        filename = f"cargosnap_{cargosnap_id}_{source_path.suffix}"
+        dest_relative = f"inspections/photos/{timestamp}/{filename}"
+        dest_path = Path(settings.MEDIA_ROOT) / dest_relative
+        if dest_path.exists():
+            dest_relative = f"inspections/photos/{timestamp}/cargosnap_{cargosnap_id}_{uuid.uuid4().hex[:8]}{source_path.suffix}"
+            dest_path = Path(settings.MEDIA_ROOT) / dest_relative
+        
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        if link:
+            try:
+                os.link(source_path, dest_path)
+                return dest_relative
+            except OSError:
+                pass
+        shutil.copy2(source_path, dest_path)
+        return dest_relative
+        
+    except Exception as e:
+        logger.error(f"Erro ao copiar imagem: {str(e)}")
+        return None
+
+
 class CargoSnapInspectionIntegrator:
     """Integra dados do CargoSnap com Inspeções ICTSI"""
     
@@ -27,7 +81,8 @@ class CargoSnapInspectionIntegrator:
         company: Company,
         inspection_type: InspectionType,
         assigned_to=None,
-        import_photos: bool = True
+        import_photos: bool = True,
+        skip_duplicates: bool = False
     ) -> Inspection:
         """
         Cria uma nova inspeção ICTSI a partir de um arquivo CargoSnap
@@ -38,6 +93,8 @@ class CargoSnapInspectionIntegrator:
             inspection_type: Tipo de inspeção
             assigned_to: Usuário responsável (opcional)
             import_photos: Se True, importa fotos do CargoSnap
+            skip_duplicates: Se True, não importa fotos quase idênticas a
+                fotos já existentes do mesmo container
             
         Returns:
             Inspeção criada
@@ -46,30 +103,17 @@ class CargoSnapInspectionIntegrator:
             logger.info(f"Criando inspeção a partir do CargoSnap: {cargosnap_file.scan_code}")
             
             # Criar inspeção
-            inspection = Inspection.objects.create(
-                company=company,
-                inspection_type=inspection_type,
-                cargosnap_file=cargosnap_file,
-                imported_from_cargosnap=True,
-                container_number=cargosnap_file.scan_code,
-                title=f"Inspeção Container {cargosnap_file.scan_code}",
-                description=f"Inspeção importada do CargoSnap em {timezone.now().strftime('%d/%m/%Y %H:%M')}",
-                status='IN_PROGRESS',
-                assigned_to=assigned_to,
-                started_at=cargosnap_file.created_at,
-                metadata={
-                    'cargosnap_id': cargosnap_file.cargosnap_id,
-                    'total_snaps': cargosnap_file.snap_count,
-                    'snaps_with_damage': cargosnap_file.snap_count_with_damage,
-                    'imported_at': timezone.now().isoformat()
-                }
-            )
+            inspection = self.build_inspection(cargosnap_file, company, inspection_type, assigned_to)
+            inspection.save()
+            self.schedule_damage_issues([cargosnap_file.pk])
             
             logger.info(f"Inspeção criada: {inspection.reference_number}")
             
             # Importar fotos se solicitado
             if import_photos:
-                imported_count = self._import_photos_from_cargosnap(inspection, cargosnap_file)
+                imported_count = self._import_photos_from_cargosnap(
+                    inspection, cargosnap_file, skip_duplicates=skip_duplicates
+                )
                 logger.info(f"Importadas {imported_count} fotos do CargoSnap")
             
             return inspection
@@ -78,18 +122,81 @@ class CargoSnapInspectionIntegrator:
             logger.error(f"Erro ao criar inspeção do CargoSnap: {str(e)}")
             raise
     
+    def build_inspection(self, cargosnap_file, company, inspection_type, assigned_to=None):
+        """Monta (sem gravar) a inspeção de um arquivo CargoSnap"""
+        now = timezone.now()
+        return Inspection(
+            company=company,
+            inspection_type=inspection_type,
+            cargosnap_file=cargosnap_file,
+            imported_from_cargosnap=True,
+            container_number=cargosnap_file.scan_code,
+            title=f"Inspeção Container {cargosnap_file.scan_code}",
+            description=f"Inspeção importada do CargoSnap em {now.strftime('%d/%m/%Y %H:%M')}",
+            status='IN_PROGRESS',
+            assigned_to=assigned_to,
+            started_at=cargosnap_file.created_at,
+            metadata={
+                'cargosnap_id': cargosnap_file.cargosnap_id,
+                'total_snaps': cargosnap_file.snap_count,
+                'snaps_with_damage': cargosnap_file.snap_count_with_damage,
+                'imported_at': now.isoformat()
+            }
+        )
+    
+    def build_photo(self, upload, inspection, photo_path, sequence):
+        """Monta (sem gravar) a foto de inspeção de um upload CargoSnap"""
+        photo = InspectionPhoto(
+            inspection=inspection,
+            photo=photo_path,
+            cargosnap_upload=upload,
+            photo_source='CARGOSNAP',
+            title=upload.workflow_step_description or f"Foto {sequence}",
+            description=upload.comment or '',
+            caption=f"Importada do CargoSnap - {upload.device_nick or 'Dispositivo'}",
+            latitude=self._parse_coordinate(upload.latitude),
+            longitude=self._parse_coordinate(upload.longitude),
+            taken_at=upload.scan_date_time,
+            sequence_number=sequence,
+            perceptual_hash=upload.perceptual_hash,
+            device_info={
+                'source': 'cargosnap',
+                'device_nick': upload.device_nick,
+                'device_id': upload.device_id,
+                'has_damage': upload.has_damage,
+                'damage_type': upload.damage_type_desc,
+            }
+        )
+        photo.refresh_coordinates()
+        return photo
+    
     def _import_photos_from_cargosnap(
         self,
         inspection: Inspection,
-        cargosnap_file: CargoSnapFile
+        cargosnap_file: CargoSnapFile,
+        skip_duplicates: bool = False,
+        max_distance: int = None
     ) -> int:
         """
         Importa fotos do CargoSnap para a inspeção
         
+        Args:
+            inspection: Inspeção de destino
+            cargosnap_file: Arquivo CargoSnap fonte
+            skip_duplicates: Ignora uploads cujo hash perceptual está a até
+                max_distance de uma foto do mesmo container (já existente ou
+                importada nesta chamada)
+            max_distance: Distância de Hamming (default: PHOTO_DUPLICATE_MAX_DISTANCE)
+        
         Returns:
             Número de fotos importadas
         """
-        imported_count = 0
+        imported_ids = []
+        skipped_count = 0
+        if max_distance is None:
+            max_distance = default_max_distance()
+        container_photo_ids = self._container_photo_ids(inspection) if skip_duplicates else set()
+        imported_hashes = []
         
         # Buscar apenas uploads com imagens baixadas localmente
         uploads = cargosnap_file.uploads.filter(
@@ -97,41 +204,56 @@ class CargoSnapInspectionIntegrator:
             local_image_path__isnull=False
         ).order_by('scan_date_time')
         
-        for sequence, upload in enumerate(uploads, start=1):
+        sequence = 0
+        for upload in uploads:
             try:
+                if skip_duplicates:
+                    hash_hex = upload.perceptual_hash or update_upload_hash(upload)
+                    if hash_hex and self.is_duplicate(
+                        hash_hex, container_photo_ids, imported_hashes, max_distance
+                    ):
+                        skipped_count += 1
+                        logger.info(f"Foto duplicada ignorada: {upload.cargosnap_id}")
+                        continue
+                
                 # Copiar arquivo de imagem
                 photo = self._copy_cargosnap_image_to_inspection(upload, inspection)
                 
                 if photo:
+                    sequence += 1
                     # Criar registro de foto na inspeção
-                    InspectionPhoto.objects.create(
-                        inspection=inspection,
-                        photo=photo,
-                        cargosnap_upload=upload,
-                        photo_source='CARGOSNAP',
-                        title=upload.workflow_step_description or f"Foto {sequence}",
-                        description=upload.comment or '',
-                        caption=f"Importada do CargoSnap - {upload.device_nick or 'Dispositivo'}",
-                        latitude=self._parse_coordinate(upload.latitude),
-                        longitude=self._parse_coordinate(upload.longitude),
-                        taken_at=upload.scan_date_time,
-                        sequence_number=sequence,
-                        device_info={
-                            'source': 'cargosnap',
-                            'device_nick': upload.device_nick,
-                            'device_id': upload.device_id,
-                            'has_damage': upload.has_damage,
-                            'damage_type': upload.damage_type_desc,
-                        }
-                    )
-                    imported_count += 1
+                    inspection_photo = self.build_photo(upload, inspection, photo, sequence)
+                    inspection_photo.save()
+                    imported_ids.append(inspection_photo.id)
+                    if upload.perceptual_hash:
+                        imported_hashes.append(int(upload.perceptual_hash, 16))
                     logger.info(f"Foto importada: {upload.cargosnap_id}")
                     
             except Exception as e:
                 logger.error(f"Erro ao importar foto {upload.cargosnap_id}: {str(e)}")
                 continue
         
-        return imported_count
+        if skipped_count:
+            logger.info(f"{skipped_count} fotos duplicadas não foram importadas")
+        schedule_photo_processing(imported_ids)
+        return len(imported_ids)
+    
+    def _container_photo_ids(self, inspection: Inspection) -> set:
+        """IDs das fotos já existentes para o mesmo container na empresa"""
+        return set(InspectionPhoto.objects.filter(
+            inspection__company=inspection.company,
+            inspection__container_number=inspection.container_number
+        ).exclude(perceptual_hash='').values_list('id', flat=True))
+    
+    def is_duplicate(self, hash_hex, container_photo_ids, imported_hashes, max_distance) -> bool:
+        """Verifica se o hash é quase idêntico a uma foto do container"""
+        value = int(hash_hex, 16)
+        if any(hamming_distance(value, other) <= max_distance for other in imported_hashes):
+            return True
+        return any(
+            kind == PHOTO and object_id in container_photo_ids
+            for _, (kind, object_id) in hash_index.search(hash_hex, max_distance)
+        )
     
     def _copy_cargosnap_image_to_inspection(
         self,
@@ -144,33 +266,12 @@ class CargoSnapInspectionIntegrator:
         Returns:
             Path relativo da imagem copiada ou None se falhar
         """
-        try:
-            from django.conf import settings
-            
-            # Caminho da imagem CargoSnap
-            source_path = Path(settings.MEDIA_ROOT) / upload.local_image_path
-            
-            if not source_path.exists():
-                logger.warning(f"Imagem CargoSnap não encontrada: {source_path}")
-                return None
-            
-            # Novo caminho para inspeção
-            timestamp = upload.scan_date_time.strftime('%Y/%m/%d')
-            filename = f"cargosnap_{upload.cargosnap_id}_{source_path.suffix}"
-            dest_relative = f"inspections/photos/{timestamp}/{filename}"
-            dest_path = Path(settings.MEDIA_ROOT) / dest_relative
-            
-            # Criar diretório se não existir
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Copiar arquivo
-            shutil.copy2(source_path, dest_path)
-            
-            return dest_relative
-            
-        except Exception as e:
-            logger.error(f"Erro ao copiar imagem: {str(e)}")
-            return None
+        return copy_cargosnap_image(upload.local_image_path, upload.cargosnap_id, upload.scan_date_time)
+    
+    def schedule_damage_issues(self, file_ids):
+        """Avarias dos arquivos viram ocorrências quando ganham inspeção (após o commit)"""
+        from apps.issues.damage_issues import schedule_for_files
+        schedule_for_files(file_ids)
     
     def _parse_coordinate(self, coord_str):
         """Converte string de coordenada para Decimal"""
@@ -208,6 +309,7 @@ class CargoSnapInspectionIntegrator:
             
             inspection.cargosnap_file = cargosnap_file
             inspection.save()
+            self.schedule_damage_issues([cargosnap_file.pk])
             
             logger.info(f"Inspeção {inspection.reference_number} vinculada ao CargoSnap {cargosnap_file.scan_code}")
             return True
@@ -236,6 +338,7 @@ class CargoSnapInspectionIntegrator:
             cargosnap_file__isnull=True,
             container_number__isnull=False
         ).exclude(container_number='')
+        linked_file_ids = []
         
         for inspection in inspections:
             stats['processed'] += 1
@@ -248,6 +351,7 @@ class CargoSnapInspectionIntegrator:
                 if cargosnap_file:
                     inspection.cargosnap_file = cargosnap_file
                     inspection.save()
+                    linked_file_ids.append(cargosnap_file.pk)
                     stats['linked'] += 1
                     logger.info(f"Auto-vinculado: {inspection.reference_number} -> {cargosnap_file.scan_code}")
                 else:
@@ -257,6 +361,7 @@ class CargoSnapInspectionIntegrator:
                 logger.error(f"Erro ao processar inspeção {inspection.id}: {str(e)}")
                 continue
         
+        self.schedule_damage_issues(linked_file_ids)
         logger.info(f"Auto-vinculação completa: {stats}")
         return stats
     
@@ -0,0 +1,73 @@
+"""
+Management command to create inspections for many CargoSnap files at once
+Usage:
+    python manage.py bulk_import_inspections --company ictsi --inspection-type CONTAINER
+        [--file-ids 1 2 3] [--date-from 2024-01-01] [--date-to 2024-01-31]
+        [--damaged-only] [--no-photos] [--skip-duplicates] [--limit 500]
+Without --file-ids every file (in the date range) that has no inspection for
+the company is imported.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.cargosnap_integration.bulk_import import BulkInspectionImporter, FAILED, summarize
+from apps.cargosnap_integration.models import CargoSnapFile
+from apps.core.models import Company
+from apps.inspections.models import Inspection, InspectionType
+
+
+class Command(BaseCommand):
+    help = 'Cria inspeções em lote a partir de arquivos CargoSnap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', required=True, help='Slug da empresa')
+        parser.add_argument('--inspection-type', required=True, help='Código do tipo de inspeção')
+        parser.add_argument('--file-ids', nargs='*', type=int, help='IDs dos arquivos CargoSnap')
+        parser.add_argument('--date-from', help='Arquivos criados a partir de (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='Arquivos criados até (YYYY-MM-DD)')
+        parser.add_argument('--damaged-only', action='store_true', help='Apenas arquivos com avarias')
+        parser.add_argument('--no-photos', action='store_true', help='Não importa as fotos')
+        parser.add_argument('--skip-duplicates', action='store_true', help='Ignora fotos quase idênticas')
+        parser.add_argument('--limit', type=int, help='Número máximo de arquivos')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(slug=options['company'])
+            inspection_type = InspectionType.objects.get(code=options['inspection_type'])
+        except (Company.DoesNotExist, InspectionType.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        files = CargoSnapFile.objects.order_by('created_at')
+        if options['file_ids']:
+            files = files.filter(id__in=options['file_ids'])
+        else:
+            files = files.exclude(id__in=Inspection.objects.filter(
+                company=company, cargosnap_file__isnull=False
+            ).values('cargosnap_file_id'))
+        if options['date_from']:
+            files = files.filter(created_at__date__gte=options['date_from'])
+        if options['date_to']:
+            files = files.filter(created_at__date__lte=options['date_to'])
+        if options['damaged_only']:
+            files = files.filter(snap_count_with_damage__gt=0)
+        if options['limit']:
+            files = files[:options['limit']]
+
+        importer = BulkInspectionImporter(
+            company=company,
+            inspection_type=inspection_type,
+            import_photos=not options['no_photos'],
+            skip_duplicates=options['skip_duplicates'],
+        )
+
+        def progress(results):
+            self.stdout.write(f'{len(results)} arquivos processados')
+
+        results = importer.run(files, progress=progress)
+        for result in results:
+            if result['status'] == FAILED:
+                self.stderr.write(f"{result['scan_code']}: {result['error']}")
+
+        totals = summarize(results)
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['created']} inspeções criadas, {totals['skipped']} ignoradas, "
+            f"{totals['failed']} com erro ({totals['photos_imported']} fotos importadas)"
+        ))
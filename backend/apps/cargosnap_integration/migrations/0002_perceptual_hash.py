@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargosnap_integration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargosnapupload',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='dHash (hex) da imagem local', max_length=16),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargosnap_integration', '0002_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargosnapupload',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='cargosnapupload',
+            name='latitude_value',
+            field=models.FloatField(blank=True, help_text='Latitude numérica (derivada de latitude)', null=True),
+        ),
+        migrations.AddField(
+            model_name='cargosnapupload',
+            name='longitude_value',
+            field=models.FloatField(blank=True, help_text='Longitude numérica (derivada de longitude)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cargosnapupload',
+            index=models.Index(fields=['latitude_value', 'longitude_value'], name='cargosnap_u_latitud_708e22_idx'),
+        ),
+    ]
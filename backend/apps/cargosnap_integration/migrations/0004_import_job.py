@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargosnap_integration', '0003_geo_index'),
+        ('core', '0002_reference_sequence'),
+        ('inspections', '0008_geo_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CargoSnapImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Executando'), ('completed', 'Completo'), ('partial', 'Parcial'), ('error', 'Erro')], default='pending', max_length=20)),
+                ('file_ids', models.JSONField(default=list, help_text='IDs dos CargoSnapFile a importar')),
+                ('options', models.JSONField(blank=True, default=dict, help_text='assigned_to_id, import_photos, skip_duplicates')),
+                ('total_files', models.IntegerField(default=0)),
+                ('processed_files', models.IntegerField(default=0)),
+                ('created_count', models.IntegerField(default=0)),
+                ('skipped_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('results', models.JSONField(blank=True, default=list, help_text='Resultado por arquivo')),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cargosnap_import_jobs', to='core.company')),
+                ('inspection_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inspections.inspectiontype')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Importação em Lote CargoSnap',
+                'verbose_name_plural': 'Importações em Lote CargoSnap',
+                'db_table': 'cargosnap_import_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
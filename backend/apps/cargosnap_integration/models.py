@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.postgres.fields import ArrayField
 import json
 
+from apps.core.geo import encode_geohash, expand_update_fields, parse_float, valid_coordinates
+
 
 class CargoSnapFile(models.Model):
     """Arquivo principal do CargoSnap (container/unidade)"""
@@ -73,6 +75,9 @@ class CargoSnapUpload(models.Model):
     longitude = models.CharField(max_length=50, blank=True, null=True)
     latitude = models.CharField(max_length=50, blank=True, null=True)
     geocoding_data = models.JSONField(blank=True, null=True, help_text="Dados completos de geocoding")
+    latitude_value = models.FloatField(blank=True, null=True, help_text="Latitude numérica (derivada de latitude)")
+    longitude_value = models.FloatField(blank=True, null=True, help_text="Longitude numérica (derivada de longitude)")
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
     
     # Danos
     has_damage = models.BooleanField(default=False)
@@ -99,6 +104,9 @@ class CargoSnapUpload(models.Model):
     local_image_path = models.CharField(max_length=500, blank=True, null=True, help_text="Caminho da imagem baixada localmente")
     local_thumb_path = models.CharField(max_length=500, blank=True, null=True, help_text="Caminho da thumbnail baixada localmente")
     image_downloaded = models.BooleanField(default=False)
+    perceptual_hash = models.CharField(max_length=16, blank=True, db_index=True, help_text="dHash (hex) da imagem local")
+    
+    GEO_DERIVED_FIELDS = ['latitude_value', 'longitude_value', 'geohash']
     
     class Meta:
         db_table = 'cargosnap_uploads'
@@ -110,10 +118,24 @@ class CargoSnapUpload(models.Model):
             models.Index(fields=['workflow_id']),
             models.Index(fields=['has_damage']),
             models.Index(fields=['image_downloaded']),
+            models.Index(fields=['latitude_value', 'longitude_value']),
         ]
     
     def __str__(self):
         return f"Upload {self.cargosnap_id} - {self.file.scan_code}"
+    
+    def refresh_coordinates(self):
+        """Converte as coordenadas recebidas como texto da API em colunas numéricas"""
+        latitude, longitude = parse_float(self.latitude), parse_float(self.longitude)
+        if not valid_coordinates(latitude, longitude):
+            latitude = longitude = None
+        self.latitude_value, self.longitude_value = latitude, longitude
+        self.geohash = encode_geohash(latitude, longitude)
+    
+    def save(self, *args, **kwargs):
+        self.refresh_coordinates()
+        expand_update_fields(kwargs, ['latitude', 'longitude'], self.GEO_DERIVED_FIELDS)
+        super().save(*args, **kwargs)
 
 
 class CargoSnapLocation(models.Model):
@@ -354,3 +376,46 @@ class CargoSnapSyncLog(models.Model):
     
     def __str__(self):
         return f"Sync {self.started_at.strftime('%Y-%m-%d %H:%M:%S')} - {self.status}"
+
+
+class CargoSnapImportJob(models.Model):
+    """Criação em lote de inspeções a partir de arquivos CargoSnap (executada em background)"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Executando'),
+        ('completed', 'Completo'),
+        ('partial', 'Parcial'),
+        ('error', 'Erro'),
+    ]
+    
+    company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='cargosnap_import_jobs')
+    inspection_type = models.ForeignKey('inspections.InspectionType', on_delete=models.PROTECT, related_name='+')
+    requested_by = models.ForeignKey(
+        'core.User', on_delete=models.SET_NULL, blank=True, null=True, related_name='+'
+    )
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file_ids = models.JSONField(default=list, help_text="IDs dos CargoSnapFile a importar")
+    options = models.JSONField(default=dict, blank=True, help_text="assigned_to_id, import_photos, skip_duplicates")
+    
+    total_files = models.IntegerField(default=0)
+    processed_files = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    skipped_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    results = models.JSONField(default=list, blank=True, help_text="Resultado por arquivo")
+    error_message = models.TextField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'cargosnap_import_jobs'
+        verbose_name = 'Importação em Lote CargoSnap'
+        verbose_name_plural = 'Importações em Lote CargoSnap'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Importação {self.id} - {self.status} ({self.processed_files}/{self.total_files})"
@@ -1,12 +1,13 @@
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetSerializerMixin
 from .models import (
     CargoSnapFile, CargoSnapUpload, CargoSnapLocation,
     CargoSnapWorkflow, CargoSnapWorkflowStep, CargoSnapWorkflowRun,
-    CargoSnapWorkflowRunStep, CargoSnapSyncLog
+    CargoSnapWorkflowRunStep, CargoSnapSyncLog, CargoSnapImportJob
 )
 
 
-class CargoSnapUploadSerializer(serializers.ModelSerializer):
+class CargoSnapUploadSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     # URLs completas para as imagens locais
     local_image_url = serializers.SerializerMethodField()
     local_thumb_url = serializers.SerializerMethodField()
@@ -16,11 +17,15 @@ class CargoSnapUploadSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'cargosnap_id', 'device_nick', 'upload_type',
             'created_at', 'scan_date_time', 'longitude', 'latitude',
-            'geocoding_data', 'has_damage', 'damage_type_desc', 'comment',
+            'latitude_value', 'longitude_value', 'geocoding_data', 'has_damage', 'damage_type_desc', 'comment',
             'workflow_description', 'workflow_step_description',
             'image_url', 'image_thumb', 'local_image_path', 'local_thumb_path',
             'local_image_url', 'local_thumb_url', 'image_downloaded'
         ]
+        sparse_field_sources = {
+            'local_image_url': ['local_image_path', 'image_downloaded'],
+            'local_thumb_url': ['local_thumb_path', 'image_downloaded'],
+        }
     
     def get_local_image_url(self, obj):
         """Retorna URL completa da imagem local"""
@@ -90,7 +95,7 @@ class CargoSnapWorkflowRunSerializer(serializers.ModelSerializer):
         ]
 
 
-class CargoSnapFileListSerializer(serializers.ModelSerializer):
+class CargoSnapFileListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer simplificado para listagem"""
     
     class Meta:
@@ -102,7 +107,7 @@ class CargoSnapFileListSerializer(serializers.ModelSerializer):
         ]
 
 
-class CargoSnapFileDetailSerializer(serializers.ModelSerializer):
+class CargoSnapFileDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer completo para detalhes"""
     
     uploads = CargoSnapUploadSerializer(many=True, read_only=True)
@@ -123,6 +128,7 @@ class CargoSnapFileDetailSerializer(serializers.ModelSerializer):
             'uploads', 'locations', 'workflow_runs',
             'total_images', 'downloaded_images', 'images_with_damage'
         ]
+        sparse_field_sources = {'total_images': [], 'downloaded_images': [], 'images_with_damage': []}
     
     def get_total_images(self, obj):
         return obj.uploads.count()
@@ -164,3 +170,17 @@ class CargoSnapStatsSerializer(serializers.Serializer):
     total_damage_images = serializers.IntegerField()
     last_sync = serializers.DateTimeField(allow_null=True)
     sync_status = serializers.DictField()
+
+
+class CargoSnapImportJobSerializer(serializers.ModelSerializer):
+    inspection_type_name = serializers.CharField(source='inspection_type.name', read_only=True)
+    
+    class Meta:
+        model = CargoSnapImportJob
+        fields = [
+            'id', 'status', 'company', 'inspection_type', 'inspection_type_name',
+            'requested_by', 'options', 'total_files', 'processed_files',
+            'created_count', 'skipped_count', 'failed_count', 'results',
+            'error_message', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
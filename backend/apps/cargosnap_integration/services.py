@@ -15,6 +15,7 @@ from .models import (
     CargoSnapWorkflowRunStep, CargoSnapFormSubmit, CargoSnapField,
     CargoSnapSyncLog
 )
+from apps.inspections.duplicates import update_upload_hash
 
 logger = logging.getLogger(__name__)
 
@@ -176,6 +177,9 @@ class CargoSnapAPIService:
             file_obj.sync_error = None
             file_obj.save()
             
+            # Avarias viram ocorrências após o commit do arquivo
+            transaction.on_commit(lambda: self.generate_damage_issues(file_obj))
+            
         except Exception as e:
             logger.error(f"Erro ao sincronizar detalhes do arquivo {file_obj.cargosnap_id}: {str(e)}")
             file_obj.sync_status = 'error'
@@ -402,8 +406,20 @@ class CargoSnapAPIService:
             else:
                 failed += 1
         
+        if downloaded:
+            from apps.issues.damage_issues import refresh_photo_paths
+            refresh_photo_paths([file_obj.pk])
+        
         return downloaded, failed
     
+    def generate_damage_issues(self, file_obj: CargoSnapFile) -> None:
+        """Cria as ocorrências das avarias do arquivo (falhas não interrompem a sincronização)"""
+        from apps.issues.damage_issues import generate_for_files
+        try:
+            generate_for_files([file_obj.pk])
+        except Exception as e:
+            logger.error(f"Erro ao gerar ocorrências do arquivo {file_obj.cargosnap_id}: {str(e)}")
+    
     def _download_upload_images(self, upload: CargoSnapUpload, force_download: bool = False) -> bool:
         """Baixa as imagens de um upload"""
         
@@ -439,6 +455,7 @@ class CargoSnapAPIService:
             
             upload.image_downloaded = True
             upload.save()
+            update_upload_hash(upload)
             return True
             
         except Exception as e:
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CargoSnapFileViewSet, CargoSnapUploadViewSet,
-    CargoSnapWorkflowViewSet, CargoSnapSyncLogViewSet
+    CargoSnapWorkflowViewSet, CargoSnapSyncLogViewSet, CargoSnapImportJobViewSet
 )
 
 app_name = 'cargosnap_integration'
@@ -12,6 +12,7 @@ router.register(r'files', CargoSnapFileViewSet, basename='cargosnap-file')
 router.register(r'uploads', CargoSnapUploadViewSet, basename='cargosnap-upload')
 router.register(r'workflows', CargoSnapWorkflowViewSet, basename='cargosnap-workflow')
 router.register(r'sync-logs', CargoSnapSyncLogViewSet, basename='cargosnap-synclog')
+router.register(r'import-jobs', CargoSnapImportJobViewSet, basename='cargosnap-import-job')
 
 urlpatterns = [
     path('', include(router.urls)),
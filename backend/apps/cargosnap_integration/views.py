@@ -7,14 +7,17 @@ from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 import logging
 
+from apps.core.mixins import ExportMixin, GeoQueryMixin, SparseFieldsetMixin
+from apps.search.filters import FullTextSearchFilter, SearchRankOrderingFilter
 from .models import (
     CargoSnapFile, CargoSnapUpload, CargoSnapWorkflow,
-    CargoSnapSyncLog
+    CargoSnapSyncLog, CargoSnapImportJob
 )
 from .serializers import (
     CargoSnapFileListSerializer, CargoSnapFileDetailSerializer,
     CargoSnapUploadSerializer, CargoSnapWorkflowSerializer,
-    CargoSnapSyncLogSerializer, CargoSnapStatsSerializer
+    CargoSnapSyncLogSerializer, CargoSnapStatsSerializer,
+    CargoSnapImportJobSerializer
 )
 from .services import CargoSnapAPIService
 from .integration_services import CargoSnapInspectionIntegrator
@@ -22,7 +25,7 @@ from .integration_services import CargoSnapInspectionIntegrator
 logger = logging.getLogger(__name__)
 
 
-class CargoSnapFileViewSet(viewsets.ReadOnlyModelViewSet):
+class CargoSnapFileViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para arquivos do CargoSnap"""
     
     permission_classes = [IsAuthenticated]
@@ -156,6 +159,8 @@ class CargoSnapFileViewSet(viewsets.ReadOnlyModelViewSet):
             - inspection_type_id: ID do tipo de inspeção
             - assigned_to_id: ID do usuário responsável (opcional)
             - import_photos: Boolean para importar fotos (default: True)
+            - skip_duplicates: Boolean para ignorar fotos quase idênticas a fotos
+              já existentes do mesmo container (default: False)
         """
         file_obj = self.get_object()
         
@@ -167,6 +172,7 @@ class CargoSnapFileViewSet(viewsets.ReadOnlyModelViewSet):
             inspection_type_id = request.data.get('inspection_type_id')
             assigned_to_id = request.data.get('assigned_to_id')
             import_photos = request.data.get('import_photos', True)
+            skip_duplicates = request.data.get('skip_duplicates', False)
             
             if not company_id or not inspection_type_id:
                 return Response({
@@ -183,7 +189,8 @@ class CargoSnapFileViewSet(viewsets.ReadOnlyModelViewSet):
                 company=company,
                 inspection_type=inspection_type,
                 assigned_to=assigned_to,
-                import_photos=import_photos
+                import_photos=import_photos,
+                skip_duplicates=skip_duplicates
             )
             
             from apps.inspections.serializers import InspectionSerializer
@@ -203,6 +210,94 @@ class CargoSnapFileViewSet(viewsets.ReadOnlyModelViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['post'])
+    def bulk_create_inspections(self, request):
+        """
+        Cria inspeções ICTSI para vários arquivos CargoSnap de uma vez
+        
+        Body params:
+            - inspection_type_id: ID do tipo de inspeção
+            - file_ids: Lista de IDs de arquivos (opcional; sem ela são usados
+              os filtros da query string - has_damage, date_from, date_to,
+              closed, sync_status - e apenas arquivos ainda sem inspeção)
+            - company_id: ID da empresa (default: empresa do usuário)
+            - assigned_to_id, import_photos, skip_duplicates: como em create_inspection
+            - run_async: Força execução em background (lotes maiores que
+              CARGOSNAP_IMPORT_SYNC_LIMIT sempre rodam em background)
+        
+        Returns:
+            200 com o resultado por arquivo, ou 202 com o job de importação
+        """
+        from django.conf import settings
+        from apps.inspections.models import Inspection, InspectionType
+        from apps.core.models import Company, User
+        from apps.core.tasks import run_on_commit
+        from .bulk_import import BulkInspectionImporter, run_import_job, summarize
+        
+        inspection_type_id = request.data.get('inspection_type_id')
+        company_id = request.data.get('company_id')
+        assigned_to_id = request.data.get('assigned_to_id')
+        import_photos = request.data.get('import_photos', True)
+        skip_duplicates = request.data.get('skip_duplicates', False)
+        file_ids = request.data.get('file_ids')
+        
+        if not inspection_type_id:
+            return Response({'error': 'inspection_type_id é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
+        if file_ids is not None and not isinstance(file_ids, list):
+            return Response({'error': 'file_ids deve ser uma lista'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            company = Company.objects.get(id=company_id) if company_id else request.user.company
+            inspection_type = InspectionType.objects.get(id=inspection_type_id)
+            assigned_to = User.objects.get(id=assigned_to_id) if assigned_to_id else None
+        except (Company.DoesNotExist, InspectionType.DoesNotExist, User.DoesNotExist) as e:
+            return Response({'error': f'Recurso não encontrado: {str(e)}'}, status=status.HTTP_404_NOT_FOUND)
+        if company is None:
+            return Response({'error': 'company_id é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_files = getattr(settings, 'CARGOSNAP_BULK_IMPORT_MAX_FILES', 1000)
+        if file_ids is not None:
+            files = CargoSnapFile.objects.filter(id__in=file_ids[:max_files]).order_by('id')
+        else:
+            files = self.filter_queryset(self.get_queryset()).exclude(
+                id__in=Inspection.objects.filter(
+                    company=company, cargosnap_file__isnull=False
+                ).values('cargosnap_file_id')
+            )[:max_files]
+        files = list(files)
+        if not files:
+            return Response({'error': 'Nenhum arquivo CargoSnap selecionado'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        run_async = request.data.get('run_async', False)
+        if run_async or len(files) > getattr(settings, 'CARGOSNAP_IMPORT_SYNC_LIMIT', 20):
+            job = CargoSnapImportJob.objects.create(
+                company=company,
+                inspection_type=inspection_type,
+                requested_by=request.user,
+                file_ids=[cargosnap_file.id for cargosnap_file in files],
+                total_files=len(files),
+                options={
+                    'assigned_to_id': assigned_to.id if assigned_to else None,
+                    'import_photos': import_photos,
+                    'skip_duplicates': skip_duplicates,
+                },
+            )
+            run_on_commit(run_import_job, job.id)
+            return Response(
+                {'status': 'queued', 'job': CargoSnapImportJobSerializer(job).data},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        importer = BulkInspectionImporter(
+            company=company,
+            inspection_type=inspection_type,
+            assigned_to=assigned_to,
+            import_photos=import_photos,
+            skip_duplicates=skip_duplicates,
+        )
+        results = importer.run(files)
+        return Response({'summary': summarize(results), 'results': results})
+    
     @action(detail=False, methods=['get'])
     def unified_search(self, request):
         """
@@ -253,16 +348,34 @@ class CargoSnapFileViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class CargoSnapUploadViewSet(viewsets.ReadOnlyModelViewSet):
+class CargoSnapUploadViewSet(ExportMixin, GeoQueryMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para uploads (imagens) do CargoSnap"""
     
+    geo_latitude_field = 'latitude_value'
+    geo_longitude_field = 'longitude_value'
     permission_classes = [IsAuthenticated]
     serializer_class = CargoSnapUploadSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, SearchRankOrderingFilter]
     filterset_fields = ['has_damage', 'image_downloaded', 'file']
     search_fields = ['file__scan_code', 'device_nick', 'workflow_step_description']
+    search_doc_type = 'cargosnap_upload'
     ordering_fields = ['scan_date_time', 'created_at']
     ordering = ['-scan_date_time']
+    export_resource = 'cargosnap_uploads'
+    export_columns = [
+        ('cargosnap_id', 'ID CargoSnap'),
+        ('file__scan_code', 'Código'),
+        ('scan_date_time', 'Data do scan'),
+        ('upload_type', 'Tipo'),
+        ('device_nick', 'Dispositivo'),
+        ('workflow_description', 'Workflow'),
+        ('workflow_step_description', 'Etapa'),
+        ('has_damage', 'Avaria'),
+        ('damage_type_desc', 'Tipo de avaria'),
+        ('latitude_value', 'Latitude'),
+        ('longitude_value', 'Longitude'),
+        ('image_url', 'Imagem'),
+    ]
     
     def get_queryset(self):
         queryset = CargoSnapUpload.objects.select_related('file').all()
@@ -346,3 +459,20 @@ class CargoSnapSyncLogViewSet(viewsets.ReadOnlyModelViewSet):
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class CargoSnapImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet para acompanhar importações em lote (bulk_create_inspections)"""
+    
+    permission_classes = [IsAuthenticated]
+    serializer_class = CargoSnapImportJobSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['status']
+    ordering_fields = ['created_at', 'finished_at']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        queryset = CargoSnapImportJob.objects.select_related('inspection_type')
+        if self.request.user.is_superuser:
+            return queryset
+        return queryset.filter(company=self.request.user.company)
@@ -0,0 +1,135 @@
+"""
+Geospatial helpers for CargoSnap ICTSI
+Geohash encoding, bounding boxes and distances used by the map endpoints
+(see GeoQueryMixin). Plain Python: no GIS extension is required.
+"""
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5m x 5m
+EARTH_RADIUS_KM = 6371.0088
+
+# Zoom do mapa (0-20) -> tamanho do prefixo de geohash usado no agrupamento
+ZOOM_PRECISION = [
+    (3, 1), (5, 2), (8, 3), (11, 4), (14, 5), (16, 6), (18, 7),
+]
+
+
+def parse_float(value):
+    """Converte coordenada (string, Decimal, None) em float ou None"""
+    if value in (None, ''):
+        return None
+    try:
+        result = float(str(value).strip().replace(',', '.'))
+    except (TypeError, ValueError):
+        return None
+    return result if math.isfinite(result) else None
+
+
+def valid_coordinates(latitude, longitude):
+    return (
+        latitude is not None and longitude is not None
+        and -90 <= latitude <= 90 and -180 <= longitude <= 180
+        and not (latitude == 0 and longitude == 0)
+    )
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash da coordenada ('' se inválida)"""
+    latitude, longitude = parse_float(latitude), parse_float(longitude)
+    if not valid_coordinates(latitude, longitude):
+        return ''
+
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def precision_for_zoom(zoom):
+    for max_zoom, precision in ZOOM_PRECISION:
+        if zoom <= max_zoom:
+            return precision
+    return 8
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bbox_around(latitude, longitude, radius_km):
+    """Retângulo (south, west, north, east) que contém o círculo"""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    delta_lng = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180)
+    return (
+        max(latitude - delta_lat, -90), longitude - delta_lng,
+        min(latitude + delta_lat, 90), longitude + delta_lng,
+    )
+
+
+def parse_bbox(value):
+    """
+    Converte 'south,west,north,east' em tupla de floats
+
+    Raises:
+        ValueError: formato inválido
+    """
+    parts = [parse_float(part) for part in (value or '').split(',')]
+    if len(parts) != 4 or any(part is None for part in parts):
+        raise ValueError('bbox deve ser south,west,north,east')
+    south, west, north, east = parts
+    if south > north:
+        raise ValueError('bbox com south > north')
+    return south, west, north, east
+
+
+def expand_update_fields(kwargs, source_fields, derived_fields):
+    """save(update_fields=...) que altera coordenadas também grava os campos derivados"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and set(source_fields) & set(update_fields):
+        kwargs['update_fields'] = {*update_fields, *derived_fields}
+
+
+def backfill_coordinates(model, batch_size=1000, stdout=None):
+    """
+    Recalcula os campos geográficos derivados de um modelo em lotes
+
+    O modelo deve expor refresh_coordinates() e GEO_DERIVED_FIELDS. A
+    paginação é por pk (sem OFFSET) e cada lote é um único bulk_update.
+
+    Returns:
+        Número de registros processados
+    """
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        for instance in batch:
+            instance.refresh_coordinates()
+        model.objects.bulk_update(batch, model.GEO_DERIVED_FIELDS)
+        total += len(batch)
+        last_pk = batch[-1].pk
+        if stdout:
+            stdout.write(f'{model._meta.label}: {total} registros atualizados')
+    return total
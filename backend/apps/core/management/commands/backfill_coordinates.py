@@ -0,0 +1,29 @@
+"""
+Management command to fill the numeric coordinate and geohash columns
+Usage: python manage.py backfill_coordinates [--model upload] [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.core.geo import backfill_coordinates
+from apps.inspections.models import InspectionPhoto
+from apps.issues.models import Issue
+
+MODELS = {
+    'upload': CargoSnapUpload,
+    'photo': InspectionPhoto,
+    'issue': Issue,
+}
+
+
+class Command(BaseCommand):
+    help = 'Preenche coordenadas numéricas e geohash (uploads CargoSnap, fotos e ocorrências) em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=list(MODELS), help='Modelo (padrão: todos)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        names = [options['model']] if options['model'] else list(MODELS)
+        for name in names:
+            total = backfill_coordinates(MODELS[name], batch_size=options['batch_size'], stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'{name}: {total} registros atualizados'))
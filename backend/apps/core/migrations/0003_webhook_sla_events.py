@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_reference_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhook',
+            name='event_type',
+            field=models.CharField(choices=[('inspection.created', 'Inspection Created'), ('inspection.updated', 'Inspection Updated'), ('inspection.completed', 'Inspection Completed'), ('inspection.approved', 'Inspection Approved'), ('issue.created', 'Issue Created'), ('issue.resolved', 'Issue Resolved'), ('issue.sla_warning', 'Issue SLA Warning'), ('issue.sla_breached', 'Issue SLA Breached'), ('report.generated', 'Report Generated'), ('workflow.completed', 'Workflow Completed')], max_length=50),
+        ),
+    ]
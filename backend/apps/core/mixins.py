@@ -1,7 +1,17 @@
 """
 Mixins for views and viewsets
 """
-from rest_framework import viewsets
+import heapq
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Avg, Count, Min, Q
+from django.db.models.functions import Substr
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import geo
+from .serializers import parse_field_list
 
 
 class CompanyFilterMixin:
@@ -42,3 +52,322 @@ class CompanyFilterMixin:
         if self.request.user.is_superuser:
             return None
         return self.request.user.company
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin for ?fields= and ?expand= (see SparseFieldsetSerializerMixin)
+
+    Besides pruning the serializer, the queryset of list/retrieve is narrowed
+    to what the remaining fields need: only() on the columns used,
+    select_related for forward relations and prefetch_related for nested
+    many relations. Relations that were not requested are never joined.
+    """
+    sparse_fields_param = 'fields'
+    sparse_expand_param = 'expand'
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self._is_read_request():
+            params = self.request.query_params
+            if self.sparse_fields_param in params:
+                context['sparse_fields'] = parse_field_list(params[self.sparse_fields_param])
+            if self.sparse_expand_param in params:
+                context['sparse_expand'] = parse_field_list(params[self.sparse_expand_param])
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self._is_read_request() or self.action not in ('list', 'retrieve'):
+            return queryset
+        return apply_query_plan(queryset, self.get_serializer())
+
+    def _is_read_request(self):
+        return getattr(self, 'request', None) is not None and self.request.method in ('GET', 'HEAD')
+
+
+def apply_query_plan(queryset, serializer):
+    """Aplica only/select_related/prefetch_related derivados dos campos do serializer"""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    plan = QueryPlan(queryset.model)
+    plan.collect(serializer)
+
+    if plan.select_related:
+        queryset = queryset.select_related(*sorted(plan.select_related))
+    if plan.prefetch_related:
+        queryset = queryset.prefetch_related(*sorted(plan.prefetch_related))
+
+    existing = queryset.query.select_related
+    if plan.only is not None and existing is not True:
+        # Relações já em select_related no get_queryset não podem ser adiadas
+        columns = plan.only | set(existing or {})
+        queryset = queryset.only(*sorted(columns))
+    return queryset
+
+
+class QueryPlan:
+    """
+    Columns and relations needed to render a serializer
+
+    `only` is None when some field reads an attribute that cannot be mapped
+    to a model column (e.g. SerializerMethodField without
+    Meta.sparse_field_sources); all columns are loaded in that case.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.only = {model._meta.pk.name}
+        self.select_related = set()
+        self.prefetch_related = set()
+
+    def collect(self, serializer, model=None, prefix='', many=False):
+        model = model or self.model
+        top_level = not prefix
+        sources = getattr(getattr(serializer, 'Meta', None), 'sparse_field_sources', {})
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            nested = isinstance(field, serializers.BaseSerializer)
+
+            if name in sources:
+                paths = sources[name]
+            elif field.source == '*':
+                if top_level:
+                    self.only = None
+                continue
+            else:
+                paths = [field.source.replace('.', '__')]
+
+            for path in paths:
+                related_model, path_many = self._resolve(model, path, prefix, many, top_level, nested)
+                if nested and related_model is not None:
+                    child = field.child if isinstance(field, serializers.ListSerializer) else field
+                    self.collect(child, related_model, f'{prefix}{path}__', path_many)
+
+    def _resolve(self, model, path, prefix, many, top_level, nested):
+        """
+        Registra colunas e relações usadas por um caminho ORM
+
+        Returns:
+            (modelo relacionado ou None, se o caminho passa por relação many)
+        """
+        current = model
+        relations = []
+        needs_relation = nested
+        ends_in_relation = True
+
+        for part in path.split('__'):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                # Atributo calculado (property/método)
+                if relations:
+                    needs_relation = True
+                elif top_level:
+                    self.only = None
+                ends_in_relation = False
+                break
+
+            if top_level and not relations and model_field.concrete:
+                self._add_only(model_field.name)
+            if not model_field.is_relation:
+                needs_relation = needs_relation or bool(relations)
+                ends_in_relation = False
+                break
+
+            relations.append(part)
+            if model_field.many_to_many or model_field.one_to_many:
+                many = True
+                needs_relation = True
+            current = model_field.related_model
+
+        if relations and needs_relation:
+            lookup = prefix + '__'.join(relations)
+            if many:
+                self.prefetch_related.add(lookup)
+            else:
+                self.select_related.add(lookup)
+        return (current if ends_in_relation and relations else None), many
+
+    def _add_only(self, name):
+        if self.only is not None:
+            self.only.add(name)
+
+
+class GeoQueryMixin:
+    """
+    ViewSet mixin with map endpoints over a latitude/longitude pair
+
+        GET within/?bbox=south,west,north,east
+        GET nearby/?lat=&lng=[&k=20][&radius_km=]
+        GET clusters/?bbox=south,west,north,east&zoom=
+
+    Rectangles are answered by the (latitude, longitude) index; nearby widens
+    a rectangle around the point until it holds k candidates and ranks them by
+    haversine distance; clusters groups rows by geohash prefix (longer
+    prefixes as the zoom increases) in a single aggregate query.
+    """
+    geo_latitude_field = 'latitude'
+    geo_longitude_field = 'longitude'
+    geo_hash_field = 'geohash'
+    geo_max_results = 500
+    geo_nearby_default_k = 20
+    geo_nearby_max_k = 200
+    geo_nearby_initial_radius_km = 1.0
+    geo_nearby_max_radius_km = 200.0
+
+    @action(detail=False, methods=['get'])
+    def within(self, request):
+        try:
+            bbox = geo.parse_bbox(request.query_params.get('bbox'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self._filter_bbox(self._geo_queryset(), bbox)
+        queryset = apply_query_plan(queryset, self.get_serializer())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        objects = list(queryset[:self.geo_max_results])
+        return Response(self.get_serializer(objects, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        params = request.query_params
+        latitude, longitude = geo.parse_float(params.get('lat')), geo.parse_float(params.get('lng'))
+        if not geo.valid_coordinates(latitude, longitude):
+            return Response({'error': 'lat e lng são obrigatórios'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            k = min(int(params.get('k', self.geo_nearby_default_k)), self.geo_nearby_max_k)
+            max_radius = float(params.get('radius_km', self.geo_nearby_max_radius_km))
+        except ValueError:
+            return Response({'error': 'k e radius_km devem ser numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+        if k < 1 or max_radius <= 0:
+            return Response({'error': 'k e radius_km devem ser positivos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        nearest = self._nearest(latitude, longitude, k, min(max_radius, self.geo_nearby_max_radius_km))
+        queryset = apply_query_plan(
+            self._geo_queryset().filter(pk__in=[pk for pk, _ in nearest]), self.get_serializer()
+        )
+        objects = {obj.pk: obj for obj in queryset}
+
+        results = []
+        for pk, distance in nearest:
+            if pk in objects:
+                data = self.get_serializer(objects[pk]).data
+                data['distance_km'] = round(distance, 4)
+                results.append(data)
+        return Response(results)
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        try:
+            bbox = geo.parse_bbox(request.query_params.get('bbox'))
+            zoom = int(request.query_params.get('zoom', 10))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        precision = geo.precision_for_zoom(zoom)
+        rows = (
+            self._filter_bbox(self._geo_queryset(), bbox)
+            .exclude(**{self.geo_hash_field: ''})
+            .order_by()
+            .values(cell=Substr(self.geo_hash_field, 1, precision))
+            .annotate(
+                count=Count('pk'),
+                latitude=Avg(self.geo_latitude_field),
+                longitude=Avg(self.geo_longitude_field),
+                sample_id=Min('pk'),
+            )
+            .order_by('-count')[:self.geo_max_results]
+        )
+
+        clusters = []
+        for row in rows:
+            cluster = {
+                'cell': row['cell'],
+                'count': row['count'],
+                'latitude': round(float(row['latitude']), 6),
+                'longitude': round(float(row['longitude']), 6),
+            }
+            if row['count'] == 1:
+                cluster['id'] = row['sample_id']
+            clusters.append(cluster)
+        return Response({'zoom': zoom, 'precision': precision, 'clusters': clusters})
+
+    def _geo_queryset(self):
+        return self.filter_queryset(self.get_queryset()).filter(**{
+            f'{self.geo_latitude_field}__isnull': False,
+            f'{self.geo_longitude_field}__isnull': False,
+        })
+
+    def _filter_bbox(self, queryset, bbox):
+        south, west, north, east = bbox
+        lat, lng = self.geo_latitude_field, self.geo_longitude_field
+        queryset = queryset.filter(**{f'{lat}__gte': south, f'{lat}__lte': north})
+        if west <= east:
+            return queryset.filter(**{f'{lng}__gte': west, f'{lng}__lte': east})
+        # Retângulo que cruza o antimeridiano
+        return queryset.filter(Q(**{f'{lng}__gte': west}) | Q(**{f'{lng}__lte': east}))
+
+    def _nearest(self, latitude, longitude, k, max_radius):
+        """
+        k vizinhos mais próximos (pk, distância em km) dentro de max_radius
+
+        O raio de busca começa em geo_nearby_initial_radius_km e quadruplica
+        até haver k candidatos no círculo; só as coordenadas são lidas.
+        """
+        radius = min(self.geo_nearby_initial_radius_km, max_radius)
+        queryset = self._geo_queryset().order_by()
+        while True:
+            bbox = geo.bbox_around(latitude, longitude, radius)
+            candidates = []
+            for pk, lat, lng in self._filter_bbox(queryset, bbox).values_list(
+                'pk', self.geo_latitude_field, self.geo_longitude_field
+            ).iterator():
+                distance = geo.haversine_km(latitude, longitude, float(lat), float(lng))
+                if distance <= radius:
+                    candidates.append((distance, pk))
+            if len(candidates) >= k or radius >= max_radius:
+                return [(pk, distance) for distance, pk in heapq.nsmallest(k, candidates)]
+            radius = min(radius * 4, max_radius)
+
+
+class ExportMixin:
+    """
+    ViewSet mixin for spreadsheet exports with the same filters as the list
+
+        GET export/?file_format=csv|xlsx[&async=true][&<filtros da listagem>]
+
+    `export_columns` lists (campo para values_list, cabeçalho). Up to
+    EXPORT_SYNC_MAX_ROWS rows are answered directly (CSV streamed); larger
+    exports, or async=true, create an ExportJob and return 202
+    (acompanhamento em /api/reports/export-jobs/).
+    """
+    export_resource = None
+    export_columns = []
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        from django.conf import settings
+        from apps.reports.exports import FORMATS, export_response, start_export_job
+        from apps.reports.serializers import ExportJobSerializer
+
+        # ?format= é reservado pelo DRF para a escolha do renderer
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in FORMATS:
+            return Response(
+                {'error': f'file_format deve ser um de {list(FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        run_async = request.query_params.get('async', '').lower() in ('1', 'true')
+        if not run_async:
+            run_async = queryset.count() > getattr(settings, 'EXPORT_SYNC_MAX_ROWS', 50000)
+        if run_async:
+            job = start_export_job(request, self.export_resource, file_format, queryset, self.export_columns)
+            return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        return export_response(queryset, self.export_columns, self.export_resource, file_format)
@@ -269,6 +269,8 @@ class Webhook(BaseModel):
         ('inspection.approved', 'Inspection Approved'),
         ('issue.created', 'Issue Created'),
         ('issue.resolved', 'Issue Resolved'),
+        ('issue.sla_warning', 'Issue SLA Warning'),
+        ('issue.sla_breached', 'Issue SLA Breached'),
         ('report.generated', 'Report Generated'),
         ('workflow.completed', 'Workflow Completed'),
     ]
@@ -386,3 +388,20 @@ class ApiKey(BaseModel):
             import secrets
             self.key = secrets.token_urlsafe(32)
         super().save(*args, **kwargs)
+
+
+class ReferenceSequence(models.Model):
+    """
+    Counter table for human-readable reference numbers (see apps/core/sequences.py)
+    One row per company and prefix; `next_value` is the first number not yet reserved.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='reference_sequences')
+    prefix = models.CharField(max_length=50)
+    next_value = models.BigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['company', 'prefix']
+    
+    def __str__(self):
+        return f"{self.prefix} ({self.company.name}) -> {self.next_value}"
@@ -0,0 +1,21 @@
+"""
+Custom parsers for REST API
+"""
+from rest_framework.parsers import BaseParser
+
+
+class OctetStreamParser(BaseParser):
+    """
+    Raw binary body parser
+    Returns the request stream itself so views can copy it to disk
+    in fixed-size buffers instead of loading the body into memory.
+    """
+    media_type = 'application/offset+octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream
+
+
+class BinaryStreamParser(OctetStreamParser):
+    """Same as OctetStreamParser for plain application/octet-stream bodies"""
+    media_type = 'application/octet-stream'
@@ -17,6 +17,9 @@ class IsSameCompany(permissions.BasePermission):
     User can only access resources from their own company (multi-tenant)
     """
     def has_object_permission(self, request, view, obj):
+        # Compare FK ids when available to avoid loading the company row
+        if hasattr(obj, 'company_id'):
+            return obj.company_id == request.user.company_id
         # Check if object has company attribute
         if hasattr(obj, 'company'):
             return obj.company == request.user.company
@@ -0,0 +1,116 @@
+"""
+Reference number allocation for CargoSnap ICTSI
+Sequential numbers per company and prefix, reserved in blocks from the
+ReferenceSequence table so that most numbers are handed out from memory.
+
+Blocks are only cached when they were reserved in a transaction of their
+own (committed immediately). Inside an outer transaction only the numbers
+actually needed are reserved: if that transaction rolls back, the counter
+rolls back with it and nothing stale is left in memory.
+"""
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from .models import ReferenceSequence
+
+
+class ReferenceAllocator:
+    """Per-process allocator with block reservation"""
+
+    def __init__(self, block_size=None):
+        self._block_size = block_size
+        self._blocks = {}  # (company_id, prefix) -> [next, end)
+        self._lock = threading.Lock()
+
+    @property
+    def block_size(self):
+        return self._block_size or getattr(settings, 'REFERENCE_BLOCK_SIZE', 20)
+
+    def allocate(self, company_id, prefix, count=1):
+        """
+        Reserva `count` números consecutivos ou não (blocos diferentes)
+
+        Returns:
+            Lista de inteiros em ordem crescente
+        """
+        key = (company_id, prefix)
+        numbers = []
+        with self._lock:
+            numbers.extend(self._take_cached(key, count))
+
+        missing = count - len(numbers)
+        if missing:
+            if connection.in_atomic_block:
+                start = self._reserve(company_id, prefix, missing)
+                numbers.extend(range(start, start + missing))
+            else:
+                size = max(missing, self.block_size)
+                with transaction.atomic():
+                    start = self._reserve(company_id, prefix, size)
+                numbers.extend(range(start, start + missing))
+                if size > missing:
+                    with self._lock:
+                        self._blocks[key] = [start + missing, start + size]
+        return numbers
+
+    def reset(self):
+        """Descarta blocos em memória (testes e após restaurar o banco)"""
+        with self._lock:
+            self._blocks.clear()
+
+    def _take_cached(self, key, count):
+        block = self._blocks.get(key)
+        if not block:
+            return []
+        start, end = block
+        taken = min(count, end - start)
+        if start + taken >= end:
+            del self._blocks[key]
+        else:
+            block[0] = start + taken
+        return range(start, start + taken)
+
+    def _reserve(self, company_id, prefix, size):
+        """Avança o contador sob lock de linha e retorna o primeiro número reservado"""
+        sequence = self._locked_sequence(company_id, prefix)
+        start = sequence.next_value
+        sequence.next_value = start + size
+        sequence.save(update_fields=['next_value', 'updated_at'])
+        return start
+
+    def _locked_sequence(self, company_id, prefix):
+        queryset = ReferenceSequence.objects.select_for_update()
+        try:
+            return queryset.get(company_id=company_id, prefix=prefix)
+        except ReferenceSequence.DoesNotExist:
+            pass
+        try:
+            # Outro worker pode criar a mesma linha ao mesmo tempo
+            with transaction.atomic():
+                ReferenceSequence.objects.create(company_id=company_id, prefix=prefix)
+        except IntegrityError:
+            pass
+        return queryset.get(company_id=company_id, prefix=prefix)
+
+
+reference_allocator = ReferenceAllocator()
+
+
+def format_reference(prefix, company_id, number):
+    return f"{prefix}-{company_id}-{number:06d}"
+
+
+def next_reference(company, prefix):
+    """Próximo número de referência (ex.: ICTSI-1-000042)"""
+    number = reference_allocator.allocate(company.pk, prefix)[0]
+    return format_reference(prefix, company.pk, number)
+
+
+def allocate_references(company, prefix, count):
+    """Reserva `count` referências de uma vez (criação em lote)"""
+    return [
+        format_reference(prefix, company.pk, number)
+        for number in reference_allocator.allocate(company.pk, prefix, count)
+    ]
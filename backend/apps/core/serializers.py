@@ -6,6 +6,69 @@ from django.contrib.auth.password_validation import validate_password
 from .models import Company, User, AuditLog, Notification, Webhook, WebhookLog, ApiKey
 
 
+def parse_field_list(value):
+    """Converte 'a,b, c' em {'a', 'b', 'c'}"""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Mixin for ?fields= and ?expand= support (sparse fieldsets)
+
+    The view passes the requested names in the context ('sparse_fields' and
+    'sparse_expand', see SparseFieldsetMixin). Only the top-level serializer
+    is pruned; nested serializers always render their full representation.
+
+    Rules:
+        - neither parameter: every field (unchanged behaviour)
+        - fields=a,b: only a and b
+        - expand=x: nested relations (expandable fields) are only rendered
+          when listed in expand or fields
+
+    Meta options:
+        expandable_fields: nested fields dropped unless expanded
+                           (default: every nested serializer field)
+        sparse_field_sources: {field: [ORM paths]} for fields whose source
+                              cannot be inferred (SerializerMethodField)
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_sparse_root():
+            return fields
+
+        requested = self.context.get('sparse_fields')
+        expand = self.context.get('sparse_expand')
+        if requested is None and expand is None:
+            return fields
+
+        requested = requested or set()
+        expand = expand or set()
+        expandable = self.get_expandable_fields(fields)
+
+        for name in list(fields):
+            if requested and name not in requested and name not in expand:
+                fields.pop(name)
+            elif name in expandable and name not in expand and name not in requested:
+                fields.pop(name)
+        return fields
+
+    def get_expandable_fields(self, fields):
+        declared = getattr(self.Meta, 'expandable_fields', None)
+        if declared is not None:
+            return set(declared)
+        return {
+            name for name, field in fields.items()
+            if isinstance(field, serializers.BaseSerializer)
+        }
+
+    def _is_sparse_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+
 class CompanySerializer(serializers.ModelSerializer):
     """Serializer for Company model"""
     
@@ -0,0 +1,65 @@
+"""
+Background task execution for CargoSnap ICTSI
+Lightweight in-process worker pool used for work that must not block the
+request (photo post-processing, imports, exports, report generation).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Retorna o pool de workers do processo (criado sob demanda)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 4),
+                    thread_name_prefix='bg-task'
+                )
+    return _executor
+
+
+def _run_task(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Erro na tarefa em background {func.__name__}")
+        raise
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Executa uma função no pool de workers
+
+    Com BACKGROUND_TASKS_EAGER=True a função roda de forma síncrona
+    (útil em testes e scripts de manutenção).
+
+    Returns:
+        Future da execução (ou None no modo eager)
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        _run_task(func, args, kwargs)
+        return None
+    return get_executor().submit(_run_task, func, args, kwargs)
+
+
+def run_on_commit(func, *args, **kwargs):
+    """
+    Agenda a função para rodar em background após o commit da transação atual
+
+    Garante que o worker só veja linhas já gravadas no banco.
+    """
+    transaction.on_commit(lambda: run_in_background(func, *args, **kwargs))
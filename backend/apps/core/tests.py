@@ -1,7 +1,7 @@
 """
 Tests for Core app
 """
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from apps.core.models import Company, User
 
 
@@ -56,3 +56,78 @@ class UserModelTest(TestCase):
         self.user.last_name = 'User'
         self.user.save()
         self.assertEqual(self.user.full_name, 'Test User')
+
+
+class ReferenceAllocatorTest(TestCase):
+    """Tests for block-based reference number allocation"""
+
+    def setUp(self):
+        from apps.core.sequences import reference_allocator
+        reference_allocator.reset()
+        self.company = Company.objects.create(name='Alloc Co', slug='alloc', company_type='CLIA')
+
+    def test_numbers_are_unique_and_sequential(self):
+        from apps.core.sequences import ReferenceAllocator
+
+        allocator = ReferenceAllocator(block_size=5)
+        numbers = [allocator.allocate(self.company.pk, 'CLIA')[0] for _ in range(12)]
+        numbers += allocator.allocate(self.company.pk, 'CLIA', count=4)
+        self.assertEqual(numbers, list(range(1, 17)))
+
+    def test_blocks_from_other_processes_do_not_overlap(self):
+        from apps.core.sequences import ReferenceAllocator
+
+        worker_a, worker_b = ReferenceAllocator(block_size=10), ReferenceAllocator(block_size=10)
+        first = worker_a.allocate(self.company.pk, 'CLIA', count=3)
+        second = worker_b.allocate(self.company.pk, 'CLIA', count=3)
+        self.assertFalse(set(first) & set(second))
+
+    def test_prefixes_have_independent_counters(self):
+        from apps.core.sequences import allocate_references
+
+        self.assertEqual(allocate_references(self.company, 'CLIA', 2), [
+            f'CLIA-{self.company.pk}-000001', f'CLIA-{self.company.pk}-000002'
+        ])
+        self.assertEqual(allocate_references(self.company, 'ISS-CLIA', 1), [f'ISS-CLIA-{self.company.pk}-000001'])
+
+
+class ReferenceBlockCacheTest(TransactionTestCase):
+    """Outside a transaction a whole block is reserved and served from memory"""
+
+    def test_block_is_reserved_once(self):
+        from apps.core.models import ReferenceSequence
+        from apps.core.sequences import ReferenceAllocator
+
+        company = Company.objects.create(name='Block Co', slug='block', company_type='ICTSI')
+        allocator = ReferenceAllocator(block_size=5)
+
+        self.assertEqual(allocator.allocate(company.pk, 'ICTSI'), [1])
+        self.assertEqual(ReferenceSequence.objects.get(company=company).next_value, 6)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(allocator.allocate(company.pk, 'ICTSI', count=4), [2, 3, 4, 5])
+
+
+class GeoHelpersTest(TestCase):
+    """Tests for geohash encoding and distance helpers"""
+
+    def test_encode_geohash(self):
+        from apps.core.geo import encode_geohash
+
+        self.assertEqual(encode_geohash(57.64911, 10.40744), 'u4pruydqq')
+        self.assertEqual(encode_geohash('-23.9608', '-46.3336', precision=5), '6gxp9')
+        self.assertEqual(encode_geohash(None, 10), '')
+        self.assertEqual(encode_geohash('abc', '10'), '')
+        self.assertEqual(encode_geohash(0, 0), '')
+
+    def test_haversine_and_bbox(self):
+        from apps.core.geo import bbox_around, haversine_km, parse_bbox
+
+        # Santos -> São Paulo (~55 km)
+        self.assertAlmostEqual(haversine_km(-23.9608, -46.3336, -23.5505, -46.6333), 55, delta=3)
+        south, west, north, east = bbox_around(-23.96, -46.33, 10)
+        self.assertLess(south, -23.96)
+        self.assertGreater(east, -46.33)
+        self.assertEqual(parse_bbox('-24,-47,-23,-46'), (-24.0, -47.0, -23.0, -46.0))
+        with self.assertRaises(ValueError):
+            parse_bbox('-24,-47')
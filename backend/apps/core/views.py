@@ -331,32 +331,23 @@ def password_reset_done_view(request):
 @login_required
 def dashboard_view(request):
     """Dashboard page"""
+    from apps.analytics.dashboard import get_dashboard_stats
     from apps.inspections.models import Inspection
-    from apps.issues.models import Issue
-    from django.db.models import Count
     
     company = request.user.company
     
     # Statistics - Superusers see all data, regular users see only their company's data
+    # (cached, shared with the /api/analytics/analytics/dashboard/ endpoint)
     if request.user.is_superuser:
+        stats, _ = get_dashboard_stats(all_companies=True)
         inspections = Inspection.objects.all()
-        issues = Issue.objects.all()
     else:
+        stats, _ = get_dashboard_stats(company)
         inspections = Inspection.objects.filter(company=company)
-        issues = Issue.objects.filter(company=company)
     
-    stats = {
-        'total_inspections': inspections.count(),
-        'completed_inspections': inspections.filter(status='COMPLETED').count(),
-        'in_progress_inspections': inspections.filter(status='IN_PROGRESS').count(),
-        'draft_inspections': inspections.filter(status='DRAFT').count(),
-        'total_issues': issues.count(),
-        'open_issues': issues.filter(status='OPEN').count(),
-        'resolved_issues': issues.filter(status='RESOLVED').count(),
-    }
-    
-    # Recent inspections
-    recent_inspections = inspections.order_by('-created_at')[:10]
+    # Recent inspections (template needs model instances: status display, assignee)
+    recent_ids = [row['id'] for row in stats['recent_inspections']]
+    recent_inspections = inspections.filter(pk__in=recent_ids).select_related('assigned_to').order_by('-created_at')
     
     context = {
         'stats': stats,
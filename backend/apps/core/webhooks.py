@@ -0,0 +1,89 @@
+"""
+Outgoing webhooks for CargoSnap ICTSI
+Delivers events to the company's active Webhook rows for the event type from
+the background pool (apps/core/tasks.py). Payloads are signed with HMAC-SHA256
+when the webhook has a secret; every attempt is logged in WebhookLog.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.tasks import run_in_background
+from .models import Webhook, WebhookLog
+
+logger = logging.getLogger(__name__)
+
+
+def sign_payload(secret, body):
+    """Assinatura HMAC-SHA256 (hex) do corpo da requisição"""
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def dispatch_event(company_id, event_type, payload):
+    """
+    Agenda a entrega do evento aos webhooks ativos da empresa
+
+    Returns:
+        Número de webhooks acionados
+    """
+    webhook_ids = list(
+        Webhook.objects.filter(company_id=company_id, event_type=event_type, is_active=True)
+        .values_list('id', flat=True)
+    )
+    for webhook_id in webhook_ids:
+        run_in_background(deliver_webhook, webhook_id, event_type, payload)
+    return len(webhook_ids)
+
+
+def deliver_webhook(webhook_id, event_type, payload):
+    """Envia o evento, com novas tentativas se configurado; retorna True em caso de sucesso"""
+    webhook = Webhook.objects.get(pk=webhook_id)
+    data = {'event': event_type, 'sent_at': timezone.now(), 'data': payload}
+    body = json.dumps(data, cls=DjangoJSONEncoder).encode()
+    headers = {'Content-Type': 'application/json', 'X-Webhook-Event': event_type, **webhook.custom_headers}
+    if webhook.secret_key:
+        headers['X-Webhook-Signature'] = sign_payload(webhook.secret_key, body)
+
+    attempts = max(webhook.max_retries, 1) if webhook.retry_on_failure else 1
+    success = False
+    status_code = None
+    for attempt in range(1, attempts + 1):
+        started = time.monotonic()
+        error_message = ''
+        response_body = ''
+        try:
+            response = requests.post(
+                webhook.url, data=body, headers=headers, timeout=getattr(settings, 'WEBHOOK_TIMEOUT', 10)
+            )
+            status_code = response.status_code
+            response_body = response.text[:2000]
+            success = response.ok
+        except requests.RequestException as e:
+            status_code = None
+            error_message = str(e)
+        WebhookLog.objects.create(
+            webhook=webhook, payload=json.loads(body), headers=headers, status_code=status_code,
+            response_body=response_body, response_time_ms=int((time.monotonic() - started) * 1000),
+            success=success, error_message=error_message, attempt_number=attempt,
+        )
+        if success:
+            break
+        logger.warning(f"Webhook {webhook.name} ({event_type}) falhou na tentativa {attempt}: "
+                       f"{error_message or status_code}")
+
+    Webhook.objects.filter(pk=webhook_id).update(
+        total_calls=F('total_calls') + 1,
+        successful_calls=F('successful_calls') + int(success),
+        failed_calls=F('failed_calls') + int(not success),
+        last_called_at=timezone.now(),
+        last_status_code=status_code,
+    )
+    return success
@@ -5,3 +5,6 @@ class InspectionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.inspections'
     verbose_name = 'Inspeções'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,127 @@
+"""
+Structure checklist services for Inspections app
+Expands an InspectionChecklist into StructureInspectionItems with a single
+bulk_create and applies batched item updates under optimistic concurrency
+(every item carries a `version` that the client must send back).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.analytics.rollups import apply_deltas, change_deltas, inspection_companies, item_cell, item_values
+from .structure_models import InspectionChecklist, ChecklistStructure, StructureInspectionItem
+
+# Campos que o PATCH em lote pode alterar
+BULK_UPDATE_FIELDS = [
+    'status', 'damage_type', 'notes', 'measurement_length', 'measurement_width',
+    'measurement_depth', 'location_description', 'severity_override',
+]
+
+
+class VersionConflict(Exception):
+    """Um ou mais itens foram alterados por outra requisição"""
+
+    def __init__(self, conflicts):
+        super().__init__('Itens alterados por outro usuário')
+        self.conflicts = conflicts
+
+
+def default_checklist(company, container_type=None):
+    """Checklist padrão ativo da empresa (preferindo o tipo de container informado)"""
+    checklists = InspectionChecklist.objects.filter(company=company, is_active=True, is_default=True)
+    if container_type:
+        checklist = checklists.filter(container_type=container_type).first()
+        if checklist:
+            return checklist
+    return checklists.filter(container_type='ALL').first() or checklists.first()
+
+
+@transaction.atomic
+def materialize_checklist(inspection, checklist):
+    """
+    Cria os itens de inspeção de todas as estruturas do checklist
+
+    Estruturas que já têm item na inspeção são mantidas (a operação pode ser
+    repetida sem duplicar itens).
+
+    Returns:
+        Tupla (itens criados, número de estruturas que já tinham item)
+    """
+    structure_ids = list(
+        ChecklistStructure.objects.filter(checklist=checklist, structure__is_active=True)
+        .order_by('sequence', 'structure__sequence')
+        .values_list('structure_id', flat=True)
+    )
+    existing = set(
+        StructureInspectionItem.objects.filter(
+            inspection=inspection, structure_id__in=structure_ids
+        ).order_by().values_list('structure_id', flat=True)
+    )
+
+    items = StructureInspectionItem.objects.bulk_create([
+        StructureInspectionItem(inspection=inspection, structure_id=structure_id)
+        for structure_id in structure_ids if structure_id not in existing
+    ])
+    if items:
+        InspectionChecklist.objects.filter(pk=checklist.pk).update(usage_count=F('usage_count') + 1)
+    return items, len(existing)
+
+
+@transaction.atomic
+def bulk_update_items(queryset, updates, user):
+    """
+    Atualiza vários itens em uma transação
+
+    Args:
+        queryset: Itens que o usuário pode alterar (escopo da empresa)
+        updates: Lista de dicts validados com 'id', 'version' e campos de BULK_UPDATE_FIELDS
+        user: Usuário que registra a inspeção dos itens
+
+    Returns:
+        Lista de itens atualizados (na ordem de updates)
+
+    Raises:
+        StructureInspectionItem.DoesNotExist: algum id fora do escopo
+        VersionConflict: algum item mudou desde a leitura (nada é gravado)
+    """
+    ids = [update['id'] for update in updates]
+    items = {item.pk: item for item in queryset.select_for_update().filter(pk__in=ids)}
+    missing = [item_id for item_id in ids if item_id not in items]
+    if missing:
+        raise StructureInspectionItem.DoesNotExist(f'Itens não encontrados: {missing}')
+
+    conflicts = [
+        {'id': update['id'], 'version': update['version'], 'current_version': items[update['id']].version}
+        for update in updates if items[update['id']].version != update['version']
+    ]
+    if conflicts:
+        raise VersionConflict(conflicts)
+
+    # bulk_update não dispara sinais: os rollups de avarias são ajustados aqui
+    companies = inspection_companies(item.inspection_id for item in items.values())
+    old_cells = {pk: item_cell(companies[item.inspection_id], item_values(item)) for pk, item in items.items()}
+
+    now = timezone.now()
+    changed_fields = {'version', 'updated_at'}
+    for update in updates:
+        item = items[update['id']]
+        for field in BULK_UPDATE_FIELDS:
+            if field in update:
+                setattr(item, field, update[field])
+                changed_fields.add(field)
+        if 'status' in update:
+            item.inspected_by = user
+            item.inspected_at = now
+            changed_fields.update({'inspected_by', 'inspected_at'})
+        item.version += 1
+        item.updated_at = now
+
+    StructureInspectionItem.objects.bulk_update(list(items.values()), sorted(changed_fields))
+
+    deltas = Counter()
+    for pk, item in items.items():
+        deltas.update(change_deltas(old_cells[pk], item_cell(companies[item.inspection_id], item_values(item))))
+    apply_deltas(deltas)
+    return [items[item_id] for item_id in ids]
@@ -0,0 +1,55 @@
+"""
+Denormalized related-object counters for Inspection
+Counters are incremented with F() expressions (atomic in the database) when
+photos, videos, documents, comments and issues are created, deleted or moved
+to another inspection (signals.py), so the summary endpoint and list views
+never need COUNT queries. Inspection.save() leaves them out of full saves of
+loaded instances, so a stale instance does not overwrite newer increments.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Inspection
+
+# Contador -> (app_label.Model, campo FK para Inspection)
+COUNTER_SOURCES = {
+    'photo_count': ('inspections.InspectionPhoto', 'inspection'),
+    'video_count': ('inspections.InspectionVideo', 'inspection'),
+    'document_count': ('inspections.InspectionDocument', 'inspection'),
+    'comment_count': ('inspections.InspectionComment', 'inspection'),
+    'issue_count': ('issues.Issue', 'inspection'),
+}
+
+
+def adjust_counters(inspection_id, **deltas):
+    """
+    Soma deltas aos contadores de uma inspeção
+
+    Exemplo: adjust_counters(inspection.id, photo_count=3)
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not inspection_id or not deltas:
+        return
+    Inspection.objects.filter(pk=inspection_id).update(**{
+        field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()
+    })
+
+
+def reconcile_counters(queryset=None):
+    """
+    Recalcula os contadores a partir das tabelas relacionadas
+
+    Returns:
+        Número de inspeções atualizadas
+    """
+    from django.apps import apps
+
+    queryset = queryset if queryset is not None else Inspection.objects.all()
+    annotations = {}
+    for field, (model_label, fk_name) in COUNTER_SOURCES.items():
+        model = apps.get_model(model_label)
+        counts = model.objects.filter(**{fk_name: OuterRef('pk')}).order_by().values(fk_name).annotate(
+            total=Count('pk')
+        ).values('total')
+        annotations[field] = Coalesce(Subquery(counts), Value(0))
+    return queryset.update(**annotations)
@@ -0,0 +1,258 @@
+"""
+Near-duplicate photo detection for Inspections app
+Perceptual hashes (dHash, 64 bits) of InspectionPhoto and CargoSnapUpload
+images are kept in an in-memory BK-tree so that Hamming-distance lookups do
+not need to scan every hash in the database.
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+from django.conf import settings
+
+from apps.cargosnap_integration.models import CargoSnapUpload
+from .models import Inspection, InspectionPhoto
+
+logger = logging.getLogger(__name__)
+
+PHOTO = 'photo'
+CARGOSNAP_UPLOAD = 'cargosnap_upload'
+
+
+def compute_dhash(image, hash_size=8):
+    """
+    Calcula o difference hash (dHash) de uma imagem PIL
+
+    Returns:
+        Hash em hexadecimal (16 caracteres para hash_size=8)
+    """
+    gray = ImageOps.exif_transpose(image).convert('L').resize(
+        (hash_size + 1, hash_size), Image.LANCZOS
+    )
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f'{value:0{hash_size * hash_size // 4}x}'
+
+
+def hash_image_file(path):
+    """Calcula o dHash de um arquivo de imagem em disco (ou file-like)"""
+    with Image.open(path) as image:
+        return compute_dhash(image)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    BK-tree sobre distância de Hamming
+
+    Cada nó guarda um hash e os itens com exatamente esse hash; os filhos são
+    indexados pela distância até o nó, o que permite podar a busca pela
+    desigualdade triangular.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, hash_value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = (hash_value, [item], {})
+            return
+
+        node = self.root
+        while True:
+            node_hash, items, children = node
+            distance = hamming_distance(hash_value, node_hash)
+            if distance == 0:
+                items.append(item)
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (hash_value, [item], {})
+                return
+            node = child
+
+    def search(self, hash_value, max_distance):
+        """Retorna [(distância, item)] com distância <= max_distance"""
+        if self.root is None:
+            return []
+
+        results = []
+        stack = [self.root]
+        while stack:
+            node_hash, items, children = stack.pop()
+            distance = hamming_distance(hash_value, node_hash)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in items)
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class PerceptualHashIndex:
+    """
+    Índice de hashes do processo
+
+    Construído a partir do banco no primeiro uso e atualizado de forma
+    incremental quando este processo calcula novos hashes. Como outros
+    processos também gravam hashes, o índice é reconstruído após
+    PHOTO_HASH_INDEX_TTL segundos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tree = None
+        self._built_at = 0
+
+    def ensure_built(self):
+        ttl = getattr(settings, 'PHOTO_HASH_INDEX_TTL', 300)
+        with self._lock:
+            if self._tree is None or time.monotonic() - self._built_at > ttl:
+                self._tree = self._build()
+                self._built_at = time.monotonic()
+            return self._tree
+
+    def invalidate(self):
+        with self._lock:
+            self._tree = None
+
+    def add(self, kind, object_id, hash_hex):
+        if not hash_hex:
+            return
+        with self._lock:
+            if self._tree is not None:
+                self._tree.add(int(hash_hex, 16), (kind, object_id))
+
+    def search(self, hash_hex, max_distance):
+        """Retorna [(distância, (tipo, id))] próximos do hash"""
+        tree = self.ensure_built()
+        with self._lock:
+            return tree.search(int(hash_hex, 16), max_distance)
+
+    def _build(self):
+        tree = BKTree()
+        for object_id, hash_hex in InspectionPhoto.objects.exclude(
+            perceptual_hash=''
+        ).values_list('id', 'perceptual_hash').iterator():
+            tree.add(int(hash_hex, 16), (PHOTO, object_id))
+        for object_id, hash_hex in CargoSnapUpload.objects.exclude(
+            perceptual_hash=''
+        ).values_list('id', 'perceptual_hash').iterator():
+            tree.add(int(hash_hex, 16), (CARGOSNAP_UPLOAD, object_id))
+        logger.info(f"Índice de hashes perceptuais construído com {len(tree)} imagens")
+        return tree
+
+
+hash_index = PerceptualHashIndex()
+
+
+def default_max_distance():
+    return getattr(settings, 'PHOTO_DUPLICATE_MAX_DISTANCE', 6)
+
+
+def update_upload_hash(upload):
+    """
+    Calcula e grava o hash da imagem local de um CargoSnapUpload
+
+    Returns:
+        Hash calculado (ou '' se a imagem não está disponível)
+    """
+    if not upload.local_image_path:
+        return ''
+    try:
+        hash_hex = hash_image_file(Path(settings.MEDIA_ROOT) / upload.local_image_path)
+    except Exception as e:
+        logger.warning(f"Não foi possível calcular hash do upload {upload.cargosnap_id}: {str(e)}")
+        return ''
+
+    if hash_hex != upload.perceptual_hash:
+        upload.perceptual_hash = hash_hex
+        CargoSnapUpload.objects.filter(pk=upload.pk).update(perceptual_hash=hash_hex)
+        hash_index.add(CARGOSNAP_UPLOAD, upload.pk, hash_hex)
+    return hash_hex
+
+
+def company_uploads(company):
+    """Uploads CargoSnap dos arquivos vinculados a inspeções da empresa"""
+    return CargoSnapUpload.objects.filter(
+        file_id__in=Inspection.objects.filter(company=company).values('cargosnap_file_id')
+    )
+
+
+def find_near_duplicates(sources, company, max_distance=None):
+    """
+    Busca quase-duplicatas para uma lista de imagens
+
+    Args:
+        sources: Lista de tuplas (tipo, id, hash)
+        company: Empresa do usuário (fotos e uploads de outras empresas são ignorados)
+        max_distance: Distância de Hamming máxima
+
+    Returns:
+        Lista de dicts {'type', 'id', 'matches': [...]} apenas para fontes com matches
+    """
+    if max_distance is None:
+        max_distance = default_max_distance()
+
+    candidates = {}
+    for kind, object_id, hash_hex in sources:
+        if not hash_hex:
+            continue
+        matches = [
+            (distance, item) for distance, item in hash_index.search(hash_hex, max_distance)
+            if item != (kind, object_id)
+        ]
+        if matches:
+            candidates[(kind, object_id)] = matches
+
+    # Uma consulta por tipo para descrever os matches (e descartar itens removidos)
+    photo_ids = {i for matches in candidates.values() for _, (k, i) in matches if k == PHOTO}
+    upload_ids = {i for matches in candidates.values() for _, (k, i) in matches if k == CARGOSNAP_UPLOAD}
+    photos = {
+        row['id']: row for row in InspectionPhoto.objects.filter(
+            id__in=photo_ids, inspection__company=company
+        ).values('id', 'inspection_id', 'inspection__reference_number', 'title')
+    }
+    uploads = {
+        row['id']: row for row in company_uploads(company).filter(
+            id__in=upload_ids
+        ).values('id', 'cargosnap_id', 'file__scan_code')
+    }
+
+    results = []
+    for (kind, object_id), matches in candidates.items():
+        described = []
+        for distance, (match_kind, match_id) in matches:
+            if match_kind == PHOTO and match_id in photos:
+                row = photos[match_id]
+                described.append({
+                    'type': PHOTO, 'id': match_id, 'distance': distance,
+                    'inspection': row['inspection_id'],
+                    'reference_number': row['inspection__reference_number'],
+                    'title': row['title'],
+                })
+            elif match_kind == CARGOSNAP_UPLOAD and match_id in uploads:
+                row = uploads[match_id]
+                described.append({
+                    'type': CARGOSNAP_UPLOAD, 'id': match_id, 'distance': distance,
+                    'cargosnap_id': row['cargosnap_id'],
+                    'container': row['file__scan_code'],
+                })
+        if described:
+            results.append({'type': kind, 'id': object_id, 'matches': described})
+    return results
@@ -0,0 +1,46 @@
+"""
+Management command to backfill perceptual hashes used for duplicate detection
+Usage: python manage.py build_photo_hashes [--force]
+"""
+from django.core.management.base import BaseCommand
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.inspections.duplicates import hash_image_file, hash_index, update_upload_hash
+from apps.inspections.models import InspectionPhoto
+
+
+class Command(BaseCommand):
+    help = 'Calcula hashes perceptuais de fotos de inspeção e uploads CargoSnap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Recalcula hashes já existentes')
+
+    def handle(self, *args, **options):
+        photos = InspectionPhoto.objects.all()
+        uploads = CargoSnapUpload.objects.filter(image_downloaded=True)
+        if not options['force']:
+            photos = photos.filter(perceptual_hash='')
+            uploads = uploads.filter(perceptual_hash='')
+
+        photo_count = failed = 0
+        for photo in photos.only('id', 'photo').iterator():
+            try:
+                with photo.photo.open('rb') as source:
+                    hash_hex = hash_image_file(source)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Foto {photo.id}: {str(e)}'))
+                continue
+            InspectionPhoto.objects.filter(pk=photo.pk).update(perceptual_hash=hash_hex)
+            photo_count += 1
+
+        upload_count = 0
+        for upload in uploads.only('id', 'cargosnap_id', 'local_image_path', 'perceptual_hash').iterator():
+            if update_upload_hash(upload):
+                upload_count += 1
+            else:
+                failed += 1
+
+        hash_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Fotos: {photo_count} | Uploads CargoSnap: {upload_count} | Falhas: {failed}'
+        ))
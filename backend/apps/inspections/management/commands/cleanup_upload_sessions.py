@@ -0,0 +1,17 @@
+"""
+Management command to garbage-collect stale resumable photo uploads
+Usage: python manage.py cleanup_upload_sessions
+"""
+from django.core.management.base import BaseCommand
+from apps.inspections.services import ChunkedUploadService
+
+
+class Command(BaseCommand):
+    help = 'Remove sessões de upload em partes expiradas e arquivos temporários órfãos'
+
+    def handle(self, *args, **options):
+        stats = ChunkedUploadService().cleanup_stale()
+        self.stdout.write(self.style.SUCCESS(
+            f"Sessões expiradas: {stats['expired_sessions']} | "
+            f"Arquivos órfãos removidos: {stats['orphan_files']}"
+        ))
@@ -0,0 +1,30 @@
+"""
+Management command to (re)run photo post-processing
+Usage: python manage.py process_photos [--all] [--failed]
+"""
+from django.core.management.base import BaseCommand
+from apps.inspections.models import InspectionPhoto
+from apps.inspections.photo_processing import process_photo
+
+
+class Command(BaseCommand):
+    help = 'Processa fotos pendentes (orientação, miniatura, EXIF, GPS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reprocessa todas as fotos')
+        parser.add_argument('--failed', action='store_true', help='Inclui fotos com falha anterior')
+
+    def handle(self, *args, **options):
+        photos = InspectionPhoto.objects.all()
+        if not options['all']:
+            statuses = ['PENDING', 'FAILED'] if options['failed'] else ['PENDING']
+            photos = photos.filter(processing_status__in=statuses)
+
+        processed = failed = 0
+        for photo_id in photos.values_list('id', flat=True).iterator():
+            if process_photo(photo_id):
+                processed += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Fotos processadas: {processed} | Falhas: {failed}'))
@@ -0,0 +1,22 @@
+"""
+Management command to recompute denormalized Inspection counters
+Usage: python manage.py reconcile_inspection_counters [--company <slug>]
+"""
+from django.core.management.base import BaseCommand
+from apps.inspections.counters import reconcile_counters
+from apps.inspections.models import Inspection
+
+
+class Command(BaseCommand):
+    help = 'Recalcula contadores de fotos, vídeos, documentos, comentários e ocorrências das inspeções'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='Slug da empresa (padrão: todas)')
+
+    def handle(self, *args, **options):
+        queryset = Inspection.objects.all()
+        if options['company']:
+            queryset = queryset.filter(company__slug=options['company'])
+
+        updated = reconcile_counters(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados para {updated} inspeções'))
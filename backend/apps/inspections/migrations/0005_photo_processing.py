@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0004_photo_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='exif_data',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='processing_status',
+            field=models.CharField(choices=[('PENDING', 'Pendente'), ('DONE', 'Processada'), ('FAILED', 'Falhou')], default='PENDING', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
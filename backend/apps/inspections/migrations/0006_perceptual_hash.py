@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0005_photo_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=16),
+        ),
+    ]
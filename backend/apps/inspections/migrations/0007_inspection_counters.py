@@ -0,0 +1,63 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+COUNTER_SOURCES = {
+    'photo_count': ('inspections', 'InspectionPhoto'),
+    'video_count': ('inspections', 'InspectionVideo'),
+    'document_count': ('inspections', 'InspectionDocument'),
+    'comment_count': ('inspections', 'InspectionComment'),
+    'issue_count': ('issues', 'Issue'),
+}
+
+
+def backfill_counters(apps, schema_editor):
+    Inspection = apps.get_model('inspections', 'Inspection')
+    annotations = {}
+    for field, (app_label, model_name) in COUNTER_SOURCES.items():
+        model = apps.get_model(app_label, model_name)
+        counts = model.objects.filter(inspection=OuterRef('pk')).order_by().values('inspection').annotate(
+            total=Count('pk')
+        ).values('total')
+        annotations[field] = Coalesce(Subquery(counts), Value(0))
+    Inspection.objects.update(**annotations)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0006_perceptual_hash'),
+        ('issues', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspection',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='document_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='issue_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='photo_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
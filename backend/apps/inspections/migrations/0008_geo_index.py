@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargosnap_integration', '0003_geo_index'),
+        ('inspections', '0007_inspection_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='inspectionphoto',
+            index=models.Index(fields=['latitude', 'longitude'], name='inspections_latitud_d05f48_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0008_geo_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='structureinspectionitem',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -2,8 +2,11 @@
 Models for Inspections app
 Complete inspection system with photos, videos, forms, and documentation
 """
+import uuid
+
 from django.db import models
 from django.core.validators import FileExtensionValidator
+from apps.core.geo import encode_geohash, expand_update_fields
 from apps.core.models import User, Company, BaseModel
 
 
@@ -98,6 +101,15 @@ class Inspection(BaseModel):
         help_text='Indica se esta inspeção foi importada do CargoSnap'
     )
     
+    # Denormalized counters (maintained by apps/inspections/counters.py)
+    photo_count = models.PositiveIntegerField(default=0)
+    video_count = models.PositiveIntegerField(default=0)
+    document_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    issue_count = models.PositiveIntegerField(default=0)
+    
+    COUNTER_FIELDS = ['photo_count', 'video_count', 'document_count', 'comment_count', 'issue_count']
+    
     # Additional data (JSON for flexibility)
     custom_fields = models.JSONField(default=dict, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
@@ -116,9 +128,15 @@ class Inspection(BaseModel):
     def save(self, *args, **kwargs):
         # Auto-generate reference number if not provided
         if not self.reference_number:
-            from django.utils import timezone
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            self.reference_number = f"{self.company.company_type}-{timestamp}"
+            from apps.core.sequences import next_reference
+            self.reference_number = next_reference(self.company, self.company.company_type)
+        # Os contadores só mudam via F() (counters.py): um save() completo de uma
+        # instância carregada antes não pode sobrescrevê-los com valores antigos
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
 
 
@@ -130,6 +148,12 @@ class InspectionPhoto(BaseModel):
         ('CARGOSNAP', 'CargoSnap'),
     ]
     
+    PROCESSING_STATUS_CHOICES = [
+        ('PENDING', 'Pendente'),
+        ('DONE', 'Processada'),
+        ('FAILED', 'Falhou'),
+    ]
+    
     inspection = models.ForeignKey(Inspection, on_delete=models.CASCADE, related_name='photos')
     
     # File information
@@ -146,7 +170,16 @@ class InspectionPhoto(BaseModel):
     taken_at = models.DateTimeField(auto_now_add=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)  # Derived from latitude/longitude
     device_info = models.JSONField(default=dict, blank=True)  # Camera, phone model, etc.
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    exif_data = models.JSONField(default=dict, blank=True)  # Subset of EXIF tags kept after processing
+    perceptual_hash = models.CharField(max_length=16, blank=True, db_index=True)  # dHash (hex) for near-duplicate detection
+    
+    # Post-processing (orientation, thumbnail, EXIF extraction)
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES, default='PENDING')
+    processed_at = models.DateTimeField(null=True, blank=True)
     
     # CargoSnap Integration
     cargosnap_upload = models.ForeignKey(
@@ -162,11 +195,69 @@ class InspectionPhoto(BaseModel):
     sequence_number = models.IntegerField(default=0)
     is_cover_photo = models.BooleanField(default=False)
     
+    GEO_DERIVED_FIELDS = ['geohash']
+    
     class Meta:
         ordering = ['sequence_number', 'created_at']
+        indexes = [
+            models.Index(fields=['latitude', 'longitude']),
+        ]
     
     def __str__(self):
         return f"Photo {self.sequence_number} - {self.inspection.reference_number}"
+    
+    def refresh_coordinates(self):
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+    
+    def save(self, *args, **kwargs):
+        self.refresh_coordinates()
+        expand_update_fields(kwargs, ['latitude', 'longitude'], self.GEO_DERIVED_FIELDS)
+        super().save(*args, **kwargs)
+
+
+class PhotoUploadSession(BaseModel):
+    """
+    Resumable (chunked) photo upload session used by mobile inspectors.
+    Chunks are appended to a temporary file until `offset` reaches `total_size`,
+    then the session is finalized into an InspectionPhoto.
+    """
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Em Andamento'),
+        ('COMPLETED', 'Concluído'),
+        ('EXPIRED', 'Expirado'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    inspection = models.ForeignKey(Inspection, on_delete=models.CASCADE, related_name='upload_sessions')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='photo_upload_sessions')
+
+    # File information
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    temp_path = models.CharField(max_length=500)
+
+    # Photo metadata captured when the session was created
+    metadata = models.JSONField(default=dict, blank=True)
+
+    # Status
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    expires_at = models.DateTimeField()
+    photo = models.ForeignKey(InspectionPhoto, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_sessions')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.id} - {self.filename} ({self.offset}/{self.total_size})"
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.total_size
 
 
 class InspectionVideo(BaseModel):
@@ -0,0 +1,200 @@
+"""
+Photo post-processing for Inspections app
+Runs in the background worker pool after the upload request has returned:
+normalizes orientation, strips (or retains) EXIF, generates the thumbnail,
+computes the perceptual hash and copies GPS, capture time and dimensions
+into InspectionPhoto.
+"""
+import logging
+import os
+from datetime import datetime
+from io import BytesIO
+
+from PIL import Image, ImageOps, ExifTags
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from apps.core.tasks import run_on_commit
+from .duplicates import PHOTO, compute_dhash, hash_index
+from .models import InspectionPhoto
+
+logger = logging.getLogger(__name__)
+
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+ORIENTATION_TAG = 0x0112
+
+# Tags copiadas para InspectionPhoto.exif_data (o resto é descartado)
+KEPT_EXIF_TAGS = ('Make', 'Model', 'Software', 'DateTimeOriginal', 'ExposureTime',
+                  'FNumber', 'ISOSpeedRatings', 'FocalLength', 'LensModel')
+
+
+def schedule_photo_processing(photo_ids):
+    """Agenda o pós-processamento das fotos para depois do commit"""
+    photo_ids = [photo_id for photo_id in photo_ids if photo_id]
+    if photo_ids:
+        run_on_commit(process_photos, photo_ids)
+
+
+def process_photos(photo_ids):
+    """Processa uma lista de fotos (usado pelo worker)"""
+    for photo_id in photo_ids:
+        process_photo(photo_id)
+
+
+def process_photo(photo_id):
+    """
+    Processa uma foto já gravada
+
+    Falhas são registradas em processing_status e não propagam: a foto
+    original continua disponível mesmo que o processamento falhe.
+
+    Returns:
+        True se a foto foi processada com sucesso
+    """
+    try:
+        photo = InspectionPhoto.objects.get(pk=photo_id)
+    except InspectionPhoto.DoesNotExist:
+        return False
+
+    try:
+        with photo.photo.open('rb') as source:
+            image = Image.open(source)
+            image.load()
+        _apply_processing(photo, image)
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao processar foto {photo_id}: {str(e)}")
+        InspectionPhoto.objects.filter(pk=photo_id).update(
+            processing_status='FAILED', processed_at=timezone.now()
+        )
+        return False
+
+
+def _apply_processing(photo, image):
+    exif = image.getexif()
+    orientation = exif.get(ORIENTATION_TAG, 1)
+    retain_exif = getattr(settings, 'PHOTO_RETAIN_EXIF', False)
+    update_fields = ['width', 'height', 'exif_data', 'perceptual_hash', 'thumbnail',
+                     'processing_status', 'processed_at', 'updated_at']
+
+    exif_data = extract_exif(exif)
+    gps = extract_gps(exif)
+    captured_at = parse_exif_datetime(exif_data.get('DateTimeOriginal') or exif.get(0x0132))
+
+    normalized = ImageOps.exif_transpose(image)
+    if orientation != 1 or (len(exif) and not retain_exif):
+        _replace_original(photo, normalized, image.format, exif if retain_exif else None)
+        update_fields.append('photo')
+
+    photo.width, photo.height = normalized.size
+    photo.exif_data = exif_data
+    photo.perceptual_hash = compute_dhash(normalized)
+
+    # Coordenadas enviadas pelo dispositivo têm prioridade sobre o EXIF
+    if gps and photo.latitude is None and photo.longitude is None:
+        photo.latitude, photo.longitude = gps
+        update_fields += ['latitude', 'longitude']
+    if captured_at:
+        photo.taken_at = captured_at
+        update_fields.append('taken_at')
+
+    _build_thumbnail(photo, normalized)
+    photo.processing_status = 'DONE'
+    photo.processed_at = timezone.now()
+    photo.save(update_fields=update_fields)
+    hash_index.add(PHOTO, photo.pk, photo.perceptual_hash)
+
+
+def _replace_original(photo, image, image_format, exif=None):
+    """Regrava o arquivo original já rotacionado (e sem EXIF, se configurado)"""
+    image_format = image_format or 'JPEG'
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    save_kwargs = {'format': image_format}
+    if image_format == 'JPEG':
+        save_kwargs['quality'] = 90
+    if exif is not None:
+        exif[ORIENTATION_TAG] = 1
+        save_kwargs['exif'] = exif.tobytes()
+
+    buffer = BytesIO()
+    image.save(buffer, **save_kwargs)
+
+    old_name = photo.photo.name
+    photo.photo.save(os.path.basename(old_name), ContentFile(buffer.getvalue()), save=False)
+    if photo.photo.name != old_name:
+        photo.photo.storage.delete(old_name)
+
+
+def _build_thumbnail(photo, image):
+    thumb = image.copy()
+    if thumb.mode not in ('RGB', 'L'):
+        thumb = thumb.convert('RGB')
+    thumb.thumbnail(getattr(settings, 'PHOTO_THUMBNAIL_SIZE', (400, 400)))
+
+    buffer = BytesIO()
+    thumb.save(buffer, format='JPEG', quality=85)
+
+    if photo.thumbnail:
+        photo.thumbnail.storage.delete(photo.thumbnail.name)
+    base_name = os.path.splitext(os.path.basename(photo.photo.name))[0]
+    photo.thumbnail.save(f'{base_name}_thumb.jpg', ContentFile(buffer.getvalue()), save=False)
+
+
+def extract_exif(exif):
+    """Retorna as tags EXIF relevantes como dict serializável em JSON"""
+    tags = dict(exif)
+    tags.update(exif.get_ifd(EXIF_IFD_POINTER))
+
+    data = {}
+    for tag_id, value in tags.items():
+        name = ExifTags.TAGS.get(tag_id)
+        if name not in KEPT_EXIF_TAGS:
+            continue
+        if isinstance(value, bytes):
+            value = value.decode(errors='ignore').strip('\x00')
+        elif not isinstance(value, (str, int)):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = str(value)
+        data[name] = value
+    return data
+
+
+def extract_gps(exif):
+    """
+    Extrai latitude/longitude em graus decimais do bloco GPS do EXIF
+
+    Returns:
+        Tupla (latitude, longitude) ou None
+    """
+    gps = exif.get_ifd(GPS_IFD_POINTER)
+    try:
+        latitude = _dms_to_degrees(gps[2], gps[1])
+        longitude = _dms_to_degrees(gps[4], gps[3])
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+    return round(latitude, 6), round(longitude, 6)
+
+
+def _dms_to_degrees(dms, ref):
+    degrees, minutes, seconds = (float(value) for value in dms)
+    value = degrees + minutes / 60 + seconds / 3600
+    if ref in ('S', 'W', b'S', b'W'):
+        value = -value
+    return value
+
+
+def parse_exif_datetime(value):
+    """Converte 'YYYY:MM:DD HH:MM:SS' do EXIF para datetime com timezone"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed)
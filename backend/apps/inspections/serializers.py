@@ -2,10 +2,12 @@
 Serializers for Inspections app
 """
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetSerializerMixin
 from .models import (
     InspectionType, Inspection, InspectionPhoto, InspectionVideo,
     InspectionDocument, InspectionTag, InspectionTagRelation,
-    InspectionSignature, InspectionComment, ScannedReference
+    InspectionSignature, InspectionComment, ScannedReference,
+    PhotoUploadSession
 )
 from .structure_models import (
     ContainerStructure, DamageType, StructureInspectionItem,
@@ -20,15 +22,25 @@ class InspectionTypeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class InspectionPhotoSerializer(serializers.ModelSerializer):
+class InspectionPhotoSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = InspectionPhoto
         fields = [
             'id', 'inspection', 'photo', 'thumbnail', 'title', 'description', 'caption',
             'taken_at', 'latitude', 'longitude', 'device_info', 'sequence_number', 
-            'is_cover_photo', 'created_at'
+            'is_cover_photo', 'width', 'height', 'processing_status', 'created_at'
         ]
-        read_only_fields = ['taken_at', 'created_at']
+        read_only_fields = ['taken_at', 'width', 'height', 'processing_status', 'created_at']
+
+
+class PhotoUploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PhotoUploadSession
+        fields = [
+            'id', 'inspection', 'filename', 'content_type', 'total_size', 'offset',
+            'status', 'expires_at', 'photo', 'created_at'
+        ]
+        read_only_fields = fields
 
 
 class InspectionVideoSerializer(serializers.ModelSerializer):
@@ -95,13 +107,12 @@ class ScannedReferenceSerializer(serializers.ModelSerializer):
         read_only_fields = ['scanned_at', 'scanned_by']
 
 
-class InspectionListSerializer(serializers.ModelSerializer):
+class InspectionListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Lightweight serializer for list views"""
     company_name = serializers.CharField(source='company.name', read_only=True)
     inspection_type_name = serializers.CharField(source='inspection_type.name', read_only=True)
     assigned_to_name = serializers.CharField(source='assigned_to.full_name', read_only=True)
     inspector_name = serializers.CharField(source='inspector.full_name', read_only=True)
-    photo_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Inspection
@@ -111,15 +122,16 @@ class InspectionListSerializer(serializers.ModelSerializer):
             'assigned_to', 'assigned_to_name', 'inspector', 'inspector_name',
             'location', 'scheduled_date', 'started_at', 'completed_at',
             'customer_name', 'container_number', 'seal_number', 'vehicle_plate',
-            'photo_count', 'created_at'
+            'photo_count', 'video_count', 'document_count', 'comment_count', 'issue_count',
+            'created_at'
+        ]
+        read_only_fields = [
+            'reference_number', 'photo_count', 'video_count', 'document_count',
+            'comment_count', 'issue_count', 'created_at'
         ]
-        read_only_fields = ['reference_number', 'created_at']
-    
-    def get_photo_count(self, obj):
-        return obj.photos.count()
 
 
-class InspectionDetailSerializer(serializers.ModelSerializer):
+class InspectionDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Complete serializer for detail views"""
     company_name = serializers.CharField(source='company.name', read_only=True)
     inspection_type_name = serializers.CharField(source='inspection_type.name', read_only=True)
@@ -210,9 +222,32 @@ class StructureInspectionItemSerializer(serializers.ModelSerializer):
             'measurement_length', 'measurement_width', 'measurement_depth',
             'location_description', 'has_photo', 'photo_count',
             'inspected_by', 'inspected_by_name', 'inspected_at',
-            'severity_override', 'final_severity', 'created_at'
+            'severity_override', 'final_severity', 'version', 'created_at'
         ]
-        read_only_fields = ['inspected_by', 'inspected_at', 'final_severity', 'created_at']
+        read_only_fields = ['inspected_by', 'inspected_at', 'final_severity', 'version', 'created_at']
+
+
+class StructureInspectionItemBulkUpdateSerializer(serializers.ModelSerializer):
+    """Uma entrada do PATCH em lote: id + version lida pelo cliente + campos alterados"""
+    id = serializers.IntegerField()
+    version = serializers.IntegerField(min_value=1)
+    
+    class Meta:
+        model = StructureInspectionItem
+        fields = [
+            'id', 'version', 'status', 'damage_type', 'notes',
+            'measurement_length', 'measurement_width', 'measurement_depth',
+            'location_description', 'severity_override'
+        ]
+        extra_kwargs = {
+            field: {'required': False} for field in fields if field not in ('id', 'version')
+        }
+    
+    def validate_damage_type(self, value):
+        company_id = self.context['request'].user.company_id
+        if value is not None and value.company_id != company_id:
+            raise serializers.ValidationError('Tipo de avaria de outra empresa')
+        return value
 
 
 class ChecklistStructureSerializer(serializers.ModelSerializer):
@@ -0,0 +1,313 @@
+"""
+Services for Inspections app
+Photo ingestion helpers shared by the mobile upload endpoints
+"""
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import models, transaction
+from django.utils import timezone
+
+from .counters import adjust_counters
+from .models import Inspection, InspectionPhoto, PhotoUploadSession
+from .photo_processing import schedule_photo_processing
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    """Erro de protocolo no upload (offset inválido, sessão expirada, etc.)"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_coordinate(value):
+    """Converte coordenada recebida do mobile para float (ou None)"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def build_mobile_metadata(data, user_agent=''):
+    """
+    Extrai os metadados de uma foto mobile a partir dos dados do request
+
+    Usado tanto pelo upload simples quanto pelo upload em partes, para que
+    as duas rotas gravem exatamente os mesmos campos.
+    """
+    return {
+        'title': data.get('title', ''),
+        'description': data.get('description', ''),
+        'latitude': data.get('latitude'),
+        'longitude': data.get('longitude'),
+        'device_info': {
+            'source': 'mobile_camera',
+            'model': data.get('device_model', ''),
+            'os': data.get('device_os', ''),
+            'user_agent': user_agent,
+            'uploaded_at': timezone.now().isoformat(),
+        },
+    }
+
+
+def next_photo_sequence(inspection):
+    """
+    Reserva o próximo número de sequência para fotos da inspeção
+
+    Deve ser chamado dentro de uma transação: a linha da inspeção é travada
+    para que uploads concorrentes não recebam o mesmo número.
+
+    Returns:
+        Número de sequência reservado
+    """
+    Inspection.objects.select_for_update().filter(pk=inspection.pk).first()
+    max_sequence = InspectionPhoto.objects.filter(
+        inspection=inspection
+    ).aggregate(max_seq=models.Max('sequence_number'))['max_seq'] or 0
+    return max_sequence + 1
+
+
+def _build_mobile_photo(inspection, photo_file, metadata, sequence):
+    photo = InspectionPhoto(
+        inspection=inspection,
+        photo=photo_file,
+        title=metadata.get('title') or f'Foto {sequence}',
+        description=metadata.get('description', ''),
+        photo_source='MOBILE',
+        latitude=parse_coordinate(metadata.get('latitude')),
+        longitude=parse_coordinate(metadata.get('longitude')),
+        device_info=metadata.get('device_info', {}),
+        sequence_number=sequence,
+        taken_at=timezone.now()
+    )
+    # bulk_create não chama save(); o geohash é derivado aqui
+    photo.refresh_coordinates()
+    return photo
+
+
+@transaction.atomic
+def create_mobile_photo(inspection, photo_file, metadata):
+    """
+    Cria uma InspectionPhoto de origem mobile a partir de um arquivo e metadados
+
+    Args:
+        inspection: Inspeção de destino
+        photo_file: Arquivo (UploadedFile ou File) da imagem
+        metadata: Dict gerado por build_mobile_metadata
+
+    Returns:
+        InspectionPhoto criada
+    """
+    photo = _build_mobile_photo(inspection, photo_file, metadata, next_photo_sequence(inspection))
+    photo.save()
+    schedule_photo_processing([photo.id])
+    return photo
+
+
+@transaction.atomic
+def create_mobile_photos_batch(inspection, uploads):
+    """
+    Cria várias fotos mobile com um único bulk_create
+
+    Os números de sequência são reservados uma única vez para o lote inteiro.
+    O pós-processamento (miniatura, EXIF) é agendado para depois do commit.
+
+    Args:
+        inspection: Inspeção de destino
+        uploads: Lista de tuplas (arquivo, metadados)
+
+    Returns:
+        Lista de InspectionPhoto criadas (com id)
+    """
+    if not uploads:
+        return []
+    first_sequence = next_photo_sequence(inspection)
+    photos = [
+        _build_mobile_photo(inspection, photo_file, metadata, first_sequence + idx)
+        for idx, (photo_file, metadata) in enumerate(uploads)
+    ]
+    photos = InspectionPhoto.objects.bulk_create(photos)
+    adjust_counters(inspection.id, photo_count=len(photos))
+    schedule_photo_processing([photo.id for photo in photos])
+    return photos
+
+
+class ChunkedUploadService:
+    """
+    Upload de fotos em partes (protocolo inspirado no tus)
+
+    Fluxo:
+        1. create_session: cria a sessão e o arquivo temporário vazio
+        2. append_chunk: anexa bytes no offset atual (PATCH)
+        3. current offset: lido da sessão (HEAD)
+        4. finalize: cria a InspectionPhoto de forma atômica
+    """
+
+    COPY_BUFFER_SIZE = 64 * 1024
+
+    def __init__(self):
+        self.temp_dir = Path(getattr(
+            settings, 'CHUNKED_UPLOAD_TEMP_DIR',
+            Path(settings.MEDIA_ROOT) / 'uploads' / 'tmp'
+        ))
+        self.expiration = timedelta(hours=getattr(settings, 'CHUNKED_UPLOAD_EXPIRATION_HOURS', 24))
+        self.max_chunk_size = getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 5 * 1024 * 1024)
+        self.max_upload_size = getattr(settings, 'MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+
+    def create_session(self, inspection, user, filename, total_size, content_type='', metadata=None):
+        """Cria uma nova sessão de upload"""
+        if total_size <= 0:
+            raise UploadError('Tamanho do arquivo inválido')
+        if total_size > self.max_upload_size:
+            raise UploadError('Arquivo excede o tamanho máximo permitido', status_code=413)
+
+        allowed_types = getattr(settings, 'ALLOWED_IMAGE_TYPES', [])
+        if content_type and allowed_types and content_type not in allowed_types:
+            raise UploadError(f'Tipo de arquivo não suportado: {content_type}', status_code=415)
+
+        session = PhotoUploadSession(
+            inspection=inspection,
+            created_by=user,
+            filename=os.path.basename(filename) or 'photo.jpg',
+            content_type=content_type,
+            total_size=total_size,
+            metadata=metadata or {},
+            expires_at=timezone.now() + self.expiration,
+        )
+        session.temp_path = str(self.temp_dir / f'{session.id}.part')
+        Path(session.temp_path).touch()
+        session.save()
+        return session
+
+    def append_chunk(self, session_id, offset, stream):
+        """
+        Anexa um chunk ao arquivo temporário
+
+        O offset informado pelo cliente precisa bater com o offset gravado;
+        caso contrário o cliente deve consultar o offset atual (HEAD) e retomar.
+
+        Returns:
+            Sessão atualizada
+        """
+        with transaction.atomic():
+            session = PhotoUploadSession.objects.select_for_update().get(pk=session_id)
+            self._check_active(session)
+
+            if offset != session.offset:
+                raise UploadError(
+                    f'Offset inválido: esperado {session.offset}, recebido {offset}',
+                    status_code=409
+                )
+
+            remaining = session.total_size - session.offset
+            limit = min(remaining, self.max_chunk_size)
+            written = 0
+
+            with open(session.temp_path, 'r+b') as destination:
+                # Descarta bytes de uma tentativa anterior que não foi confirmada
+                destination.truncate(session.offset)
+                destination.seek(session.offset)
+                while True:
+                    buffer = stream.read(self.COPY_BUFFER_SIZE)
+                    if not buffer:
+                        break
+                    written += len(buffer)
+                    if written > limit:
+                        destination.truncate(session.offset)
+                        raise UploadError('Chunk excede o tamanho permitido', status_code=413)
+                    destination.write(buffer)
+
+            session.offset += written
+            session.expires_at = timezone.now() + self.expiration
+            session.save(update_fields=['offset', 'expires_at', 'updated_at'])
+            return session
+
+    def finalize(self, session_id):
+        """
+        Finaliza a sessão criando a InspectionPhoto
+
+        Idempotente: se a sessão já foi finalizada, retorna a foto existente
+        (clientes offline reenviam a finalização após perder a resposta).
+        """
+        with transaction.atomic():
+            session = PhotoUploadSession.objects.select_for_update().select_related(
+                'inspection', 'photo'
+            ).get(pk=session_id)
+
+            if session.status == 'COMPLETED' and session.photo_id:
+                return session.photo
+
+            self._check_active(session)
+            if not session.is_complete:
+                raise UploadError(
+                    f'Upload incompleto: {session.offset}/{session.total_size} bytes',
+                    status_code=409
+                )
+
+            with open(session.temp_path, 'rb') as temp_file:
+                photo = create_mobile_photo(
+                    session.inspection,
+                    File(temp_file, name=session.filename),
+                    session.metadata
+                )
+
+            session.status = 'COMPLETED'
+            session.photo = photo
+            session.save(update_fields=['status', 'photo', 'updated_at'])
+
+            temp_path = session.temp_path
+            transaction.on_commit(lambda: self._remove_temp_file(temp_path))
+            return photo
+
+    def cleanup_stale(self, now=None):
+        """
+        Remove sessões expiradas e arquivos temporários órfãos
+
+        Returns:
+            Dict com estatísticas da limpeza
+        """
+        now = now or timezone.now()
+        stats = {'expired_sessions': 0, 'orphan_files': 0}
+
+        stale = PhotoUploadSession.objects.filter(status='ACTIVE', expires_at__lt=now)
+        for session in stale.iterator():
+            self._remove_temp_file(session.temp_path)
+            stats['expired_sessions'] += 1
+        stale.update(status='EXPIRED', updated_at=now)
+
+        # Arquivos .part sem sessão ativa (ex.: processo interrompido após finalizar)
+        active_paths = set(
+            PhotoUploadSession.objects.filter(status='ACTIVE').values_list('temp_path', flat=True)
+        )
+        grace = now.timestamp() - self.expiration.total_seconds()
+        for part_file in self.temp_dir.glob('*.part'):
+            if str(part_file) not in active_paths and part_file.stat().st_mtime < grace:
+                self._remove_temp_file(str(part_file))
+                stats['orphan_files'] += 1
+
+        return stats
+
+    def _check_active(self, session):
+        if session.status != 'ACTIVE':
+            raise UploadError('Sessão de upload não está ativa', status_code=410)
+        if session.expires_at < timezone.now():
+            raise UploadError('Sessão de upload expirada', status_code=410)
+
+    def _remove_temp_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Não foi possível remover arquivo temporário {path}: {str(e)}")
@@ -0,0 +1,42 @@
+"""
+Signals for Inspections app
+Keep Inspection counters in sync with related objects: create and delete
+adjust the counter of the object's inspection, and moving an object to
+another inspection moves one unit between them (the loaded inspection id is
+kept at post_init, so no extra read is needed). Bulk operations (bulk_create)
+do not send signals and must call counters.adjust_counters explicitly.
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .counters import COUNTER_SOURCES, adjust_counters
+
+
+def _connect_counter(field, model_label, fk_name):
+    fk_attname = f'{fk_name}_id'
+
+    def on_init(sender, instance, **kwargs):
+        # Inspeção carregada (None se o campo foi adiado): base para detectar a troca
+        instance._counter_inspection_id = instance.__dict__.get(fk_attname)
+
+    def on_save(sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        previous = instance._counter_inspection_id
+        current = getattr(instance, fk_attname)
+        instance._counter_inspection_id = current
+        if created:
+            adjust_counters(current, **{field: 1})
+        elif previous is not None and previous != current:
+            adjust_counters(previous, **{field: -1})
+            adjust_counters(current, **{field: 1})
+
+    def on_delete(sender, instance, **kwargs):
+        adjust_counters(getattr(instance, fk_attname), **{field: -1})
+
+    post_init.connect(on_init, sender=model_label, weak=False, dispatch_uid=f'{field}_on_init')
+    post_save.connect(on_save, sender=model_label, weak=False, dispatch_uid=f'{field}_on_save')
+    post_delete.connect(on_delete, sender=model_label, weak=False, dispatch_uid=f'{field}_on_delete')
+
+
+for _field, (_model_label, _fk_name) in COUNTER_SOURCES.items():
+    _connect_counter(_field, _model_label, _fk_name)
@@ -137,6 +137,9 @@ class StructureInspectionItem(BaseModel):
     # Severity override (can override damage_type default)
     severity_override = models.CharField(max_length=20, choices=DamageType.SEVERITY_CHOICES, blank=True)
     
+    # Optimistic concurrency: incremented on every update (see checklists.py)
+    version = models.PositiveIntegerField(default=1)
+    
     class Meta:
         ordering = ['structure__sequence', 'created_at']
         unique_together = ['inspection', 'structure']
@@ -0,0 +1,722 @@
+"""
+Tests for Inspections app
+"""
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from PIL import Image
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.core.models import Company, User
+from apps.inspections.models import Inspection, InspectionType, InspectionPhoto, PhotoUploadSession
+
+
+def make_jpeg(size=(64, 48), color=(200, 30, 30)):
+    """Return the bytes of a small JPEG image"""
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class InspectionTestMixin:
+    """Common fixtures: company, inspector and an inspection"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CHUNKED_UPLOAD_TEMP_DIR=Path(self.media_root) / 'uploads' / 'tmp',
+            BACKGROUND_TASKS_EAGER=True,
+        )
+        self.settings_override.enable()
+
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='inspector', password='testpass123',
+            company=self.company, role='INSPECTOR'
+        )
+        self.inspection_type = InspectionType.objects.create(
+            company=self.company, name='Container', code='CONTAINER'
+        )
+        self.inspection = Inspection.objects.create(
+            company=self.company, inspection_type=self.inspection_type,
+            reference_number='ICTSI-TEST-1', title='Container ABCD1234567'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+
+class ChunkedPhotoUploadTest(InspectionTestMixin, TestCase):
+    """Tests for the resumable photo upload protocol"""
+
+    url = '/api/inspections/photo-uploads/'
+
+    def _create_session(self, data):
+        response = self.client.post(self.url, {
+            'inspection_id': self.inspection.id,
+            'filename': 'yard.jpg',
+            'total_size': len(data),
+            'content_type': 'image/jpeg',
+            'latitude': '-12.97',
+            'device_model': 'Pixel',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def _patch(self, session_id, offset, chunk):
+        return self.client.generic(
+            'PATCH', f'{self.url}{session_id}/', chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_upload_in_chunks_and_finalize(self):
+        data = make_jpeg()
+        session_id = self._create_session(data)
+        middle = len(data) // 2
+
+        response = self._patch(session_id, 0, data[:middle])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], str(middle))
+
+        response = self.client.head(f'{self.url}{session_id}/')
+        self.assertEqual(response['Upload-Offset'], str(middle))
+
+        response = self._patch(session_id, middle, data[middle:])
+        self.assertEqual(response['Upload-Offset'], str(len(data)))
+
+        response = self.client.post(f'{self.url}{session_id}/complete/')
+        self.assertEqual(response.status_code, 201)
+
+        photo = InspectionPhoto.objects.get(inspection=self.inspection)
+        self.assertEqual(photo.sequence_number, 1)
+        self.assertEqual(photo.device_info['model'], 'Pixel')
+        self.assertEqual(float(photo.latitude), -12.97)
+        with photo.photo.open('rb') as stored:
+            self.assertEqual(stored.read(), data)
+
+        # Finalizing again returns the same photo instead of duplicating it
+        response = self.client.post(f'{self.url}{session_id}/complete/')
+        self.assertEqual(response.data['photo']['id'], photo.id)
+        self.assertEqual(InspectionPhoto.objects.count(), 1)
+
+    def test_wrong_offset_is_rejected(self):
+        data = make_jpeg()
+        session_id = self._create_session(data)
+
+        response = self._patch(session_id, 10, data[10:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        data = make_jpeg()
+        session_id = self._create_session(data)
+        self._patch(session_id, 0, data[:10])
+
+        response = self.client.post(f'{self.url}{session_id}/complete/')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(InspectionPhoto.objects.exists())
+
+    def test_cleanup_expires_stale_sessions(self):
+        from django.utils import timezone
+        from apps.inspections.services import ChunkedUploadService
+
+        session_id = self._create_session(make_jpeg())
+        PhotoUploadSession.objects.filter(pk=session_id).update(expires_at=timezone.now())
+        temp_path = PhotoUploadSession.objects.get(pk=session_id).temp_path
+
+        stats = ChunkedUploadService().cleanup_stale()
+        self.assertEqual(stats['expired_sessions'], 1)
+        self.assertEqual(PhotoUploadSession.objects.get(pk=session_id).status, 'EXPIRED')
+        self.assertFalse(Path(temp_path).exists())
+
+
+class BatchPhotoUploadTest(InspectionTestMixin, TestCase):
+    """Tests for the multipart and legacy base64 batch upload endpoints"""
+
+    def test_multipart_batch_creates_sequenced_photos(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        import json
+
+        files = [SimpleUploadedFile(f'p{i}.jpg', make_jpeg(), content_type='image/jpeg') for i in range(3)]
+        response = self.client.post('/api/inspections/photos/batch_upload/', {
+            'inspection_id': self.inspection.id,
+            'photos': files,
+            'metadata': json.dumps([{'title': 'Porta'}, {}, {'latitude': '-3.1'}]),
+            'device_model': 'Pixel',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['photo_ids']), 3)
+
+        photos = list(InspectionPhoto.objects.filter(inspection=self.inspection).order_by('sequence_number'))
+        self.assertEqual([p.sequence_number for p in photos], [1, 2, 3])
+        self.assertEqual(photos[0].title, 'Porta')
+        self.assertEqual(photos[1].title, 'Foto 2')
+        self.assertEqual(float(photos[2].latitude), -3.1)
+        self.assertEqual(photos[2].device_info['model'], 'Pixel')
+
+    def test_legacy_base64_batch_still_works(self):
+        import base64
+
+        encoded = base64.b64encode(make_jpeg()).decode()
+        response = self.client.post('/api/inspections/photos/batch_upload_from_mobile/', {
+            'inspection_id': self.inspection.id,
+            'photos': [{'data': f'data:image/jpeg;base64,{encoded}', 'title': 'Lacre'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        photo = InspectionPhoto.objects.get(pk=response.data['photo_ids'][0])
+        self.assertEqual(photo.title, 'Lacre')
+        self.assertEqual(photo.sequence_number, 1)
+
+
+class PhotoProcessingTest(InspectionTestMixin, TestCase):
+    """Tests for the background photo post-processing stage"""
+
+    def _jpeg_with_exif(self):
+        image = Image.new('RGB', (80, 40), (10, 120, 10))
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 CW
+        exif[0x0110] = 'Pixel 8'
+        exif[0x0132] = '2024:03:05 14:30:00'
+        exif[0x8825] = {1: 'S', 2: (12.0, 58.0, 12.0), 3: 'W', 4: (38.0, 30.0, 0.0)}
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def test_upload_is_processed_after_commit(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('rotated.jpg', self._jpeg_with_exif(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/inspections/photos/upload_from_mobile/', {
+                'inspection_id': self.inspection.id,
+                'photo': upload,
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        photo = InspectionPhoto.objects.get(inspection=self.inspection)
+        self.assertEqual(photo.processing_status, 'DONE')
+        self.assertEqual((photo.width, photo.height), (40, 80))
+        self.assertAlmostEqual(float(photo.latitude), -12.97, places=2)
+        self.assertAlmostEqual(float(photo.longitude), -38.5, places=2)
+        self.assertEqual(photo.taken_at.year, 2024)
+        self.assertEqual(photo.exif_data['Model'], 'Pixel 8')
+        self.assertTrue(photo.thumbnail)
+
+        # EXIF is stripped from the stored original by default
+        with photo.photo.open('rb') as stored:
+            self.assertEqual(len(Image.open(stored).getexif()), 0)
+
+    def test_unreadable_file_is_marked_failed(self):
+        from django.core.files.base import ContentFile
+        from apps.inspections.photo_processing import process_photo
+
+        photo = InspectionPhoto.objects.create(
+            inspection=self.inspection, photo=ContentFile(b'not an image', name='broken.jpg')
+        )
+        self.assertFalse(process_photo(photo.id))
+        photo.refresh_from_db()
+        self.assertEqual(photo.processing_status, 'FAILED')
+
+
+class DuplicatePhotoTest(InspectionTestMixin, TestCase):
+    """Tests for perceptual-hash near-duplicate detection"""
+
+    def setUp(self):
+        super().setUp()
+        from apps.inspections.duplicates import hash_index
+        hash_index.invalidate()
+
+    def _gradient(self, shift=0, flip=False):
+        image = Image.new('L', (90, 80))
+        image.putdata([((x * 3 + y + shift) % 256) for y in range(80) for x in range(90)])
+        if flip:
+            image = image.transpose(Image.FLIP_LEFT_RIGHT)
+        buffer = BytesIO()
+        image.convert('RGB').save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    def test_bk_tree_search(self):
+        from apps.inspections.duplicates import BKTree
+
+        tree = BKTree()
+        for value, name in [(0b0000, 'a'), (0b0001, 'b'), (0b0011, 'c'), (0b1111, 'd')]:
+            tree.add(value, name)
+        self.assertEqual(tree.search(0b0000, 1), [(0, 'a'), (1, 'b')])
+        self.assertEqual(len(tree.search(0b0000, 4)), 4)
+
+    def test_duplicates_endpoint(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        images = [self._gradient(), self._gradient(shift=2), self._gradient(flip=True)]
+        files = [SimpleUploadedFile(f'p{i}.jpg', data, content_type='image/jpeg') for i, data in enumerate(images)]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/inspections/photos/batch_upload/', {
+                'inspection_id': self.inspection.id, 'photos': files,
+            }, format='multipart')
+        original, near_copy, flipped = response.data['photo_ids']
+
+        response = self.client.get('/api/inspections/photos/duplicates/', {'photo': original})
+        self.assertEqual(response.status_code, 200)
+        match_ids = [match['id'] for match in response.data['results'][0]['matches']]
+        self.assertEqual(match_ids, [near_copy])
+
+        response = self.client.get('/api/inspections/photos/duplicates/', {'inspection': self.inspection.id})
+        self.assertEqual({result['id'] for result in response.data['results']}, {original, near_copy})
+        self.assertNotIn(flipped, [result['id'] for result in response.data['results']])
+
+    def test_container_duplicates_are_company_scoped(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.utils import timezone
+        from apps.cargosnap_integration.models import CargoSnapFile, CargoSnapUpload
+
+        now = timezone.now()
+        container = 'MSCU1234567'
+        other_company = Company.objects.create(name='Outra', slug='outra', company_type='CLIA')
+        other_type = InspectionType.objects.create(company=other_company, name='Container', code='OTHER')
+        uploads = []
+        for number, (company, inspection_type) in enumerate(
+            [(self.company, self.inspection_type), (other_company, other_type)], start=1
+        ):
+            cargosnap_file = CargoSnapFile.objects.create(
+                cargosnap_id=number, scan_code=container, created_at=now, updated_at=now
+            )
+            Inspection.objects.create(
+                company=company, inspection_type=inspection_type, reference_number=f'CS-{number}',
+                title='Container', container_number=container, cargosnap_file=cargosnap_file,
+            )
+            uploads.append(CargoSnapUpload.objects.create(
+                file=cargosnap_file, cargosnap_id=number, tenant_id=1, device_id=1, upload_type='image',
+                created_at=now, scan_date_time=now, perceptual_hash=f'ffff0000ffff000{number}',
+            ))
+        own_upload, other_upload = uploads
+        self.inspection.container_number = container
+        self.inspection.save()
+        photo = InspectionPhoto.objects.create(
+            inspection=self.inspection,
+            photo=SimpleUploadedFile('p.jpg', make_jpeg(), content_type='image/jpeg'),
+        )
+        InspectionPhoto.objects.filter(pk=photo.pk).update(perceptual_hash='ffff0000ffff0000')
+
+        response = self.client.get('/api/inspections/photos/duplicates/', {'container': container})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {(result['type'], result['id']): [match['id'] for match in result['matches']]
+             for result in response.data['results']},
+            {('photo', photo.pk): [own_upload.pk], ('cargosnap_upload', own_upload.pk): [photo.pk]},
+        )
+        self.assertNotIn(other_upload.pk, [result['id'] for result in response.data['results']
+                                           if result['type'] == 'cargosnap_upload'])
+
+
+class SparseFieldsetTest(InspectionTestMixin, TestCase):
+    """Tests for ?fields= and ?expand= on the inspections API"""
+
+    url = '/api/inspections/inspections/'
+
+    def test_list_fields_are_pruned(self):
+        response = self.client.get(self.url, {'fields': 'id,title,company_name'})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(set(results[0]), {'id', 'title', 'company_name'})
+        self.assertEqual(results[0]['company_name'], self.company.name)
+
+    def test_detail_expand_controls_nested_relations(self):
+        detail = f'{self.url}{self.inspection.id}/'
+
+        response = self.client.get(detail)
+        self.assertIn('photos', response.data)
+        self.assertIn('comments', response.data)
+
+        response = self.client.get(detail, {'expand': 'photos'})
+        self.assertIn('photos', response.data)
+        self.assertNotIn('comments', response.data)
+        self.assertIn('description', response.data)
+
+        response = self.client.get(detail, {'fields': 'id,reference_number'})
+        self.assertEqual(set(response.data), {'id', 'reference_number'})
+
+    def test_query_plan_only_loads_requested_columns(self):
+        from apps.core.mixins import apply_query_plan
+        from apps.inspections.serializers import InspectionDetailSerializer
+
+        serializer = InspectionDetailSerializer(context={'sparse_fields': {'id', 'title', 'inspector_name'}})
+        queryset = apply_query_plan(Inspection.objects.all(), serializer)
+        deferred, _ = queryset.query.deferred_loading
+        self.assertEqual(set(deferred), {'id', 'title', 'inspector'})
+        self.assertEqual(queryset.query.select_related, {'inspector': {}})
+        self.assertEqual(queryset._prefetch_related_lookups, ())
+
+        serializer = InspectionDetailSerializer(context={'sparse_expand': {'documents'}})
+        queryset = apply_query_plan(Inspection.objects.all(), serializer)
+        self.assertEqual(set(queryset._prefetch_related_lookups), {'documents', 'documents__uploaded_by'})
+
+
+class InspectionCounterTest(InspectionTestMixin, TestCase):
+    """Tests for the denormalized counters on Inspection"""
+
+    def test_counters_follow_creates_and_deletes(self):
+        from django.core.files.base import ContentFile
+        from apps.inspections.models import InspectionComment
+
+        photo = InspectionPhoto.objects.create(
+            inspection=self.inspection, photo=ContentFile(make_jpeg(), name='a.jpg')
+        )
+        InspectionComment.objects.create(inspection=self.inspection, user=self.user, comment='Amassado')
+        self.inspection.refresh_from_db()
+        self.assertEqual((self.inspection.photo_count, self.inspection.comment_count), (1, 1))
+
+        photo.delete()
+        self.inspection.refresh_from_db()
+        self.assertEqual(self.inspection.photo_count, 0)
+
+    def test_summary_uses_counters_and_batch_upload_increments(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        files = [SimpleUploadedFile(f'p{i}.jpg', make_jpeg(), content_type='image/jpeg') for i in range(2)]
+        self.client.post('/api/inspections/photos/batch_upload/', {
+            'inspection_id': self.inspection.id, 'photos': files,
+        }, format='multipart')
+
+        url = f'/api/inspections/inspections/{self.inspection.id}/summary/'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['photos'], 2)
+
+    def test_reconcile_fixes_drift(self):
+        from apps.inspections.counters import reconcile_counters
+
+        InspectionPhoto.objects.create(inspection=self.inspection, photo='x.jpg')
+        Inspection.objects.filter(pk=self.inspection.pk).update(photo_count=7, issue_count=3)
+
+        reconcile_counters()
+        self.inspection.refresh_from_db()
+        self.assertEqual((self.inspection.photo_count, self.inspection.issue_count), (1, 0))
+
+    def test_saving_stale_instance_keeps_counters(self):
+        from apps.inspections.models import InspectionComment
+
+        stale = Inspection.objects.get(pk=self.inspection.pk)
+        InspectionComment.objects.create(inspection=self.inspection, user=self.user, comment='Amassado')
+        stale.title = 'Atualizada'
+        stale.save()
+
+        self.inspection.refresh_from_db()
+        self.assertEqual((self.inspection.title, self.inspection.comment_count), ('Atualizada', 1))
+
+    def test_moving_related_object_moves_counter(self):
+        from apps.issues.models import Issue
+
+        other = Inspection.objects.create(
+            company=self.company, inspection_type=self.inspection_type,
+            reference_number='ICTSI-TEST-2', title='Outra'
+        )
+        issue = Issue.objects.create(company=self.company, inspection=self.inspection, title='Avaria')
+        issue.inspection = other
+        issue.save()
+
+        counts = dict(Inspection.objects.filter(pk__in=[self.inspection.pk, other.pk]).values_list('pk', 'issue_count'))
+        self.assertEqual(counts, {self.inspection.pk: 0, other.pk: 1})
+
+        issue.title = 'Avaria revisada'
+        issue.save(update_fields=['title'])
+        other.refresh_from_db()
+        self.assertEqual(other.issue_count, 1)
+
+
+class GeoQueryTest(InspectionTestMixin, TestCase):
+    """Tests for the bbox / nearby / clusters map endpoints"""
+
+    POINTS = [
+        (-23.9608, -46.3336),  # Santos
+        (-23.9610, -46.3340),
+        (-23.9700, -46.3000),
+        (-22.9068, -43.1729),  # Rio de Janeiro
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.photos = [
+            InspectionPhoto.objects.create(
+                inspection=self.inspection, photo=f'p{i}.jpg', latitude=lat, longitude=lng
+            )
+            for i, (lat, lng) in enumerate(self.POINTS)
+        ]
+        InspectionPhoto.objects.create(inspection=self.inspection, photo='no_gps.jpg')
+
+    def test_geohash_follows_coordinates(self):
+        photo = self.photos[0]
+        self.assertEqual(photo.geohash[:5], '6gxp9')
+        photo.latitude, photo.longitude = -22.9068, -43.1729
+        photo.save(update_fields=['latitude', 'longitude'])
+        photo.refresh_from_db()
+        self.assertEqual(photo.geohash[:4], '75cm')
+
+    def test_within_bbox(self):
+        response = self.client.get('/api/inspections/photos/within/', {'bbox': '-24.1,-46.5,-23.9,-46.2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item['id'] for item in response.data['results']}, {p.id for p in self.photos[:3]})
+
+        response = self.client.get('/api/inspections/photos/within/', {'bbox': 'invalid'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_nearby_returns_k_nearest_by_distance(self):
+        response = self.client.get('/api/inspections/photos/nearby/', {
+            'lat': -23.9608, 'lng': -46.3336, 'k': 3,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [p.id for p in self.photos[:3]])
+        distances = [item['distance_km'] for item in response.data]
+        self.assertEqual(distances, sorted(distances))
+
+        response = self.client.get('/api/inspections/photos/nearby/', {
+            'lat': -23.9608, 'lng': -46.3336, 'k': 10, 'radius_km': 1,
+        })
+        self.assertEqual(len(response.data), 2)
+
+    def test_clusters_by_zoom(self):
+        bbox = '-30,-50,-20,-40'
+        response = self.client.get('/api/inspections/photos/clusters/', {'bbox': bbox, 'zoom': 4})
+        self.assertEqual(response.status_code, 200)
+        counts = sorted(cluster['count'] for cluster in response.data['clusters'])
+        self.assertEqual(counts, [1, 3])
+
+        response = self.client.get('/api/inspections/photos/clusters/', {'bbox': bbox, 'zoom': 18})
+        self.assertEqual(sum(c['count'] for c in response.data['clusters']), 4)
+        self.assertGreater(len(response.data['clusters']), 2)
+
+    def test_upload_coordinates_backfill(self):
+        from django.utils import timezone
+        from apps.cargosnap_integration.models import CargoSnapFile, CargoSnapUpload
+        from apps.core.geo import backfill_coordinates
+
+        now = timezone.now()
+        cargosnap_file = CargoSnapFile.objects.create(
+            cargosnap_id=1, scan_code='ABCD1234567', created_at=now, updated_at=now
+        )
+        upload = CargoSnapUpload.objects.create(
+            file=cargosnap_file, cargosnap_id=10, tenant_id=1, device_id=1, upload_type='image',
+            created_at=now, scan_date_time=now, latitude='-23,9608', longitude='-46.3336',
+            image_path='x.jpg', image_url='http://example.com/x.jpg', image_thumb='http://example.com/t.jpg',
+        )
+        self.assertAlmostEqual(upload.latitude_value, -23.9608)
+
+        CargoSnapUpload.objects.filter(pk=upload.pk).update(latitude_value=None, geohash='')
+        self.assertEqual(backfill_coordinates(CargoSnapUpload, batch_size=1), 1)
+        upload.refresh_from_db()
+        self.assertEqual(upload.geohash[:5], '6gxp9')
+
+        response = self.client.get('/api/cargosnap/uploads/within/', {'bbox': '-24,-47,-23,-46'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [upload.id])
+
+
+class BulkCargoSnapImportTest(InspectionTestMixin, TestCase):
+    """Tests for bulk inspection creation from CargoSnap files"""
+
+    def setUp(self):
+        super().setUp()
+        from django.utils import timezone
+        from apps.cargosnap_integration.models import CargoSnapFile, CargoSnapUpload
+
+        now = timezone.now()
+        source_dir = Path(self.media_root) / 'cargosnap'
+        source_dir.mkdir(parents=True)
+        self.files = []
+        for i in range(3):
+            cargosnap_file = CargoSnapFile.objects.create(
+                cargosnap_id=100 + i, scan_code=f'MSCU000000{i}', created_at=now, updated_at=now
+            )
+            self.files.append(cargosnap_file)
+            for j in range(2):
+                upload_id = 1000 + i * 10 + j
+                (source_dir / f'{upload_id}.jpg').write_bytes(make_jpeg(color=(i * 80, j * 80, 10)))
+                CargoSnapUpload.objects.create(
+                    file=cargosnap_file, cargosnap_id=upload_id, tenant_id=1, device_id=1,
+                    upload_type='image', created_at=now, scan_date_time=now,
+                    latitude='-23.96', longitude='-46.33',
+                    image_path='x', image_url='http://example.com/x.jpg', image_thumb='http://example.com/t.jpg',
+                    local_image_path=f'cargosnap/{upload_id}.jpg', image_downloaded=True,
+                )
+        # Imagem ausente no disco: conta como falha da foto, não do arquivo
+        CargoSnapUpload.objects.filter(cargosnap_id=1021).update(local_image_path='cargosnap/missing.jpg')
+
+    def _post(self, **data):
+        data.setdefault('inspection_type_id', self.inspection_type.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/cargosnap/files/bulk_create_inspections/', data, format='json')
+
+    def test_bulk_create_returns_per_file_results(self):
+        response = self._post(file_ids=[f.id for f in self.files])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['created'], 3)
+        self.assertEqual(response.data['summary']['photos_imported'], 5)
+        by_file = {result['file_id']: result for result in response.data['results']}
+        self.assertEqual(by_file[self.files[2].id]['photos_failed'], 1)
+
+        inspections = Inspection.objects.filter(cargosnap_file__in=self.files)
+        self.assertEqual(inspections.count(), 3)
+        self.assertEqual(len({i.reference_number for i in inspections}), 3)
+        inspection = inspections.get(cargosnap_file=self.files[0])
+        self.assertEqual(inspection.photo_count, 2)
+        self.assertEqual(inspection.photos.count(), 2)
+        self.assertTrue(all(p.geohash for p in inspection.photos.all()))
+
+        # Repetir a importação não duplica inspeções
+        response = self._post(file_ids=[f.id for f in self.files])
+        self.assertEqual(response.data['summary']['skipped'], 3)
+
+    def test_large_batch_runs_as_job(self):
+        from apps.cargosnap_integration.models import CargoSnapImportJob
+
+        with self.settings(CARGOSNAP_IMPORT_SYNC_LIMIT=1):
+            response = self._post()
+        self.assertEqual(response.status_code, 202)
+
+        job = CargoSnapImportJob.objects.get(pk=response.data['job']['id'])
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.created_count, 3)
+        self.assertEqual(len(job.results), 3)
+
+        response = self.client.get(f'/api/cargosnap/import-jobs/{job.id}/')
+        self.assertEqual(response.data['status'], 'completed')
+
+    def test_management_command(self):
+        from django.core.management import call_command
+
+        call_command('bulk_import_inspections', company='ictsi', inspection_type='CONTAINER',
+                     no_photos=True, stdout=StringIO())
+        self.assertEqual(Inspection.objects.filter(cargosnap_file__isnull=False, photo_count=0).count(), 3)
+
+
+class StructureChecklistTest(InspectionTestMixin, TestCase):
+    """Tests for checklist materialization and bulk item updates"""
+
+    def setUp(self):
+        super().setUp()
+        from apps.inspections.structure_models import (
+            ChecklistStructure, ContainerStructure, DamageType, InspectionChecklist
+        )
+
+        self.checklist = InspectionChecklist.objects.create(
+            company=self.company, name='Padrão', is_default=True
+        )
+        self.structures = []
+        for i in range(4):
+            structure = ContainerStructure.objects.create(
+                company=self.company, code=str(i), name=f'Estrutura {i}', sequence=i
+            )
+            ChecklistStructure.objects.create(checklist=self.checklist, structure=structure, sequence=i)
+            self.structures.append(structure)
+        self.damage_type = DamageType.objects.create(company=self.company, code='1', name='AMASSADO')
+
+    def _materialize(self):
+        return self.client.post('/api/inspections/structure-items/materialize/', {
+            'inspection': self.inspection.id,
+        }, format='json')
+
+    def test_materialize_creates_items_once(self):
+        from apps.inspections.structure_models import StructureInspectionItem
+
+        with self.assertNumQueries(8):
+            response = self._materialize()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(StructureInspectionItem.objects.filter(inspection=self.inspection).count(), 4)
+
+        response = self._materialize()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'checklist': self.checklist.id, 'created': 0, 'existing': 4})
+
+    def test_bulk_update_with_version_check(self):
+        from apps.inspections.structure_models import StructureInspectionItem
+
+        self._materialize()
+        first, second = StructureInspectionItem.objects.filter(inspection=self.inspection)[:2]
+
+        response = self.client.patch('/api/inspections/structure-items/bulk_update/', {'items': [
+            {'id': first.id, 'version': 1, 'status': 'DAMAGED', 'damage_type': self.damage_type.id,
+             'measurement_length': '12.50'},
+            {'id': second.id, 'version': 1, 'status': 'OK'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.version, first.inspected_by), ('DAMAGED', 2, self.user))
+        self.assertEqual(str(first.measurement_length), '12.50')
+
+        # Versão desatualizada: nada é gravado
+        response = self.client.patch('/api/inspections/structure-items/bulk_update/', {'items': [
+            {'id': second.id, 'version': 2, 'notes': 'ok'},
+            {'id': first.id, 'version': 1, 'status': 'OK'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'], [{'id': first.id, 'version': 1, 'current_version': 2}])
+        second.refresh_from_db()
+        self.assertEqual((second.notes, second.version), ('', 2))
+
+    def test_single_patch_checks_version(self):
+        from apps.inspections.structure_models import StructureInspectionItem
+
+        self._materialize()
+        item = StructureInspectionItem.objects.filter(inspection=self.inspection).first()
+        url = f'/api/inspections/structure-items/{item.id}/'
+
+        response = self.client.patch(url, {'notes': 'a', 'version': 1}, format='json')
+        self.assertEqual(response.data['version'], 2)
+        response = self.client.patch(url, {'notes': 'b', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+
+class ExportTest(InspectionTestMixin, TestCase):
+    """Tests for streaming CSV/XLSX exports and background export jobs"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            Inspection.objects.create(
+                company=self.company, inspection_type=self.inspection_type,
+                reference_number=f'ICTSI-EXP-{i}', title=f'Container {i}', status='COMPLETED'
+            )
+
+    def test_csv_is_streamed_with_list_filters(self):
+        response = self.client.get('/api/inspections/inspections/export/', {'status': 'COMPLETED'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        lines = content.strip().splitlines()
+        self.assertEqual(lines[0].split(';')[:4], ['Referência', 'Título', 'Tipo', 'Status'])
+        self.assertEqual(len(lines), 4)
+        self.assertNotIn('ICTSI-TEST-1', content)
+
+        response = self.client.get('/api/inspections/inspections/export/', {'file_format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    @unittest.skipUnless(importlib.util.find_spec('xlsxwriter'), 'xlsxwriter não instalado')
+    def test_xlsx_export(self):
+        response = self.client.get('/api/inspections/inspections/export/', {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+    def test_large_export_runs_as_job(self):
+        from apps.reports.models import ExportJob
+
+        with override_settings(EXPORT_SYNC_MAX_ROWS=2), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/inspections/inspections/export/')
+        self.assertEqual(response.status_code, 202)
+
+        job = ExportJob.objects.get(pk=response.data['id'])
+        self.assertEqual((job.status, job.row_count, job.resource), ('COMPLETED', 4, 'inspections'))
+        with job.file.open('rb') as exported:
+            self.assertEqual(len(exported.read().decode('utf-8-sig').strip().splitlines()), 5)
+
+        response = self.client.get(f'/api/reports/export-jobs/{job.id}/')
+        self.assertEqual(response.data['status'], 'COMPLETED')
@@ -8,7 +8,7 @@ from .views import (
     InspectionVideoViewSet, InspectionDocumentViewSet, InspectionTagViewSet,
     InspectionSignatureViewSet, InspectionCommentViewSet, ScannedReferenceViewSet,
     ContainerStructureViewSet, DamageTypeViewSet, StructureInspectionItemViewSet,
-    InspectionChecklistViewSet
+    InspectionChecklistViewSet, PhotoUploadSessionViewSet
 )
 
 router = DefaultRouter()
@@ -17,6 +17,7 @@ router = DefaultRouter()
 router.register(r'types', InspectionTypeViewSet, basename='inspection-type')
 router.register(r'inspections', InspectionViewSet, basename='inspection')
 router.register(r'photos', InspectionPhotoViewSet, basename='inspection-photo')
+router.register(r'photo-uploads', PhotoUploadSessionViewSet, basename='photo-upload')
 router.register(r'videos', InspectionVideoViewSet, basename='inspection-video')
 router.register(r'documents', InspectionDocumentViewSet, basename='inspection-document')
 router.register(r'tags', InspectionTagViewSet, basename='inspection-tag')
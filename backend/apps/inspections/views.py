@@ -5,8 +5,15 @@ Complete ViewSets for all inspection-related models
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import models
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+import base64
+import json
+import logging
 from apps.core.permissions import (
     IsAuthenticated, IsSameCompany, CanCreateInspection,
     CanEditInspection, CanDeleteInspection, IsAdminOrManager
@@ -14,7 +21,7 @@ from apps.core.permissions import (
 from .models import (
     InspectionType, Inspection, InspectionPhoto, InspectionVideo,
     InspectionDocument, InspectionTag, InspectionSignature,
-    InspectionComment, ScannedReference
+    InspectionComment, ScannedReference, PhotoUploadSession
 )
 from .structure_models import (
     ContainerStructure, DamageType, StructureInspectionItem,
@@ -28,8 +35,21 @@ from .serializers import (
     InspectionSignatureSerializer, InspectionCommentSerializer,
     ScannedReferenceSerializer, ContainerStructureSerializer,
     DamageTypeSerializer, StructureInspectionItemSerializer,
-    InspectionChecklistSerializer
+    InspectionChecklistSerializer, PhotoUploadSessionSerializer,
+    StructureInspectionItemBulkUpdateSerializer
 )
+from .services import (
+    ChunkedUploadService, UploadError, build_mobile_metadata,
+    create_mobile_photo, create_mobile_photos_batch
+)
+from .photo_processing import schedule_photo_processing
+from .checklists import VersionConflict, bulk_update_items, default_checklist, materialize_checklist
+from .duplicates import CARGOSNAP_UPLOAD, PHOTO, company_uploads, default_max_distance, find_near_duplicates
+from apps.core.parsers import OctetStreamParser, BinaryStreamParser
+from apps.core.mixins import ExportMixin, GeoQueryMixin, SparseFieldsetMixin
+from apps.search.filters import FullTextSearchFilter, SearchRankOrderingFilter
+
+logger = logging.getLogger(__name__)
 
 
 class InspectionTypeViewSet(viewsets.ModelViewSet):
@@ -45,15 +65,36 @@ class InspectionTypeViewSet(viewsets.ModelViewSet):
         return self.queryset.filter(company=self.request.user.company)
 
 
-class InspectionViewSet(viewsets.ModelViewSet):
+class InspectionViewSet(ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """CRUD for Inspections with multiple serializers"""
     queryset = Inspection.objects.all()
     permission_classes = [IsAuthenticated, IsSameCompany, CanCreateInspection]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, SearchRankOrderingFilter]
     filterset_fields = ['status', 'inspection_type', 'assigned_to', 'inspector']
     search_fields = ['reference_number', 'title', 'customer_name']
+    search_doc_type = 'inspection'
     ordering_fields = ['created_at', 'scheduled_date', 'completed_at']
     ordering = ['-created_at']
+    export_resource = 'inspections'
+    export_columns = [
+        ('reference_number', 'Referência'),
+        ('title', 'Título'),
+        ('inspection_type__name', 'Tipo'),
+        ('status', 'Status'),
+        ('container_number', 'Container'),
+        ('seal_number', 'Lacre'),
+        ('booking_number', 'Booking'),
+        ('vessel_name', 'Navio'),
+        ('customer_name', 'Cliente'),
+        ('location', 'Local'),
+        ('assigned_to__username', 'Responsável'),
+        ('inspector__username', 'Inspetor'),
+        ('photo_count', 'Fotos'),
+        ('scheduled_date', 'Agendada em'),
+        ('started_at', 'Iniciada em'),
+        ('completed_at', 'Concluída em'),
+        ('created_at', 'Criada em'),
+    ]
     
     def get_queryset(self):
         queryset = self.queryset.filter(company=self.request.user.company)
@@ -101,20 +142,20 @@ class InspectionViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def summary(self, request, pk=None):
-        """Get inspection summary"""
+        """Get inspection summary (counters are denormalized on Inspection)"""
         inspection = self.get_object()
         return Response({
             'reference': inspection.reference_number,
             'status': inspection.status,
-            'photos': inspection.photos.count(),
-            'videos': inspection.videos.count(),
-            'documents': inspection.documents.count(),
-            'comments': inspection.comments.count(),
-            'issues': inspection.issues.count() if hasattr(inspection, 'issues') else 0,
+            'photos': inspection.photo_count,
+            'videos': inspection.video_count,
+            'documents': inspection.document_count,
+            'comments': inspection.comment_count,
+            'issues': inspection.issue_count,
         })
 
 
-class InspectionPhotoViewSet(viewsets.ModelViewSet):
+class InspectionPhotoViewSet(GeoQueryMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """CRUD for Inspection Photos with mobile camera support"""
     queryset = InspectionPhoto.objects.all()
     serializer_class = InspectionPhotoSerializer
@@ -125,7 +166,11 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(inspection__company=self.request.user.company)
     
-    @action(detail=False, methods=['post'], parser_classes=['parsers.MultiPartParser', 'parsers.FormParser'])
+    def perform_create(self, serializer):
+        photo = serializer.save()
+        schedule_photo_processing([photo.id])
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def upload_from_mobile(self, request):
         """
         Upload de foto via câmera mobile com metadados
@@ -140,9 +185,6 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
             - device_model: Modelo do dispositivo (opcional)
             - device_os: Sistema operacional (opcional)
         """
-        from django.utils import timezone
-        import json
-        
         try:
             inspection_id = request.data.get('inspection_id')
             photo_file = request.FILES.get('photo')
@@ -158,39 +200,9 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
                 company=request.user.company
             )
             
-            # Próximo número de sequência
-            max_sequence = InspectionPhoto.objects.filter(
-                inspection=inspection
-            ).aggregate(max_seq=models.Max('sequence_number'))['max_seq'] or 0
-            
-            # Extrair metadados
-            latitude = request.data.get('latitude')
-            longitude = request.data.get('longitude')
-            device_model = request.data.get('device_model', '')
-            device_os = request.data.get('device_os', '')
-            
-            # Criar device_info
-            device_info = {
-                'source': 'mobile_camera',
-                'model': device_model,
-                'os': device_os,
-                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-                'uploaded_at': timezone.now().isoformat()
-            }
-            
-            # Criar foto
-            photo = InspectionPhoto.objects.create(
-                inspection=inspection,
-                photo=photo_file,
-                title=request.data.get('title', f'Foto {max_sequence + 1}'),
-                description=request.data.get('description', ''),
-                photo_source='MOBILE',
-                latitude=float(latitude) if latitude else None,
-                longitude=float(longitude) if longitude else None,
-                device_info=device_info,
-                sequence_number=max_sequence + 1,
-                taken_at=timezone.now()
-            )
+            # Criar foto com os mesmos metadados usados no upload em partes
+            metadata = build_mobile_metadata(request.data, request.META.get('HTTP_USER_AGENT', ''))
+            photo = create_mobile_photo(inspection, photo_file, metadata)
             
             serializer = self.get_serializer(photo)
             return Response({
@@ -204,26 +216,134 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
                 'error': 'Inspeção não encontrada'
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Erro ao fazer upload de foto mobile: {str(e)}")
             return Response({
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'])
+    def duplicates(self, request):
+        """
+        Lista fotos quase duplicadas (hash perceptual + BK-tree)
+        
+        Query params (um dos três):
+            - photo: ID da foto
+            - inspection: ID da inspeção (todas as fotos dela)
+            - container: Número do container (fotos das inspeções e uploads CargoSnap)
+            - max_distance: Distância de Hamming máxima (opcional)
+        """
+        from apps.cargosnap_integration.models import CargoSnapUpload
+        
+        try:
+            max_distance = int(request.query_params.get('max_distance', default_max_distance()))
+        except ValueError:
+            return Response({
+                'error': 'max_distance deve ser um inteiro'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        photos = self.get_queryset().exclude(perceptual_hash='')
+        uploads = CargoSnapUpload.objects.none()
+        if request.query_params.get('photo'):
+            photos = photos.filter(pk=request.query_params['photo'])
+        elif request.query_params.get('inspection'):
+            photos = photos.filter(inspection_id=request.query_params['inspection'])
+        elif request.query_params.get('container'):
+            container = request.query_params['container']
+            photos = photos.filter(inspection__container_number=container)
+            uploads = company_uploads(request.user.company).filter(
+                file__scan_code=container
+            ).exclude(perceptual_hash='')
+        else:
+            return Response({
+                'error': 'Informe photo, inspection ou container'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        sources = [(PHOTO, pk, h) for pk, h in photos.values_list('id', 'perceptual_hash')]
+        sources += [(CARGOSNAP_UPLOAD, pk, h) for pk, h in uploads.values_list('id', 'perceptual_hash')]
+        
+        return Response({
+            'max_distance': max_distance,
+            'results': find_near_duplicates(sources, request.user.company, max_distance)
+        })
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def batch_upload(self, request):
+        """
+        Upload em lote de múltiplas fotos via multipart (streaming)
+        
+        Cada parte de arquivo é gravada em disco à medida que chega, sem
+        carregar o lote inteiro em memória. As fotos são criadas com um único
+        bulk_create e a numeração de sequência é reservada uma vez por lote.
+        
+        Form data:
+            - inspection_id: ID da inspeção
+            - photos: Arquivos de imagem (campo repetido)
+            - metadata: JSON opcional com uma lista de objetos (title, description,
+              latitude, longitude, device_info) na mesma ordem dos arquivos
+            - device_model, device_os: Dados do dispositivo comuns ao lote (opcionais)
+        """
+        # Precisa acontecer antes de request.data/FILES serem acessados
+        request._request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+        
+        try:
+            inspection_id = request.data.get('inspection_id')
+            photo_files = request.FILES.getlist('photos')
+            
+            if not inspection_id or not photo_files:
+                return Response({
+                    'error': 'inspection_id e photos são obrigatórios'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                photos_metadata = json.loads(request.data.get('metadata') or '[]')
+            except ValueError:
+                return Response({
+                    'error': 'metadata deve ser uma lista JSON'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            inspection = Inspection.objects.get(
+                id=inspection_id,
+                company=request.user.company
+            )
+            
+            common = build_mobile_metadata(request.data, request.META.get('HTTP_USER_AGENT', ''))
+            uploads = []
+            for idx, photo_file in enumerate(photo_files):
+                metadata = dict(common, title='', description='')
+                if idx < len(photos_metadata) and isinstance(photos_metadata[idx], dict):
+                    metadata.update(photos_metadata[idx])
+                uploads.append((photo_file, metadata))
+            
+            photos = create_mobile_photos_batch(inspection, uploads)
+            
+            return Response({
+                'status': 'success',
+                'message': f'{len(photos)} fotos enviadas com sucesso',
+                'photo_ids': [photo.id for photo in photos]
+            }, status=status.HTTP_201_CREATED)
+            
+        except Inspection.DoesNotExist:
+            return Response({
+                'error': 'Inspeção não encontrada'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Erro no upload em lote: {str(e)}")
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
     @action(detail=False, methods=['post'])
     def batch_upload_from_mobile(self, request):
         """
-        Upload em lote de múltiplas fotos via mobile
+        Upload em lote de múltiplas fotos via mobile (base64 em JSON)
+        
+        Mantido por compatibilidade com versões antigas do app; prefira
+        batch_upload (multipart), que não precisa de base64.
         
         JSON body:
             - inspection_id: ID da inspeção
             - photos: Array de objetos com dados das fotos em base64
         """
-        import base64
-        from django.core.files.base import ContentFile
-        from django.utils import timezone
-        
         try:
             inspection_id = request.data.get('inspection_id')
             photos_data = request.data.get('photos', [])
@@ -238,11 +358,8 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
                 company=request.user.company
             )
             
-            uploaded_photos = []
-            max_sequence = InspectionPhoto.objects.filter(
-                inspection=inspection
-            ).aggregate(max_seq=models.Max('sequence_number'))['max_seq'] or 0
-            
+            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
+            uploads = []
             for idx, photo_data in enumerate(photos_data):
                 try:
                     # Decodificar base64
@@ -251,36 +368,26 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
                         format, imgstr = image_data.split('base64,')
                         ext = format.split('/')[-1].split(';')[0]
                         
-                        # Criar arquivo
-                        filename = f"mobile_{timezone.now().strftime('%Y%m%d%H%M%S')}_{idx}.{ext}"
+                        filename = f"mobile_{timestamp}_{idx}.{ext}"
                         photo_file = ContentFile(base64.b64decode(imgstr), name=filename)
-                        
-                        # Criar foto
-                        photo = InspectionPhoto.objects.create(
-                            inspection=inspection,
-                            photo=photo_file,
-                            title=photo_data.get('title', f'Foto {max_sequence + idx + 1}'),
-                            description=photo_data.get('description', ''),
-                            photo_source='MOBILE',
-                            latitude=float(photo_data.get('latitude')) if photo_data.get('latitude') else None,
-                            longitude=float(photo_data.get('longitude')) if photo_data.get('longitude') else None,
-                            device_info=photo_data.get('device_info', {}),
-                            sequence_number=max_sequence + idx + 1,
-                            taken_at=timezone.now()
-                        )
-                        
-                        uploaded_photos.append(photo.id)
+                        uploads.append((photo_file, {
+                            'title': photo_data.get('title', ''),
+                            'description': photo_data.get('description', ''),
+                            'latitude': photo_data.get('latitude'),
+                            'longitude': photo_data.get('longitude'),
+                            'device_info': photo_data.get('device_info', {}),
+                        }))
                         
                 except Exception as e:
-                    import logging
-                    logger = logging.getLogger(__name__)
                     logger.error(f"Erro ao processar foto {idx}: {str(e)}")
                     continue
             
+            photos = create_mobile_photos_batch(inspection, uploads)
+            
             return Response({
                 'status': 'success',
-                'message': f'{len(uploaded_photos)} fotos enviadas com sucesso',
-                'photo_ids': uploaded_photos
+                'message': f'{len(photos)} fotos enviadas com sucesso',
+                'photo_ids': [photo.id for photo in photos]
             }, status=status.HTTP_201_CREATED)
             
         except Inspection.DoesNotExist:
@@ -288,14 +395,134 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
                 'error': 'Inspeção não encontrada'
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Erro no upload em lote: {str(e)}")
             return Response({
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class PhotoUploadSessionViewSet(viewsets.GenericViewSet):
+    """
+    Upload de fotos em partes (resumable) para inspetores em redes instáveis
+    
+    Protocolo:
+        POST   /photo-uploads/                 cria a sessão (retorna id e Upload-Offset)
+        HEAD   /photo-uploads/{id}/            offset atual no header Upload-Offset
+        PATCH  /photo-uploads/{id}/            anexa um chunk (header Upload-Offset,
+                                               Content-Type: application/offset+octet-stream)
+        POST   /photo-uploads/{id}/complete/   cria a InspectionPhoto
+    """
+    queryset = PhotoUploadSession.objects.all()
+    serializer_class = PhotoUploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, FormParser, MultiPartParser, OctetStreamParser, BinaryStreamParser]
+    
+    def get_queryset(self):
+        return self.queryset.filter(inspection__company=self.request.user.company)
+    
+    def _offset_headers(self, session):
+        return {
+            'Upload-Offset': str(session.offset),
+            'Upload-Length': str(session.total_size),
+            'Upload-Expires': session.expires_at.isoformat(),
+            'Cache-Control': 'no-store',
+        }
+    
+    def create(self, request):
+        """
+        Cria uma sessão de upload
+        
+        JSON body:
+            - inspection_id: ID da inspeção
+            - filename: Nome do arquivo
+            - total_size: Tamanho total em bytes (ou header Upload-Length)
+            - content_type: Tipo MIME da imagem (opcional)
+            - title, description, latitude, longitude, device_model, device_os (opcionais)
+        """
+        inspection_id = request.data.get('inspection_id')
+        total_size = request.data.get('total_size') or request.headers.get('Upload-Length')
+        
+        if not inspection_id or not total_size:
+            return Response({
+                'error': 'inspection_id e total_size são obrigatórios'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            inspection = Inspection.objects.get(
+                id=inspection_id,
+                company=request.user.company
+            )
+            session = ChunkedUploadService().create_session(
+                inspection=inspection,
+                user=request.user,
+                filename=request.data.get('filename', ''),
+                total_size=int(total_size),
+                content_type=request.data.get('content_type', ''),
+                metadata=build_mobile_metadata(request.data, request.META.get('HTTP_USER_AGENT', ''))
+            )
+        except Inspection.DoesNotExist:
+            return Response({
+                'error': 'Inspeção não encontrada'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'total_size inválido'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        
+        headers = self._offset_headers(session)
+        headers['Location'] = request.build_absolute_uri(f'{session.id}/')
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED, headers=headers)
+    
+    def retrieve(self, request, pk=None):
+        """Estado da sessão (HEAD retorna apenas os headers de offset)"""
+        session = self.get_object()
+        return Response(self.get_serializer(session).data, headers=self._offset_headers(session))
+    
+    def partial_update(self, request, pk=None):
+        """Anexa um chunk no offset informado pelo header Upload-Offset"""
+        session = self.get_object()
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({
+                'error': 'Header Upload-Offset é obrigatório'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        stream = request.data
+        if not hasattr(stream, 'read'):
+            return Response({
+                'error': 'Content-Type deve ser application/offset+octet-stream'
+            }, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        
+        try:
+            session = ChunkedUploadService().append_chunk(session.pk, offset, stream)
+        except UploadError as e:
+            session.refresh_from_db()
+            return Response({'error': e.message}, status=e.status_code, headers=self._offset_headers(session))
+        
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=self._offset_headers(session))
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Finaliza o upload criando a foto da inspeção"""
+        session = self.get_object()
+        
+        try:
+            photo = ChunkedUploadService().finalize(session.pk)
+        except UploadError as e:
+            session.refresh_from_db()
+            return Response({'error': e.message}, status=e.status_code, headers=self._offset_headers(session))
+        
+        return Response({
+            'status': 'success',
+            'message': 'Foto enviada com sucesso',
+            'photo': InspectionPhotoSerializer(photo, context=self.get_serializer_context()).data
+        }, status=status.HTTP_201_CREATED)
+
+
 class InspectionVideoViewSet(viewsets.ModelViewSet):
     """CRUD for Inspection Videos"""
     queryset = InspectionVideo.objects.all()
@@ -429,6 +656,91 @@ class StructureInspectionItemViewSet(viewsets.ModelViewSet):
             inspected_by=self.request.user,
             inspected_at=timezone.now()
         )
+    
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except VersionConflict as e:
+            return Response({'error': str(e), 'conflicts': e.conflicts}, status=status.HTTP_409_CONFLICT)
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # "version" no corpo é opcional aqui; quando enviado, precisa ser a atual
+        current = StructureInspectionItem.objects.select_for_update().values_list(
+            'version', flat=True
+        ).get(pk=serializer.instance.pk)
+        expected = self.request.data.get('version')
+        if expected not in (None, '') and str(expected) != str(current):
+            raise VersionConflict([{
+                'id': serializer.instance.pk, 'version': expected, 'current_version': current
+            }])
+        serializer.save(version=current + 1)
+    
+    @action(detail=False, methods=['post'])
+    def materialize(self, request):
+        """
+        Cria os itens de todas as estruturas de um checklist para a inspeção
+        
+        Body params:
+            - inspection: ID da inspeção
+            - checklist: ID do checklist (default: checklist padrão da empresa)
+        """
+        try:
+            inspection = Inspection.objects.get(
+                id=request.data.get('inspection'), company=request.user.company
+            )
+        except (Inspection.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'Inspeção não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        
+        checklist_id = request.data.get('checklist')
+        if checklist_id:
+            checklist = InspectionChecklist.objects.filter(
+                id=checklist_id, company=request.user.company, is_active=True
+            ).first()
+        else:
+            checklist = default_checklist(request.user.company, inspection.container_type.upper())
+        if checklist is None:
+            return Response({'error': 'Checklist não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        
+        items, existing = materialize_checklist(inspection, checklist)
+        return Response({
+            'checklist': checklist.id,
+            'created': len(items),
+            'existing': existing,
+        }, status=status.HTTP_201_CREATED if items else status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['patch'])
+    def bulk_update(self, request):
+        """
+        Atualiza vários itens em uma transação
+        
+        Body: {"items": [{"id": 1, "version": 3, "status": "DAMAGED", "damage_type": 5, ...}]}
+        Se algum item mudou desde a leitura (version diferente) nada é gravado
+        e a resposta é 409 com os itens em conflito.
+        """
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'items deve ser uma lista não vazia'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = StructureInspectionItemBulkUpdateSerializer(
+            data=items, many=True, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        ids = [update['id'] for update in serializer.validated_data]
+        if len(ids) != len(set(ids)):
+            return Response({'error': 'Itens repetidos'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            updated = bulk_update_items(self.get_queryset(), serializer.validated_data, request.user)
+        except StructureInspectionItem.DoesNotExist as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except VersionConflict as e:
+            return Response({'error': str(e), 'conflicts': e.conflicts}, status=status.HTTP_409_CONFLICT)
+        
+        queryset = self.get_queryset().filter(pk__in=[item.pk for item in updated]).select_related(
+            'structure', 'damage_type', 'inspected_by'
+        )
+        return Response(self.get_serializer(queryset, many=True).data)
 
 
 class InspectionChecklistViewSet(viewsets.ModelViewSet):
@@ -4,7 +4,7 @@ Admin configuration for Issues app
 from django.contrib import admin
 from .models import (
     IssueCategory, Issue, IssuePhoto, IssueComment, 
-    IssueAttachment, IssueTask, IssueHistory, IssueTemplate
+    IssueAttachment, IssueTask, IssueHistory, IssueTemplate, DamageIssueRule
 )
 
 
@@ -20,7 +20,7 @@ class IssueAdmin(admin.ModelAdmin):
     list_display = ['reference_number', 'title', 'company', 'priority', 'severity', 'status', 'assigned_to', 'created_at']
     list_filter = ['company', 'status', 'priority', 'severity', 'category']
     search_fields = ['reference_number', 'title', 'description']
-    readonly_fields = ['reference_number', 'detected_at']
+    readonly_fields = ['reference_number', 'detected_at', 'sla_warned_at', 'sla_breached_at']
     
     fieldsets = (
         ('Basic Information', {
@@ -37,7 +37,7 @@ class IssueAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Dates', {
-            'fields': ('detected_at', 'due_date', 'resolved_at', 'closed_at')
+            'fields': ('detected_at', 'due_date', 'sla_warned_at', 'sla_breached_at', 'resolved_at', 'closed_at')
         }),
         ('Resolution', {
             'fields': ('resolved_by', 'resolution_notes', 'root_cause', 'preventive_action'),
@@ -74,5 +74,11 @@ class IssueTemplateAdmin(admin.ModelAdmin):
     list_filter = ['company', 'category', 'is_active']
 
 
+@admin.register(DamageIssueRule)
+class DamageIssueRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'company', 'damage_type_id', 'workflow_step_id', 'category', 'priority', 'create_issue', 'is_active']
+    list_filter = ['company', 'priority', 'create_issue', 'is_active']
+
+
 admin.site.register(IssueAttachment)
 admin.site.register(IssueHistory)
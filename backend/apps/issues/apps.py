@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class IssuesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.issues'
+
+    def ready(self):
+        from . import history, sla  # noqa: F401
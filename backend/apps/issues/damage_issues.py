@@ -0,0 +1,255 @@
+"""
+Issues from CargoSnap damage uploads for Issues app
+Every CargoSnapUpload with has_damage=True becomes an IssuePhoto of a tracked
+Issue. The company's DamageIssueRule rows map damage_type_id/workflow_step_id
+to category, priority and severity; damages of the same inspection that map
+to the same (category, priority, severity) are grouped in one issue, and new
+damages found by a later sync join the open issue of their group.
+
+IssuePhoto.cargosnap_upload is unique, so uploads already linked are skipped
+and re-syncs never duplicate issues. Uploads are read in keyset chunks and
+each chunk is written with bulk_create. Runs after each file sync (services.py),
+after a file gets its inspection (integration_services.py, bulk_import.py,
+see schedule_for_files) and over historical uploads with
+`generate_damage_issues --backfill`.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.analytics.dashboard import invalidate_dashboard
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.core.sequences import allocate_references
+from apps.core.tasks import run_on_commit
+from apps.inspections.counters import adjust_counters
+from apps.inspections.models import Inspection
+from apps.search.documents import build_document, upsert_documents
+from .history import record
+from .models import DamageIssueRule, Issue, IssueHistory, IssuePhoto
+from .sla import ACTIVE_STATUSES, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_size():
+    return getattr(settings, 'ISSUE_AUTOCREATE_CHUNK_SIZE', 500)
+
+
+def match_rule(rules, upload):
+    """Regra mais específica que casa com o upload (None se nenhuma)"""
+    best = None
+    best_score = -1
+    for rule in rules:
+        if rule.damage_type_id is not None and rule.damage_type_id != upload.damage_type_id:
+            continue
+        if rule.workflow_step_id is not None and rule.workflow_step_id != upload.workflow_step_id:
+            continue
+        score = (rule.damage_type_id is not None) + (rule.workflow_step_id is not None)
+        if score > best_score:
+            best, best_score = rule, score
+    return best
+
+
+def _coordinate(value):
+    return None if value is None else Decimal(str(round(value, 6)))
+
+
+class DamageIssueGenerator:
+    """Cria/atualiza as ocorrências das avarias de um conjunto de uploads"""
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or _chunk_size()
+        self.stats = {'issues_created': 0, 'photos_linked': 0, 'uploads_ignored': 0, 'uploads_unlinked': 0}
+
+    def run(self, uploads=None, stdout=None):
+        """
+        Processa os uploads com avaria ainda sem ocorrência
+
+        Args:
+            uploads: Queryset de CargoSnapUpload (padrão: todos)
+
+        Returns:
+            Contadores da execução
+        """
+        uploads = (uploads if uploads is not None else CargoSnapUpload.objects.all()).filter(
+            has_damage=True, issue_photo__isnull=True
+        )
+        last_pk = 0
+        while True:
+            chunk = list(
+                uploads.filter(pk__gt=last_pk).select_related('file').order_by('pk')[:self.chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            self._process(chunk)
+            if stdout:
+                stdout.write(f"Uploads até o id {last_pk}: {self.stats['issues_created']} ocorrências, "
+                             f"{self.stats['photos_linked']} fotos")
+        return self.stats
+
+    def _inspections(self, file_ids):
+        """Inspeção mais recente de cada arquivo CargoSnap"""
+        inspections = {}
+        for inspection in Inspection.objects.filter(cargosnap_file_id__in=file_ids).select_related(
+            'company'
+        ).order_by('cargosnap_file_id', '-created_at'):
+            inspections.setdefault(inspection.cargosnap_file_id, inspection)
+        return inspections
+
+    def _process(self, uploads):
+        inspections = self._inspections({upload.file_id for upload in uploads})
+        rules = defaultdict(list)
+        for rule in DamageIssueRule.objects.filter(
+            company_id__in={inspection.company_id for inspection in inspections.values()}, is_active=True
+        ).select_related('category').order_by('pk'):
+            rules[rule.company_id].append(rule)
+
+        # (inspection_id, category_id, priority, severity) -> (inspeção, regra, uploads)
+        groups = {}
+        for upload in uploads:
+            inspection = inspections.get(upload.file_id)
+            if inspection is None:
+                # Arquivo sem inspeção: a ocorrência precisa de uma (gerada quando o arquivo for vinculado)
+                self.stats['uploads_unlinked'] += 1
+                continue
+            rule = match_rule(rules[inspection.company_id], upload)
+            if rule is not None and not rule.create_issue:
+                self.stats['uploads_ignored'] += 1
+                continue
+            key = (
+                inspection.pk,
+                rule.category_id if rule else None,
+                rule.priority if rule else 'MEDIUM',
+                rule.severity if rule else 'MODERATE',
+            )
+            groups.setdefault(key, (inspection, rule, []))[2].append(upload)
+        if groups:
+            with transaction.atomic():
+                self._write(groups)
+
+    def _open_issues(self, groups):
+        """Ocorrências automáticas abertas dos grupos, com o número de fotos"""
+        existing = {}
+        for issue in Issue.objects.filter(
+            inspection_id__in={key[0] for key in groups},
+            status__in=ACTIVE_STATUSES,
+            photos__cargosnap_upload__isnull=False,
+        ).annotate(photo_total=Count('photos')).order_by('created_at'):
+            existing.setdefault((issue.inspection_id, issue.category_id, issue.priority, issue.severity), issue)
+        return existing
+
+    def _build_issue(self, inspection, rule, uploads, now):
+        scan_code = uploads[0].file.scan_code
+        category = rule.category if rule else None
+        damages = sorted({upload.damage_type_desc or 'Avaria' for upload in uploads})
+        located = next((upload for upload in uploads if upload.latitude_value is not None), None)
+        issue = Issue(
+            company=inspection.company,
+            inspection=inspection,
+            category=category,
+            title=f"{category.name if category else 'Avarias'} - container {scan_code}"[:200],
+            description='\n'.join(
+                f"- {upload.damage_type_desc or 'Avaria'}"
+                f"{f' ({upload.workflow_step_description})' if upload.workflow_step_description else ''}"
+                f"{f': {upload.comment}' if upload.comment else ''}"
+                for upload in uploads
+            ),
+            priority=rule.priority if rule else 'MEDIUM',
+            severity=rule.severity if rule else 'MODERATE',
+            location=scan_code,
+            latitude=_coordinate(located.latitude_value) if located else None,
+            longitude=_coordinate(located.longitude_value) if located else None,
+            due_date=now + timedelta(hours=category.default_sla_hours) if category else None,
+            custom_fields={
+                'source': 'cargosnap',
+                'cargosnap_file_id': uploads[0].file.cargosnap_id,
+                'damage_types': damages,
+            },
+        )
+        issue.refresh_coordinates()
+        return issue
+
+    def _write(self, groups):
+        now = timezone.now()
+        existing = self._open_issues(groups)
+        new_issues = {}
+        for key, (inspection, rule, uploads) in groups.items():
+            if key not in existing:
+                new_issues[key] = self._build_issue(inspection, rule, uploads, now)
+
+        # Referências reservadas em um único passo por empresa
+        by_company = defaultdict(list)
+        for issue in new_issues.values():
+            by_company[issue.company].append(issue)
+        for company, issues in by_company.items():
+            for issue, reference in zip(issues, allocate_references(company, f"ISS-{company.company_type}", len(issues))):
+                issue.reference_number = reference
+        Issue.objects.bulk_create(list(new_issues.values()))
+        # bulk_create não dispara o sinal dos contadores da inspeção
+        for inspection_id, count in Counter(issue.inspection_id for issue in new_issues.values()).items():
+            adjust_counters(inspection_id, issue_count=count)
+
+        photos = []
+        for key, (_, _, uploads) in groups.items():
+            issue = existing.get(key) or new_issues[key]
+            start = getattr(issue, 'photo_total', 0)
+            for sequence, upload in enumerate(sorted(uploads, key=lambda u: u.scan_date_time), start=start + 1):
+                photos.append(IssuePhoto(
+                    issue=issue,
+                    photo=upload.local_image_path or '',
+                    thumbnail=upload.local_thumb_path or '',
+                    caption=(upload.comment or upload.damage_type_desc or '')[:500],
+                    photo_type='EVIDENCE',
+                    sequence_number=sequence,
+                    cargosnap_upload=upload,
+                ))
+        IssuePhoto.objects.bulk_create(photos, batch_size=500)
+
+        created = list(new_issues.values())
+        upsert_documents([build_document('issue', issue) for issue in created])
+        record([IssueHistory(issue_id=issue.pk, action='created', new_value=issue.status) for issue in created])
+        for company_id in {issue.company_id for issue in created}:
+            invalidate_dashboard(company_id)
+        scheduler = get_scheduler()
+        if scheduler is not None:
+            for issue in created:
+                scheduler.update(issue)
+
+        self.stats['issues_created'] += len(created)
+        self.stats['photos_linked'] += len(photos)
+
+
+def generate_for_files(file_ids):
+    """Ocorrências das avarias de arquivos recém-sincronizados"""
+    stats = DamageIssueGenerator().run(CargoSnapUpload.objects.filter(file_id__in=file_ids))
+    if stats['issues_created'] or stats['photos_linked']:
+        logger.info(f"Ocorrências de avarias (arquivos {sorted(file_ids)}): {stats}")
+    return stats
+
+
+def schedule_for_files(file_ids):
+    """Gera em background, após o commit, as ocorrências de arquivos recém-vinculados a inspeções"""
+    file_ids = sorted(set(file_ids))
+    if file_ids:
+        run_on_commit(generate_for_files, file_ids)
+
+
+def refresh_photo_paths(file_ids):
+    """Preenche as fotos das ocorrências cujos uploads foram baixados depois da criação"""
+    photos = list(
+        IssuePhoto.objects.filter(
+            photo='', cargosnap_upload__file_id__in=file_ids, cargosnap_upload__image_downloaded=True
+        ).select_related('cargosnap_upload')
+    )
+    for photo in photos:
+        photo.photo = photo.cargosnap_upload.local_image_path or ''
+        photo.thumbnail = photo.cargosnap_upload.local_thumb_path or ''
+    IssuePhoto.objects.bulk_update(photos, ['photo', 'thumbnail'], batch_size=500)
+    return len(photos)
@@ -0,0 +1,210 @@
+"""
+Issue change tracking for Issues app
+Writes IssueHistory rows for changes to Issue.HISTORY_FIELDS without extra
+reads: Issue.from_db keeps a snapshot of the loaded values and post_save
+diffs against it. Entries are only collected after their transaction commits
+and are buffered while a tracking scope is open (one per API request, see
+TrackedRequestMixin), then written with a single bulk_create. Outside a scope
+each commit writes its own batch. queryset.update() bypasses signals: use
+update_issues() instead.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import Issue, IssueHistory
+
+_local = threading.local()
+
+# Ação registrada por campo (demais campos: 'updated')
+FIELD_ACTIONS = {
+    'status': 'status_changed',
+    'priority': 'priority_changed',
+    'assigned_to_id': 'assigned',
+    'due_date': 'due_date_changed',
+}
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _field_name(attname):
+    return attname[:-3] if attname.endswith('_id') else attname
+
+
+def _scope():
+    scopes = getattr(_local, 'scopes', None)
+    return scopes[-1] if scopes else None
+
+
+@contextmanager
+def tracking_scope(user=None, ip_address=None):
+    """
+    Agrupa as entradas de histórico e as grava em um bulk_create ao sair
+
+    Args:
+        user: Usuário atribuído às entradas sem usuário explícito
+        ip_address: IP da requisição
+    """
+    if not hasattr(_local, 'scopes'):
+        _local.scopes = []
+    scope = {'user': user, 'ip_address': ip_address, 'entries': []}
+    _local.scopes.append(scope)
+    try:
+        yield scope
+    finally:
+        _local.scopes.pop()
+        _write(scope['entries'])
+
+
+def _write(entries):
+    if entries:
+        IssueHistory.objects.bulk_create(entries)
+
+
+def record(entries):
+    """
+    Registra entradas após o commit da transação atual (se houver)
+
+    Usuário e IP vêm da tracking_scope ativa no momento da alteração; a
+    gravação entra no lote da scope se ela ainda estiver aberta no commit.
+    """
+    if not entries:
+        return
+    scope = _scope()
+    if scope is not None:
+        for entry in entries:
+            if entry.user_id is None and scope['user'] is not None:
+                entry.user = scope['user']
+            if entry.ip_address is None:
+                entry.ip_address = scope['ip_address']
+
+    def collect():
+        if any(open_scope is scope for open_scope in getattr(_local, 'scopes', [])):
+            scope['entries'].extend(entries)
+        else:
+            _write(entries)
+
+    transaction.on_commit(collect)
+
+
+def diff_entries(issue_id, old, new, user=None):
+    """Entradas de histórico para os campos que mudaram ({attname: valor})"""
+    return [
+        IssueHistory(
+            issue_id=issue_id, user=user, action=FIELD_ACTIONS.get(attname, 'updated'),
+            field_name=_field_name(attname), old_value=_text(old[attname]), new_value=_text(new[attname]),
+        )
+        for attname in Issue.HISTORY_FIELDS
+        if attname in old and attname in new and old[attname] != new[attname]
+    ]
+
+
+def snapshot(issue):
+    """Valores atuais dos campos rastreados"""
+    loaded = issue.__dict__
+    return {attname: loaded[attname] for attname in Issue.HISTORY_FIELDS if attname in loaded}
+
+
+def _on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    current = snapshot(instance)
+    if created:
+        record([IssueHistory(issue_id=instance.pk, user_id=instance.reported_by_id, action='created',
+                             new_value=_text(instance.status))])
+    else:
+        previous = getattr(instance, '_history_snapshot', None)
+        if previous is not None:
+            if update_fields is not None:
+                previous = {key: value for key, value in previous.items() if _field_name(key) in update_fields
+                            or key in update_fields}
+            record(diff_entries(instance.pk, previous, current))
+    instance._history_snapshot = current
+
+
+def update_issues(queryset, user=None, **changes):
+    """
+    queryset.update(**changes) com histórico
+
+    Lê os valores anteriores dos campos rastreados alterados em uma consulta
+    e registra as entradas em um único bulk_create.
+
+    Returns:
+        Número de ocorrências atualizadas
+    """
+    attnames = [Issue._meta.get_field(name).attname for name in changes]
+    tracked = [attname for attname in attnames if attname in Issue.HISTORY_FIELDS]
+    new = {attname: value.pk if hasattr(value, 'pk') else value for attname, value in zip(attnames, changes.values())}
+
+    with transaction.atomic():
+        previous = list(queryset.select_for_update().values_list('pk', *tracked)) if tracked else []
+        updated = queryset.update(**changes)
+        entries = []
+        for pk, *values in previous:
+            entries.extend(diff_entries(pk, dict(zip(tracked, values)), new, user=user))
+        record(entries)
+    return updated
+
+
+def timeline(issue, public_only=False):
+    """Histórico e comentários da ocorrência em ordem cronológica (public_only: sem comentários internos)"""
+    comments = issue.comments.select_related('user')
+    if public_only:
+        comments = comments.filter(is_internal=False)
+    events = [
+        {
+            'type': 'history',
+            'at': entry.changed_at,
+            'user': entry.user.get_full_name() if entry.user else None,
+            'action': entry.action,
+            'field_name': entry.field_name,
+            'old_value': entry.old_value,
+            'new_value': entry.new_value,
+        }
+        for entry in issue.history.select_related('user')
+    ]
+    events.extend(
+        {
+            'type': 'comment',
+            'at': comment.created_at,
+            'user': comment.user.get_full_name() if comment.user else None,
+            'comment': comment.comment,
+            'is_internal': comment.is_internal,
+        }
+        for comment in comments
+    )
+    events.sort(key=lambda event: event['at'])
+    return events
+
+
+class TrackedRequestMixin:
+    """ViewSet mixin: uma tracking_scope por requisição (usuário e IP da requisição)"""
+
+    def dispatch(self, request, *args, **kwargs):
+        # A scope envolve o dispatch inteiro: é fechada mesmo quando a view levanta exceção não tratada
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        ip_address = forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR')
+        with tracking_scope(ip_address=ip_address or None) as scope:
+            self._history_scope = scope
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # O usuário só é conhecido depois da autenticação do DRF
+        if request.user.is_authenticated:
+            self._history_scope['user'] = request.user
+
+
+post_save.connect(_on_save, sender=Issue, dispatch_uid='issue_history_on_save')
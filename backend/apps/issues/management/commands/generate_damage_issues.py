@@ -0,0 +1,27 @@
+"""
+Management command to create issues from CargoSnap damage uploads
+Usage: python manage.py generate_damage_issues [--file-id 123 ...] [--chunk-size 500]
+Without --file-id every historical upload is processed (backfill).
+"""
+from django.core.management.base import BaseCommand
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.issues.damage_issues import DamageIssueGenerator
+
+
+class Command(BaseCommand):
+    help = 'Cria ocorrências para os uploads CargoSnap com avaria ainda sem ocorrência'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file-id', type=int, nargs='+', help='IDs CargoSnap dos arquivos (padrão: todos)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Uploads por lote')
+
+    def handle(self, *args, **options):
+        uploads = CargoSnapUpload.objects.all()
+        if options['file_id']:
+            uploads = uploads.filter(file__cargosnap_id__in=options['file_id'])
+        stats = DamageIssueGenerator(chunk_size=options['chunk_size']).run(uploads, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['issues_created']} ocorrências criadas, {stats['photos_linked']} fotos vinculadas, "
+            f"{stats['uploads_ignored']} avarias ignoradas por regra, "
+            f"{stats['uploads_unlinked']} sem inspeção"
+        ))
@@ -0,0 +1,25 @@
+"""
+Management command to run the issue SLA worker
+Usage: python manage.py run_sla_worker [--poll-interval 30]
+"""
+from django.core.management.base import BaseCommand
+from apps.issues.sla import SLAScheduler, set_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Dispara avisos e violações de SLA das ocorrências (processo contínuo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=int, default=None,
+                            help='Segundos máximos até ler as ocorrências alteradas (padrão: SLA_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        scheduler = SLAScheduler()
+        set_scheduler(scheduler)
+        self.stdout.write(self.style.SUCCESS('Worker de SLA iniciado'))
+        try:
+            scheduler.run_forever(poll_interval=options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker de SLA encerrado')
+        finally:
+            set_scheduler(None)
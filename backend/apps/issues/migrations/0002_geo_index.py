@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0008_geo_index'),
+        ('issues', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['company', 'latitude', 'longitude'], name='issues_issu_company_166847_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_webhook_sla_events'),
+        ('inspections', '0009_structure_item_version'),
+        ('issues', '0002_geo_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='sla_breached_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='sla_warned_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['sla_breached_at', 'due_date'], name='issues_issu_sla_bre_e08b07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['updated_at'], name='issues_issu_updated_f60a88_idx'),
+        ),
+    ]
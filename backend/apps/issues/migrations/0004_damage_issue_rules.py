@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-19 19:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargosnap_integration', '0004_import_job'),
+        ('core', '0003_webhook_sla_events'),
+        ('issues', '0003_sla_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issuephoto',
+            name='cargosnap_upload',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='issue_photo', to='cargosnap_integration.cargosnapupload'),
+        ),
+        migrations.CreateModel(
+            name='DamageIssueRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=200)),
+                ('damage_type_id', models.IntegerField(blank=True, null=True)),
+                ('workflow_step_id', models.IntegerField(blank=True, null=True)),
+                ('priority', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('CRITICAL', 'Critical')], default='MEDIUM', max_length=20)),
+                ('severity', models.CharField(choices=[('MINOR', 'Minor'), ('MODERATE', 'Moderate'), ('MAJOR', 'Major'), ('CRITICAL', 'Critical')], default='MODERATE', max_length=20)),
+                ('create_issue', models.BooleanField(default=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='issues.issuecategory')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='damage_issue_rules', to='core.company')),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['company', 'is_active'], name='issues_dama_company_1cfc81_idx')],
+            },
+        ),
+    ]
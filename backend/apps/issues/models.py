@@ -3,6 +3,7 @@ Models for Issues app
 Issue/Problem management system with tracking and resolution
 """
 from django.db import models
+from apps.core.geo import encode_geohash, expand_update_fields
 from apps.core.models import User, Company, BaseModel
 from apps.inspections.models import Inspection
 
@@ -78,6 +79,7 @@ class Issue(BaseModel):
     location = models.CharField(max_length=200, blank=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
     
     # Dates
     detected_at = models.DateTimeField(auto_now_add=True)
@@ -85,6 +87,10 @@ class Issue(BaseModel):
     resolved_at = models.DateTimeField(null=True, blank=True)
     closed_at = models.DateTimeField(null=True, blank=True)
     
+    # SLA (preenchidos pelo worker de SLA, sla.py)
+    sla_warned_at = models.DateTimeField(null=True, blank=True)
+    sla_breached_at = models.DateTimeField(null=True, blank=True)
+    
     # Resolution
     resolved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='resolved_issues')
     resolution_notes = models.TextField(blank=True)
@@ -98,6 +104,14 @@ class Issue(BaseModel):
     # Additional data
     custom_fields = models.JSONField(default=dict, blank=True)
     
+    GEO_DERIVED_FIELDS = ['geohash']
+    
+    # Campos (attname) registrados no IssueHistory (history.py)
+    HISTORY_FIELDS = [
+        'status', 'priority', 'severity', 'category_id', 'assigned_to_id', 'assigned_team',
+        'title', 'location', 'due_date', 'resolution_notes', 'estimated_cost', 'actual_cost',
+    ]
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -105,18 +119,35 @@ class Issue(BaseModel):
             models.Index(fields=['reference_number']),
             models.Index(fields=['assigned_to', 'status']),
             models.Index(fields=['priority', 'status']),
+            models.Index(fields=['company', 'latitude', 'longitude']),
+            models.Index(fields=['sla_breached_at', 'due_date']),
+            models.Index(fields=['updated_at']),
         ]
     
     def __str__(self):
         return f"{self.reference_number} - {self.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores carregados: base do diff do histórico, sem nova consulta
+        loaded = instance.__dict__
+        instance._history_snapshot = {name: loaded[name] for name in cls.HISTORY_FIELDS if name in loaded}
+        return instance
+    
     def save(self, *args, **kwargs):
         # Auto-generate reference number if not provided
         if not self.reference_number:
-            from django.utils import timezone
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            self.reference_number = f"ISS-{self.company.company_type}-{timestamp}"
+            from apps.core.sequences import next_reference
+            self.reference_number = next_reference(self.company, f"ISS-{self.company.company_type}")
+        self.refresh_coordinates()
+        expand_update_fields(kwargs, ['latitude', 'longitude'], self.GEO_DERIVED_FIELDS)
+        from .sla import apply_sla
+        apply_sla(self, kwargs)
         super().save(*args, **kwargs)
+    
+    def refresh_coordinates(self):
+        self.geohash = encode_geohash(self.latitude, self.longitude)
 
 
 class IssuePhoto(BaseModel):
@@ -141,6 +172,15 @@ class IssuePhoto(BaseModel):
     
     sequence_number = models.IntegerField(default=0)
     
+    # Upload CargoSnap de origem (ocorrências geradas de avarias, damage_issues.py)
+    cargosnap_upload = models.OneToOneField(
+        'cargosnap_integration.CargoSnapUpload',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='issue_photo'
+    )
+    
     class Meta:
         ordering = ['sequence_number', 'created_at']
     
@@ -238,6 +278,38 @@ class IssueHistory(models.Model):
         return f"{self.issue.reference_number} - {self.action} by {self.user}"
 
 
+class DamageIssueRule(BaseModel):
+    """
+    Maps CargoSnap damages to issue category/priority (damage_issues.py)
+
+    Blank damage_type_id/workflow_step_id match any value; the rule with the
+    most matching criteria wins.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='damage_issue_rules')
+    name = models.CharField(max_length=200)
+    
+    # Critérios (IDs do CargoSnap)
+    damage_type_id = models.IntegerField(null=True, blank=True)
+    workflow_step_id = models.IntegerField(null=True, blank=True)
+    
+    # Ocorrência gerada
+    category = models.ForeignKey(IssueCategory, on_delete=models.SET_NULL, null=True, blank=True)
+    priority = models.CharField(max_length=20, choices=Issue.PRIORITY_CHOICES, default='MEDIUM')
+    severity = models.CharField(max_length=20, choices=Issue.SEVERITY_CHOICES, default='MODERATE')
+    create_issue = models.BooleanField(default=True)  # False: avarias ignoradas
+    
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['company', 'is_active']),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+
 class IssueTemplate(BaseModel):
     """Templates for common issues"""
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='issue_templates')
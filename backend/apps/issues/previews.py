@@ -0,0 +1,84 @@
+"""
+Issue sub-resources for Issues app
+Photos, comments, tasks and history are not inlined in full in the issue
+detail: it carries the latest ISSUE_PREVIEW_SIZE rows of each (one sliced
+prefetch per sub-resource) plus their totals (correlated COUNT subqueries),
+and the complete lists are served paginated by the sub-resource endpoints of
+IssueViewSet. Query count for a detail is fixed regardless of the number of
+rows.
+"""
+from django.conf import settings
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import IssueComment, IssueHistory, IssuePhoto, IssueTask
+
+# {nome: (modelo, ordenação da prévia - mais recentes primeiro)}
+SUB_RESOURCES = {
+    'photos': (IssuePhoto, ('-created_at', '-id')),
+    'comments': (IssueComment, ('-created_at', '-id')),
+    'tasks': (IssueTask, ('-created_at', '-id')),
+    'history': (IssueHistory, ('-changed_at', '-id')),
+}
+
+
+def preview_size():
+    return getattr(settings, 'ISSUE_PREVIEW_SIZE', 5)
+
+
+def hides_internal(user):
+    """Clientes não veem comentários internos"""
+    return getattr(user, 'role', None) == 'CLIENT'
+
+
+def sub_resource_queryset(name, public_only=False):
+    """Queryset de um sub-recurso com as relações que o serializer usa"""
+    model = SUB_RESOURCES[name][0]
+    queryset = model.objects.all()
+    if name == 'photos':
+        queryset = queryset.select_related('taken_by')
+    elif name == 'comments':
+        queryset = queryset.select_related('user').prefetch_related('attachments')
+        if public_only:
+            queryset = queryset.filter(is_internal=False)
+    elif name == 'tasks':
+        queryset = queryset.select_related('assigned_to', 'completed_by')
+    elif name == 'history':
+        queryset = queryset.select_related('user')
+    return queryset
+
+
+def _count(name, public_only):
+    rows = sub_resource_queryset(name, public_only).filter(issue=OuterRef('pk')).order_by()
+    subquery = Subquery(rows.values('issue').annotate(n=Count('pk')).values('n'), output_field=IntegerField())
+    return Coalesce(subquery, Value(0))
+
+
+def with_previews(queryset, names, public_only=False):
+    """
+    Anota os totais e pré-carrega as prévias dos sub-recursos em `names`
+
+    `names` são nomes de campos do serializer: <nome> pede a prévia
+    (preview_<nome>, lista) e <nome>_count o total.
+    """
+    size = preview_size()
+    prefetches = [
+        Prefetch(
+            name,
+            queryset=sub_resource_queryset(name, public_only).order_by(*SUB_RESOURCES[name][1])[:size],
+            to_attr=f'preview_{name}',
+        )
+        for name in SUB_RESOURCES if name in names
+    ]
+    counts = {f'{name}_count': _count(name, public_only) for name in SUB_RESOURCES if f'{name}_count' in names}
+    return queryset.annotate(**counts).prefetch_related(*prefetches)
+
+
+def has_previews(issue, names):
+    """A instância já tem as prévias e totais pedidos em `names`?"""
+    return all(
+        hasattr(issue, attr)
+        for name in SUB_RESOURCES
+        for field, attr in ((name, f'preview_{name}'), (f'{name}_count', f'{name}_count'))
+        if field in names
+    )
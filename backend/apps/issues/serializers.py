@@ -2,10 +2,12 @@
 Serializers for Issues app
 """
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetSerializerMixin
 from .models import (
     IssueCategory, Issue, IssuePhoto, IssueComment,
-    IssueAttachment, IssueTask, IssueHistory, IssueTemplate
+    IssueAttachment, IssueTask, IssueHistory, IssueTemplate, DamageIssueRule
 )
+from .previews import SUB_RESOURCES, has_previews, hides_internal, with_previews
 
 
 class IssueCategorySerializer(serializers.ModelSerializer):
@@ -80,7 +82,7 @@ class IssueHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['changed_at']
 
 
-class IssueListSerializer(serializers.ModelSerializer):
+class IssueListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Lightweight for list views"""
     company_name = serializers.CharField(source='company.name', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -93,15 +95,20 @@ class IssueListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'company', 'company_name', 'inspection', 'inspection_reference',
             'category', 'category_name', 'reference_number', 'title',
-            'priority', 'severity', 'status',
+            'priority', 'severity', 'status', 'latitude', 'longitude',
             'reported_by', 'reported_by_name', 'assigned_to', 'assigned_to_name',
             'detected_at', 'due_date', 'resolved_at', 'created_at'
         ]
         read_only_fields = ['reference_number', 'detected_at', 'created_at']
 
 
-class IssueDetailSerializer(serializers.ModelSerializer):
-    """Complete for detail views"""
+class IssueDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    Complete for detail views
+
+    photos/comments/tasks/history are previews with the latest rows (see
+    previews.py); the full lists come from the issue's sub-resource endpoints.
+    """
     company_name = serializers.CharField(source='company.name', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     inspection_reference = serializers.CharField(source='inspection.reference_number', read_only=True)
@@ -109,10 +116,14 @@ class IssueDetailSerializer(serializers.ModelSerializer):
     assigned_to_name = serializers.CharField(source='assigned_to.full_name', read_only=True)
     resolved_by_name = serializers.CharField(source='resolved_by.full_name', read_only=True)
     
-    photos = IssuePhotoSerializer(many=True, read_only=True)
-    comments = IssueCommentSerializer(many=True, read_only=True)
-    tasks = IssueTaskSerializer(many=True, read_only=True)
-    history = IssueHistorySerializer(many=True, read_only=True)
+    photos = IssuePhotoSerializer(source='preview_photos', many=True, read_only=True)
+    comments = IssueCommentSerializer(source='preview_comments', many=True, read_only=True)
+    tasks = IssueTaskSerializer(source='preview_tasks', many=True, read_only=True)
+    history = IssueHistorySerializer(source='preview_history', many=True, read_only=True)
+    photos_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+    tasks_count = serializers.IntegerField(read_only=True)
+    history_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Issue
@@ -123,13 +134,31 @@ class IssueDetailSerializer(serializers.ModelSerializer):
             'reported_by', 'reported_by_name', 'assigned_to', 'assigned_to_name',
             'assigned_team', 'location', 'latitude', 'longitude',
             'detected_at', 'due_date', 'resolved_at', 'closed_at',
+            'sla_warned_at', 'sla_breached_at',
             'resolved_by', 'resolved_by_name', 'resolution_notes',
             'root_cause', 'preventive_action',
             'estimated_cost', 'actual_cost', 'custom_fields',
             'photos', 'comments', 'tasks', 'history',
+            'photos_count', 'comments_count', 'tasks_count', 'history_count',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['reference_number', 'detected_at', 'created_at', 'updated_at']
+        read_only_fields = [
+            'reference_number', 'detected_at', 'sla_warned_at', 'sla_breached_at', 'created_at', 'updated_at'
+        ]
+        # Prévias e totais vêm de with_previews, não de colunas
+        sparse_field_sources = {
+            **{name: [] for name in SUB_RESOURCES},
+            **{f'{name}_count': [] for name in SUB_RESOURCES},
+        }
+    
+    def to_representation(self, instance):
+        names = set(self.fields)
+        if not has_previews(instance, names):
+            # Instância recém-criada/atualizada: carrega as prévias pelo mesmo plano
+            request = self.context.get('request')
+            public_only = hides_internal(getattr(request, 'user', None))
+            instance = with_previews(Issue.objects.filter(pk=instance.pk), names, public_only).get()
+        return super().to_representation(instance)
 
 
 class IssueTemplateSerializer(serializers.ModelSerializer):
@@ -144,3 +173,16 @@ class IssueTemplateSerializer(serializers.ModelSerializer):
             'usage_count', 'is_active', 'created_at'
         ]
         read_only_fields = ['usage_count', 'created_at']
+
+
+class DamageIssueRuleSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = DamageIssueRule
+        fields = [
+            'id', 'company', 'name', 'damage_type_id', 'workflow_step_id',
+            'category', 'category_name', 'priority', 'severity',
+            'create_issue', 'is_active', 'created_at'
+        ]
+        read_only_fields = ['company', 'created_at']
@@ -0,0 +1,224 @@
+"""
+SLA deadlines for Issues app
+New issues get due_date from their category's default_sla_hours. The SLA
+worker (run_sla_worker) keeps a min-heap with the warning and breach instant of
+every open issue: it is loaded once from an indexed query (sla_breached_at,
+due_date) and then kept current from issue writes - directly through post_save
+when the scheduler runs in the same process, otherwise by reading only the rows
+changed since the last poll (updated_at index, re-reading an overlap window
+for rows committed after their updated_at). The worker sleeps until the
+next deadline or the next poll; there is no periodic scan of the table.
+
+Stale heap entries (issue resolved, due_date moved) are discarded when popped.
+Warnings and breaches are stamped with a conditional UPDATE, so a deadline
+fires once even with more than one worker running.
+"""
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from apps.core.geo import expand_update_fields
+from .models import Issue, IssueHistory
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('OPEN', 'IN_PROGRESS', 'REOPENED')
+WARNING = 'warning'
+BREACH = 'breach'
+EVENT_TYPES = {WARNING: 'issue.sla_warning', BREACH: 'issue.sla_breached'}
+STAMP_FIELDS = {WARNING: 'sla_warned_at', BREACH: 'sla_breached_at'}
+SCHEDULE_FIELDS = ('id', 'status', 'detected_at', 'due_date', 'sla_warned_at', 'sla_breached_at')
+
+
+def apply_sla(issue, save_kwargs):
+    """
+    Chamado por Issue.save: prazo padrão da categoria na criação; prazo
+    alterado depois de um aviso/violação reinicia o SLA
+    """
+    if issue._state.adding:
+        if issue.due_date is None and issue.category_id:
+            issue.due_date = timezone.now() + timedelta(hours=issue.category.default_sla_hours)
+        return
+    loaded = getattr(issue, '_history_snapshot', {})
+    if 'due_date' in loaded and loaded['due_date'] != issue.due_date and (issue.sla_warned_at or issue.sla_breached_at):
+        issue.sla_warned_at = issue.sla_breached_at = None
+        expand_update_fields(save_kwargs, ['due_date'], list(STAMP_FIELDS.values()))
+
+
+def warning_at(detected_at, due_date):
+    """Instante do aviso: SLA_WARNING_RATIO da janela entre a detecção e o prazo"""
+    if detected_at is None or detected_at >= due_date:
+        return due_date
+    ratio = getattr(settings, 'SLA_WARNING_RATIO', 0.8)
+    return detected_at + (due_date - detected_at) * ratio
+
+
+class SLAScheduler:
+    """Heap de prazos (instante, issue_id, tipo, due_date) das ocorrências abertas"""
+
+    def __init__(self):
+        self._heap = []
+        self._due_dates = {}  # issue_id -> due_date agendado (entradas divergentes estão obsoletas)
+        self._lock = threading.Lock()
+        self.watermark = None
+
+    def __len__(self):
+        return len(self._due_dates)
+
+    def load(self):
+        """Carrega as ocorrências abertas com prazo (uma consulta pelo índice de SLA)"""
+        self.watermark = timezone.now()
+        rows = Issue.objects.filter(
+            sla_breached_at__isnull=True, due_date__isnull=False, status__in=ACTIVE_STATUSES
+        ).order_by().values_list(*SCHEDULE_FIELDS)
+        with self._lock:
+            self._heap = []
+            self._due_dates = {}
+            for row in rows:
+                self._schedule(*row)
+
+    def _schedule(self, issue_id, status, detected_at, due_date, warned_at, breached_at):
+        if status not in ACTIVE_STATUSES or due_date is None or breached_at is not None:
+            self._due_dates.pop(issue_id, None)
+            return
+        if self._due_dates.get(issue_id) == due_date:
+            return
+        self._due_dates[issue_id] = due_date
+        if warned_at is None:
+            heapq.heappush(self._heap, (warning_at(detected_at, due_date), issue_id, WARNING, due_date))
+        heapq.heappush(self._heap, (due_date, issue_id, BREACH, due_date))
+
+    def update(self, issue):
+        """Reagenda uma ocorrência gravada"""
+        with self._lock:
+            self._schedule(*(getattr(issue, field) for field in SCHEDULE_FIELDS))
+
+    def refresh(self):
+        """Reagenda as ocorrências alteradas desde a última leitura (índice de updated_at)"""
+        if self.watermark is None:
+            self.load()
+            return
+        since, self.watermark = self.watermark, timezone.now()
+        # updated_at é gravado antes do commit: relê uma janela anterior para não perder transações longas
+        overlap = timedelta(seconds=getattr(settings, 'SLA_REFRESH_OVERLAP', 300))
+        rows = Issue.objects.filter(updated_at__gte=since - overlap).order_by().values_list(*SCHEDULE_FIELDS)
+        with self._lock:
+            for row in rows:
+                self._schedule(*row)
+
+    def next_deadline(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now=None):
+        """
+        Dispara os avisos e violações vencidos até `now`
+
+        Returns:
+            Lista de (issue_id, tipo) disparados
+        """
+        now = now or timezone.now()
+        fired = []
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, issue_id, kind, due_date = heapq.heappop(self._heap)
+                if self._due_dates.get(issue_id) != due_date:
+                    continue
+                if kind == BREACH:
+                    del self._due_dates[issue_id]
+            if fire(issue_id, kind, due_date, now):
+                fired.append((issue_id, kind))
+        return fired
+
+    def run_forever(self, poll_interval=None, stop_event=None):
+        """Loop do worker: dorme até o próximo prazo ou a próxima leitura de alterações"""
+        poll_interval = poll_interval or getattr(settings, 'SLA_POLL_INTERVAL', 30)
+        stop_event = stop_event or threading.Event()
+        self.load()
+        logger.info(f"Worker de SLA iniciado com {len(self)} ocorrências")
+        while not stop_event.is_set():
+            self.refresh()
+            self.run_due()
+            close_old_connections()
+            wait = poll_interval
+            deadline = self.next_deadline()
+            if deadline is not None:
+                wait = min(wait, max((deadline - timezone.now()).total_seconds(), 0))
+            stop_event.wait(wait)
+
+
+def fire(issue_id, kind, due_date, now):
+    """Registra o aviso/violação (uma única vez) e notifica; retorna True se disparou"""
+    stamp = STAMP_FIELDS[kind]
+    updated = Issue.objects.filter(
+        pk=issue_id, due_date=due_date, status__in=ACTIVE_STATUSES, **{f'{stamp}__isnull': True}
+    ).update(**{stamp: now})
+    if not updated:
+        return False
+    notify(Issue.objects.select_related('assigned_to', 'reported_by').get(pk=issue_id), kind, now)
+    return True
+
+
+def notify(issue, kind, now):
+    """Notificação ao responsável (ou a quem reportou), webhooks e histórico"""
+    from apps.core.models import Notification
+    from apps.core.webhooks import dispatch_event
+    from .history import record
+
+    overdue = kind == BREACH
+    title = f"SLA {'violado' if overdue else 'próximo do vencimento'}: {issue.reference_number}"
+    message = (
+        f"A ocorrência {issue.reference_number} ({issue.title}) "
+        f"{'ultrapassou o' if overdue else 'está próxima do'} prazo de "
+        f"{timezone.localtime(issue.due_date):%d/%m/%Y %H:%M}."
+    )
+    recipient = issue.assigned_to or issue.reported_by
+    if recipient is not None:
+        Notification.objects.create(
+            company_id=issue.company_id, user=recipient, title=title, message=message,
+            notification_type='ERROR' if overdue else 'WARNING',
+            related_model='Issue', related_id=str(issue.pk),
+            data={'kind': kind, 'due_date': issue.due_date.isoformat()},
+        )
+    dispatch_event(issue.company_id, EVENT_TYPES[kind], {
+        'issue_id': issue.pk,
+        'reference_number': issue.reference_number,
+        'title': issue.title,
+        'priority': issue.priority,
+        'status': issue.status,
+        'due_date': issue.due_date,
+        'assigned_to': issue.assigned_to_id,
+        'at': now,
+    })
+    record([IssueHistory(
+        issue_id=issue.pk, action=EVENT_TYPES[kind].split('.')[1], field_name='due_date', new_value=issue.due_date.isoformat(),
+    )])
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Scheduler ativo neste processo (None fora do worker)"""
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    global _scheduler
+    _scheduler = scheduler
+
+
+def _on_save(sender, instance, raw=False, **kwargs):
+    if not raw and _scheduler is not None:
+        _scheduler.update(instance)
+
+
+post_save.connect(_on_save, sender=Issue, dispatch_uid='issue_sla_on_save')
@@ -0,0 +1,470 @@
+"""
+Tests for Issues app
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from apps.cargosnap_integration.models import CargoSnapFile, CargoSnapUpload
+from apps.core.models import Company, Notification, User, Webhook, WebhookLog
+from apps.inspections.models import Inspection, InspectionType
+from apps.issues.damage_issues import DamageIssueGenerator, generate_for_files
+from apps.issues import history
+from apps.issues.history import TrackedRequestMixin, tracking_scope, update_issues
+from apps.issues.models import (
+    DamageIssueRule, Issue, IssueAttachment, IssueCategory, IssueComment, IssueHistory, IssuePhoto, IssueTask
+)
+from apps.issues.sla import BREACH, WARNING, SLAScheduler, set_scheduler
+
+
+class IssueHistoryTest(TestCase):
+    """Tests for the automatic, batched issue change tracking"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='manager', password='testpass123', company=self.company, role='MANAGER',
+            first_name='Ana', last_name='Souza',
+        )
+        inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        self.inspection = Inspection.objects.create(
+            company=self.company, inspection_type=inspection_type, title='Container'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.issue = Issue.objects.create(
+                company=self.company, inspection=self.inspection, title='Lacre violado', reported_by=self.user
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create_and_field_changes_are_recorded(self):
+        created = IssueHistory.objects.get(issue=self.issue)
+        self.assertEqual((created.action, created.user, created.new_value), ('created', self.user, 'OPEN'))
+
+        issue = Issue.objects.get(pk=self.issue.pk)
+        issue.status = 'IN_PROGRESS'
+        issue.assigned_to = self.user
+        issue.description = 'Não rastreado'
+        # Diff contra os valores carregados: sem SELECT (UPDATE, índice de busca e INSERT do histórico)
+        with self.assertNumQueries(3):
+            with tracking_scope(user=self.user, ip_address='10.0.0.1'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    issue.save()
+        changes = {
+            entry.field_name: (entry.action, entry.old_value, entry.new_value, entry.ip_address)
+            for entry in IssueHistory.objects.filter(issue=self.issue).exclude(action='created')
+        }
+        self.assertEqual(changes, {
+            'status': ('status_changed', 'OPEN', 'IN_PROGRESS', '10.0.0.1'),
+            'assigned_to': ('assigned', '', str(self.user.pk), '10.0.0.1'),
+        })
+
+        # update_fields limita o diff aos campos gravados
+        issue.priority = 'HIGH'
+        issue.title = 'Lacre rompido'
+        with self.captureOnCommitCallbacks(execute=True):
+            issue.save(update_fields=['priority'])
+        self.assertEqual(
+            list(IssueHistory.objects.filter(action='priority_changed').values_list('old_value', 'new_value')),
+            [('MEDIUM', 'HIGH')]
+        )
+        self.assertFalse(IssueHistory.objects.filter(field_name='title').exists())
+
+    def test_scope_writes_one_batch(self):
+        issues = [self.issue] + [
+            Issue.objects.create(company=self.company, inspection=self.inspection, title=f'Avaria {n}')
+            for n in range(3)
+        ]
+        issues = list(Issue.objects.filter(pk__in=[issue.pk for issue in issues]))
+        # Quatro UPDATEs (e índices de busca) e um único INSERT ao fechar a scope
+        with self.assertNumQueries(9):
+            with tracking_scope(user=self.user) as scope:
+                with self.captureOnCommitCallbacks(execute=True):
+                    for issue in issues:
+                        issue.status = 'CLOSED'
+                        issue.save()
+                self.assertEqual(len(scope['entries']), 4)
+        self.assertEqual(IssueHistory.objects.filter(action='status_changed', user=self.user).count(), 4)
+
+    def test_update_issues_records_history_in_bulk(self):
+        other = Issue.objects.create(company=self.company, inspection=self.inspection, title='Avaria', priority='LOW')
+        # Savepoint, leitura dos valores anteriores, UPDATE e um bulk_create após o commit
+        with self.assertNumQueries(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                updated = update_issues(
+                    Issue.objects.filter(company=self.company), user=self.user, priority='LOW', assigned_to=self.user
+                )
+        self.assertEqual(updated, 2)
+        self.assertEqual(
+            sorted(IssueHistory.objects.filter(user=self.user).exclude(action='created')
+                   .values_list('issue_id', 'field_name')),
+            sorted([(self.issue.pk, 'priority'), (self.issue.pk, 'assigned_to'), (other.pk, 'assigned_to')])
+        )
+
+    def test_resolve_endpoint_and_timeline(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/issues/issues/{self.issue.pk}/resolve/', {'notes': 'Lacre substituído'},
+                REMOTE_ADDR='192.168.0.5',
+            )
+        self.assertEqual(response.status_code, 200)
+        entry = IssueHistory.objects.get(issue=self.issue, action='status_changed')
+        self.assertEqual((entry.user, entry.new_value), (self.user, 'RESOLVED'))
+        IssueComment.objects.create(issue=self.issue, user=self.user, comment='Verificado')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/issues/issues/{self.issue.pk}/timeline/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(event['type'], event.get('action')) for event in response.data],
+            [('history', 'created'), ('history', 'status_changed'), ('history', 'updated'), ('comment', None)]
+        )
+        self.assertEqual(response.data[-1]['user'], 'Ana Souza')
+
+        # Clientes não veem comentários internos
+        IssueComment.objects.create(issue=self.issue, user=self.user, comment='Aberto ao cliente', is_internal=False)
+        client_user = User.objects.create_user(
+            username='cliente', password='testpass123', company=self.company, role='CLIENT'
+        )
+        self.client.force_authenticate(client_user)
+        response = self.client.get(f'/api/issues/issues/{self.issue.pk}/timeline/')
+        self.assertEqual(
+            [event['comment'] for event in response.data if event['type'] == 'comment'], ['Aberto ao cliente']
+        )
+
+    def test_scope_is_closed_when_view_raises(self):
+        seen_users = []
+
+        class FailingView(TrackedRequestMixin, APIView):
+            def get(self, request):
+                seen_users.append(history._scope()['user'])
+                raise RuntimeError('falha inesperada')
+
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.user)
+        view = FailingView.as_view()
+        with self.assertRaises(RuntimeError):
+            view(request)
+        self.assertEqual(seen_users, [self.user])
+        self.assertIsNone(history._scope())
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, SLA_WARNING_RATIO=0.8)
+class IssueSLATest(TestCase):
+    """Tests for SLA due dates and the deadline heap worker"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='operator', password='testpass123', company=self.company, role='OPERATOR'
+        )
+        inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        self.inspection = Inspection.objects.create(
+            company=self.company, inspection_type=inspection_type, title='Container'
+        )
+        self.category = IssueCategory.objects.create(company=self.company, name='Lacre', default_sla_hours=10)
+
+    def _issue(self, **kwargs):
+        return Issue.objects.create(
+            company=self.company, inspection=self.inspection, category=self.category,
+            title='Lacre violado', assigned_to=self.user, **kwargs
+        )
+
+    def test_due_date_from_category(self):
+        before = timezone.now()
+        issue = self._issue()
+        self.assertTrue(before + timedelta(hours=10) <= issue.due_date <= timezone.now() + timedelta(hours=10))
+        explicit = timezone.now() + timedelta(days=3)
+        self.assertEqual(self._issue(due_date=explicit).due_date, explicit)
+
+    def test_warning_and_breach_fire_once(self):
+        issue = self._issue()
+        Issue.objects.create(company=self.company, inspection=self.inspection, title='Sem prazo')
+        Webhook.objects.create(company=self.company, name='ERP', url='https://erp.example.com/hook',
+                               event_type='issue.sla_breached', secret_key='segredo')
+
+        scheduler = SLAScheduler()
+        with self.assertNumQueries(1):
+            scheduler.load()
+        self.assertEqual(len(scheduler), 1)
+
+        start = issue.detected_at
+        self.assertEqual(scheduler.run_due(start + timedelta(hours=7)), [])
+        self.assertEqual(scheduler.run_due(start + timedelta(hours=8, minutes=1)), [(issue.pk, WARNING)])
+
+        response = mock.Mock(status_code=200, text='ok', ok=True)
+        with mock.patch('apps.core.webhooks.requests.post', return_value=response) as post, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(scheduler.run_due(issue.due_date + timedelta(minutes=1)), [(issue.pk, BREACH)])
+        self.assertIn('X-Webhook-Signature', post.call_args.kwargs['headers'])
+
+        issue.refresh_from_db()
+        self.assertIsNotNone(issue.sla_warned_at)
+        self.assertIsNotNone(issue.sla_breached_at)
+        self.assertEqual(
+            list(Notification.objects.filter(user=self.user).order_by('created_at')
+                 .values_list('notification_type', flat=True)),
+            ['WARNING', 'ERROR']
+        )
+        self.assertTrue(WebhookLog.objects.get().success)
+        self.assertTrue(IssueHistory.objects.filter(issue=issue, action='sla_breached').exists())
+
+        # Um segundo worker com a mesma ocorrência não dispara de novo
+        other = SLAScheduler()
+        other.load()
+        self.assertEqual(len(other), 0)
+        self.assertEqual(scheduler.run_due(issue.due_date + timedelta(days=1)), [])
+
+    def test_writes_reschedule_the_heap(self):
+        resolved = self._issue()
+        extended = self._issue()
+        scheduler = SLAScheduler()
+        scheduler.load()
+        set_scheduler(scheduler)
+        try:
+            resolved.status = 'RESOLVED'
+            resolved.save()
+            original_due = extended.due_date
+            extended.due_date = original_due + timedelta(days=1)
+            extended.save()
+            added = self._issue()
+        finally:
+            set_scheduler(None)
+
+        # O aviso da ocorrência prorrogada passa para 80% da nova janela (34 h)
+        fired = scheduler.run_due(original_due + timedelta(minutes=1))
+        self.assertEqual(fired, [(added.pk, WARNING), (added.pk, BREACH)])
+        self.assertEqual(scheduler.run_due(original_due + timedelta(hours=18))[0], (extended.pk, WARNING))
+
+    def test_refresh_reads_only_changed_issues(self):
+        issue = self._issue()
+        scheduler = SLAScheduler()
+        scheduler.load()
+        # Escrita em outro processo: vista na próxima leitura por updated_at
+        Issue.objects.filter(pk=issue.pk).update(status='CLOSED', updated_at=timezone.now())
+        with self.assertNumQueries(1):
+            scheduler.refresh()
+        self.assertEqual(len(scheduler), 0)
+        self.assertEqual(scheduler.run_due(issue.due_date + timedelta(minutes=1)), [])
+
+    def test_refresh_sees_rows_committed_after_the_watermark(self):
+        scheduler = SLAScheduler()
+        scheduler.load()
+        scheduler.refresh()
+        # Gravada em uma transação longa: updated_at anterior à última leitura, commit depois dela
+        issue = self._issue()
+        Issue.objects.filter(pk=issue.pk).update(updated_at=scheduler.watermark - timedelta(seconds=30))
+        scheduler.refresh()
+        self.assertEqual(len(scheduler), 1)
+        # Linhas relidas sem alteração não duplicam os prazos
+        scheduler.refresh()
+        self.assertEqual(
+            scheduler.run_due(issue.due_date + timedelta(minutes=1)), [(issue.pk, WARNING), (issue.pk, BREACH)]
+        )
+
+
+@override_settings(ISSUE_PREVIEW_SIZE=5)
+class IssueDetailQueryTest(TestCase):
+    """Query-count regression tests for the issue detail and its sub-resources"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='manager', password='testpass123', company=self.company, role='MANAGER'
+        )
+        inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        inspection = Inspection.objects.create(company=self.company, inspection_type=inspection_type, title='Container')
+        self.issue = Issue.objects.create(
+            company=self.company, inspection=inspection, title='Lacre violado', reported_by=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _populate(self, n):
+        for i in range(n):
+            comment = IssueComment.objects.create(
+                issue=self.issue, user=self.user, comment=f'Comentário {i}', is_internal=i % 2 == 0
+            )
+            IssueAttachment.objects.create(comment=comment, file=f'issues/attachments/{i}.pdf', file_name=f'{i}.pdf')
+            IssuePhoto.objects.create(issue=self.issue, photo=f'issues/photos/{i}.jpg', taken_by=self.user)
+            IssueTask.objects.create(issue=self.issue, title=f'Tarefa {i}', assigned_to=self.user)
+            IssueHistory.objects.create(issue=self.issue, user=self.user, action='updated', field_name='title')
+
+    def _retrieve_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/issues/issues/{self.issue.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_detail_query_count_is_constant(self):
+        self._populate(2)
+        small, _ = self._retrieve_queries()
+        self._populate(30)
+        large, data = self._retrieve_queries()
+        # Ocorrência com totais + 4 prévias + anexos dos comentários
+        self.assertEqual(large, 6)
+        self.assertEqual(small, large)
+
+        self.assertEqual(len(data['comments']), 5)
+        self.assertEqual(data['comments'][0]['comment'], 'Comentário 29')
+        self.assertEqual(len(data['comments'][0]['attachments']), 1)
+        self.assertEqual(
+            (data['comments_count'], data['photos_count'], data['tasks_count'], data['history_count']),
+            (32, 32, 32, IssueHistory.objects.filter(issue=self.issue).count())
+        )
+
+    def test_sparse_detail_skips_unrequested_previews(self):
+        self._populate(3)
+        # Ocorrência com o total pedido (+ company_id adiado, lido por IsSameCompany)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/issues/issues/{self.issue.pk}/?fields=title,comments_count')
+        self.assertEqual(response.data, {'title': 'Lacre violado', 'comments_count': 3})
+
+    def test_sub_resource_endpoints_are_paginated(self):
+        self._populate(30)
+        # Ocorrência, COUNT, página e anexos
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/issues/issues/{self.issue.pk}/comments/')
+        self.assertEqual((response.data['count'], len(response.data['results'])), (30, 25))
+        response = self.client.get(f'/api/issues/issues/{self.issue.pk}/comments/?page=2')
+        self.assertEqual(len(response.data['results']), 5)
+
+        for name in ('photos', 'tasks', 'history'):
+            with self.assertNumQueries(3):
+                response = self.client.get(f'/api/issues/issues/{self.issue.pk}/{name}/')
+            self.assertEqual(response.status_code, 200)
+
+        client_user = User.objects.create_user(
+            username='cliente', password='testpass123', company=self.company, role='CLIENT'
+        )
+        self.client.force_authenticate(client_user)
+        self.assertEqual(self.client.get(f'/api/issues/issues/{self.issue.pk}/comments/').data['count'], 15)
+        self.assertEqual(self.client.get(f'/api/issues/issues/{self.issue.pk}/').data['comments_count'], 15)
+
+
+class DamageIssueGeneratorTest(TestCase):
+    """Tests for the rule-driven issue creation from CargoSnap damages"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        self.now = timezone.now()
+        self.files = []
+        for n in range(2):
+            cargosnap_file = CargoSnapFile.objects.create(
+                cargosnap_id=n + 1, scan_code=f'MSCU{n}', created_at=self.now, updated_at=self.now
+            )
+            Inspection.objects.create(
+                company=self.company, inspection_type=inspection_type, title='Container', cargosnap_file=cargosnap_file
+            )
+            self.files.append(cargosnap_file)
+        self.seal = IssueCategory.objects.create(company=self.company, name='Lacre', default_sla_hours=8)
+        DamageIssueRule.objects.create(
+            company=self.company, name='Lacre', damage_type_id=7, category=self.seal, priority='HIGH'
+        )
+        DamageIssueRule.objects.create(
+            company=self.company, name='Lacre na vistoria final', damage_type_id=7, workflow_step_id=3,
+            category=self.seal, priority='CRITICAL'
+        )
+        DamageIssueRule.objects.create(company=self.company, name='Sujeira', damage_type_id=9, create_issue=False)
+        self.next_id = 100
+
+    def _upload(self, cargosnap_file, damage_type_id, workflow_step_id=None, has_damage=True):
+        self.next_id += 1
+        return CargoSnapUpload.objects.create(
+            file=cargosnap_file, cargosnap_id=self.next_id, tenant_id=1, device_id=1, upload_type='image',
+            created_at=self.now, scan_date_time=self.now, has_damage=has_damage,
+            damage_type_id=damage_type_id, damage_type_desc=f'Tipo {damage_type_id}', workflow_step_id=workflow_step_id,
+            image_path='x', image_url='http://example.com/x.jpg', image_thumb='http://example.com/t.jpg',
+            local_image_path=f'cargosnap/{self.next_id}.jpg',
+        )
+
+    def test_rules_group_and_idempotency(self):
+        first, second = self.files
+        for _ in range(2):
+            self._upload(first, 7)
+        self._upload(first, 7, workflow_step_id=3)
+        self._upload(first, 5)
+        self._upload(first, 9)
+        self._upload(first, 7, has_damage=False)
+        self._upload(second, 7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = DamageIssueGenerator(chunk_size=3).run()
+        self.assertEqual((stats['issues_created'], stats['photos_linked'], stats['uploads_ignored']), (4, 5, 1))
+
+        groups = {
+            (issue.inspection.cargosnap_file_id, issue.category_id, issue.priority): issue.photos.count()
+            for issue in Issue.objects.select_related('inspection')
+        }
+        self.assertEqual(groups, {
+            (first.pk, self.seal.pk, 'HIGH'): 2,
+            (first.pk, self.seal.pk, 'CRITICAL'): 1,
+            (first.pk, None, 'MEDIUM'): 1,
+            (second.pk, self.seal.pk, 'HIGH'): 1,
+        })
+        issue = Issue.objects.get(inspection__cargosnap_file=first, priority='HIGH')
+        self.assertTrue(issue.reference_number.startswith('ISS-ICTSI-'))
+        self.assertAlmostEqual((issue.due_date - issue.detected_at).total_seconds(), 8 * 3600, delta=5)
+        self.assertTrue(IssueHistory.objects.filter(issue=issue, action='created').exists())
+        self.assertEqual(
+            {inspection.cargosnap_file_id: inspection.issue_count for inspection in Inspection.objects.all()},
+            {first.pk: 3, second.pk: 1},
+        )
+
+        # Nova sincronização: nada duplicado, avaria nova entra na ocorrência aberta do grupo
+        self.assertEqual(DamageIssueGenerator().run()['issues_created'], 0)
+        self._upload(first, 7)
+        with self.assertNumQueries(8):
+            stats = generate_for_files([first.pk])
+        self.assertEqual((stats['issues_created'], stats['photos_linked']), (0, 1))
+        self.assertEqual(issue.photos.count(), 3)
+        self.assertEqual(list(issue.photos.values_list('sequence_number', flat=True)), [1, 2, 3])
+
+    def test_unlinked_files_wait_for_backfill(self):
+        orphan = CargoSnapFile.objects.create(cargosnap_id=99, scan_code='TGHU9', created_at=self.now, updated_at=self.now)
+        upload = self._upload(orphan, 7)
+        stats = DamageIssueGenerator().run()
+        self.assertEqual((stats['issues_created'], stats['uploads_unlinked']), (0, 1))
+
+        inspection_type = InspectionType.objects.get(company=self.company)
+        Inspection.objects.create(
+            company=self.company, inspection_type=inspection_type, title='Container', cargosnap_file=orphan
+        )
+        out = StringIO()
+        call_command('generate_damage_issues', stdout=out)
+        self.assertIn('1 ocorrências criadas', out.getvalue())
+        self.assertEqual(IssuePhoto.objects.get(cargosnap_upload=upload).photo.name, upload.local_image_path)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_linking_a_file_creates_its_issues(self):
+        from apps.cargosnap_integration.bulk_import import BulkInspectionImporter
+        from apps.cargosnap_integration.integration_services import CargoSnapInspectionIntegrator
+
+        inspection_type = InspectionType.objects.get(company=self.company)
+        linked, imported = [
+            CargoSnapFile.objects.create(cargosnap_id=n, scan_code=f'TGHU{n}', created_at=self.now, updated_at=self.now)
+            for n in (97, 98)
+        ]
+        uploads = [self._upload(linked, 7), self._upload(imported, 5)]
+        inspection = Inspection.objects.create(
+            company=self.company, inspection_type=inspection_type, title='Container', container_number='TGHU97'
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(CargoSnapInspectionIntegrator().link_existing_inspection_to_cargosnap(inspection, 'TGHU97'))
+        with self.captureOnCommitCallbacks(execute=True):
+            BulkInspectionImporter(self.company, inspection_type, import_photos=False).run([imported])
+
+        self.assertEqual(
+            set(IssuePhoto.objects.values_list('cargosnap_upload_id', 'issue__inspection__cargosnap_file_id')),
+            {(uploads[0].pk, linked.pk), (uploads[1].pk, imported.pk)},
+        )
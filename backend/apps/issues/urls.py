@@ -5,7 +5,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     IssueCategoryViewSet, IssueViewSet, IssuePhotoViewSet,
-    IssueCommentViewSet, IssueTaskViewSet, IssueTemplateViewSet
+    IssueCommentViewSet, IssueTaskViewSet, IssueTemplateViewSet, DamageIssueRuleViewSet
 )
 
 router = DefaultRouter()
@@ -16,6 +16,7 @@ router.register(r'photos', IssuePhotoViewSet, basename='issue-photo')
 router.register(r'comments', IssueCommentViewSet, basename='issue-comment')
 router.register(r'tasks', IssueTaskViewSet, basename='issue-task')
 router.register(r'templates', IssueTemplateViewSet, basename='issue-template')
+router.register(r'damage-rules', DamageIssueRuleViewSet, basename='damage-issue-rule')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -7,14 +7,18 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from apps.core.permissions import IsAuthenticated, IsSameCompany, IsAdminOrManager
+from apps.core.mixins import ExportMixin, GeoQueryMixin, SparseFieldsetMixin
+from apps.search.filters import FullTextSearchFilter, SearchRankOrderingFilter
+from .history import TrackedRequestMixin, timeline
+from .previews import hides_internal, sub_resource_queryset, with_previews
 from .models import (
     IssueCategory, Issue, IssuePhoto, IssueComment,
-    IssueTask, IssueTemplate
+    IssueTask, IssueTemplate, DamageIssueRule
 )
 from .serializers import (
     IssueCategorySerializer, IssueListSerializer, IssueDetailSerializer,
     IssuePhotoSerializer, IssueCommentSerializer, IssueTaskSerializer,
-    IssueTemplateSerializer
+    IssueHistorySerializer, IssueTemplateSerializer, DamageIssueRuleSerializer
 )
 
 
@@ -33,24 +37,87 @@ class IssueCategoryViewSet(viewsets.ModelViewSet):
         serializer.save(company=self.request.user.company)
 
 
-class IssueViewSet(viewsets.ModelViewSet):
+class IssueViewSet(TrackedRequestMixin, ExportMixin, GeoQueryMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """CRUD for Issues"""
     queryset = Issue.objects.all()
     permission_classes = [IsAuthenticated, IsSameCompany]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, SearchRankOrderingFilter]
     filterset_fields = ['status', 'priority', 'severity', 'category', 'assigned_to']
     search_fields = ['reference_number', 'title', 'description']
+    search_doc_type = 'issue'
     ordering_fields = ['created_at', 'due_date', 'priority']
     ordering = ['-created_at']
+    export_resource = 'issues'
+    export_columns = [
+        ('reference_number', 'Referência'),
+        ('title', 'Título'),
+        ('inspection__reference_number', 'Inspeção'),
+        ('category__name', 'Categoria'),
+        ('priority', 'Prioridade'),
+        ('severity', 'Severidade'),
+        ('status', 'Status'),
+        ('assigned_to__username', 'Responsável'),
+        ('assigned_team', 'Equipe'),
+        ('location', 'Local'),
+        ('detected_at', 'Detectada em'),
+        ('due_date', 'Prazo'),
+        ('resolved_at', 'Resolvida em'),
+        ('estimated_cost', 'Custo estimado'),
+        ('actual_cost', 'Custo real'),
+    ]
+    
+    sub_resource_serializers = {
+        'photos': IssuePhotoSerializer,
+        'comments': IssueCommentSerializer,
+        'tasks': IssueTaskSerializer,
+        'history': IssueHistorySerializer,
+    }
     
     def get_queryset(self):
-        return self.queryset.filter(company=self.request.user.company)
+        queryset = self.queryset.filter(company=self.request.user.company)
+        if self.action == 'retrieve':
+            # Plano fixo: totais e prévias apenas dos campos que serão renderizados
+            queryset = with_previews(
+                queryset, set(self.get_serializer().fields), public_only=hides_internal(self.request.user)
+            )
+        return queryset
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'within', 'nearby'):
             return IssueListSerializer
         return IssueDetailSerializer
     
+    def _sub_resource(self, name):
+        """Lista paginada de um sub-recurso da ocorrência"""
+        issue = self.get_object()
+        queryset = sub_resource_queryset(name, public_only=hides_internal(self.request.user)).filter(issue=issue)
+        serializer_class = self.sub_resource_serializers[name]
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer_class(page, many=True, context=context).data)
+        return Response(serializer_class(queryset, many=True, context=context).data)
+    
+    @action(detail=True, methods=['get'], url_path='photos')
+    def photo_list(self, request, pk=None):
+        """Fotos da ocorrência (paginado)"""
+        return self._sub_resource('photos')
+    
+    @action(detail=True, methods=['get'], url_path='comments')
+    def comment_list(self, request, pk=None):
+        """Comentários da ocorrência (paginado)"""
+        return self._sub_resource('comments')
+    
+    @action(detail=True, methods=['get'], url_path='tasks')
+    def task_list(self, request, pk=None):
+        """Tarefas da ocorrência (paginado)"""
+        return self._sub_resource('tasks')
+    
+    @action(detail=True, methods=['get'], url_path='history')
+    def history_list(self, request, pk=None):
+        """Histórico da ocorrência (paginado)"""
+        return self._sub_resource('history')
+    
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
         """Resolve an issue"""
@@ -72,6 +139,11 @@ class IssueViewSet(viewsets.ModelViewSet):
         issue.closed_at = timezone.now()
         issue.save()
         return Response({'status': 'Issue closed'})
+    
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """Histórico e comentários da ocorrência em ordem cronológica"""
+        return Response(timeline(self.get_object(), public_only=hides_internal(request.user)))
 
 
 class IssuePhotoViewSet(viewsets.ModelViewSet):
@@ -132,3 +204,18 @@ class IssueTemplateViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(company=self.request.user.company)
+
+
+class DamageIssueRuleViewSet(viewsets.ModelViewSet):
+    """CRUD for the rules that turn CargoSnap damages into Issues"""
+    queryset = DamageIssueRule.objects.select_related('category')
+    serializer_class = DamageIssueRuleSerializer
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['damage_type_id', 'workflow_step_id', 'category', 'is_active']
+    
+    def get_queryset(self):
+        return self.queryset.filter(company=self.request.user.company)
+    
+    def perform_create(self, serializer):
+        serializer.save(company=self.request.user.company)
@@ -1,7 +1,13 @@
 """
 Admin configuration for Reports app
-Placeholder - to be implemented
 """
 from django.contrib import admin
 
-# Register your models here
+from .models import ExportJob
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['resource', 'file_format', 'status', 'row_count', 'company', 'requested_by', 'created_at']
+    list_filter = ['status', 'resource', 'file_format']
+    readonly_fields = ['filters', 'file', 'error_message', 'started_at', 'finished_at']
@@ -0,0 +1,190 @@
+"""
+CSV/XLSX exports for Reports app
+Rows are read with values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE), so
+no model instances are built and nothing is cached by the queryset: memory
+stays flat regardless of the row count. CSV is streamed to the client as it is
+produced; XLSX is written by xlsxwriter in constant_memory mode to a temporary
+file that is then streamed. Large exports run as an ExportJob in the
+background pool (apps/core/tasks.py).
+"""
+import csv
+import io
+import logging
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files import File
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from apps.core.tasks import run_on_commit
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+XLSX_MAX_ROWS = 1048575  # Limite de linhas de uma planilha (mais o cabeçalho)
+CSV_LINES_PER_CHUNK = 500
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _local(value):
+    return timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Sim' if value else 'Não'
+    if isinstance(value, datetime):
+        return _local(value).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def xlsx_value(value):
+    if isinstance(value, bool):
+        return 'Sim' if value else 'Não'
+    if isinstance(value, datetime):
+        return _local(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def export_rows(queryset, columns, convert):
+    """Linhas (listas) dos campos das colunas, lidas em lotes"""
+    fields = [field for field, _ in columns]
+    for row in queryset.values_list(*fields).iterator(chunk_size=_chunk_size()):
+        yield [convert(value) for value in row]
+
+
+class _Echo:
+    """Pseudo-arquivo: csv.writer devolve a linha em vez de gravá-la"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, columns):
+    """Gera o CSV em pedaços de CSV_LINES_PER_CHUNK linhas (com BOM para o Excel)"""
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff' + writer.writerow([header for _, header in columns])
+    lines = []
+    for row in export_rows(queryset, columns, csv_value):
+        lines.append(writer.writerow(row))
+        if len(lines) >= CSV_LINES_PER_CHUNK:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def write_csv(target, queryset, columns):
+    """Grava o CSV em um arquivo texto aberto; retorna o número de linhas"""
+    writer = csv.writer(target, delimiter=';')
+    target.write('\ufeff')
+    writer.writerow([header for _, header in columns])
+    count = 0
+    for count, row in enumerate(export_rows(queryset, columns, csv_value), start=1):
+        writer.writerow(row)
+    return count
+
+
+def write_xlsx(target, queryset, columns):
+    """
+    Grava a planilha em `target` (caminho ou arquivo binário)
+
+    Returns:
+        Número de linhas de dados
+
+    Raises:
+        ValueError: mais linhas do que uma planilha comporta
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(target, {
+        'constant_memory': True,
+        'default_date_format': 'dd/mm/yyyy hh:mm:ss',
+    })
+    try:
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, [header for _, header in columns], workbook.add_format({'bold': True}))
+        row_number = 0
+        for row_number, row in enumerate(export_rows(queryset, columns, xlsx_value), start=1):
+            if row_number > XLSX_MAX_ROWS:
+                raise ValueError(f'XLSX comporta no máximo {XLSX_MAX_ROWS} linhas; use CSV')
+            worksheet.write_row(row_number, 0, row)
+    finally:
+        workbook.close()
+    return row_number
+
+
+def export_filename(resource, file_format):
+    return f"{resource}_{timezone.localtime():%Y%m%d_%H%M%S}.{file_format}"
+
+
+def export_response(queryset, columns, resource, file_format):
+    """Resposta HTTP com o arquivo (CSV em streaming, XLSX via arquivo temporário)"""
+    filename = export_filename(resource, file_format)
+    if file_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(queryset, columns), content_type=FORMATS['csv'])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    # Arquivo temporário anônimo: removido quando a resposta o fecha
+    output = tempfile.TemporaryFile()
+    write_xlsx(output, queryset, columns)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=FORMATS['xlsx'])
+
+
+def start_export_job(request, resource, file_format, queryset, columns):
+    """Cria o ExportJob e agenda a geração após o commit"""
+    job = ExportJob.objects.create(
+        company=request.user.company,
+        requested_by=request.user,
+        resource=resource,
+        file_format=file_format,
+        filters=request.query_params.dict(),
+    )
+    # O worker roda no mesmo processo: o queryset (ainda não avaliado) é passado como está
+    run_on_commit(run_export_job, job.pk, queryset, columns)
+    return job
+
+
+def run_export_job(job_id, queryset, columns):
+    """Gera o arquivo de um ExportJob (chamado no pool de background)"""
+    job = ExportJob.objects.get(pk=job_id)
+    ExportJob.objects.filter(pk=job_id).update(status='RUNNING', started_at=timezone.now())
+    try:
+        with tempfile.TemporaryFile() as output:
+            if job.file_format == 'csv':
+                text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+                row_count = write_csv(text, queryset, columns)
+                text.flush()
+                text.detach()
+            else:
+                row_count = write_xlsx(output, queryset, columns)
+            output.seek(0)
+            job.file.save(export_filename(job.resource, job.file_format), File(output), save=False)
+    except Exception as e:
+        logger.error(f"Erro na exportação {job_id}: {str(e)}")
+        ExportJob.objects.filter(pk=job_id).update(
+            status='FAILED', error_message=str(e), finished_at=timezone.now()
+        )
+        return
+
+    ExportJob.objects.filter(pk=job_id).update(
+        status='COMPLETED', file=job.file.name, row_count=row_count, finished_at=timezone.now()
+    )
@@ -0,0 +1,344 @@
+"""
+PDF report generation for Reports app
+The request only creates the Report (status GENERATING) and schedules the
+work; the client polls the report until it is COMPLETED or FAILED.
+
+In the background worker the inspection, its photos, signatures and comments
+and the template sections are read once into a plain payload (strings, file
+paths). The payload is rendered by rendering.py in a pool of separate
+processes, so CPU-bound layout and image work neither holds the GIL of the
+web process nor needs a database connection. The PDF is written to a
+temporary file by the render process and then stored in Report.file.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from apps.core.tasks import run_on_commit
+from .models import Report
+from .rendering import render_report
+
+logger = logging.getLogger(__name__)
+
+# Seções padrão (sem ReportSection cadastrada) e a flag do template que habilita cada uma
+SECTION_FLAGS = {
+    'cover': 'include_cover_page',
+    'summary': 'include_summary',
+    'photos': 'include_photos',
+    'signatures': 'include_signatures',
+    'comments': 'include_comments',
+    'metadata': 'include_metadata',
+}
+SECTION_TITLES = {
+    'cover': 'Relatório de Inspeção',
+    'summary': 'Resumo',
+    'photos': 'Fotos',
+    'signatures': 'Assinaturas',
+    'comments': 'Comentários',
+    'metadata': 'Dados da Inspeção',
+}
+METADATA_FIELDS = [
+    ('external_reference', 'Referência do cliente'),
+    ('location', 'Local'),
+    ('latitude', 'Latitude'),
+    ('longitude', 'Longitude'),
+    ('weather_condition', 'Condição do tempo'),
+    ('temperature', 'Temperatura'),
+    ('scheduled_date', 'Agendada para'),
+    ('started_at', 'Iniciada em'),
+    ('completed_at', 'Concluída em'),
+    ('customer_name', 'Cliente'),
+    ('customer_email', 'Email do cliente'),
+    ('customer_phone', 'Telefone do cliente'),
+    ('container_number', 'Contêiner'),
+    ('seal_number', 'Lacre'),
+    ('booking_number', 'Booking/BL'),
+    ('vessel_name', 'Navio'),
+    ('voyage_number', 'Viagem'),
+    ('container_type', 'Tipo de contêiner'),
+    ('container_size', 'Tamanho do contêiner'),
+    ('cargo_description', 'Carga'),
+    ('cargo_weight', 'Peso da carga (kg)'),
+    ('vehicle_plate', 'Placa'),
+    ('vehicle_model', 'Modelo do veículo'),
+    ('vehicle_year', 'Ano do veículo'),
+    ('vehicle_vin', 'Chassi'),
+]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _date(value):
+    return timezone.localtime(value).strftime('%d/%m/%Y %H:%M') if value else ''
+
+
+def _source(field):
+    """Caminho local do arquivo; bytes quando o storage não é local; None se não há arquivo"""
+    if not field:
+        return None
+    try:
+        return field.path
+    except NotImplementedError:
+        try:
+            with field.open('rb') as source:
+                return source.read()
+        except OSError:
+            return None
+
+
+def report_sections(template):
+    """
+    Seções do template na ordem de renderização
+
+    As ReportSection habilitadas definem a ordem; sem nenhuma, usa as seções
+    padrão. Em ambos os casos as flags include_* do template prevalecem.
+    """
+    sections = [
+        {
+            'type': section.content_type.strip().lower(),
+            'title': section.title,
+            'description': section.description,
+            'config': section.content_config or {},
+            'page_break_before': section.page_break_before,
+            'page_break_after': section.page_break_after,
+        }
+        for section in template.sections.filter(is_enabled=True).order_by('sequence', 'id')
+    ]
+    if not sections:
+        sections = [
+            {'type': kind, 'title': title, 'description': '', 'config': {},
+             'page_break_before': False, 'page_break_after': False}
+            for kind, title in SECTION_TITLES.items()
+        ]
+    return [
+        section for section in sections
+        if section['type'] not in SECTION_FLAGS or getattr(template, SECTION_FLAGS[section['type']])
+    ]
+
+
+def build_payload(report):
+    """
+    Dados do relatório para o processo de renderização (sem objetos do ORM)
+
+    Só consulta fotos, assinaturas e comentários das seções presentes.
+    """
+    inspection = report.inspection
+    template = report.template
+    sections = report_sections(template)
+    kinds = {section['type'] for section in sections}
+    styling = template.styling or {}
+
+    payload = {
+        'title': f"{SECTION_TITLES['cover']} {inspection.reference_number}",
+        'author': inspection.company.name,
+        'template': {
+            'name': template.name,
+            'header_text': template.header_text,
+            'footer_text': template.footer_text,
+            'watermark_text': template.watermark_text,
+            'logo': _source(template.logo),
+            'styling': styling,
+        },
+        'options': {
+            'page_size': styling.get('page_size') or getattr(settings, 'REPORT_PAGE_SIZE', 'A4'),
+            'landscape': bool(styling.get('landscape')),
+            'photo_dpi': getattr(settings, 'REPORT_PHOTO_DPI', 150),
+            'jpeg_quality': getattr(settings, 'REPORT_PHOTO_JPEG_QUALITY', 80),
+        },
+        'sections': sections,
+        'inspection': {
+            'reference_number': inspection.reference_number,
+            'title': inspection.title,
+            'description': inspection.description,
+            'customer_name': inspection.customer_name,
+            'date': _date(inspection.completed_at or inspection.started_at or inspection.scheduled_date),
+        },
+        'summary': [
+            ('Referência', inspection.reference_number),
+            ('Tipo', inspection.inspection_type.name),
+            ('Status', inspection.get_status_display()),
+            ('Inspetor', inspection.inspector.get_full_name() or inspection.inspector.username
+             if inspection.inspector else '-'),
+            ('Local', inspection.location or '-'),
+            ('Fotos', inspection.photo_count),
+            ('Comentários', inspection.comment_count),
+            ('Não conformidades', inspection.issue_count),
+        ],
+        'metadata': [],
+        'photos': [],
+        'cover_photo': None,
+        'signatures': [],
+        'comments': [],
+    }
+
+    for field, label in METADATA_FIELDS:
+        value = getattr(inspection, field)
+        if value not in (None, ''):
+            payload['metadata'].append((label, _date(value) if isinstance(value, datetime) else value))
+
+    if kinds & {'photos', 'cover'}:
+        photos = list(inspection.photos.only(
+            'photo', 'title', 'caption', 'taken_at', 'is_cover_photo', 'sequence_number', 'created_at'
+        ))
+        payload['photos'] = [
+            {'source': _source(photo.photo), 'title': photo.title, 'caption': photo.caption,
+             'taken_at': _date(photo.taken_at)}
+            for photo in photos
+        ] if 'photos' in kinds else []
+        if 'cover' in kinds:
+            cover = next((photo for photo in photos if photo.is_cover_photo), None)
+            payload['cover_photo'] = _source(cover.photo) if cover else None
+
+    if 'signatures' in kinds:
+        payload['signatures'] = [
+            {'source': _source(signature.signature_image), 'signer_name': signature.signer_name,
+             'signer_role': signature.signer_role, 'signature_type': signature.get_signature_type_display(),
+             'signed_at': _date(signature.signed_at)}
+            for signature in inspection.signatures.all()
+        ]
+
+    if 'comments' in kinds:
+        # Comentários internos só entram se a seção pedir (content_config.include_internal)
+        include_internal = any(
+            section['config'].get('include_internal') for section in sections if section['type'] == 'comments'
+        )
+        comments = inspection.comments.select_related('user')
+        if not include_internal:
+            comments = comments.filter(is_internal=False)
+        payload['comments'] = [
+            {'author': comment.user.get_full_name() or comment.user.username if comment.user else '-',
+             'date': _date(comment.created_at), 'text': comment.comment,
+             'is_reply': comment.parent_comment_id is not None}
+            for comment in comments
+        ]
+    return payload
+
+
+def get_render_pool():
+    """Pool de processos de renderização (criado sob demanda)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o processo filho não herda threads nem conexões do processo web
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.REPORT_RENDER_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _discard_pool(pool, terminate=False):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # shutdown() não interrompe renderizações em andamento: terminate encerra os processos
+    processes = list((getattr(pool, '_processes', None) or {}).values()) if terminate else []
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def render_pdf(payload, output_path):
+    """
+    Renderiza o payload em output_path no pool de processos
+
+    Com REPORT_RENDER_PROCESSES=0 renderiza na própria thread (testes). Após
+    REPORT_RENDER_TIMEOUT segundos o pool é descartado e seus processos
+    encerrados (renderizações em andamento nele também falham).
+
+    Returns:
+        Estatísticas da renderização (páginas, fotos)
+    """
+    if not getattr(settings, 'REPORT_RENDER_PROCESSES', 0):
+        return render_report(payload, output_path)
+    pool = get_render_pool()
+    try:
+        return pool.submit(render_report, payload, output_path).result(
+            timeout=getattr(settings, 'REPORT_RENDER_TIMEOUT', 300)
+        )
+    except BrokenProcessPool:
+        # Processo de renderização morreu (ex.: falta de memória): o próximo relatório recria o pool
+        _discard_pool(pool)
+        raise
+    except TimeoutError:
+        # A renderização travada continuaria ocupando um processo: encerra o pool inteiro
+        _discard_pool(pool, terminate=True)
+        raise
+
+
+def report_filename(report):
+    return get_valid_filename(f"{report.inspection.reference_number}_{timezone.localtime():%Y%m%d_%H%M%S}.pdf")
+
+
+def start_report_generation(inspection, template, user):
+    """Cria o Report (GENERATING) e agenda a geração do PDF após o commit"""
+    report = Report.objects.create(
+        inspection=inspection,
+        template=template,
+        status='GENERATING',
+        generated_by=user,
+    )
+    run_on_commit(generate_report, report.pk)
+    return report
+
+
+def generate_report(report_id):
+    """
+    Gera o PDF de um Report (chamado no pool de background)
+
+    Falhas ficam em status/error_message; não propagam.
+
+    Returns:
+        True se o relatório foi gerado
+    """
+    started = time.perf_counter()
+    report = Report.objects.select_related(
+        'inspection__company', 'inspection__inspection_type', 'inspection__inspector', 'template'
+    ).get(pk=report_id)
+    handle, output_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(handle)
+    try:
+        stats = render_pdf(build_payload(report), output_path)
+        file_size = os.path.getsize(output_path)
+        with open(output_path, 'rb') as output:
+            report.file.save(report_filename(report), File(output), save=False)
+    except Exception as e:
+        message = str(e) or e.__class__.__name__
+        logger.error(f"Erro ao gerar relatório {report_id}: {message}")
+        Report.objects.filter(pk=report_id).update(
+            status='FAILED', error_message=message, generation_time_seconds=_elapsed(started),
+            updated_at=timezone.now(),
+        )
+        return False
+    finally:
+        os.remove(output_path)
+
+    if stats['missing_images']:
+        logger.warning(f"Relatório {report_id}: {stats['missing_images']} imagem(ns) não puderam ser lidas")
+    Report.objects.filter(pk=report_id).update(
+        status='COMPLETED',
+        file=report.file.name,
+        file_size_mb=(Decimal(file_size) / (1024 * 1024)).quantize(Decimal('0.01')),
+        generation_time_seconds=_elapsed(started),
+        error_message='',
+        updated_at=timezone.now(),
+    )
+    return True
+
+
+def _elapsed(started):
+    return Decimal(time.perf_counter() - started).quantize(Decimal('0.01'))
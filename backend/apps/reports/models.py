@@ -235,3 +235,38 @@ class ReportSchedule(BaseModel):
     
     def __str__(self):
         return f"{self.name} ({self.frequency})"
+
+
+class ExportJob(BaseModel):
+    """CSV/XLSX export generated in background (see apps/reports/exports.py)"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ]
+    
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='export_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='export_jobs')
+    
+    resource = models.CharField(max_length=50)  # inspections, issues, cargosnap_uploads
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    filters = models.JSONField(default=dict, blank=True)  # Query string of the request
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    row_count = models.IntegerField(default=0)
+    file = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+    error_message = models.TextField(blank=True)
+    
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Export {self.resource}.{self.file_format} ({self.status})"
@@ -0,0 +1,308 @@
+"""
+PDF rendering for Reports app
+Turns a report payload (plain dicts and strings built by generation.py) into a
+PDF with ReportLab. Nothing here touches the database or Django settings, so
+it runs unchanged in the report worker processes.
+
+Photos, signatures and the logo are decoded at reduced scale where the format
+allows it (JPEG draft mode) and downscaled to the print resolution of the box
+they occupy on the page before being embedded, so the PDF carries no more
+pixels than the printer can use.
+"""
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from PIL import Image, ImageOps
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4, LETTER, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import (
+    Image as PdfImage, KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+)
+
+PAGE_SIZES = {'A4': A4, 'LETTER': LETTER}
+ORIENTATION_TAG = 0x0112
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)  # EXIF: imagem gravada deitada
+GAP = 4 * mm
+
+
+def print_image(source, max_width, max_height, dpi, quality=80, lossless=False):
+    """
+    Imagem reduzida à resolução de impressão de uma caixa da página
+
+    Args:
+        source: Caminho do arquivo ou bytes da imagem
+        max_width, max_height: Caixa disponível em pontos (1/72")
+        dpi: Resolução de impressão
+        quality: Qualidade JPEG
+        lossless: Grava PNG (assinaturas e logos: traços finos, poucas cores)
+
+    Returns:
+        Tupla (buffer, largura, altura), com largura/altura em pontos na
+        proporção da imagem
+    """
+    box = (max(1, round(max_width / 72 * dpi)), max(1, round(max_height / 72 * dpi)))
+    with Image.open(BytesIO(source) if isinstance(source, bytes) else source) as image:
+        if image.getexif().get(ORIENTATION_TAG, 1) in ROTATED_ORIENTATIONS:
+            draft_box = (box[1], box[0])
+        else:
+            draft_box = box
+        # JPEG: decodifica direto em escala 1/2, 1/4 ou 1/8 (ainda >= caixa)
+        image.draft('RGB', draft_box)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(box, Image.Resampling.LANCZOS)
+
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Transparência sobre fundo branco (o PDF não precisa do canal alfa)
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        buffer = BytesIO()
+        if lossless:
+            image.save(buffer, format='PNG', optimize=True)
+        else:
+            image.save(buffer, format='JPEG', quality=quality, optimize=True)
+        width, height = image.size
+
+    buffer.seek(0)
+    scale = min(max_width / width, max_height / height)
+    return buffer, width * scale, height * scale
+
+
+class ReportRenderer:
+    """Monta o PDF de um payload (uma instância por relatório)"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.options = payload['options']
+        styling = payload['template'].get('styling') or {}
+        self.primary = _color(styling.get('primary_color'), colors.HexColor('#0066CC'))
+        font_size = styling.get('font_size') or 10
+
+        styles = getSampleStyleSheet()
+        self.body = ParagraphStyle('body', parent=styles['BodyText'], fontSize=font_size, leading=font_size * 1.3)
+        self.small = ParagraphStyle('small', parent=self.body, fontSize=font_size - 2, leading=(font_size - 2) * 1.3,
+                                    textColor=colors.HexColor('#555555'))
+        self.heading = ParagraphStyle('heading', parent=styles['Heading2'], textColor=self.primary)
+        self.cover_title = ParagraphStyle('cover_title', parent=styles['Title'], textColor=self.primary,
+                                          fontSize=24, leading=30)
+        self.cover_text = ParagraphStyle('cover_text', parent=self.body, alignment=TA_CENTER,
+                                         fontSize=font_size + 2, leading=(font_size + 2) * 1.4)
+        self.photo_count = 0
+        self.missing_images = 0
+
+    # Imagens
+
+    def image(self, source, max_width, max_height, lossless=False):
+        """Flowable da imagem reduzida; None se o arquivo não pode ser lido"""
+        if source is None:
+            return None
+        try:
+            buffer, width, height = print_image(
+                source, max_width, max_height, self.options['photo_dpi'],
+                self.options['jpeg_quality'], lossless
+            )
+        except (OSError, ValueError, Image.DecompressionBombError):
+            self.missing_images += 1
+            return None
+        return PdfImage(buffer, width=width, height=height)
+
+    # Seções
+
+    def paragraph(self, text, style=None):
+        return Paragraph(escape(str(text)).replace('\n', '<br/>'), style or self.body)
+
+    def table(self, rows, widths):
+        table = Table(
+            [[self.paragraph(label, self.small), self.paragraph(value)] for label, value in rows],
+            colWidths=widths
+        )
+        table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.HexColor('#DDDDDD')),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ]))
+        return table
+
+    def cover(self, section, width, height):
+        inspection = self.payload['inspection']
+        flowables = []
+        logo = self.image(self.payload['template'].get('logo'), width / 3, 25 * mm, lossless=True)
+        if logo is not None:
+            flowables += [logo, Spacer(1, 10 * mm)]
+        flowables += [
+            Spacer(1, 20 * mm),
+            Paragraph(escape(section['title'] or self.payload['title']), self.cover_title),
+            Spacer(1, 6 * mm),
+            self.paragraph(inspection['reference_number'], self.cover_text),
+            self.paragraph(inspection['title'], self.cover_text),
+        ]
+        for value in (inspection['customer_name'], inspection['date']):
+            if value:
+                flowables.append(self.paragraph(value, self.cover_text))
+        photo = self.image(self.payload.get('cover_photo'), width, height / 2)
+        if photo is not None:
+            flowables += [Spacer(1, 10 * mm), photo]
+        return flowables
+
+    def summary(self, section, width, height):
+        flowables = [self.table(self.payload['summary'], [width * 0.3, width * 0.7])]
+        description = self.payload['inspection']['description']
+        if description:
+            flowables += [Spacer(1, 4 * mm), self.paragraph(description)]
+        return flowables
+
+    def metadata(self, section, width, height):
+        if not self.payload['metadata']:
+            return [self.paragraph('Nenhum dado adicional registrado.', self.small)]
+        return [self.table(self.payload['metadata'], [width * 0.3, width * 0.7])]
+
+    def photos(self, section, width, height):
+        photos = self.payload['photos']
+        limit = section['config'].get('limit')
+        if limit:
+            photos = photos[:int(limit)]
+        if not photos:
+            return [self.paragraph('Nenhuma foto registrada.', self.small)]
+
+        columns = max(1, int(section['config'].get('columns') or 2))
+        cell_width = width / columns - GAP
+        cell_height = min(cell_width * 0.75, height * 0.4)
+        cells = []
+        for photo in photos:
+            image = self.image(photo['source'], cell_width, cell_height)
+            if image is None:
+                image = self.paragraph('Foto indisponível', self.small)
+            else:
+                self.photo_count += 1
+            caption = ' - '.join(part for part in (photo['title'], photo['caption']) if part)
+            cells.append([image, self.paragraph(caption or photo['taken_at'], self.small)])
+
+        rows = [cells[index:index + columns] for index in range(0, len(cells), columns)]
+        rows[-1] += [''] * (columns - len(rows[-1]))
+        table = Table(rows, colWidths=[width / columns] * columns)
+        table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), GAP),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), GAP),
+        ]))
+        return [table]
+
+    def signatures(self, section, width, height):
+        signatures = self.payload['signatures']
+        if not signatures:
+            return [self.paragraph('Nenhuma assinatura registrada.', self.small)]
+        cell_width = width / 2 - GAP
+        cells = []
+        for signature in signatures:
+            image = self.image(signature['source'], cell_width, 25 * mm, lossless=True)
+            signer = ', '.join(part for part in (signature['signer_role'], signature['signature_type']) if part)
+            cells.append([
+                image or Spacer(1, 25 * mm),
+                self.paragraph(signature['signer_name']),
+                self.paragraph(f"{signer} - {signature['signed_at']}", self.small),
+            ])
+        rows = [cells[index:index + 2] for index in range(0, len(cells), 2)]
+        rows[-1] += [''] * (2 - len(rows[-1]))
+        table = Table(rows, colWidths=[width / 2] * 2)
+        table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), GAP),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), GAP),
+        ]))
+        return [table]
+
+    def comments(self, section, width, height):
+        comments = self.payload['comments']
+        if not comments:
+            return [self.paragraph('Nenhum comentário.', self.small)]
+        flowables = []
+        for comment in comments:
+            indent = 8 * mm if comment['is_reply'] else 0
+            flowables.append(KeepTogether([
+                Paragraph(escape(f"{comment['author']} - {comment['date']}"),
+                          ParagraphStyle('comment_author', parent=self.small, leftIndent=indent)),
+                Paragraph(escape(comment['text']).replace('\n', '<br/>'),
+                          ParagraphStyle('comment', parent=self.body, leftIndent=indent, spaceAfter=3 * mm)),
+            ]))
+        return flowables
+
+    def text(self, section, width, height):
+        return [self.paragraph(section['config'].get('text') or section['description'])]
+
+    # Página
+
+    def decorate(self, canvas, doc):
+        """Cabeçalho, rodapé com numeração e marca d'água de cada página"""
+        template = self.payload['template']
+        page_width, page_height = doc.pagesize
+        canvas.saveState()
+        if template['watermark_text']:
+            canvas.setFont('Helvetica-Bold', 60)
+            canvas.setFillColor(colors.Color(0.5, 0.5, 0.5, alpha=0.15))
+            canvas.translate(page_width / 2, page_height / 2)
+            canvas.rotate(45)
+            canvas.drawCentredString(0, 0, template['watermark_text'])
+            canvas.rotate(-45)
+            canvas.translate(-page_width / 2, -page_height / 2)
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.HexColor('#555555'))
+        if template['header_text']:
+            canvas.drawString(doc.leftMargin, page_height - doc.topMargin / 2, template['header_text'][:150])
+        if template['footer_text']:
+            canvas.drawString(doc.leftMargin, doc.bottomMargin / 2, template['footer_text'][:120])
+        canvas.drawRightString(page_width - doc.rightMargin, doc.bottomMargin / 2, f'Página {doc.page}')
+        canvas.restoreState()
+
+    def render(self, output):
+        """Grava o PDF em `output` (caminho ou arquivo binário); retorna estatísticas"""
+        page_size = PAGE_SIZES.get(self.options['page_size'], A4)
+        if self.options.get('landscape'):
+            page_size = landscape(page_size)
+        doc = SimpleDocTemplate(
+            output, pagesize=page_size, title=self.payload['title'], author=self.payload['author'],
+            leftMargin=15 * mm, rightMargin=15 * mm, topMargin=20 * mm, bottomMargin=20 * mm,
+        )
+        builders = {
+            'cover': self.cover, 'summary': self.summary, 'photos': self.photos, 'signatures': self.signatures,
+            'comments': self.comments, 'metadata': self.metadata, 'text': self.text,
+        }
+        story = []
+        sections = [section for section in self.payload['sections'] if section['type'] in builders]
+        for index, section in enumerate(sections):
+            builder = builders[section['type']]
+            if section['page_break_before'] and story:
+                story.append(PageBreak())
+            if section['type'] != 'cover' and section['title']:
+                story.append(Paragraph(escape(section['title']), self.heading))
+            story.extend(builder(section, doc.width, doc.height))
+            last = index == len(sections) - 1
+            if (section['page_break_after'] or section['type'] == 'cover') and not last:
+                story.append(PageBreak())
+            elif not last:
+                story.append(Spacer(1, 6 * mm))
+        if not story:
+            story.append(self.paragraph(self.payload['title']))
+        doc.build(story, onFirstPage=self.decorate, onLaterPages=self.decorate)
+        return {'pages': doc.page, 'photos': self.photo_count, 'missing_images': self.missing_images}
+
+
+def _color(value, default):
+    try:
+        return colors.HexColor(value) if value else default
+    except (ValueError, TypeError):
+        return default
+
+
+def render_report(payload, output_path):
+    """Renderiza o payload em PDF no caminho indicado (ponto de entrada dos processos de renderização)"""
+    return ReportRenderer(payload).render(output_path)
@@ -4,7 +4,7 @@ Serializers for Reports app
 from rest_framework import serializers
 from .models import (
     ReportTemplate, Report, ReportSection, ReportShare,
-    ReportAnnotation, ReportSchedule
+    ReportAnnotation, ReportSchedule, ExportJob
 )
 
 
@@ -132,3 +132,13 @@ class ReportScheduleSerializer(serializers.ModelSerializer):
             'run_count', 'created_by', 'created_by_name', 'created_at'
         ]
         read_only_fields = ['created_by', 'last_run_at', 'run_count', 'created_at']
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'resource', 'file_format', 'filters', 'status', 'row_count', 'file',
+            'error_message', 'requested_by', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,209 @@
+"""
+Tests for Reports app
+"""
+import multiprocessing
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.core.models import Company
+from apps.inspections.models import Inspection, InspectionComment, InspectionPhoto, InspectionSignature
+from apps.inspections.tests import InspectionTestMixin, make_jpeg
+from apps.reports import generation
+from apps.reports.models import Report, ReportSection, ReportTemplate
+from apps.reports.rendering import print_image
+
+
+def make_png_signature(size=(600, 200)):
+    """Return the bytes of a transparent PNG with a black stroke"""
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    for x in range(50, 550):
+        image.putpixel((x, 100 + (x % 20)), (0, 0, 0, 255))
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@override_settings(REPORT_RENDER_PROCESSES=0)
+class ReportGenerationTest(InspectionTestMixin, TestCase):
+    """Tests for background PDF generation"""
+
+    url = '/api/reports/reports/'
+
+    def setUp(self):
+        super().setUp()
+        self.template = ReportTemplate.objects.create(
+            company=self.company, name='Padrão', code='DEFAULT_PDF',
+            header_text='ICTSI Brasil', footer_text='Documento gerado automaticamente',
+            watermark_text='CONFIDENCIAL',
+        )
+        self.inspection.customer_name = 'Cliente Teste'
+        self.inspection.container_number = 'ABCD1234567'
+        self.inspection.save()
+        for number in range(3):
+            InspectionPhoto.objects.create(
+                inspection=self.inspection, sequence_number=number, caption=f'Lado {number}',
+                is_cover_photo=number == 0,
+                photo=SimpleUploadedFile(f'photo{number}.jpg', make_jpeg((3000, 2000)), content_type='image/jpeg'),
+            )
+        InspectionSignature.objects.create(
+            inspection=self.inspection, signature_type='INSPECTOR', signer_name='João Silva',
+            signature_image=SimpleUploadedFile('signature.png', make_png_signature(), content_type='image/png'),
+        )
+        InspectionComment.objects.create(inspection=self.inspection, user=self.user, comment='Lacre íntegro',
+                                         is_internal=False)
+        InspectionComment.objects.create(inspection=self.inspection, user=self.user, comment='Nota interna')
+
+    def _generate(self, template=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'{self.url}generate/', {
+                'inspection_id': self.inspection.id,
+                'template_id': (template or self.template).id,
+            }, format='json')
+        return response
+
+    def test_generate_renders_pdf_in_background(self):
+        response = self._generate()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'GENERATING')
+
+        report = Report.objects.get(pk=response.data['id'])
+        self.assertEqual(report.status, 'COMPLETED', report.error_message)
+        with report.file.open('rb') as pdf:
+            content = pdf.read()
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertEqual(report.file.size, len(content))
+        self.assertGreaterEqual(report.generation_time_seconds, 0)
+        # Três fotos de 3000x2000 reduzidas à resolução de impressão: bem menor que os originais
+        self.assertLess(len(content), 3 * len(make_jpeg((3000, 2000))))
+
+        status_response = self.client.get(f'{self.url}{report.id}/status/')
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.data['status'], 'COMPLETED')
+        self.assertTrue(status_response.data['file'].endswith('.pdf'))
+
+    def test_generate_validates_request(self):
+        response = self.client.post(f'{self.url}generate/', {'inspection_id': self.inspection.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        other = Company.objects.create(name='Outra', slug='outra', company_type='ICTSI')
+        other_template = ReportTemplate.objects.create(company=other, name='Outra', code='OTHER_PDF')
+        self.assertEqual(self._generate(other_template).status_code, 404)
+
+        excel = ReportTemplate.objects.create(company=self.company, name='Planilha', code='XLS', format='EXCEL')
+        self.assertEqual(self._generate(excel).status_code, 400)
+        self.assertFalse(Report.objects.exists())
+
+    def test_payload_follows_template_sections_and_flags(self):
+        ReportSection.objects.create(template=self.template, name='c', title='Comentários', sequence=1,
+                                     content_type='comments')
+        ReportSection.objects.create(template=self.template, name='p', title='Fotos', sequence=2,
+                                     content_type='photos')
+        ReportSection.objects.create(template=self.template, name='m', title='Dados', sequence=3,
+                                     content_type='metadata', is_enabled=False)
+        self.template.include_photos = False
+        self.template.save()
+        report = Report.objects.create(inspection=self.inspection, template=self.template)
+
+        payload = generation.build_payload(report)
+        self.assertEqual([section['type'] for section in payload['sections']], ['comments'])
+        self.assertEqual([comment['text'] for comment in payload['comments']], ['Lacre íntegro'])
+        self.assertEqual(payload['photos'], [])
+        self.assertIn(('Contêiner', 'ABCD1234567'), payload['metadata'])
+
+    def test_failure_is_recorded(self):
+        ReportSection.objects.create(template=self.template, name='p', title='Fotos', content_type='photos',
+                                     content_config={'limit': 'todas'})
+        report = Report.objects.get(pk=self._generate().data['id'])
+        self.assertEqual(report.status, 'FAILED')
+        self.assertTrue(report.error_message)
+        self.assertFalse(report.file)
+
+    def test_status_change_touches_updated_at(self):
+        # As agregações incrementais (analytics) acompanham updated_at
+        report = Report.objects.create(inspection=self.inspection, template=self.template)
+        stale = timezone.now() - timedelta(days=1)
+        Report.objects.filter(pk=report.pk).update(updated_at=stale)
+        self.assertTrue(generation.generate_report(report.pk))
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'COMPLETED')
+        self.assertGreater(report.updated_at, stale + timedelta(hours=1))
+
+    def test_bare_inspection_renders(self):
+        self.inspection = Inspection.objects.create(
+            company=self.company, inspection_type=self.inspection_type,
+            reference_number='ICTSI-TEST-2', title='Sem dados'
+        )
+        report = Report.objects.get(pk=self._generate().data['id'])
+        self.assertEqual(report.status, 'COMPLETED', report.error_message)
+
+    def test_missing_photo_file_does_not_fail_report(self):
+        photo = self.inspection.photos.first()
+        os.remove(photo.photo.path)
+        report = Report.objects.get(pk=self._generate().data['id'])
+        self.assertEqual(report.status, 'COMPLETED', report.error_message)
+
+
+class PrintImageTest(TestCase):
+    """Tests for photo downscaling before embedding"""
+
+    def test_photo_is_downscaled_to_print_resolution(self):
+        # Caixa de 144 x 72 pontos (2" x 1") a 150 dpi: no máximo 300 x 150 pixels
+        buffer, width, height = print_image(make_jpeg((4000, 3000)), 144, 72, dpi=150)
+        with Image.open(buffer) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertLessEqual(image.width, 300)
+            self.assertLessEqual(image.height, 150)
+        self.assertAlmostEqual(width / height, 4 / 3, places=2)
+        self.assertLessEqual(width, 144)
+        self.assertLessEqual(height, 72)
+
+    def test_transparent_signature_is_flattened(self):
+        buffer, _, _ = print_image(make_png_signature(), 200, 60, dpi=150, lossless=True)
+        with Image.open(buffer) as image:
+            self.assertEqual((image.format, image.mode), ('PNG', 'RGB'))
+            self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
+
+    def _payload(self):
+        return {
+            'title': 'Relatório', 'author': 'ICTSI',
+            'template': {'name': 'T', 'header_text': '', 'footer_text': '', 'watermark_text': '', 'logo': None,
+                         'styling': {}},
+            'options': {'page_size': 'A4', 'photo_dpi': 150, 'jpeg_quality': 80},
+            'sections': [{'type': 'photos', 'title': 'Fotos', 'description': '', 'config': {},
+                          'page_break_before': False, 'page_break_after': False}],
+            'photos': [{'source': make_jpeg((800, 600)), 'title': '', 'caption': 'Frente', 'taken_at': ''}],
+        }
+
+    @override_settings(REPORT_RENDER_PROCESSES=1)
+    def test_render_in_process_pool(self):
+        handle, output_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(handle)
+        try:
+            stats = generation.render_pdf(self._payload(), output_path)
+            with open(output_path, 'rb') as pdf:
+                self.assertTrue(pdf.read().startswith(b'%PDF'))
+        finally:
+            os.remove(output_path)
+            generation._discard_pool(generation.get_render_pool())
+        self.assertEqual((stats['pages'], stats['photos']), (1, 1))
+
+    @override_settings(REPORT_RENDER_PROCESSES=1, REPORT_RENDER_TIMEOUT=0.01)
+    def test_timed_out_render_stops_its_process(self):
+        handle, output_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(handle)
+        try:
+            with self.assertRaises(TimeoutError):
+                generation.render_pdf(self._payload(), output_path)
+        finally:
+            os.remove(output_path)
+        self.assertIsNone(generation._pool)
+        for process in multiprocessing.active_children():
+            process.join(5)
+        self.assertEqual(multiprocessing.active_children(), [])
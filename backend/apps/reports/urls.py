@@ -5,7 +5,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ReportTemplateViewSet, ReportViewSet, ReportSectionViewSet,
-    ReportShareViewSet, ReportAnnotationViewSet, ReportScheduleViewSet
+    ReportShareViewSet, ReportAnnotationViewSet, ReportScheduleViewSet,
+    ExportJobViewSet
 )
 
 router = DefaultRouter()
@@ -16,6 +17,7 @@ router.register(r'sections', ReportSectionViewSet, basename='report-section')
 router.register(r'shares', ReportShareViewSet, basename='report-share')
 router.register(r'annotations', ReportAnnotationViewSet, basename='report-annotation')
 router.register(r'schedules', ReportScheduleViewSet, basename='report-schedule')
+router.register(r'export-jobs', ExportJobViewSet, basename='export-job')
 
 urlpatterns = [
     path('', include(router.urls)),
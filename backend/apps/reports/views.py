@@ -9,12 +9,13 @@ from django_filters.rest_framework import DjangoFilterBackend
 from apps.core.permissions import IsAuthenticated, IsSameCompany, IsAdminOrManager, CanGenerateReports
 from .models import (
     ReportTemplate, Report, ReportSection, ReportShare,
-    ReportAnnotation, ReportSchedule
+    ReportAnnotation, ReportSchedule, ExportJob
 )
 from .serializers import (
     ReportTemplateListSerializer, ReportTemplateDetailSerializer,
     ReportListSerializer, ReportDetailSerializer, ReportSectionSerializer,
-    ReportShareSerializer, ReportAnnotationSerializer, ReportScheduleSerializer
+    ReportShareSerializer, ReportAnnotationSerializer, ReportScheduleSerializer,
+    ExportJobSerializer
 )
 
 
@@ -61,7 +62,15 @@ class ReportViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def generate(self, request):
-        """Generate a new report"""
+        """
+        Start PDF generation for an inspection
+
+        Returns 202 with the report in GENERATING status; the PDF is rendered
+        in the background. Poll /reports/{id}/status/ until COMPLETED or FAILED.
+        """
+        from apps.inspections.models import Inspection
+        from .generation import start_report_generation
+        
         inspection_id = request.data.get('inspection_id')
         template_id = request.data.get('template_id')
         
@@ -71,28 +80,36 @@ class ReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create report record
-        from apps.inspections.models import Inspection
-        from django.utils import timezone
-        import time
-        
-        start_time = time.time()
-        
-        report = Report.objects.create(
-            inspection_id=inspection_id,
-            template_id=template_id,
-            status='GENERATING',
-            generated_by=request.user
-        )
-        
-        # TODO: Implement actual PDF generation with ReportLab/WeasyPrint
-        # For now, just mark as completed
-        report.status = 'COMPLETED'
-        report.generation_time_seconds = round(time.time() - start_time, 2)
-        report.save()
+        company = request.user.company
+        inspection = Inspection.objects.filter(pk=inspection_id, company=company).first()
+        template = ReportTemplate.objects.filter(pk=template_id, company=company, is_active=True).first()
+        if inspection is None or template is None:
+            return Response(
+                {'error': 'Inspection or template not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if template.format != 'PDF':
+            return Response(
+                {'error': f'Template format {template.format} is not supported; only PDF reports can be generated'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = ReportDetailSerializer(report)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        report = start_report_generation(inspection, template, request.user)
+        serializer = ReportDetailSerializer(report, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'], url_path='status')
+    def generation_status(self, request, pk=None):
+        """Lightweight generation status for polling"""
+        report = self.get_object()
+        return Response({
+            'id': report.id,
+            'status': report.status,
+            'file': request.build_absolute_uri(report.file.url) if report.file else None,
+            'file_size_mb': report.file_size_mb,
+            'generation_time_seconds': report.generation_time_seconds,
+            'error_message': report.error_message,
+        })
     
     @action(detail=True, methods=['post'])
     def share(self, request, pk=None):
@@ -197,3 +214,15 @@ class ReportScheduleViewSet(viewsets.ModelViewSet):
         schedule.run_count += 1
         schedule.save()
         return Response({'status': 'Schedule executed'})
+
+
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Background CSV/XLSX exports (see ExportMixin)"""
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['status', 'resource', 'file_format']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        return ExportJob.objects.filter(company=self.request.user.company)
@@ -0,0 +1,12 @@
+"""
+Admin configuration for Search app
+"""
+from django.contrib import admin
+from .models import SearchDocument
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ['doc_type', 'object_id', 'company', 'title', 'updated_at']
+    list_filter = ['doc_type', 'company']
+    search_fields = ['title']
@@ -0,0 +1,154 @@
+"""
+Full-text search backends
+The backend is chosen from the database vendor (or SEARCH_BACKEND):
+    - sqlite: FTS5 virtual table kept in sync by triggers (dev)
+    - postgresql: generated tsvector column with a GIN index (production)
+    - anything else: icontains fallback
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import SearchDocument
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_TABLE = 'search_searchdocument_fts'
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query or '')
+
+
+class BaseSearchBackend:
+    """
+    Interface: search() returns [(SearchDocument id, rank)] best first;
+    matches_sql() returns the SQL selecting the object_id of every match
+    (used as a subquery by FullTextSearchFilter, so nothing is capped)
+    """
+
+    def search(self, query, doc_types=None, company_id=None, limit=50):
+        raise NotImplementedError
+
+    def matches_sql(self, query, doc_types=None, company_id=None):
+        """(sql, params) de um SELECT object_id de todos os documentos encontrados; None sem termos"""
+        raise NotImplementedError
+
+    def _scope_sql(self, doc_types, company_id, alias='d'):
+        """WHERE extra para tipo e empresa (documentos sem empresa são visíveis a todos)"""
+        clauses, params = [], []
+        if doc_types:
+            clauses.append(f"{alias}.doc_type IN ({', '.join(['%s'] * len(doc_types))})")
+            params.extend(doc_types)
+        if company_id is not None:
+            clauses.append(f"({alias}.company_id = %s OR {alias}.company_id IS NULL)")
+            params.append(company_id)
+        return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """FTS5 com ranking bm25; cada termo vira prefixo ("cont"* casa "container")"""
+
+    def _select(self, columns, query, doc_types, company_id):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        scope, params = self._scope_sql(doc_types, company_id)
+        sql = (
+            f"SELECT {columns} "
+            f"FROM {FTS_TABLE} JOIN search_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{scope}"
+        )
+        return sql, [match, *params]
+
+    def search(self, query, doc_types=None, company_id=None, limit=50):
+        select = self._select(f'd.id, bm25({FTS_TABLE}, 10.0, 1.0) AS rank', query, doc_types, company_id)
+        if select is None:
+            return []
+        sql, params = select
+        with connection.cursor() as cursor:
+            # LIMIT -1: sem limite
+            cursor.execute(f'{sql} ORDER BY rank LIMIT %s', [*params, -1 if limit is None else limit])
+            # bm25 é negativo (menor = melhor); expõe como score positivo
+            return [(row[0], -row[1]) for row in cursor.fetchall()]
+
+    def matches_sql(self, query, doc_types=None, company_id=None):
+        return self._select('d.object_id', query, doc_types, company_id)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector gerado (título peso A, corpo peso B) + índice GIN, ranking ts_rank"""
+
+    def _select(self, columns, query, doc_types, company_id):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        config = getattr(settings, 'SEARCH_POSTGRES_CONFIG', 'portuguese')
+        scope, params = self._scope_sql(doc_types, company_id)
+        sql = (
+            f"SELECT {columns} "
+            "FROM search_searchdocument d, to_tsquery(%s::regconfig, %s) q "
+            f"WHERE d.search_vector @@ q{scope}"
+        )
+        return sql, [config, tsquery, *params]
+
+    def search(self, query, doc_types=None, company_id=None, limit=50):
+        select = self._select('d.id, ts_rank(d.search_vector, q) AS rank', query, doc_types, company_id)
+        if select is None:
+            return []
+        sql, params = select
+        with connection.cursor() as cursor:
+            # LIMIT NULL: sem limite
+            cursor.execute(f'{sql} ORDER BY rank DESC LIMIT %s', [*params, limit])
+            return cursor.fetchall()
+
+    def matches_sql(self, query, doc_types=None, company_id=None):
+        return self._select('d.object_id', query, doc_types, company_id)
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Fallback sem índice (icontains em todos os termos)"""
+
+    def _documents(self, query, doc_types, company_id):
+        from django.db.models import Q
+
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        documents = SearchDocument.objects.all()
+        for token in tokens:
+            documents = documents.filter(Q(title__icontains=token) | Q(body__icontains=token))
+        if doc_types:
+            documents = documents.filter(doc_type__in=doc_types)
+        if company_id is not None:
+            documents = documents.filter(Q(company_id=company_id) | Q(company__isnull=True))
+        return documents
+
+    def search(self, query, doc_types=None, company_id=None, limit=50):
+        documents = self._documents(query, doc_types, company_id)
+        if documents is None:
+            return []
+        return [(pk, 1.0) for pk in documents.values_list('id', flat=True)[:limit]]
+
+    def matches_sql(self, query, doc_types=None, company_id=None):
+        documents = self._documents(query, doc_types, company_id)
+        if documents is None:
+            return None
+        return documents.order_by().values('object_id').query.sql_with_params()
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    backend_path = getattr(settings, 'SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    return VENDOR_BACKENDS.get(connection.vendor, BasicSearchBackend)()
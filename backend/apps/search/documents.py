@@ -0,0 +1,122 @@
+"""
+Search document builders
+Each indexed model registers how to turn an instance into a SearchDocument
+(title, body and owning company). Documents are upserted on save and removed
+on delete (see signals.py); `reindex` rebuilds them in batches.
+"""
+from django.db import transaction
+
+from apps.cargosnap_integration.models import CargoSnapUpload
+from apps.inspections.models import Inspection
+from apps.issues.models import Issue
+from .models import SearchDocument
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def inspection_document(inspection):
+    return {
+        'company_id': inspection.company_id,
+        'title': _join(inspection.reference_number, inspection.title),
+        'body': _join(
+            inspection.description, inspection.customer_name, inspection.container_number,
+            inspection.seal_number, inspection.booking_number, inspection.vessel_name,
+            inspection.location, inspection.vehicle_plate, inspection.external_reference,
+        ),
+    }
+
+
+def issue_document(issue):
+    return {
+        'company_id': issue.company_id,
+        'title': _join(issue.reference_number, issue.title),
+        'body': _join(issue.description, issue.location, issue.resolution_notes, issue.root_cause),
+    }
+
+
+def cargosnap_upload_document(upload):
+    return {
+        'company_id': None,
+        'title': _join(upload.file.scan_code, upload.workflow_step_description),
+        'body': _join(
+            upload.comment, upload.damage_type_desc, upload.workflow_description,
+            upload.device_nick,
+        ),
+    }
+
+
+# doc_type -> (modelo, builder, select_related usado no reindex)
+REGISTRY = {
+    'inspection': (Inspection, inspection_document, []),
+    'issue': (Issue, issue_document, []),
+    'cargosnap_upload': (CargoSnapUpload, cargosnap_upload_document, ['file']),
+}
+
+MODEL_DOC_TYPES = {model: doc_type for doc_type, (model, _, _) in REGISTRY.items()}
+
+
+def build_document(doc_type, instance):
+    _, builder, _ = REGISTRY[doc_type]
+    data = builder(instance)
+    return SearchDocument(
+        doc_type=doc_type,
+        object_id=instance.pk,
+        company_id=data['company_id'],
+        title=data['title'][:500],
+        body=data['body'],
+    )
+
+
+def upsert_documents(documents):
+    """Insere ou atualiza documentos (um único INSERT ... ON CONFLICT)"""
+    if documents:
+        SearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['doc_type', 'object_id'],
+            update_fields=['company', 'title', 'body', 'updated_at'],
+        )
+
+
+def index_instance(instance):
+    doc_type = MODEL_DOC_TYPES.get(type(instance))
+    if doc_type:
+        upsert_documents([build_document(doc_type, instance)])
+
+
+def remove_instance(instance):
+    doc_type = MODEL_DOC_TYPES.get(type(instance))
+    if doc_type:
+        SearchDocument.objects.filter(doc_type=doc_type, object_id=instance.pk).delete()
+
+
+def reindex(doc_type, batch_size=500, stdout=None):
+    """
+    Reconstrói os documentos de um tipo em lotes
+
+    Returns:
+        Número de documentos indexados
+    """
+    model, _, related = REGISTRY[doc_type]
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            model.objects.select_related(*related).filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+        )
+        if not batch:
+            break
+        with transaction.atomic():
+            upsert_documents([build_document(doc_type, instance) for instance in batch])
+        total += len(batch)
+        last_pk = batch[-1].pk
+        if stdout:
+            stdout.write(f'{doc_type}: {total} documentos indexados')
+
+    # Remove documentos de objetos que não existem mais
+    SearchDocument.objects.filter(doc_type=doc_type).exclude(
+        object_id__in=model.objects.values('pk')
+    ).delete()
+    return total
@@ -0,0 +1,62 @@
+"""
+DRF filter backends that answer ?search= from the full-text index
+"""
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .backends import get_backend
+from .models import SearchDocument
+
+SEARCH_RANK = 'search_rank'
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter on indexed models
+
+    The view declares `search_doc_type`; matching object ids come from the
+    search backend instead of LIKE '%term%' over `search_fields`. Every match
+    is kept (the backend query runs as a subquery); the best
+    SEARCH_FILTER_RANKED_RESULTS are annotated with their position in the
+    ranking (`search_rank`) for SearchRankOrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        doc_type = getattr(view, 'search_doc_type', None)
+        if not query or not doc_type:
+            return super().filter_queryset(request, queryset, view)
+
+        company = getattr(request.user, 'company', None)
+        company_id = company.pk if company else None
+        backend = get_backend()
+        matches = backend.matches_sql(query, doc_types=[doc_type], company_id=company_id)
+        if matches is None:
+            return queryset.none()
+        queryset = queryset.filter(pk__in=RawSQL(*matches))
+
+        # Posição dos melhores resultados; os demais ficam depois deles
+        ranked = backend.search(
+            query, doc_types=[doc_type], company_id=company_id,
+            limit=getattr(settings, 'SEARCH_FILTER_RANKED_RESULTS', 1000)
+        )
+        positions = {document_id: position for position, (document_id, _) in enumerate(ranked)}
+        object_positions = sorted(
+            (positions[document_id], object_id)
+            for document_id, object_id in SearchDocument.objects.filter(pk__in=list(positions)).values_list('pk', 'object_id')
+        )
+        return queryset.annotate(**{SEARCH_RANK: Case(
+            *[When(pk=object_id, then=Value(position)) for position, object_id in object_positions],
+            default=Value(len(ranked)), output_field=IntegerField(),
+        )})
+
+
+class SearchRankOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that keeps the ?search= relevance order unless ?ordering= is given"""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and SEARCH_RANK in queryset.query.annotations:
+            return [SEARCH_RANK, *(self.get_default_ordering(view) or [])]
+        return super().get_ordering(request, queryset, view)
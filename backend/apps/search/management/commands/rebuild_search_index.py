@@ -0,0 +1,20 @@
+"""
+Management command to rebuild the full-text search documents
+Usage: python manage.py rebuild_search_index [--type inspection] [--batch-size 500]
+"""
+from django.core.management.base import BaseCommand
+from apps.search.documents import REGISTRY, reindex
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=list(REGISTRY), help='Tipo de documento (padrão: todos)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        doc_types = [options['type']] if options['type'] else list(REGISTRY)
+        for doc_type in doc_types:
+            total = reindex(doc_type, batch_size=options['batch_size'], stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'{doc_type}: {total} documentos indexados'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0002_reference_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(choices=[('inspection', 'Inspeção'), ('issue', 'Ocorrência'), ('cargosnap_upload', 'Upload CargoSnap')], max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=500)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='core.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'doc_type'], name='search_sear_company_59e83b_idx')],
+                'unique_together': {('doc_type', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+"""
+Backend-specific full-text index over SearchDocument
+    - SQLite: external-content FTS5 table kept in sync by triggers
+    - PostgreSQL: generated tsvector column (title weight A, body weight B) + GIN index
+Other vendors fall back to BasicSearchBackend and need nothing here.
+"""
+from django.conf import settings
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE search_searchdocument_fts USING fts5(
+        title, body,
+        content='search_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER search_searchdocument_ai AFTER INSERT ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER search_searchdocument_ad AFTER DELETE ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER search_searchdocument_au AFTER UPDATE ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS search_searchdocument_au',
+    'DROP TRIGGER IF EXISTS search_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS search_searchdocument_ai',
+    'DROP TABLE IF EXISTS search_searchdocument_fts',
+]
+
+def postgres_forward():
+    # Mesma configuração de texto usada nas consultas (backends.py); alterá-la depois exige recriar a coluna
+    config = getattr(settings, 'SEARCH_POSTGRES_CONFIG', 'portuguese')
+    return [
+        ("""
+        ALTER TABLE search_searchdocument ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector(%s::regconfig, coalesce(title, '')), 'A') ||
+            setweight(to_tsvector(%s::regconfig, coalesce(body, '')), 'B')
+        ) STORED
+        """, [config, config]),
+        'CREATE INDEX search_searchdocument_vector_gin ON search_searchdocument USING GIN (search_vector)',
+    ]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS search_searchdocument_vector_gin',
+    'ALTER TABLE search_searchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        if callable(statements):
+            statements = statements()
+        for statement in statements:
+            sql, params = statement if isinstance(statement, tuple) else (statement, None)
+            schema_editor.execute(sql, params)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': postgres_forward}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,35 @@
+"""
+Search models for CargoSnap ICTSI
+One denormalized document per searchable object; the full-text index over
+it is backend specific (FTS5 table on SQLite, tsvector + GIN on Postgres)
+and is created by the migrations, not by the model.
+"""
+from django.db import models
+from apps.core.models import Company
+
+
+class SearchDocument(models.Model):
+    """Searchable text of an Inspection, Issue or CargoSnapUpload"""
+    DOC_TYPES = [
+        ('inspection', 'Inspeção'),
+        ('issue', 'Ocorrência'),
+        ('cargosnap_upload', 'Upload CargoSnap'),
+    ]
+    
+    doc_type = models.CharField(max_length=30, choices=DOC_TYPES)
+    object_id = models.BigIntegerField()
+    # Null for CargoSnap data, which is shared by every company
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True, related_name='search_documents')
+    
+    title = models.CharField(max_length=500)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['doc_type', 'object_id']
+        indexes = [
+            models.Index(fields=['company', 'doc_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.doc_type}:{self.object_id} - {self.title}"
@@ -0,0 +1,16 @@
+"""
+Serializers for Search app
+"""
+from rest_framework import serializers
+
+
+class SearchResultSerializer(serializers.Serializer):
+    type = serializers.CharField(source='doc_type')
+    id = serializers.IntegerField(source='object_id')
+    title = serializers.CharField()
+    snippet = serializers.SerializerMethodField()
+    score = serializers.FloatField()
+
+    def get_snippet(self, obj):
+        body = obj.body or ''
+        return body if len(body) <= 200 else f'{body[:200]}…'
@@ -0,0 +1,21 @@
+"""
+Signals for Search app
+Keep SearchDocument rows in sync with the indexed models.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .documents import REGISTRY, index_instance, remove_instance
+
+
+def _on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_instance(instance)
+
+
+def _on_delete(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+for _doc_type, (_model, _builder, _related) in REGISTRY.items():
+    post_save.connect(_on_save, sender=_model, dispatch_uid=f'search_index_{_doc_type}')
+    post_delete.connect(_on_delete, sender=_model, dispatch_uid=f'search_remove_{_doc_type}')
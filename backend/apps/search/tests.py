@@ -0,0 +1,99 @@
+"""
+Tests for Search app
+"""
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.core.models import Company, User
+from apps.inspections.models import Inspection, InspectionType
+from apps.issues.models import Issue
+from apps.search.documents import reindex
+from apps.search.models import SearchDocument
+
+
+class FullTextSearchTest(TestCase):
+    """Tests for document maintenance and the /api/search endpoint"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.other = Company.objects.create(name='CLIA', slug='clia', company_type='CLIA')
+        self.user = User.objects.create_user(
+            username='inspector', password='testpass123', company=self.company, role='INSPECTOR'
+        )
+        inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        other_type = InspectionType.objects.create(company=self.other, name='Container', code='C2')
+
+        self.inspection = Inspection.objects.create(
+            company=self.company, inspection_type=inspection_type,
+            title='Container MSCU1234567', description='Porta traseira amassada'
+        )
+        self.issue = Issue.objects.create(
+            company=self.company, inspection=self.inspection,
+            title='Lacre violado', description='Lacre do container rompido na chegada'
+        )
+        Inspection.objects.create(
+            company=self.other, inspection_type=other_type,
+            title='Container MSCU7654321', description='Porta amassada'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_documents_follow_writes(self):
+        self.assertTrue(SearchDocument.objects.filter(doc_type='inspection', object_id=self.inspection.pk).exists())
+
+        self.inspection.description = 'Piso danificado'
+        self.inspection.save()
+        response = self.client.get('/api/search/', {'q': 'amassada'})
+        self.assertEqual(response.data['count'], 0)
+
+        self.issue.delete()
+        self.assertFalse(SearchDocument.objects.filter(doc_type='issue').exists())
+
+    def test_search_is_ranked_prefix_and_company_scoped(self):
+        response = self.client.get('/api/search/', {'q': 'lacre'})
+        self.assertEqual(response.status_code, 200)
+        # Title matches (issue) rank above body-only matches
+        self.assertEqual(response.data['results'][0]['type'], 'issue')
+        self.assertEqual(response.data['results'][0]['id'], self.issue.pk)
+
+        response = self.client.get('/api/search/', {'q': 'mscu', 'type': 'inspection'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.inspection.pk])
+
+    def test_viewset_search_uses_index(self):
+        response = self.client.get('/api/inspections/inspections/', {'search': 'traseira'})
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([r['id'] for r in results], [self.inspection.pk])
+
+    @override_settings(SEARCH_FILTER_RANKED_RESULTS=1)
+    def test_viewset_search_keeps_every_match_in_rank_order(self):
+        inspection_type = self.inspection.inspection_type
+        best = Inspection.objects.create(
+            company=self.company, inspection_type=inspection_type, title='Avaria no piso', description=''
+        )
+        later = [
+            Inspection.objects.create(
+                company=self.company, inspection_type=inspection_type, title=f'Container {n}',
+                description='Registro de avaria leve'
+            )
+            for n in range(2)
+        ]
+        url = '/api/inspections/inspections/'
+        response = self.client.get(url, {'search': 'avaria'})
+        # Além do limite ranqueado: o melhor resultado primeiro, os demais na ordenação padrão (-created_at)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([r['id'] for r in response.data['results']], [best.pk, later[1].pk, later[0].pk])
+
+        response = self.client.get(url, {'search': 'avaria', 'ordering': 'created_at'})
+        self.assertEqual([r['id'] for r in response.data['results']], [best.pk, later[0].pk, later[1].pk])
+
+        self.assertEqual(self.client.get(url, {'search': '!!!'}).data['count'], 0)
+
+    @override_settings(SEARCH_BACKEND='apps.search.backends.BasicSearchBackend')
+    def test_viewset_search_with_fallback_backend(self):
+        response = self.client.get('/api/inspections/inspections/', {'search': 'traseira'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.inspection.pk])
+
+    def test_reindex_rebuilds_missing_documents(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(reindex('inspection', batch_size=1), 2)
+        self.assertEqual(SearchDocument.objects.filter(doc_type='inspection').count(), 2)
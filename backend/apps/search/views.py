@@ -0,0 +1,51 @@
+"""
+Views for Search app
+Unified full-text search over inspections, issues and CargoSnap uploads
+"""
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+
+from apps.core.permissions import IsAuthenticated
+from .backends import get_backend
+from .models import SearchDocument
+from .serializers import SearchResultSerializer
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    GET /api/search/?q=<termos>&type=inspection,issue&limit=20
+
+    Resultados ordenados por relevância; cada termo casa por prefixo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Parâmetro q é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
+
+        valid_types = {doc_type for doc_type, _ in SearchDocument.DOC_TYPES}
+        doc_types = [t for t in request.query_params.get('type', '').split(',') if t in valid_types]
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            limit = 20
+
+        company = request.user.company
+        matches = get_backend().search(
+            query, doc_types=doc_types or None,
+            company_id=company.pk if company else None, limit=limit
+        )
+        documents = SearchDocument.objects.in_bulk([document_id for document_id, _ in matches])
+        results = []
+        for document_id, score in matches:
+            document = documents.get(document_id)
+            if document:
+                document.score = score
+                results.append(document)
+
+        return Response({
+            'query': query,
+            'count': len(results),
+            'results': SearchResultSerializer(results, many=True).data,
+        })
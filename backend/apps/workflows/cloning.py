@@ -0,0 +1,174 @@
+"""
+Deep copy of workflows for Workflows app
+A workflow is copied with its steps, step/form links, forms and form fields
+(validation rules and conditions included) using one bulk_create per model.
+New primary keys are mapped from the source rows in insertion order, so the
+number of queries does not depend on the size of the workflow.
+
+Workflow and form codes are unique: each copy gets a free code derived from
+the source (<code>_COPY, <code>_COPY_2, ...) found with one query per model,
+and the whole copy is retried with the next free codes if a concurrent copy
+takes them first.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+
+from .models import Workflow, WorkflowForm, WorkflowFormField, WorkflowStep, WorkflowStepForm
+
+CODE_MAX_LENGTH = 50
+MAX_ATTEMPTS = 3
+COPY_SUFFIX_RE = re.compile(r'_COPY(_\d+)?$')
+
+STEP_COPY_FIELDS = (
+    'name', 'description', 'step_type', 'sequence', 'is_required', 'is_skippable', 'min_photos',
+    'max_photos', 'condition_field', 'condition_operator', 'condition_value', 'config',
+)
+FORM_COPY_FIELDS = ('name', 'description', 'is_active', 'config')
+FIELD_COPY_FIELDS = (
+    'label', 'field_type', 'placeholder', 'help_text', 'is_required', 'min_value', 'max_value',
+    'min_length', 'max_length', 'pattern', 'options', 'default_value', 'sequence', 'width',
+    'show_if_field', 'show_if_value',
+)
+
+
+def copy_code(code):
+    """Código base da cópia: <code>_COPY (sem acumular sufixos de cópias anteriores)"""
+    return f"{COPY_SUFFIX_RE.sub('', code)}_COPY"
+
+
+def unique_codes(model, bases, exclude=()):
+    """
+    Códigos livres para cada código base em `bases` (uma consulta)
+
+    Args:
+        model: Modelo com o campo `code` único
+        bases: Códigos desejados; os ocupados recebem _2, _3, ...
+        exclude: Códigos a tratar como ocupados (ex.: tentativa anterior)
+
+    Returns:
+        Lista de códigos na ordem de `bases`
+    """
+    bases = [base[:CODE_MAX_LENGTH] for base in bases]
+    stems = {base[:CODE_MAX_LENGTH - 4] for base in bases}
+    taken = set(exclude)
+    if stems:
+        query = model.objects.none()
+        for stem in stems:
+            query = query | model.objects.filter(code__startswith=stem)
+        taken.update(query.values_list('code', flat=True))
+
+    codes = []
+    for base in bases:
+        code, number = base, 1
+        while code in taken:
+            number += 1
+            suffix = f'_{number}'
+            code = f'{base[:CODE_MAX_LENGTH - len(suffix)]}{suffix}'
+        taken.add(code)
+        codes.append(code)
+    return codes
+
+
+def clone_workflow(source, company=None, created_by=None, rename_code=copy_code, **overrides):
+    """
+    Copia o workflow com etapas, vínculos, formulários e campos
+
+    Args:
+        source: Workflow de origem
+        company: Empresa da cópia (padrão: a do workflow de origem)
+        created_by: Usuário que criou a cópia (também dos formulários)
+        rename_code: Função que gera o código base da cópia a partir do código
+            de origem (workflow e formulários)
+        overrides: Valores do novo workflow (name, inspection_type, is_default, ...)
+
+    Returns:
+        O novo Workflow (versão 1)
+    """
+    company_id = company.pk if company else source.company_id
+    overrides = _attnames(overrides)
+    steps = list(WorkflowStep.objects.filter(workflow=source).order_by('sequence', 'id'))
+    links = list(
+        WorkflowStepForm.objects.filter(step__workflow=source).select_related('form').order_by('id')
+    )
+    forms = list({link.form_id: link.form for link in links}.values())
+    fields = list(WorkflowFormField.objects.filter(form__in=forms).order_by('form_id', 'sequence', 'id'))
+
+    base_code = overrides.pop('code', None) or rename_code(source.code)
+    taken_workflow_codes, taken_form_codes = set(), set()
+    for attempt in range(MAX_ATTEMPTS):
+        workflow_code = unique_codes(Workflow, [base_code], taken_workflow_codes)[0]
+        form_codes = unique_codes(WorkflowForm, [rename_code(form.code) for form in forms], taken_form_codes)
+        try:
+            with transaction.atomic():
+                return _write_copy(
+                    source, company_id, created_by, workflow_code, steps, links, forms, form_codes, fields, overrides
+                )
+        except IntegrityError:
+            # Outra cópia ocupou os códigos entre a consulta e a gravação
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            taken_workflow_codes.add(workflow_code)
+            taken_form_codes.update(form_codes)
+
+
+def _attnames(overrides):
+    """FKs passados como objeto (inspection_type=...) viram <campo>_id, como os valores copiados da origem"""
+    normalized = {}
+    for name, value in overrides.items():
+        field = Workflow._meta.get_field(name)
+        if field.many_to_one and name != field.attname:
+            name, value = field.attname, value.pk if value is not None else None
+        normalized[name] = value
+    return normalized
+
+
+def _write_copy(source, company_id, created_by, code, steps, links, forms, form_codes, fields, overrides):
+    values = {
+        'name': source.name,
+        'description': source.description,
+        'inspection_type_id': source.inspection_type_id,
+        'is_active': source.is_active,
+        'is_default': False,
+        'requires_approval': source.requires_approval,
+        'allow_skip_steps': source.allow_skip_steps,
+        'auto_generate_report': source.auto_generate_report,
+        **overrides,
+    }
+    workflow = Workflow.objects.create(company_id=company_id, code=code, version=1, created_by=created_by, **values)
+
+    new_forms = WorkflowForm.objects.bulk_create([
+        WorkflowForm(
+            company_id=company_id, code=form_code, created_by=created_by,
+            **{field: getattr(form, field) for field in FORM_COPY_FIELDS}
+        )
+        for form, form_code in zip(forms, form_codes)
+    ])
+    form_ids = {old.pk: new.pk for old, new in zip(forms, new_forms)}
+
+    new_fields = WorkflowFormField.objects.bulk_create([
+        WorkflowFormField(form_id=form_ids[field.form_id], **{name: getattr(field, name) for name in FIELD_COPY_FIELDS})
+        for field in fields
+    ], batch_size=500)
+    # Condições (condition_field/show_if_field) podem referenciar campos pelo id: apontam para as cópias
+    field_ids = {str(old.pk): str(new.pk) for old, new in zip(fields, new_fields)}
+
+    new_steps = []
+    for step in steps:
+        new_step = WorkflowStep(workflow=workflow, **{field: getattr(step, field) for field in STEP_COPY_FIELDS})
+        new_step.condition_field = field_ids.get(step.condition_field, step.condition_field)
+        new_steps.append(new_step)
+    WorkflowStep.objects.bulk_create(new_steps)
+    step_ids = {old.pk: new.pk for old, new in zip(steps, new_steps)}
+
+    WorkflowStepForm.objects.bulk_create([
+        WorkflowStepForm(step_id=step_ids[link.step_id], form_id=form_ids[link.form_id], is_required=link.is_required)
+        for link in links
+    ])
+
+    remapped = [field for field in new_fields if field.show_if_field in field_ids]
+    for field in remapped:
+        field.show_if_field = field_ids[field.show_if_field]
+    if remapped:
+        WorkflowFormField.objects.bulk_update(remapped, ['show_if_field'], batch_size=500)
+    return workflow
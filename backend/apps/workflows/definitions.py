@@ -0,0 +1,195 @@
+"""
+Compiled workflow definitions for Workflows app
+The mobile app loads a workflow with all its steps, forms, fields and
+conditions; it is read thousands of times per write. The definition is built
+once per (workflow.id, version) with one query per level, serialized to JSON
+once and kept both in-process (small LRU) and in the shared cache. Any write
+to a step, step/form link, form or form field bumps Workflow.version
+(signals below), and so does saving the workflow itself, so entries are never
+deleted: a new version simply has a new key. The ETag is derived from the
+serialized body and served by WorkflowViewSet.definition.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .models import Workflow, WorkflowForm, WorkflowFormField, WorkflowStep, WorkflowStepForm
+
+WORKFLOW_FIELDS = (
+    'id', 'code', 'name', 'description', 'version', 'inspection_type_id', 'is_active',
+    'requires_approval', 'allow_skip_steps', 'auto_generate_report',
+)
+STEP_FIELDS = (
+    'id', 'name', 'description', 'step_type', 'sequence', 'is_required', 'is_skippable',
+    'min_photos', 'max_photos', 'condition_field', 'condition_operator', 'condition_value', 'config',
+)
+FORM_FIELDS = (
+    'id', 'label', 'field_type', 'placeholder', 'help_text', 'is_required', 'min_value', 'max_value',
+    'min_length', 'max_length', 'pattern', 'options', 'default_value', 'sequence', 'width',
+    'show_if_field', 'show_if_value',
+)
+
+
+class CompiledWorkflow:
+    """Definição de uma versão do workflow: dados, corpo JSON, ETag e validador (validation.py)"""
+
+    __slots__ = ('workflow_id', 'version', 'data', 'body', 'etag', 'validator')
+
+    def __init__(self, workflow_id, version, data, body):
+        self.workflow_id = workflow_id
+        self.version = version
+        self.data = data
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self.validator = None
+
+
+def _cache_key(workflow_id, version):
+    return f'workflows:definition:{workflow_id}:{version}'
+
+
+def build_definition(workflow):
+    """Monta a definição completa (workflow, etapas, formulários e campos) em três consultas"""
+    steps = list(WorkflowStep.objects.filter(workflow_id=workflow.pk).order_by('sequence').values(*STEP_FIELDS))
+    links = list(
+        WorkflowStepForm.objects.filter(step__workflow_id=workflow.pk)
+        .order_by('step_id', 'id')
+        .values('step_id', 'form_id', 'is_required', 'form__code', 'form__name', 'form__description', 'form__config')
+    )
+    fields = {}
+    for field in WorkflowFormField.objects.filter(
+        form_id__in={link['form_id'] for link in links}
+    ).order_by('form_id', 'sequence', 'id').values('form_id', *FORM_FIELDS):
+        fields.setdefault(field.pop('form_id'), []).append(field)
+
+    forms = {}
+    for link in links:
+        forms.setdefault(link['step_id'], []).append({
+            'id': link['form_id'],
+            'code': link['form__code'],
+            'name': link['form__name'],
+            'description': link['form__description'],
+            'config': link['form__config'],
+            'is_required': link['is_required'],
+            'fields': fields.get(link['form_id'], []),
+        })
+    for step in steps:
+        step['forms'] = forms.get(step['id'], [])
+
+    data = {field: getattr(workflow, field) for field in WORKFLOW_FIELDS}
+    data['inspection_type'] = data.pop('inspection_type_id')
+    data['steps'] = steps
+    return data
+
+
+class DefinitionCache:
+    """LRU em processo na frente do cache compartilhado"""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or getattr(settings, 'WORKFLOW_DEFINITION_CACHE_SIZE', 256)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, workflow):
+        """
+        Definição compilada da versão atual do workflow
+
+        Args:
+            workflow: Instância com `id` e `version` (e os WORKFLOW_FIELDS se
+                ainda não estiver em cache)
+        """
+        key = (workflow.pk, workflow.version)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+
+        body = cache.get(_cache_key(*key))
+        if body is not None:
+            compiled = CompiledWorkflow(workflow.pk, workflow.version, json.loads(body), body)
+        else:
+            data = build_definition(workflow)
+            # Corpo serializado uma única vez; os decimais saem como string, como na API
+            body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+            compiled = CompiledWorkflow(workflow.pk, workflow.version, json.loads(body), body)
+            cache.set(_cache_key(*key), body, getattr(settings, 'WORKFLOW_DEFINITION_CACHE_TIMEOUT', 86400))
+
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+definitions = DefinitionCache()
+
+
+def get_definition(workflow):
+    """Definição compilada (em cache) da versão atual do workflow"""
+    return definitions.get(workflow)
+
+
+def bump_versions(workflows):
+    """Nova versão dos workflows do queryset: as definições em cache deixam de ser usadas"""
+    return workflows.update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def _workflow_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or update_fields is not None:
+        return
+    # Parte da versão gravada no banco: uma instância desatualizada nunca reutiliza uma versão
+    current = Workflow.objects.filter(pk=instance.pk).values_list('version', flat=True).first()
+    if current is not None:
+        instance.version = current + 1
+
+
+def _workflow_post_save(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or created or update_fields is None or 'version' in update_fields:
+        return
+    bump_versions(Workflow.objects.filter(pk=instance.pk))
+    instance.version += 1
+
+
+def _step_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_versions(Workflow.objects.filter(pk=instance.workflow_id))
+
+
+def _link_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_versions(Workflow.objects.filter(steps__id=instance.step_id))
+
+
+def _form_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_versions(Workflow.objects.filter(steps__form_links__form_id=instance.pk))
+
+
+def _field_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_versions(Workflow.objects.filter(steps__form_links__form_id=instance.form_id))
+
+
+pre_save.connect(_workflow_pre_save, sender=Workflow, dispatch_uid='workflow_definition_version')
+post_save.connect(_workflow_post_save, sender=Workflow, dispatch_uid='workflow_definition_version_fields')
+for model, handler in (
+    (WorkflowStep, _step_changed),
+    (WorkflowStepForm, _link_changed),
+    (WorkflowForm, _form_changed),
+    (WorkflowFormField, _field_changed),
+):
+    post_save.connect(handler, sender=model, dispatch_uid=f'workflow_definition_{model.__name__}_save')
+    post_delete.connect(handler, sender=model, dispatch_uid=f'workflow_definition_{model.__name__}_delete')
@@ -0,0 +1,99 @@
+"""
+Management command to benchmark the compiled workflow validation engine
+Usage: python manage.py benchmark_workflow_validation [--responses 10000] [--fields 50]
+Runs on a synthetic definition in memory (no database access) and compares
+validation with the compiled validator against recompiling the rules for
+every submission.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from apps.workflows.validation import WorkflowValidator
+
+FIELD_TEMPLATES = [
+    {'field_type': 'TEXT', 'pattern': r'^[A-Z]{4}\d{7}$', 'min_length': 11, 'max_length': 11},
+    {'field_type': 'NUMBER', 'min_value': '0.00', 'max_value': '40000.00'},
+    {'field_type': 'SELECT', 'options': ['OK', 'AVARIADO', 'AUSENTE']},
+    {'field_type': 'EMAIL'},
+    {'field_type': 'DATE'},
+    {'field_type': 'CHECKBOX'},
+]
+VALUES = {
+    'TEXT': ['MSCU1234567', 'mscu123', ''],
+    'NUMBER': ['1200.5', '-3', '50000', 'abc'],
+    'SELECT': ['OK', 'AVARIADO', 'OUTRO'],
+    'EMAIL': ['inspetor@ictsi.com', 'invalido'],
+    'DATE': ['2024-05-01', '01/05/2024'],
+    'CHECKBOX': [True, False],
+}
+
+
+def synthetic_definition(field_count, steps=5):
+    """Definição com `field_count` campos distribuídos em `steps` etapas, com condições"""
+    definition = {'id': 0, 'version': 1, 'steps': []}
+    per_step = max(field_count // steps, 1)
+    field_id = 0
+    for step_number in range(steps):
+        fields = []
+        for _ in range(per_step):
+            field_id += 1
+            template = FIELD_TEMPLATES[field_id % len(FIELD_TEMPLATES)]
+            field = {
+                'id': field_id, 'label': f'Campo {field_id}', 'is_required': field_id % 3 == 0,
+                'min_value': None, 'max_value': None, 'min_length': None, 'max_length': None,
+                'pattern': '', 'options': [], 'show_if_field': '', 'show_if_value': '', **template,
+            }
+            if field_id % 7 == 0:
+                field['show_if_field'], field['show_if_value'] = '3', 'OK'
+            fields.append(field)
+        definition['steps'].append({
+            'id': step_number + 1,
+            'condition_field': '2' if step_number % 2 else '',
+            'condition_operator': 'greater_than',
+            'condition_value': '1000',
+            'forms': [{'id': step_number + 1, 'fields': fields}],
+        })
+    return definition
+
+
+class Command(BaseCommand):
+    help = 'Mede a validação de respostas de workflow com as regras compiladas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--responses', type=int, default=10000, help='Total de respostas validadas')
+        parser.add_argument('--fields', type=int, default=50, help='Campos por submissão')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        definition = synthetic_definition(options['fields'])
+        fields = [field for step in definition['steps'] for field in step['forms'][0]['fields']]
+        rng = random.Random(options['seed'])
+        submissions = [
+            {field['id']: rng.choice(VALUES[field['field_type']]) for field in fields}
+            for _ in range(max(options['responses'] // len(fields), 1))
+        ]
+        total = len(submissions) * len(fields)
+
+        started = time.perf_counter()
+        validator = WorkflowValidator(definition)
+        compile_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        errors = sum(len(validator.validate(values)) for values in submissions)
+        compiled_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for values in submissions:
+            WorkflowValidator(definition).validate(values)
+        uncompiled_time = time.perf_counter() - started
+
+        self.stdout.write(f'{total} respostas em {len(submissions)} submissões de {len(fields)} campos ({errors} erros)')
+        self.stdout.write(f'Compilação: {compile_time * 1000:.2f} ms')
+        self.stdout.write(
+            f'Validador compilado: {compiled_time * 1000:.1f} ms ({compiled_time / total * 1e6:.2f} µs/resposta)'
+        )
+        self.stdout.write(
+            f'Recompilando por submissão: {uncompiled_time * 1000:.1f} ms '
+            f'({uncompiled_time / total * 1e6:.2f} µs/resposta)'
+        )
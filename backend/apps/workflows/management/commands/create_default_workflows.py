@@ -1,10 +1,13 @@
 """
 Management command to create default workflows for each inspection type
+The first company missing a default workflow gets it built step by step; the
+other companies get a bulk deep copy of that one (apps/workflows/cloning.py).
 """
 from django.core.management.base import BaseCommand
 from apps.core.models import Company
 from apps.inspections.models import InspectionType
-from apps.workflows.models import Workflow, WorkflowStep, WorkflowForm, WorkflowFormField
+from apps.workflows.cloning import clone_workflow
+from apps.workflows.models import Workflow, WorkflowStep, WorkflowForm, WorkflowFormField, WorkflowStepForm
 
 
 class Command(BaseCommand):
@@ -12,6 +15,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
         companies = Company.objects.all()
+        templates = {}  # {tipo: workflow construído nesta execução}
         
         for company in companies:
             self.stdout.write(f'Creating workflows for {company.name}...')
@@ -50,17 +54,36 @@ class Command(BaseCommand):
                 }
             )
             
-            # Create Container Inspection Workflow
-            self.create_container_workflow(company, container_type)
-            
-            # Create Cargo Inspection Workflow
-            self.create_cargo_workflow(company, cargo_type)
-            
-            # Create Vehicle Inspection Workflow
-            self.create_vehicle_workflow(company, vehicle_type)
+            # Create Container, Cargo and Vehicle Inspection Workflows
+            for kind, inspection_type, build in (
+                ('CONTAINER', container_type, self.create_container_workflow),
+                ('CARGO', cargo_type, self.create_cargo_workflow),
+                ('VEHICLE', vehicle_type, self.create_vehicle_workflow),
+            ):
+                self.ensure_workflow(templates, kind, company, inspection_type, build)
             
             self.stdout.write(self.style.SUCCESS(f'✓ Workflows created for {company.name}'))
 
+    def ensure_workflow(self, templates, kind, company, inspection_type, build):
+        """Create the company's default workflow, copying the one built earlier in this run"""
+        code = f'{kind}_DEFAULT_{company.id}'
+        if Workflow.objects.filter(code=code).exists():
+            return
+        template = templates.get(kind)
+        if template is None:
+            templates[kind] = build(company, inspection_type)
+            return
+        suffix = f'_{template.company_id}'
+        clone_workflow(
+            template,
+            company=company,
+            code=code,
+            inspection_type=inspection_type,
+            is_default=True,
+            is_active=True,
+            rename_code=lambda source_code: f'{source_code.removesuffix(suffix)}_{company.id}',
+        )
+
     def create_container_workflow(self, company, inspection_type):
         """Create default container inspection workflow"""
         workflow, created = Workflow.objects.get_or_create(
@@ -76,7 +99,7 @@ class Command(BaseCommand):
         )
         
         if not created:
-            return
+            return workflow
         
         # Step 1: Identificação
         step1 = WorkflowStep.objects.create(
@@ -101,6 +124,7 @@ class Command(BaseCommand):
             WorkflowFormField(form=form1, label='Tipo de Container', field_type='SELECT', is_required=True, sequence=3,
                      options={'choices': ['20ft Standard', '40ft Standard', '40ft High Cube', '20ft Refrigerated', '40ft Refrigerated']}),
         ])
+        WorkflowStepForm.objects.create(step=step1, form=form1)
         
         # Step 2: Fotos Externas
         step2 = WorkflowStep.objects.create(
@@ -142,6 +166,7 @@ class Command(BaseCommand):
             WorkflowFormField(form=form3, label='Vazamentos Detectados', field_type='BOOLEAN', is_required=True, sequence=5),
             WorkflowFormField(form=form3, label='Observações', field_type='TEXTAREA', is_required=False, sequence=6),
         ])
+        WorkflowStepForm.objects.create(step=step3, form=form3)
         
         # Step 4: Fotos Internas
         step4 = WorkflowStep.objects.create(
@@ -180,6 +205,9 @@ class Command(BaseCommand):
                      options={'choices': ['Leve', 'Moderada', 'Grave', 'Crítica']}),
             WorkflowFormField(form=form5, label='Descrição Detalhada', field_type='TEXTAREA', is_required=True, sequence=4),
         ])
+        WorkflowStepForm.objects.create(step=step5, form=form5)
+        
+        return workflow
 
     def create_cargo_workflow(self, company, inspection_type):
         """Create default cargo inspection workflow"""
@@ -196,7 +224,7 @@ class Command(BaseCommand):
         )
         
         if not created:
-            return
+            return workflow
         
         # Step 1: Identificação da Carga
         step1 = WorkflowStep.objects.create(
@@ -222,6 +250,7 @@ class Command(BaseCommand):
             WorkflowFormField(form=form1, label='Tipo de Embalagem', field_type='SELECT', is_required=True, sequence=4,
                      options={'choices': ['Caixas', 'Paletes', 'Sacos', 'Tambores', 'Granel', 'Outro']}),
         ])
+        WorkflowStepForm.objects.create(step=step1, form=form1)
         
         # Step 2: Fotos Gerais
         WorkflowStep.objects.create(
@@ -259,6 +288,9 @@ class Command(BaseCommand):
             WorkflowFormField(form=form3, label='Etiquetas Legíveis', field_type='BOOLEAN', is_required=True, sequence=4),
             WorkflowFormField(form=form3, label='Observações', field_type='TEXTAREA', is_required=False, sequence=5),
         ])
+        WorkflowStepForm.objects.create(step=step3, form=form3)
+        
+        return workflow
 
     def create_vehicle_workflow(self, company, inspection_type):
         """Create default vehicle inspection workflow"""
@@ -275,7 +307,7 @@ class Command(BaseCommand):
         )
         
         if not created:
-            return
+            return workflow
         
         # Step 1: Identificação do Veículo
         step1 = WorkflowStep.objects.create(
@@ -301,6 +333,7 @@ class Command(BaseCommand):
             WorkflowFormField(form=form1, label='Cor', field_type='TEXT', is_required=True, sequence=4),
             WorkflowFormField(form=form1, label='Chassi (VIN)', field_type='TEXT', is_required=False, sequence=5),
         ])
+        WorkflowStepForm.objects.create(step=step1, form=form1)
         
         # Step 2: Fotos Externas
         WorkflowStep.objects.create(
@@ -340,3 +373,6 @@ class Command(BaseCommand):
             WorkflowFormField(form=form3, label='Amassados ou Arranhões', field_type='BOOLEAN', is_required=True, sequence=5),
             WorkflowFormField(form=form3, label='Observações', field_type='TEXTAREA', is_required=False, sequence=6),
         ])
+        WorkflowStepForm.objects.create(step=step3, form=form3)
+        
+        return workflow
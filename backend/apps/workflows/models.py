@@ -258,3 +258,20 @@ class WorkflowFormResponse(BaseModel):
     
     def __str__(self):
         return f"{self.form.name} - {self.field.label}: {self.value[:50]}"
+
+
+class WorkflowSubmission(BaseModel):
+    """Batch of form responses submitted by a client, keyed for safe retries"""
+    execution = models.ForeignKey(WorkflowExecution, on_delete=models.CASCADE, related_name='submissions')
+    step = models.ForeignKey(WorkflowStep, on_delete=models.SET_NULL, null=True, blank=True, related_name='submissions')
+    submission_key = models.CharField(max_length=100)  # Client-generated (e.g. UUID), reused on retries
+    submitted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    response_count = models.IntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)  # Response body replayed on retries
+    
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['execution', 'submission_key']
+    
+    def __str__(self):
+        return f"{self.execution_id} - {self.submission_key}"
@@ -2,6 +2,7 @@
 Serializers for Workflows app
 """
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetSerializerMixin
 from .models import (
     Workflow, WorkflowStep, WorkflowForm, WorkflowFormField,
     WorkflowStepForm, WorkflowExecution, WorkflowStepExecution,
@@ -52,7 +53,9 @@ class WorkflowStepSerializer(serializers.ModelSerializer):
     
     def get_forms(self, obj):
         """Return forms with their fields properly nested"""
-        form_links = obj.form_links.select_related('form').prefetch_related('form__fields').all()
+        form_links = obj.form_links.all()
+        if 'form_links' not in getattr(obj, '_prefetched_objects_cache', {}):
+            form_links = form_links.select_related('form').prefetch_related('form__fields')
         return [
             {
                 'id': link.form.id,
@@ -74,7 +77,7 @@ class WorkflowStepFormSerializer(serializers.ModelSerializer):
         fields = ['id', 'step', 'form', 'form_id', 'is_required']
 
 
-class WorkflowListSerializer(serializers.ModelSerializer):
+class WorkflowListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Lightweight for list views"""
     company_name = serializers.CharField(source='company.name', read_only=True)
     inspection_type_name = serializers.CharField(source='inspection_type.name', read_only=True)
@@ -88,13 +91,16 @@ class WorkflowListSerializer(serializers.ModelSerializer):
             'requires_approval', 'allow_skip_steps', 'auto_generate_report',
             'version', 'step_count', 'created_at'
         ]
-        read_only_fields = ['created_at']
+        read_only_fields = ['version', 'created_at']
+        sparse_field_sources = {'step_count': []}
     
     def get_step_count(self, obj):
+        if hasattr(obj, 'step_total'):
+            return obj.step_total
         return obj.steps.count()
 
 
-class WorkflowDetailSerializer(serializers.ModelSerializer):
+class WorkflowDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Complete for detail views"""
     company_name = serializers.CharField(source='company.name', read_only=True)
     inspection_type_name = serializers.CharField(source='inspection_type.name', read_only=True)
@@ -110,7 +116,7 @@ class WorkflowDetailSerializer(serializers.ModelSerializer):
             'version', 'created_by', 'created_by_name', 'steps',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_by', 'created_at', 'updated_at']
+        read_only_fields = ['version', 'created_by', 'created_at', 'updated_at']
 
 
 class WorkflowFormResponseSerializer(serializers.ModelSerializer):
@@ -126,7 +132,7 @@ class WorkflowFormResponseSerializer(serializers.ModelSerializer):
         read_only_fields = ['answered_by', 'answered_at']
 
 
-class WorkflowStepExecutionSerializer(serializers.ModelSerializer):
+class WorkflowStepExecutionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     step_name = serializers.CharField(source='step.name', read_only=True)
     step_type = serializers.CharField(source='step.step_type', read_only=True)
     completed_by_name = serializers.CharField(source='completed_by.full_name', read_only=True)
@@ -142,7 +148,7 @@ class WorkflowStepExecutionSerializer(serializers.ModelSerializer):
         read_only_fields = ['completed_by', 'created_at']
 
 
-class WorkflowExecutionSerializer(serializers.ModelSerializer):
+class WorkflowExecutionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     workflow_name = serializers.CharField(source='workflow.name', read_only=True)
     inspection_reference = serializers.CharField(source='inspection.reference_number', read_only=True)
     current_step_name = serializers.CharField(source='current_step.name', read_only=True)
@@ -158,6 +164,7 @@ class WorkflowExecutionSerializer(serializers.ModelSerializer):
             'step_executions', 'progress_percentage', 'created_at'
         ]
         read_only_fields = ['created_at']
+        sparse_field_sources = {'progress_percentage': ['current_step_number', 'total_steps']}
     
     def get_progress_percentage(self, obj):
         if obj.total_steps == 0:
@@ -0,0 +1,222 @@
+"""
+Batch form response submission for Workflows app
+A client sends a whole step (or the whole execution) worth of responses in
+one request. The batch is validated together (validation.py), then the
+WorkflowFormResponse rows are upserted in bulk, the step executions get
+their step_data and status, and the execution its execution_data and
+progress - all in one transaction with the execution row locked.
+
+Every batch carries a client-generated submission key. The result of the
+first successful submission is stored in WorkflowSubmission and returned
+again for any retry with the same key, so offline clients can resend
+safely without duplicating responses or advancing progress twice.
+"""
+import json
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import (
+    WorkflowExecution, WorkflowFormResponse, WorkflowStepExecution, WorkflowSubmission
+)
+from .validation import get_validator, submission_values
+
+
+class SubmissionError(Exception):
+    """Lote rejeitado (dados inválidos, etapa desconhecida, etc.)"""
+
+    def __init__(self, message, errors=None, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.errors = errors or []
+        self.status_code = status_code
+
+
+def _parse_responses(responses):
+    """[{field, value, file_url}] -> {field_id: (valor, file_url)}; a última resposta de cada campo vale"""
+    parsed = {}
+    for response in responses:
+        try:
+            field_id = int(response['field'])
+        except (KeyError, TypeError, ValueError):
+            raise SubmissionError('Cada resposta precisa de field (id do campo) e value')
+        parsed[field_id] = (response.get('value'), response.get('file_url') or '')
+    return parsed
+
+
+def _stored_value(value):
+    """Valor gravado em WorkflowFormResponse.value (texto)"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def submit_responses(execution_id, submission_key, responses, step_id=None, user=None):
+    """
+    Grava um lote de respostas de uma execução (idempotente por submission_key)
+
+    Args:
+        execution_id: Id da WorkflowExecution
+        submission_key: Chave gerada pelo cliente, repetida nas novas tentativas
+        responses: Lista de {'field', 'value', 'file_url'}
+        step_id: Etapa enviada (None = a execução inteira)
+        user: Usuário que respondeu
+
+    Returns:
+        Tupla (resultado, True se é a repetição de uma submissão já gravada)
+
+    Raises:
+        SubmissionError: Lote inválido; nada é gravado
+    """
+    if not submission_key:
+        raise SubmissionError('submission_key é obrigatório')
+    answers = _parse_responses(responses)
+    try:
+        with transaction.atomic():
+            return _submit(execution_id, submission_key, answers, step_id, user)
+    except IntegrityError:
+        # Repetição concorrente com a mesma chave: vale a submissão que gravou primeiro
+        previous = WorkflowSubmission.objects.filter(
+            execution_id=execution_id, submission_key=submission_key
+        ).first()
+        if previous is None:
+            raise
+        return previous.result, True
+
+
+def _submit(execution_id, submission_key, answers, step_id, user):
+    """Corpo de submit_responses, dentro da transação"""
+    execution = WorkflowExecution.objects.select_for_update().select_related('workflow').get(pk=execution_id)
+    previous = WorkflowSubmission.objects.filter(execution=execution, submission_key=submission_key).first()
+    if previous is not None:
+        return previous.result, True
+
+    validator = get_validator(execution.workflow)
+    if step_id is not None and step_id not in {step for step, _, _ in validator.steps}:
+        raise SubmissionError('Etapa não pertence ao workflow da execução')
+
+    # Etapa e formulário de cada resposta
+    placement = {}
+    errors = []
+    for field_id in answers:
+        options = validator.field_steps.get(field_id, [])
+        if step_id is not None:
+            options = [option for option in options if option[0] == step_id]
+        if not options:
+            errors.append({'step': step_id, 'form': None, 'field': field_id,
+                           'message': 'Campo não pertence à etapa' if step_id else 'Campo não pertence ao workflow'})
+            continue
+        placement[field_id] = options[0]
+    if errors:
+        raise SubmissionError('Submissão inválida', errors)
+
+    stored = {}  # field_id -> id da resposta gravada
+    current = []
+    for response_id, field_id, value in execution.form_responses.order_by('id').values_list('id', 'field_id', 'value'):
+        stored[field_id] = response_id
+        current.append({'field': field_id, 'value': value})
+    values = submission_values(execution.execution_data, current, validator.step_ids)
+    values.update({field_id: value for field_id, (value, _) in answers.items()})
+
+    # Validação do lote inteiro: a etapa enviada ou todas as etapas ativas
+    if step_id is not None:
+        checked_steps = submitted_steps = {step_id}
+    else:
+        checked_steps = set(validator.active_steps(values))
+        # Etapas sem campos (fotos, assinatura...) não são concluídas por respostas
+        submitted_steps = {step for step, _, fields in validator.steps if step in checked_steps and fields}
+    errors = [error for error in validator.validate(values) if error['step'] in checked_steps]
+    if errors:
+        raise SubmissionError('Submissão inválida', errors)
+
+    now = timezone.now()
+    step_executions = {
+        step_execution.step_id: step_execution
+        for step_execution in WorkflowStepExecution.objects.filter(execution=execution)
+    }
+    touched_steps = submitted_steps | {step for step, _ in placement.values()}
+    missing = [
+        WorkflowStepExecution(execution=execution, step_id=step, status='IN_PROGRESS', started_at=now)
+        for step in touched_steps if step not in step_executions
+    ]
+    for step_execution in WorkflowStepExecution.objects.bulk_create(missing):
+        step_executions[step_execution.step_id] = step_execution
+
+    # Upsert das respostas: uma linha por campo na execução
+    to_create, to_update = [], []
+    for field_id, (value, file_url) in answers.items():
+        step, form = placement[field_id]
+        text = _stored_value(value)
+        if field_id in stored:
+            to_update.append(WorkflowFormResponse(
+                id=stored[field_id], step_execution_id=step_executions[step].pk, value=text,
+                file_url=file_url, answered_by=user, updated_at=now,
+            ))
+        else:
+            to_create.append(WorkflowFormResponse(
+                execution=execution, step_execution_id=step_executions[step].pk, form_id=form,
+                field_id=field_id, value=text, file_url=file_url, answered_by=user,
+            ))
+    WorkflowFormResponse.objects.bulk_create(to_create, batch_size=500)
+    WorkflowFormResponse.objects.bulk_update(
+        to_update, ['step_execution', 'value', 'file_url', 'answered_by', 'updated_at'], batch_size=500
+    )
+
+    # step_data das etapas enviadas e execution_data ({step_id: {field_id: valor}})
+    execution_data = dict(execution.execution_data or {})
+    for field_id, (value, _) in answers.items():
+        step = placement[field_id][0]
+        step_executions[step].step_data[str(field_id)] = value
+        if not isinstance(execution_data.get(str(step)), dict):
+            execution_data[str(step)] = {}
+        execution_data[str(step)][str(field_id)] = value
+    for step in touched_steps:
+        step_execution = step_executions[step]
+        step_execution.updated_at = now
+        if step in submitted_steps:
+            step_execution.status = 'COMPLETED'
+            step_execution.started_at = step_execution.started_at or now
+            step_execution.completed_at = now
+            step_execution.completed_by = user
+    WorkflowStepExecution.objects.bulk_update(
+        [step_executions[step] for step in touched_steps],
+        ['status', 'started_at', 'completed_at', 'completed_by', 'step_data', 'updated_at'],
+    )
+
+    # Progresso: etapas ativas concluídas e a próxima pendente
+    active = validator.active_steps(values)
+    completed = {step for step, step_execution in step_executions.items() if step_execution.status == 'COMPLETED'}
+    pending = [step for step in active if step not in completed]
+    execution.execution_data = execution_data
+    execution.total_steps = len(active)
+    execution.current_step_number = len([step for step in active if step in completed])
+    execution.current_step_id = pending[0] if pending else None
+    if execution.status == 'NOT_STARTED':
+        execution.status = 'IN_PROGRESS'
+    execution.started_at = execution.started_at or now
+    execution.save(update_fields=[
+        'execution_data', 'total_steps', 'current_step_number', 'current_step', 'status', 'started_at', 'updated_at'
+    ])
+
+    result = {
+        'execution': execution.pk,
+        'submission_key': submission_key,
+        'step': step_id,
+        'responses_created': len(to_create),
+        'responses_updated': len(to_update),
+        'status': execution.status,
+        'current_step': execution.current_step_id,
+        'current_step_number': execution.current_step_number,
+        'total_steps': execution.total_steps,
+        'progress_percentage': round(execution.current_step_number / execution.total_steps * 100, 2)
+        if execution.total_steps else 0,
+    }
+    WorkflowSubmission.objects.create(
+        execution=execution, step_id=step_id, submission_key=submission_key, submitted_by=user,
+        response_count=len(answers), result=result,
+    )
+    return result, False
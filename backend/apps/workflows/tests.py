@@ -0,0 +1,432 @@
+"""
+Tests for Workflows app
+"""
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.core.models import Company, User
+from apps.inspections.models import Inspection, InspectionType
+from apps.workflows.cloning import clone_workflow
+from apps.workflows.definitions import build_definition, definitions
+from apps.workflows.models import (
+    Workflow, WorkflowExecution, WorkflowForm, WorkflowFormField, WorkflowFormResponse, WorkflowStep,
+    WorkflowStepExecution, WorkflowStepForm, WorkflowSubmission
+)
+from apps.workflows.validation import get_validator, validate_execution
+
+
+def create_workflow(company, code='CONTAINER'):
+    """Workflow com uma etapa de formulário (dois campos) e uma de fotos"""
+    workflow = Workflow.objects.create(company=company, name='Inspeção de Container', code=code)
+    form = WorkflowForm.objects.create(company=company, name='Identificação', code=f'{code}_FORM')
+    WorkflowFormField.objects.create(
+        form=form, label='Número do container', field_type='TEXT', is_required=True,
+        pattern=r'^[A-Z]{4}\d{7}$', sequence=1,
+    )
+    WorkflowFormField.objects.create(
+        form=form, label='Peso bruto', field_type='NUMBER', min_value=0, max_value=40000, sequence=2,
+        show_if_field='Número do container', show_if_value='MSCU1234567',
+    )
+    form_step = WorkflowStep.objects.create(workflow=workflow, name='Dados', step_type='FORM', sequence=1)
+    WorkflowStepForm.objects.create(step=form_step, form=form)
+    WorkflowStep.objects.create(
+        workflow=workflow, name='Fotos', step_type='PHOTO', sequence=2, min_photos=2,
+        condition_field='Peso bruto', condition_operator='greater_than', condition_value='1000',
+    )
+    return Workflow.objects.get(pk=workflow.pk), form
+
+
+class WorkflowDefinitionTest(TestCase):
+    """Tests for the compiled, versioned workflow definition cache"""
+
+    def setUp(self):
+        cache.clear()
+        definitions.clear()
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.manager = User.objects.create_user(
+            username='manager', password='testpass123', company=self.company, role='MANAGER'
+        )
+        self.inspector = User.objects.create_user(
+            username='inspector', password='testpass123', company=self.company, role='INSPECTOR'
+        )
+        self.workflow, self.form = create_workflow(self.company)
+        self.client = APIClient()
+        self.client.force_authenticate(self.inspector)
+
+    def _url(self, workflow=None):
+        return f'/api/workflows/workflows/{(workflow or self.workflow).pk}/definition/'
+
+    def test_definition_is_compiled_once_and_served_with_etag(self):
+        response = self.client.get(self._url())
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([step['name'] for step in data['steps']], ['Dados', 'Fotos'])
+        fields = data['steps'][0]['forms'][0]['fields']
+        self.assertEqual([field['label'] for field in fields], ['Número do container', 'Peso bruto'])
+        self.assertEqual(fields[1]['max_value'], '40000.00')
+        self.assertEqual(data['steps'][1]['condition_operator'], 'greater_than')
+        etag = response['ETag']
+
+        # Versão em cache: só a consulta do workflow
+        with self.assertNumQueries(1):
+            cached = self.client.get(self._url())
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(self._url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+
+        # Outro processo: vem do cache compartilhado, sem recompilar
+        definitions.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self._url()).content, response.content)
+
+    def test_definition_changes_bump_version(self):
+        etag = self.client.get(self._url())['ETag']
+        version = self.workflow.version
+
+        field = self.form.fields.get(sequence=2)
+        field.max_value = 30000
+        field.save()
+        self.workflow.refresh_from_db()
+        self.assertEqual(self.workflow.version, version + 1)
+        response = self.client.get(self._url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['steps'][0]['forms'][0]['fields'][1]['max_value'], '30000.00')
+
+        WorkflowStepForm.objects.get(form=self.form).delete()
+        self.workflow.refresh_from_db()
+        self.assertEqual(self.workflow.version, version + 2)
+        self.assertEqual(self.client.get(self._url()).json()['steps'][0]['forms'], [])
+
+        # Instância desatualizada: a versão parte do banco, nunca reutiliza uma anterior
+        stale = Workflow.objects.get(pk=self.workflow.pk)
+        WorkflowStep.objects.filter(workflow=self.workflow, sequence=2).get().delete()
+        stale.name = 'Inspeção Completa'
+        stale.save()
+        self.assertEqual(stale.version, version + 4)
+        stale.is_active = False
+        stale.save(update_fields=['is_active'])
+        self.assertEqual(Workflow.objects.get(pk=stale.pk).version, version + 5)
+        data = self.client.get(self._url()).json()
+        self.assertEqual((data['name'], data['is_active'], len(data['steps'])), ('Inspeção Completa', False, 1))
+
+    def test_definition_is_scoped_to_company(self):
+        other = Company.objects.create(name='Cliente', slug='cliente', company_type='CLIENT')
+        workflow, _ = create_workflow(other, code='OTHER')
+        self.assertEqual(self.client.get(self._url(workflow)).status_code, 404)
+
+    def test_list_and_detail_queries_do_not_grow_with_steps(self):
+        self.client.force_authenticate(self.manager)
+        for code in ('CARGO', 'VEHICLE'):
+            create_workflow(self.company, code=code)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/workflows/workflows/')
+        self.assertEqual({row['step_count'] for row in response.json()['results']}, {2})
+
+        # Workflow, etapas, vínculos, formulários e campos
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/workflows/workflows/{self.workflow.pk}/')
+        self.assertEqual(len(response.json()['steps'][0]['forms'][0]['fields']), 2)
+
+
+class ExecutionFixtureMixin:
+    """Workflow com etapa condicional (peso acima de 1000 kg) e uma execução"""
+
+    def setUp(self):
+        cache.clear()
+        definitions.clear()
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.user = User.objects.create_user(
+            username='inspector', password='testpass123', company=self.company, role='INSPECTOR'
+        )
+        self.workflow, self.form = create_workflow(self.company)
+        self.number, self.weight = self.form.fields.order_by('sequence')
+        # Etapa exibida só para cargas acima de 1000 kg
+        heavy_form = WorkflowForm.objects.create(company=self.company, name='Carga pesada', code='HEAVY_FORM')
+        self.lashing = WorkflowFormField.objects.create(
+            form=heavy_form, label='Amarração', field_type='SELECT', is_required=True,
+            options=[{'value': 'OK', 'label': 'Conforme'}, {'value': 'NOK', 'label': 'Não conforme'}],
+        )
+        heavy_step = WorkflowStep.objects.create(
+            workflow=self.workflow, name='Carga pesada', step_type='FORM', sequence=3,
+            condition_field=str(self.weight.pk), condition_operator='>', condition_value='1000',
+        )
+        WorkflowStepForm.objects.create(step=heavy_step, form=heavy_form)
+        self.workflow.refresh_from_db()
+        inspection_type = InspectionType.objects.create(company=self.company, name='Container', code='C')
+        inspection = Inspection.objects.create(
+            company=self.company, inspection_type=inspection_type, title='Container', reference_number='INS-1'
+        )
+        self.execution = WorkflowExecution.objects.create(workflow=self.workflow, inspection=inspection)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+
+class WorkflowValidationTest(ExecutionFixtureMixin, TestCase):
+    """Tests for the compiled step conditions and field validators"""
+
+    def _errors(self, values):
+        return {(error['field'], error['message']) for error in get_validator(self.workflow).validate(values)}
+
+    def test_rules_conditions_and_show_if(self):
+        self.assertEqual(self._errors({}), {(self.number.pk, 'Campo obrigatório')})
+        # Todos os erros de uma vez; peso oculto porque o número não é o do show_if
+        self.assertEqual(self._errors({self.number.pk: 'abc', self.weight.pk: '99999'}), {
+            (self.number.pk, 'Formato inválido'),
+            (self.lashing.pk, 'Campo obrigatório'),
+        })
+        self.assertEqual(self._errors({self.number.pk: 'MSCU1234567', self.weight.pk: '99999'}), {
+            (self.weight.pk, 'Valor máximo: 40000.00'),
+            (self.lashing.pk, 'Campo obrigatório'),
+        })
+        self.assertEqual(self._errors({self.number.pk: 'MSCU1234567', self.weight.pk: '800'}), set())
+        self.assertEqual(
+            self._errors({self.number.pk: 'MSCU1234567', self.weight.pk: '1500', self.lashing.pk: 'TALVEZ'}),
+            {(self.lashing.pk, 'Opção inválida')},
+        )
+        self.assertEqual(self._errors({self.number.pk: 'MSCU1234567', 999999: 'x'}), {(999999, 'Campo não pertence ao workflow')})
+
+    def test_validator_is_compiled_once_per_version(self):
+        validator = get_validator(self.workflow)
+        self.assertIs(get_validator(Workflow.objects.get(pk=self.workflow.pk)), validator)
+        self.weight.max_value = 50000
+        self.weight.save()
+        self.workflow.refresh_from_db()
+        self.assertIsNot(get_validator(self.workflow), validator)
+        self.assertEqual(self._errors({self.number.pk: 'MSCU1234567', self.weight.pk: '45000', self.lashing.pk: 'OK'}), set())
+
+    def test_execution_data_and_responses_are_validated_together(self):
+        self.execution.execution_data = {str(self.number.pk): 'MSCU1234567', str(self.weight.pk): '1500'}
+        self.execution.save()
+        step_execution = WorkflowStepExecution.objects.create(
+            execution=self.execution, step=self.workflow.steps.get(sequence=3)
+        )
+        WorkflowFormResponse.objects.create(
+            execution=self.execution, step_execution=step_execution, form=self.lashing.form,
+            field=self.lashing, value='NOK', answered_by=self.user,
+        )
+        self.assertEqual(validate_execution(self.execution), [])
+        # Lote informado substitui as respostas gravadas; peso abaixo de 1000 dispensa a etapa de carga pesada
+        errors = validate_execution(self.execution, responses=[{'field': self.weight.pk, 'value': '-1'}])
+        self.assertEqual([(error['field'], error['message']) for error in errors], [(self.weight.pk, 'Valor mínimo: 0.00')])
+
+    def test_object_valued_field_in_execution_data(self):
+        photo = WorkflowFormField.objects.create(form=self.form, label='Foto do lacre', field_type='FILE',
+                                                 is_required=True, sequence=3)
+        metadata = {'name': 'lacre.jpg', 'size': 1024}
+        first_step = str(self.workflow.steps.get(sequence=1).pk)
+        for data in (
+            {str(self.number.pk): 'MSCU1234567', str(self.weight.pk): '500', str(photo.pk): metadata},
+            {first_step: {str(self.number.pk): 'MSCU1234567', str(self.weight.pk): '500', str(photo.pk): metadata}},
+        ):
+            self.assertEqual(validate_execution(self.execution, execution_data=data), [])
+        errors = validate_execution(self.execution, execution_data={str(self.number.pk): 'MSCU1234567'})
+        self.assertIn((photo.pk, 'Campo obrigatório'), [(error['field'], error['message']) for error in errors])
+
+    def test_validate_and_complete_endpoints(self):
+        url = f'/api/workflows/executions/{self.execution.pk}/'
+        response = self.client.post(f'{url}validate/', {
+            'execution_data': {str(self.number.pk): 'MSCU1234567'},
+            'responses': [{'field': self.weight.pk, 'value': '2000'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['valid'])
+        self.assertEqual([error['field'] for error in response.data['errors']], [self.lashing.pk])
+
+        response = self.client.post(f'{url}complete/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['message'], 'Campo obrigatório')
+
+        self.execution.execution_data = {str(self.workflow.steps.get(sequence=1).pk): {str(self.number.pk): 'MSCU1234567'}}
+        self.execution.save()
+        self.assertEqual(self.client.post(f'{url}complete/').status_code, 200)
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.status, 'COMPLETED')
+
+    def test_benchmark_validates_10k_responses(self):
+        out = StringIO()
+        call_command('benchmark_workflow_validation', responses=10000, fields=50, stdout=out)
+        self.assertIn('10000 respostas em 200 submissões', out.getvalue())
+
+
+def _shape(workflow):
+    """Definição sem ids, para comparar cópias"""
+    def strip(data):
+        if isinstance(data, dict):
+            return {key: strip(value) for key, value in data.items() if key not in ('id', 'code', 'version', 'condition_field', 'show_if_field')}
+        if isinstance(data, list):
+            return [strip(item) for item in data]
+        return data
+    return strip(build_definition(workflow)['steps'])
+
+
+class WorkflowCloneTest(TestCase):
+    """Tests for the bulk deep copy of workflows"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='ICTSI Brasil', slug='ictsi', company_type='ICTSI')
+        self.manager = User.objects.create_user(
+            username='manager', password='testpass123', company=self.company, role='MANAGER'
+        )
+        self.workflow, self.form = create_workflow(self.company)
+        # Condições pelo id do campo
+        number, weight = self.form.fields.order_by('sequence')
+        weight.show_if_field = str(number.pk)
+        weight.save()
+        WorkflowStep.objects.filter(workflow=self.workflow, sequence=2).update(condition_field=str(weight.pk))
+        self.workflow.refresh_from_db()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_clone_copies_everything_with_remapped_conditions(self):
+        copy = clone_workflow(self.workflow, created_by=self.manager)
+        self.assertEqual((copy.code, copy.version, copy.created_by), ('CONTAINER_COPY', 1, self.manager))
+        self.assertEqual(_shape(copy), _shape(self.workflow))
+
+        form = WorkflowForm.objects.get(step_links__step__workflow=copy)
+        self.assertEqual(form.code, 'CONTAINER_FORM_COPY')
+        number, weight = form.fields.order_by('sequence')
+        self.assertEqual(weight.show_if_field, str(number.pk))
+        self.assertEqual(copy.steps.get(sequence=2).condition_field, str(weight.pk))
+        # A origem não muda
+        self.assertEqual(self.form.fields.get(sequence=2).show_if_field, str(self.form.fields.get(sequence=1).pk))
+
+    def test_clone_query_count_does_not_depend_on_size(self):
+        with CaptureQueriesContext(connection) as small:
+            clone_workflow(self.workflow)
+        number = self.form.fields.get(sequence=1)
+        for sequence in range(3, 30):
+            step = WorkflowStep.objects.create(workflow=self.workflow, name=f'Etapa {sequence}', step_type='FORM', sequence=sequence)
+            form = WorkflowForm.objects.create(company=self.company, name=f'Form {sequence}', code=f'FORM_{sequence}')
+            WorkflowFormField.objects.create(form=form, label=f'Campo {sequence}', field_type='TEXT', show_if_field=str(number.pk))
+            WorkflowStepForm.objects.create(step=step, form=form)
+        with CaptureQueriesContext(connection) as large:
+            copy = clone_workflow(self.workflow)
+        # Um INSERT por modelo (dentro do limite de parâmetros por INSERT do banco)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(copy.steps.count(), 29)
+        self.assertEqual(WorkflowFormField.objects.filter(form__step_links__step__workflow=copy).count(), 29)
+
+    def test_duplicate_endpoint_generates_unique_codes(self):
+        url = f'/api/workflows/workflows/{self.workflow.pk}/duplicate/'
+        first = self.client.post(url)
+        second = self.client.post(url)
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual((first.data['code'], second.data['code']), ('CONTAINER_COPY', 'CONTAINER_COPY_2'))
+        self.assertEqual(first.data['name'], 'Inspeção de Container (Copy)')
+        # Cópia da cópia não acumula sufixos
+        third = self.client.post(f"/api/workflows/workflows/{first.data['id']}/duplicate/")
+        self.assertEqual(third.data['code'], 'CONTAINER_COPY_3')
+        self.assertEqual(
+            sorted(WorkflowForm.objects.filter(code__startswith='CONTAINER_FORM').values_list('code', flat=True)),
+            ['CONTAINER_FORM', 'CONTAINER_FORM_COPY', 'CONTAINER_FORM_COPY_2', 'CONTAINER_FORM_COPY_3'],
+        )
+
+    def test_default_workflows_are_copied_between_companies(self):
+        other = Company.objects.create(name='Cliente', slug='cliente', company_type='CLIENT')
+        call_command('create_default_workflows', stdout=StringIO())
+
+        for kind in ('CONTAINER', 'CARGO', 'VEHICLE'):
+            built = Workflow.objects.get(code=f'{kind}_DEFAULT_{self.company.pk}')
+            copied = Workflow.objects.get(code=f'{kind}_DEFAULT_{other.pk}')
+            self.assertEqual((copied.company, copied.is_default), (other, True))
+            for company in (self.company, other):
+                workflow = Workflow.objects.get(code=f'{kind}_DEFAULT_{company.pk}')
+                self.assertEqual(workflow.inspection_type.company, company)
+            self.assertEqual(_shape(copied), _shape(built))
+            self.assertTrue(WorkflowStepForm.objects.filter(step__workflow=built).exists())
+        self.assertTrue(WorkflowForm.objects.filter(company=other, code=f'CONTAINER_IDENTIFICATION_{other.pk}').exists())
+
+        # Idempotente
+        call_command('create_default_workflows', stdout=StringIO())
+        self.assertEqual(Workflow.objects.filter(code__contains='_DEFAULT_').count(), 6)
+
+
+class WorkflowSubmissionTest(ExecutionFixtureMixin, TestCase):
+    """Tests for the idempotent batch submission of form responses"""
+
+    def _submit(self, key, responses, step=None, **extra):
+        data = {'submission_key': key, 'responses': responses}
+        if step is not None:
+            data['step'] = step.pk
+        return self.client.post(f'/api/workflows/executions/{self.execution.pk}/submit/', data, format='json', **extra)
+
+    def test_step_batch_updates_progress_and_is_idempotent(self):
+        first_step = self.workflow.steps.get(sequence=1)
+        responses = [{'field': self.number.pk, 'value': 'MSCU1234567'}, {'field': self.weight.pk, 'value': 1500}]
+        response = self._submit('offline-1', responses, step=first_step)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            (response.data['responses_created'], response.data['current_step_number'], response.data['total_steps']),
+            (2, 1, 3),
+        )
+        self.assertEqual(response.data['current_step'], self.workflow.steps.get(sequence=2).pk)
+        self.assertEqual(response.data['progress_percentage'], 33.33)
+
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.status, 'IN_PROGRESS')
+        self.assertEqual(self.execution.execution_data[str(first_step.pk)][str(self.weight.pk)], 1500)
+        step_execution = WorkflowStepExecution.objects.get(execution=self.execution, step=first_step)
+        self.assertEqual((step_execution.status, step_execution.completed_by), ('COMPLETED', self.user))
+        self.assertEqual(step_execution.step_data, {str(self.number.pk): 'MSCU1234567', str(self.weight.pk): 1500})
+
+        # Reenvio após perder a resposta: mesmo resultado, nada gravado de novo
+        retry = self._submit('offline-1', responses, step=first_step)
+        self.assertEqual(retry.status_code, 200)
+        self.assertTrue(retry.data['replayed'])
+        self.assertEqual({**retry.data, 'replayed': False}, {**response.data, 'replayed': False})
+        self.assertEqual(WorkflowFormResponse.objects.filter(execution=self.execution).count(), 2)
+        self.assertEqual(WorkflowSubmission.objects.filter(execution=self.execution).count(), 1)
+
+    def test_responses_are_upserted(self):
+        first_step = self.workflow.steps.get(sequence=1)
+        self._submit('a', [{'field': self.number.pk, 'value': 'MSCU1234567'}], step=first_step)
+        response = self._submit(
+            'b', [{'field': self.number.pk, 'value': 'MSCU7654321'}], step=first_step, HTTP_IDEMPOTENCY_KEY='ignored'
+        )
+        self.assertEqual((response.data['responses_created'], response.data['responses_updated']), (0, 1))
+        self.assertEqual(
+            list(WorkflowFormResponse.objects.filter(execution=self.execution).values_list('value', flat=True)),
+            ['MSCU7654321'],
+        )
+        self.assertEqual(validate_execution(self.execution), [])
+
+    def test_invalid_batch_returns_all_errors_and_writes_nothing(self):
+        response = self._submit('bad', [
+            {'field': self.number.pk, 'value': 'x'},
+            {'field': self.weight.pk, 'value': '2000'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            {(error['field'], error['message']) for error in response.data['errors']},
+            {(self.number.pk, 'Formato inválido'), (self.lashing.pk, 'Campo obrigatório')},
+        )
+        self.assertFalse(WorkflowFormResponse.objects.exists())
+        self.assertFalse(WorkflowSubmission.objects.exists())
+
+        # Campo de outra etapa
+        response = self._submit('bad-2', [{'field': self.lashing.pk, 'value': 'OK'}], step=self.workflow.steps.get(sequence=1))
+        self.assertEqual(response.data['errors'][0]['message'], 'Campo não pertence à etapa')
+        self.assertEqual(self._submit('', []).status_code, 400)
+
+    def test_whole_execution_batch(self):
+        response = self._submit('all', [
+            {'field': self.number.pk, 'value': 'MSCU1234567'},
+            {'field': self.weight.pk, 'value': '2000'},
+            {'field': self.lashing.pk, 'value': 'OK'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        # Etapas de formulário concluídas; a de fotos continua pendente
+        self.assertEqual((response.data['current_step_number'], response.data['total_steps']), (2, 3))
+        self.assertEqual(response.data['current_step'], self.workflow.steps.get(sequence=2).pk)
+        self.assertEqual(WorkflowStepExecution.objects.filter(execution=self.execution, status='COMPLETED').count(), 2)
+        self.assertEqual(validate_execution(self.execution), [])
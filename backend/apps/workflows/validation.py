@@ -0,0 +1,391 @@
+"""
+Server-side evaluation of workflow conditions and field validation for Workflows app
+The step conditions (condition_field/operator/value), the field rules
+(is_required, pattern, min/max_value, min/max_length, options, field type)
+and the field display conditions (show_if_*) of a compiled definition
+(definitions.py) are turned into closures once: regexes are compiled,
+limits parsed and operators resolved up front. The resulting
+WorkflowValidator is kept on the CompiledWorkflow, so there is one per
+workflow version per process.
+
+A submission (execution_data plus WorkflowFormResponse rows) is validated in
+a single pass over the steps and returns every error at once. Submitted
+values are keyed by field id (as the app posts step_data); conditions may
+reference a field by id or by label.
+"""
+import json
+import logging
+import re
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+
+from .definitions import get_definition
+
+logger = logging.getLogger(__name__)
+
+EMAIL_RE = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
+URL_RE = re.compile(r'^https?://\S+$', re.IGNORECASE)
+PHONE_RE = re.compile(r'^\+?[\d\s().-]{8,20}$')
+TRUE_VALUES = {'true', '1', 'on', 'yes', 'sim'}
+
+
+def is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return '' if value is None else str(value).strip()
+
+
+def _number(value):
+    if isinstance(value, bool) or is_empty(value):
+        return None
+    try:
+        return Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        return None
+
+
+def _items(value):
+    """Valores de um campo múltiplo (lista JSON, lista ou texto separado por vírgulas)"""
+    if isinstance(value, (list, tuple)):
+        return [_text(item) for item in value]
+    text = _text(value)
+    if text.startswith('['):
+        try:
+            return [_text(item) for item in json.loads(text)]
+        except ValueError:
+            pass
+    return [item.strip() for item in text.split(',') if item.strip()]
+
+
+def _compare(cast, test):
+    """Operador que converte o valor esperado uma vez e o valor informado a cada avaliação"""
+    def build(expected):
+        expected = cast(expected)
+
+        def predicate(actual):
+            actual = cast(actual)
+            return actual is not None and expected is not None and test(actual, expected)
+        return predicate
+    return build
+
+
+def _membership(negate):
+    def build(expected):
+        options = {item.strip() for item in _text(expected).split(',')}
+        return lambda actual: any(item in options for item in _items(actual)) != negate
+    return build
+
+
+def _equals(negate):
+    def build(expected):
+        expected = _text(expected).casefold()
+
+        def predicate(actual):
+            if isinstance(actual, (list, tuple)):
+                found = any(_text(item).casefold() == expected for item in actual)
+            else:
+                found = _text(actual).casefold() == expected
+            return found != negate
+        return predicate
+    return build
+
+
+def _contains(negate):
+    def build(expected):
+        expected = _text(expected).casefold()
+
+        def predicate(actual):
+            if isinstance(actual, (list, tuple)):
+                found = any(_text(item).casefold() == expected for item in actual)
+            else:
+                found = expected in _text(actual).casefold()
+            return found != negate
+        return predicate
+    return build
+
+
+# {operador: construtor(valor esperado) -> predicado(valor informado)}
+OPERATORS = {
+    'equals': _equals(False),
+    'not_equals': _equals(True),
+    'contains': _contains(False),
+    'not_contains': _contains(True),
+    'greater_than': _compare(_number, lambda a, b: a > b),
+    'greater_or_equal': _compare(_number, lambda a, b: a >= b),
+    'less_than': _compare(_number, lambda a, b: a < b),
+    'less_or_equal': _compare(_number, lambda a, b: a <= b),
+    'in': _membership(False),
+    'not_in': _membership(True),
+    'is_empty': lambda expected: is_empty,
+    'is_not_empty': lambda expected: lambda actual: not is_empty(actual),
+}
+OPERATOR_ALIASES = {
+    '=': 'equals', '==': 'equals', 'eq': 'equals', '!=': 'not_equals', 'ne': 'not_equals',
+    '>': 'greater_than', 'gt': 'greater_than', '>=': 'greater_or_equal', 'gte': 'greater_or_equal',
+    '<': 'less_than', 'lt': 'less_than', '<=': 'less_or_equal', 'lte': 'less_or_equal',
+    'empty': 'is_empty', 'not_empty': 'is_not_empty',
+}
+
+
+def compile_condition(field_key, operator, expected, resolve):
+    """
+    Predicado (valores -> bool) de uma condição; None quando não há condição
+
+    Args:
+        field_key: Campo referenciado (id ou rótulo)
+        operator: Nome do operador (OPERATORS ou OPERATOR_ALIASES); vazio = equals
+        expected: Valor de comparação
+        resolve: Função que converte id/rótulo no id do campo
+    """
+    if not field_key:
+        return None
+    name = (operator or 'equals').strip().lower()
+    name = OPERATOR_ALIASES.get(name, name)
+    build = OPERATORS.get(name)
+    if build is None:
+        logger.warning(f"Operador de condição desconhecido '{operator}': condição ignorada")
+        return None
+    field_id = resolve(field_key)
+    test = build(expected)
+    return lambda values: test(values.get(field_id))
+
+
+def _parse_date(cast):
+    def check(value):
+        try:
+            cast(_text(value))
+        except ValueError:
+            return 'Data/hora inválida'
+        return None
+    return check
+
+
+def _option_values(options):
+    if isinstance(options, dict):
+        # Formato dos workflows padrão: {'choices': [...]}
+        options = options.get('choices', [])
+    values = set()
+    for option in options or []:
+        if isinstance(option, dict):
+            option = option.get('value', option.get('label'))
+        values.add(_text(option))
+    return values
+
+
+def compile_field(field):
+    """
+    Validador (valor -> lista de erros) de um campo da definição compilada
+
+    Todas as regras são resolvidas aqui; o validador só compara.
+    """
+    field_type = field['field_type']
+    checks = []
+
+    if field_type == 'NUMBER':
+        minimum, maximum = _number(field['min_value']), _number(field['max_value'])
+
+        def check_number(value):
+            number = _number(value)
+            if number is None:
+                return ['Número inválido']
+            errors = []
+            if minimum is not None and number < minimum:
+                errors.append(f"Valor mínimo: {field['min_value']}")
+            if maximum is not None and number > maximum:
+                errors.append(f"Valor máximo: {field['max_value']}")
+            return errors
+        checks.append(check_number)
+    elif field_type in ('SELECT', 'RADIO', 'MULTISELECT') and field['options']:
+        options = _option_values(field['options'])
+        many = field_type == 'MULTISELECT'
+
+        def check_options(value):
+            selected = _items(value) if many else [_text(value)]
+            return [] if all(item in options for item in selected) else ['Opção inválida']
+        checks.append(check_options)
+    else:
+        simple = {
+            'EMAIL': (EMAIL_RE, 'Email inválido'),
+            'URL': (URL_RE, 'URL inválida'),
+            'PHONE': (PHONE_RE, 'Telefone inválido'),
+        }.get(field_type)
+        if simple:
+            regex, message = simple
+            checks.append(lambda value: [] if regex.match(_text(value)) else [message])
+        parser = {
+            'DATE': _parse_date(date.fromisoformat),
+            'TIME': _parse_date(time.fromisoformat),
+            'DATETIME': _parse_date(datetime.fromisoformat),
+        }.get(field_type)
+        if parser:
+            checks.append(lambda value: [error] if (error := parser(value)) else [])
+
+    if field_type not in ('NUMBER', 'MULTISELECT', 'CHECKBOX', 'FILE'):
+        min_length, max_length = field['min_length'], field['max_length']
+        if min_length or max_length:
+            def check_length(value):
+                length = len(_text(value))
+                errors = []
+                if min_length and length < min_length:
+                    errors.append(f'Mínimo {min_length} caracteres')
+                if max_length and length > max_length:
+                    errors.append(f'Máximo {max_length} caracteres')
+                return errors
+            checks.append(check_length)
+        if field['pattern']:
+            try:
+                pattern = re.compile(field['pattern'])
+            except re.error as e:
+                logger.warning(f"Padrão inválido no campo {field['id']} ({field['label']}): {e}")
+            else:
+                checks.append(lambda value: [] if pattern.fullmatch(_text(value)) else ['Formato inválido'])
+
+    required = field['is_required']
+    checkbox = field_type == 'CHECKBOX'
+
+    def validate(value):
+        if checkbox:
+            value = value if isinstance(value, bool) else _text(value).lower() in TRUE_VALUES
+            return ['Campo obrigatório'] if required and not value else []
+        if is_empty(value):
+            return ['Campo obrigatório'] if required else []
+        errors = []
+        for check in checks:
+            errors.extend(check(value))
+        return errors
+
+    return validate
+
+
+class WorkflowValidator:
+    """Condições e validadores compilados de uma versão do workflow"""
+
+    def __init__(self, definition):
+        self.version = definition['version']
+        by_label = {}
+        self.field_ids = set()
+        for step in definition['steps']:
+            for form in step['forms']:
+                for field in form['fields']:
+                    self.field_ids.add(field['id'])
+                    by_label.setdefault(field['label'].casefold(), field['id'])
+
+        def resolve(key):
+            text = _text(key)
+            if text.isdigit() and int(text) in self.field_ids:
+                return int(text)
+            return by_label.get(text.casefold(), text)
+
+        # [(step_id, condição, [(field_id, form_id, visibilidade, validador)])]
+        self.steps = []
+        self.field_steps = {}  # field_id -> [(step_id, form_id)] na ordem das etapas
+        for step in definition['steps']:
+            fields = []
+            seen = set()
+            for form in step['forms']:
+                for field in form['fields']:
+                    if field['id'] in seen:
+                        continue
+                    seen.add(field['id'])
+                    self.field_steps.setdefault(field['id'], []).append((step['id'], form['id']))
+                    show_if = compile_condition(field['show_if_field'], 'equals', field['show_if_value'], resolve)
+                    fields.append((field['id'], form['id'], show_if, compile_field(field)))
+            condition = compile_condition(
+                step['condition_field'], step['condition_operator'], step['condition_value'], resolve
+            )
+            self.steps.append((step['id'], condition, fields))
+        self.step_ids = [step_id for step_id, _, _ in self.steps]
+
+    def active_steps(self, values):
+        """Ids das etapas cuja condição é satisfeita pelos valores"""
+        return [step_id for step_id, condition, _ in self.steps if condition is None or condition(values)]
+
+    def validate(self, values):
+        """
+        Valida uma submissão inteira em uma passada
+
+        Args:
+            values: {field_id (int): valor}
+
+        Returns:
+            Lista de erros ({'step', 'form', 'field', 'message'}); vazia se válida
+        """
+        errors = [
+            {'step': None, 'form': None, 'field': field_id, 'message': 'Campo não pertence ao workflow'}
+            for field_id in values if field_id not in self.field_ids
+        ]
+        for step_id, condition, fields in self.steps:
+            if condition is not None and not condition(values):
+                continue
+            for field_id, form_id, show_if, validate in fields:
+                if show_if is not None and not show_if(values):
+                    continue
+                for message in validate(values.get(field_id)):
+                    errors.append({'step': step_id, 'form': form_id, 'field': field_id, 'message': message})
+        return errors
+
+
+def get_validator(workflow):
+    """Validador da versão atual do workflow (compilado uma vez por versão)"""
+    compiled = get_definition(workflow)
+    validator = compiled.validator
+    if validator is None:
+        validator = compiled.validator = WorkflowValidator(compiled.data)
+    return validator
+
+
+def submission_values(execution_data=None, responses=(), step_ids=()):
+    """
+    Valores de uma submissão por id de campo
+
+    execution_data aceita {field_id: valor} ou {step_id: {field_id: valor}}
+    (step_data por etapa, step_id entre step_ids); fora disso um dict é o
+    próprio valor do campo (ex.: metadados de FILE). Respostas
+    (WorkflowFormResponse ou dicts com field/value) prevalecem sobre
+    execution_data.
+    """
+    values = {}
+    step_keys = {str(step_id) for step_id in step_ids}
+
+    def collect(data, nested=False):
+        for key, value in (data or {}).items():
+            key = _text(key)
+            if not nested and key in step_keys and isinstance(value, dict):
+                collect(value, nested=True)
+            elif key.isdigit():
+                values[int(key)] = value
+    collect(execution_data)
+    for response in responses:
+        if isinstance(response, dict):
+            values[int(response['field'])] = response.get('value')
+        else:
+            values[response.field_id] = response.value
+    return values
+
+
+def validate_execution(execution, execution_data=None, responses=None):
+    """
+    Valida a submissão de uma execução contra a versão atual do workflow
+
+    Args:
+        execution: WorkflowExecution
+        execution_data: Dados a validar (padrão: execution.execution_data)
+        responses: Lote de respostas (padrão: as WorkflowFormResponse gravadas)
+
+    Returns:
+        Lista de erros; vazia se a submissão é válida
+    """
+    if responses is None:
+        responses = [
+            {'field': field_id, 'value': value}
+            for field_id, value in execution.form_responses.order_by('answered_at', 'id').values_list('field_id', 'value')
+        ]
+    validator = get_validator(execution.workflow)
+    values = submission_values(
+        execution.execution_data if execution_data is None else execution_data, responses, validator.step_ids
+    )
+    return validator.validate(values)
@@ -5,8 +5,16 @@ Complete ViewSets for workflow management
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from apps.core.permissions import IsAuthenticated, IsSameCompany, IsAdminOrManager
+from apps.core.mixins import SparseFieldsetMixin
+from .cloning import clone_workflow
+from .definitions import get_definition
+from .submissions import SubmissionError, submit_responses
+from .validation import validate_execution
 from .models import (
     Workflow, WorkflowStep, WorkflowForm, WorkflowFormField,
     WorkflowExecution, WorkflowStepExecution
@@ -18,7 +26,7 @@ from .serializers import (
 )
 
 
-class WorkflowViewSet(viewsets.ModelViewSet):
+class WorkflowViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """CRUD for Workflows"""
     queryset = Workflow.objects.all()
     permission_classes = [IsAuthenticated, IsAdminOrManager]
@@ -27,7 +35,12 @@ class WorkflowViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'code']
     
     def get_queryset(self):
-        return self.queryset.filter(company=self.request.user.company)
+        queryset = self.queryset.filter(company=self.request.user.company)
+        if self.action == 'list':
+            queryset = queryset.annotate(step_total=Count('steps')).order_by('name', 'id')
+        elif self.action == 'retrieve':
+            queryset = queryset.prefetch_related('steps__form_links__form__fields')
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -40,35 +53,29 @@ class WorkflowViewSet(viewsets.ModelViewSet):
             created_by=self.request.user
         )
     
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def definition(self, request, pk=None):
+        """
+        Compiled definition (steps, forms, fields and conditions) for the mobile app
+
+        Served from the per-version cache with an ETag; If-None-Match gets a 304.
+        """
+        workflow = self.get_object()
+        compiled = get_definition(workflow)
+        if compiled.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(compiled.body, content_type='application/json')
+        response['ETag'] = compiled.etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
     @action(detail=True, methods=['post'])
     def duplicate(self, request, pk=None):
-        """Duplicate a workflow"""
+        """Duplicate a workflow with its steps, forms and fields"""
         workflow = self.get_object()
-        new_workflow = Workflow.objects.create(
-            company=workflow.company,
-            name=f"{workflow.name} (Copy)",
-            description=workflow.description,
-            code=f"{workflow.code}_copy",
-            inspection_type=workflow.inspection_type,
-            requires_approval=workflow.requires_approval,
-            allow_skip_steps=workflow.allow_skip_steps,
-            auto_generate_report=workflow.auto_generate_report,
-            version=1,
-            created_by=request.user
-        )
-        # Copy steps
-        for step in workflow.steps.all():
-            WorkflowStep.objects.create(
-                workflow=new_workflow,
-                name=step.name,
-                description=step.description,
-                step_type=step.step_type,
-                sequence=step.sequence,
-                is_required=step.is_required,
-                is_skippable=step.is_skippable,
-                config=step.config
-            )
-        return Response({'id': new_workflow.id, 'name': new_workflow.name})
+        new_workflow = clone_workflow(workflow, created_by=request.user, name=f"{workflow.name} (Copy)")
+        return Response({'id': new_workflow.id, 'name': new_workflow.name, 'code': new_workflow.code})
 
 
 class WorkflowStepViewSet(viewsets.ModelViewSet):
@@ -113,7 +120,7 @@ class WorkflowFormFieldViewSet(viewsets.ModelViewSet):
         return self.queryset.filter(form__company=self.request.user.company)
 
 
-class WorkflowExecutionViewSet(viewsets.ModelViewSet):
+class WorkflowExecutionViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """CRUD for Workflow Executions"""
     queryset = WorkflowExecution.objects.all()
     serializer_class = WorkflowExecutionSerializer
@@ -122,7 +129,10 @@ class WorkflowExecutionViewSet(viewsets.ModelViewSet):
     filterset_fields = ['workflow', 'inspection', 'status']
     
     def get_queryset(self):
-        return self.queryset.filter(workflow__company=self.request.user.company)
+        queryset = self.queryset.filter(workflow__company=self.request.user.company)
+        if self.action in ('validate', 'complete'):
+            queryset = queryset.select_related('workflow')
+        return queryset
     
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
@@ -134,18 +144,72 @@ class WorkflowExecutionViewSet(viewsets.ModelViewSet):
         execution.save()
         return Response({'status': 'Workflow started'})
     
+    @action(detail=True, methods=['post'])
+    def validate(self, request, pk=None):
+        """
+        Validate a submission against the workflow conditions and field rules
+
+        Body (optional): execution_data and responses ([{field, value}]); defaults
+        to the data already stored in the execution. All errors are returned together.
+        """
+        execution = self.get_object()
+        execution_data = request.data.get('execution_data')
+        responses = request.data.get('responses')
+        if execution_data is not None and not isinstance(execution_data, dict):
+            return Response({'error': 'execution_data deve ser um objeto'}, status=status.HTTP_400_BAD_REQUEST)
+        if responses is not None and not isinstance(responses, list):
+            return Response({'error': 'responses deve ser uma lista'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            errors = validate_execution(execution, execution_data, responses)
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'Respostas inválidas: informe field e value'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'valid': not errors, 'errors': errors})
+    
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """
+        Submit a batch of form responses (one step or the whole execution)
+
+        Body: submission_key (or Idempotency-Key header), step (optional) and
+        responses ([{field, value, file_url}]). Retries with the same key return
+        the original result.
+        """
+        execution = self.get_object()
+        responses = request.data.get('responses')
+        if not isinstance(responses, list):
+            return Response({'error': 'responses deve ser uma lista'}, status=status.HTTP_400_BAD_REQUEST)
+        step = request.data.get('step')
+        try:
+            step = int(step) if step not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({'error': 'step deve ser o id de uma etapa'}, status=status.HTTP_400_BAD_REQUEST)
+        key = request.data.get('submission_key') or request.headers.get('Idempotency-Key')
+        try:
+            result, replayed = submit_responses(execution.pk, key, responses, step_id=step, user=request.user)
+        except SubmissionError as e:
+            return Response({'error': e.message, 'errors': e.errors}, status=e.status_code)
+        return Response(
+            {**result, 'replayed': replayed},
+            status=status.HTTP_200_OK if replayed else status.HTTP_201_CREATED
+        )
+    
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         """Complete workflow execution"""
         from django.utils import timezone
         execution = self.get_object()
+        errors = validate_execution(execution)
+        if errors:
+            return Response(
+                {'error': 'Submissão inválida', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST
+            )
         execution.status = 'COMPLETED'
         execution.completed_at = timezone.now()
         execution.save()
         return Response({'status': 'Workflow completed'})
 
 
-class WorkflowStepExecutionViewSet(viewsets.ModelViewSet):
+class WorkflowStepExecutionViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """CRUD for Step Executions"""
     queryset = WorkflowStepExecution.objects.all()
     serializer_class = WorkflowStepExecutionSerializer
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'apps.analytics',
     'apps.issues',
     'apps.cargosnap_integration',
+    'apps.search',
 ]
 
 MIDDLEWARE = [
@@ -204,6 +205,77 @@ MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE
 FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE
 
+# Resumable (chunked) photo uploads
+CHUNKED_UPLOAD_TEMP_DIR = MEDIA_ROOT / 'uploads' / 'tmp'
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = config('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', default=5 * 1024 * 1024, cast=int)
+CHUNKED_UPLOAD_EXPIRATION_HOURS = config('CHUNKED_UPLOAD_EXPIRATION_HOURS', default=24, cast=int)
+
+# Background tasks (in-process worker pool, see apps/core/tasks.py)
+BACKGROUND_TASK_WORKERS = config('BACKGROUND_TASK_WORKERS', default=4, cast=int)
+BACKGROUND_TASKS_EAGER = config('BACKGROUND_TASKS_EAGER', default=False, cast=bool)
+
+# Reference numbers reserved per process in one round trip (apps/core/sequences.py)
+REFERENCE_BLOCK_SIZE = config('REFERENCE_BLOCK_SIZE', default=20, cast=int)
+
+# Full-text search (apps/search). Backend chosen by database vendor unless set.
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='') or None
+SEARCH_POSTGRES_CONFIG = 'portuguese'
+SEARCH_FILTER_RANKED_RESULTS = 1000  # ?search= list matches ordered by relevance; further matches follow the default ordering
+
+# Photo post-processing
+PHOTO_THUMBNAIL_SIZE = (400, 400)
+PHOTO_RETAIN_EXIF = config('PHOTO_RETAIN_EXIF', default=False, cast=bool)
+PHOTO_DUPLICATE_MAX_DISTANCE = 6  # Hamming distance between 64-bit dHashes
+PHOTO_HASH_INDEX_TTL = 300  # Seconds before the in-memory BK-tree is rebuilt from the DB
+
+# Bulk inspection creation from CargoSnap files (apps/cargosnap_integration/bulk_import.py)
+CARGOSNAP_IMPORT_CHUNK_SIZE = 50  # Files written per transaction
+CARGOSNAP_IMPORT_IO_WORKERS = config('CARGOSNAP_IMPORT_IO_WORKERS', default=8, cast=int)
+CARGOSNAP_IMPORT_LINK_IMAGES = config('CARGOSNAP_IMPORT_LINK_IMAGES', default=False, cast=bool)  # Hard links instead of copies
+CARGOSNAP_IMPORT_SYNC_LIMIT = 20  # Larger batches run as a background CargoSnapImportJob
+CARGOSNAP_BULK_IMPORT_MAX_FILES = 1000
+
+# Dashboard statistics cache (apps/analytics/dashboard.py). Version bumps only reach
+# other processes when CACHES points to a shared backend; otherwise entries expire
+# after the timeout.
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+# Daily DashboardMetric rollups (apps/analytics/metrics.py, rollup_dashboard_metrics).
+# Analytics endpoints fall back to live queries when the last run is older than this.
+DASHBOARD_METRICS_MAX_AGE = config('DASHBOARD_METRICS_MAX_AGE', default=3600, cast=int)
+DASHBOARD_METRICS_OVERLAP = 300  # Seconds re-read before the last run's start, for transactions that commit after stamping updated_at
+
+# CSV/XLSX exports (apps/reports/exports.py)
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per database round trip
+EXPORT_SYNC_MAX_ROWS = config('EXPORT_SYNC_MAX_ROWS', default=50000, cast=int)  # Larger exports run as an ExportJob
+
+# PDF reports (apps/reports/generation.py). Rendering runs in a pool of separate
+# processes; 0 renders in the background worker thread itself.
+REPORT_RENDER_PROCESSES = config('REPORT_RENDER_PROCESSES', default=2, cast=int)
+REPORT_RENDER_TIMEOUT = 300  # Seconds before a render is reported as FAILED
+REPORT_PAGE_SIZE = 'A4'  # Default when the template styling has no page_size (A4 or LETTER)
+REPORT_PHOTO_DPI = 150  # Photos are downscaled to this resolution at their printed size
+REPORT_PHOTO_JPEG_QUALITY = 80
+
+# Latest photos/comments/tasks/history rows inlined in the issue detail (apps/issues/previews.py)
+ISSUE_PREVIEW_SIZE = 5
+
+# Issues created from CargoSnap damage uploads (apps/issues/damage_issues.py)
+ISSUE_AUTOCREATE_CHUNK_SIZE = 500  # Uploads read and written per transaction
+
+# Issue SLA deadlines (apps/issues/sla.py, run_sla_worker)
+SLA_WARNING_RATIO = 0.8  # Warn once this fraction of the SLA window has elapsed
+SLA_POLL_INTERVAL = config('SLA_POLL_INTERVAL', default=30, cast=int)  # Max seconds before the worker picks up issue writes
+SLA_REFRESH_OVERLAP = 300  # Seconds re-read before each poll, for transactions that commit after stamping updated_at
+
+# Outgoing webhooks (apps/core/webhooks.py)
+WEBHOOK_TIMEOUT = 10
+
+# Compiled workflow definitions (apps/workflows/definitions.py). Keys include the
+# workflow version, so entries are never invalidated, only superseded.
+WORKFLOW_DEFINITION_CACHE_SIZE = 256  # Versions kept in each process
+WORKFLOW_DEFINITION_CACHE_TIMEOUT = config('WORKFLOW_DEFINITION_CACHE_TIMEOUT', default=86400, cast=int)
+
 ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/webp', 'image/heic']
 ALLOWED_VIDEO_TYPES = ['video/mp4', 'video/quicktime', 'video/x-msvideo']
 ALLOWED_DOCUMENT_TYPES = ['application/pdf', 'application/msword', 
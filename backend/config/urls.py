@@ -37,6 +37,7 @@ urlpatterns = [
     path('api/analytics/', include('apps.analytics.urls')),
     path('api/issues/', include('apps.issues.urls')),
     path('api/cargosnap/', include('apps.cargosnap_integration.urls')),
+    path('api/search/', include('apps.search.urls')),
 ]
 
 # Serve media files in development